@@ -59,7 +59,7 @@ install_audio() {
     
     sudo apt-get update -y
     
-    # Chỉ cài những gì cần thiết cho audio
+    # Chỉ cài những gì cần thiết cho audio (ffmpeg: giải mã MP3/AAC cho bus nhạc)
     sudo apt-get install -y \
         alsa-utils \
         libportaudio2 \
@@ -67,6 +67,7 @@ install_audio() {
         libsndfile1 \
         libopus0 \
         libopus-dev \
+        ffmpeg \
         2>&1 | tee -a "$LOG_FILE"
     
     # Thêm user vào group audio
@@ -106,6 +107,11 @@ install_python_deps() {
         sherpa-onnx \
         2>&1 | tee -a "$LOG_FILE"
     
+    # Tùy chọn: uvloop cho --mode cli (không cài được thì app dùng vòng lặp asyncio chuẩn)
+    pip3 install --user --break-system-packages uvloop 2>&1 | tee -a "$LOG_FILE" || \
+    pip3 install --user uvloop 2>&1 | tee -a "$LOG_FILE" || \
+    log "uvloop không cài được, dùng vòng lặp asyncio chuẩn"
+    
     log "✓ Python dependencies đã cài đặt"
 }
 
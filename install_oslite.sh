@@ -301,6 +301,7 @@ install_audio_network() {
         libsndfile1 \
         libopus0 \
         libopus-dev \
+        ffmpeg \
         network-manager \
         2>&1 | tee -a "$LOG_FILE"
     
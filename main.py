@@ -11,7 +11,20 @@ from pathlib import Path
 os.environ.setdefault("GST_AUDIO_SINK", "fakesink")
 os.environ.setdefault("PULSE_SINK", "null")
 
-from src.application import Application
+# --profile-startup: đo import phải bắt đầu trước khi import src.application
+_import_profiler = None
+if "--profile-startup" in sys.argv:
+    from src.utils.import_profiler import ImportProfiler
+
+    _import_profiler = ImportProfiler().start()
+
+try:
+    from src.application import Application
+except ImportError:
+    # Khi đo import: vẫn báo cáo (module lỗi được đánh dấu trong cây import)
+    if _import_profiler is None:
+        raise
+    Application = None
 from src.utils.logging_config import get_logger, setup_logging
 
 logger = get_logger(__name__)
@@ -44,9 +57,72 @@ def parse_args():
         action="store_true",
         help="Chạy ứng dụng không cần hệ thống âm thanh (cấu hình/bảo trì)",
     )
+    parser.add_argument(
+        "--loop",
+        choices=["auto", "uvloop", "asyncio"],
+        default=None,
+        help="Vòng lặp sự kiện cho chế độ cli (mặc định theo SYSTEM_OPTIONS.EVENT_LOOP, auto = uvloop nếu có)",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Đo thời gian/RSS import khi khởi động, so với ngân sách rồi thoát",
+    )
+    parser.add_argument(
+        "--import-budget",
+        default=None,
+        help="File ngân sách import (mặc định config/import_budget.json)",
+    )
+    parser.add_argument(
+        "--update-budget",
+        action="store_true",
+        help="Cùng --profile-startup: ghi kết quả đo làm ngân sách mới",
+    )
     return parser.parse_args()
 
 
+# Module khởi động được import lười trong Application.run/plugin (cũng tính vào chi phí khởi động)
+STARTUP_LAZY_MODULES = [
+    "src.core.system_initializer",
+    "src.plugins.audio",
+    "src.audio_processing.wake_word_detect",
+    "src.network.web_settings",
+    "src.mcp.tools.calendar",
+]
+
+
+def profile_startup(args) -> int:
+    """
+    Hoàn tất đo import (kèm module khởi động lười), in báo cáo và so với ngân sách.
+
+    Trả về 1 nếu có nhóm vượt ngân sách.
+    """
+    from src.utils.import_profiler import DEFAULT_BUDGET_PATH, load_budget
+
+    modules = list(STARTUP_LAZY_MODULES)
+    modules.append("src.display.gui_display" if args.mode == "gui" else "src.display.cli_display")
+    for name in modules:
+        error = _import_profiler.import_optional(name)
+        if error:
+            print(f"⚠️ Không import được {name}: {error}")
+    _import_profiler.stop()
+
+    budget_path = Path(args.import_budget) if args.import_budget else DEFAULT_BUDGET_PATH
+    if args.update_budget:
+        import json
+
+        budget_path.write_text(
+            json.dumps(_import_profiler.make_budget(), indent=2) + "\n", encoding="utf-8"
+        )
+        _import_profiler.print_report()
+        print(f"\n💾 Đã ghi ngân sách mới: {budget_path}")
+        return 0
+    budget = load_budget(budget_path)
+    if budget is None:
+        print(f"⚠️ Không có file ngân sách {budget_path}")
+    return 1 if _import_profiler.print_report(budget) else 0
+
+
 async def handle_activation(mode: str) -> bool:
     """Xử lý quy trình kích hoạt thiết bị, phụ thuộc vào vòng lặp sự kiện hiện có.
 
@@ -161,6 +237,9 @@ if __name__ == "__main__":
     exit_code = 1
     try:
         args = parse_args()
+        if _import_profiler is not None:
+            exit_code = profile_startup(args)
+            sys.exit(exit_code)
         setup_logging()
 
         # Phát hiện môi trường Wayland và thiết lập cấu hình plugin nền tảng Qt
@@ -205,6 +284,9 @@ if __name__ == "__main__":
                 logger.error(f"Chế độ GUI yêu cầu thư viện qasync và PyQt5: {e}")
                 sys.exit(1)
 
+            if args.loop == "uvloop":
+                logger.warning("--loop uvloop chỉ áp dụng cho --mode cli, GUI dùng vòng lặp qasync")
+
             qt_app = QApplication.instance() or QApplication(sys.argv)
 
             loop = qasync.QEventLoop(qt_app)
@@ -222,9 +304,16 @@ if __name__ == "__main__":
                     start_app(args.mode, args.protocol, args.skip_activation, args.no_audio)
                 )
         else:
-            # Chế độ CLI sử dụng vòng lặp sự kiện asyncio tiêu chuẩn
-            exit_code = asyncio.run(
-                start_app(args.mode, args.protocol, args.skip_activation, args.no_audio)
+            # Chế độ CLI: uvloop nếu có (không có Qt), tự quay về vòng lặp asyncio chuẩn
+            from src.utils import event_loop
+            from src.utils.config_manager import ConfigManager
+
+            loop_preference = args.loop or ConfigManager.get_instance().get_config(
+                "SYSTEM_OPTIONS.EVENT_LOOP", "auto"
+            )
+            exit_code = event_loop.run(
+                start_app(args.mode, args.protocol, args.skip_activation, args.no_audio),
+                loop_preference,
             )
 
     except KeyboardInterrupt:
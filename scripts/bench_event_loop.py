@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark vòng lặp sự kiện: asyncio chuẩn so với uvloop trên cùng phần cứng.
+
+Đo các công việc gắn với vòng lặp ở chế độ CLI/headless:
+- GỬI: số khung âm thanh/giây qua WebsocketProtocol.send_audio tới máy chủ WebSocket cục bộ
+  (client và server cùng một vòng lặp, như khi chạy cùng standin_server).
+- HTTP: độ trễ yêu cầu aiohttp (p50/p95/p99) tới máy chủ aiohttp cục bộ, nhiều yêu cầu song song
+  như dashboard web cài đặt.
+
+Mỗi vòng lặp chạy trong tiến trình riêng để kết quả không ảnh hưởng lẫn nhau.
+
+Chạy: python scripts/bench_event_loop.py [--frames 20000] [--size 120] [--requests 2000]
+          [--concurrency 8] [--loop asyncio|uvloop]
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import websockets
+from aiohttp import ClientSession, web
+
+# Thêm thư mục gốc dự án vào path
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from src.protocols.websocket_protocol import WebsocketProtocol  # noqa: E402
+from src.utils import event_loop  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+async def bench_send(frames: int, size: int) -> dict:
+    received = 0
+    done = asyncio.Event()
+
+    async def handler(websocket, path=None):
+        nonlocal received
+        async for message in websocket:
+            if isinstance(message, bytes):
+                received += 1
+                if received >= frames:
+                    done.set()
+
+    server = await websockets.serve(handler, "127.0.0.1", 0, max_queue=None)
+    port = server.sockets[0].getsockname()[1]
+    client = await websockets.connect(f"ws://127.0.0.1:{port}", max_queue=None)
+
+    protocol = WebsocketProtocol()
+    protocol.websocket = client
+    protocol.connected = True
+    frame = bytes(size)
+
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for _ in range(frames):
+        await protocol.send_audio(frame)
+    await asyncio.wait_for(done.wait(), timeout=60)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+
+    await client.close()
+    server.close()
+    await server.wait_closed()
+    return {"fps": frames / wall, "cpu_us": cpu / frames * 1e6}
+
+
+async def bench_http(requests: int, concurrency: int) -> dict:
+    payload = {"success": True, "config": {f"KEY_{i}": i for i in range(50)}}
+
+    async def handle(request):
+        return web.json_response(payload)
+
+    app = web.Application()
+    app.router.add_get("/api/config", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/api/config"
+
+    latencies = []
+    remaining = requests
+
+    async def worker(session):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            async with session.get(url) as resp:
+                await resp.read()
+            latencies.append((time.perf_counter() - started) * 1000.0)
+
+    wall = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    wall = time.perf_counter() - wall
+    await runner.cleanup()
+    return {
+        "rps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+async def bench_all(args) -> dict:
+    return {
+        "loop": event_loop.loop_impl_name(),
+        "send": await bench_send(args.frames, args.size),
+        "http": await bench_http(args.requests, args.concurrency),
+    }
+
+
+def run_child(args, loop_name: str) -> dict:
+    cmd = [
+        sys.executable, __file__, "--child", "--loop", loop_name,
+        "--frames", str(args.frames), "--size", str(args.size),
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+    ]
+    output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vòng lặp sự kiện asyncio/uvloop")
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=120, help="Kích thước khung Opus (byte)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--loop", choices=["asyncio", "uvloop"], default=None,
+                        help="Chỉ đo một vòng lặp (mặc định: tất cả vòng lặp có sẵn)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(event_loop.run(bench_all(args), args.loop)))
+        return
+
+    loops = [args.loop] if args.loop else ["asyncio"]
+    if not args.loop:
+        if event_loop.UVLOOP_AVAILABLE:
+            loops.append("uvloop")
+        else:
+            print("⚠️ uvloop chưa được cài đặt (pip install uvloop), chỉ đo asyncio")
+
+    results = {}
+    for name in loops:
+        result = run_child(args, name)
+        if result["loop"] != name:
+            print(f"⚠️ Yêu cầu {name} nhưng chạy trên {result['loop']}")
+        results[name] = result
+
+    print("=" * 60)
+    print(f"  GỬI: {args.frames} khung {args.size} byte qua WebsocketProtocol.send_audio")
+    print("=" * 60)
+    for name, r in results.items():
+        print(f"  {name:8s}: {r['send']['fps']:10.0f} khung/s, {r['send']['cpu_us']:6.2f} µs CPU/khung")
+
+    print("=" * 60)
+    print(f"  HTTP: {args.requests} yêu cầu aiohttp, {args.concurrency} song song")
+    print("=" * 60)
+    for name, r in results.items():
+        h = r["http"]
+        print(
+            f"  {name:8s}: {h['rps']:8.0f} yêu cầu/s, p50 {h['p50_ms']:.2f} ms, "
+            f"p95 {h['p95_ms']:.2f} ms, p99 {h['p99_ms']:.2f} ms"
+        )
+
+    if "asyncio" in results and "uvloop" in results:
+        base, fast = results["asyncio"], results["uvloop"]
+        print("=" * 60)
+        print(
+            f"  uvloop/asyncio: gửi x{fast['send']['fps'] / base['send']['fps']:.2f}, "
+            f"HTTP x{fast['http']['rps'] / base['http']['rps']:.2f}, "
+            f"p99 {fast['http']['p99_ms'] - base['http']['p99_ms']:+.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
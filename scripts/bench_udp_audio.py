@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark kênh âm thanh UDP (MQTT + UDP): cách cũ (thread + socket chặn + Cipher mỗi gói)
+so với cách mới (asyncio DatagramProtocol + AesCtrCodec).
+
+Đo trên loopback: số gói/giây và thời gian CPU cho mỗi gói, cả chiều gửi và nhận.
+Chiều nhận bao gồm cả chi phí đánh thức thread/event loop cho mỗi gói.
+
+Chạy: python scripts/bench_udp_audio.py [--packets 20000] [--size 120]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# Thêm thư mục gốc dự án vào path
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from src.protocols.udp_audio import AesCtrCodec, UdpAudioProtocol  # noqa: E402
+
+
+def legacy_encrypt(key_hex: str, nonce_hex: str, payload: bytes, sequence: int) -> bytes:
+    """
+    Cách dựng gói cũ của MqttProtocol.send_audio.
+    """
+    new_nonce = (
+        nonce_hex[:4] + format(len(payload), "04x") + nonce_hex[8:24] + format(sequence, "08x")
+    )
+    encryptor = Cipher(
+        algorithms.AES(bytes.fromhex(key_hex)), modes.CTR(bytes.fromhex(new_nonce))
+    ).encryptor()
+    return bytes.fromhex(new_nonce) + encryptor.update(payload) + encryptor.finalize()
+
+
+def legacy_decrypt(key_hex: str, packet: bytes) -> bytes:
+    decryptor = Cipher(
+        algorithms.AES(bytes.fromhex(key_hex)), modes.CTR(packet[:16])
+    ).decryptor()
+    return decryptor.update(packet[16:]) + decryptor.finalize()
+
+
+def bench_send(key_hex, nonce_hex, payload, count):
+    codec = AesCtrCodec(key_hex, nonce_hex)
+    results = {}
+    for name, fn in (
+        ("cũ", lambda i: legacy_encrypt(key_hex, nonce_hex, payload, i)),
+        ("mới", lambda i: codec.encrypt_packet(payload, i)),
+    ):
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for i in range(count):
+            fn(i)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        results[name] = (count / wall, cpu / count * 1e6)
+    return results
+
+
+def make_packets(key_hex, nonce_hex, payload, count):
+    codec = AesCtrCodec(key_hex, nonce_hex)
+    return [codec.encrypt_packet(payload, i) for i in range(count)]
+
+
+def blast(packets, addr, rate):
+    """
+    Gửi gói từ một tiến trình riêng với tốc độ cố định (CPU của bên gửi không bị tính).
+    """
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    for i, packet in enumerate(packets):
+        delay = start + i * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sender.sendto(packet, addr)
+    sender.close()
+
+
+async def bench_receive_legacy(key_hex, packets, rate):
+    loop = asyncio.get_running_loop()
+    received = 0
+    done = asyncio.Event()
+
+    def on_audio(data):
+        nonlocal received
+        received += 1
+        if received >= len(packets):
+            done.set()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.5)
+    running = True
+
+    def receive_thread():
+        while running:
+            try:
+                data, _ = sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            decrypted = legacy_decrypt(key_hex, data)
+            loop.call_soon_threadsafe(on_audio, decrypted)
+
+    thread = threading.Thread(target=receive_thread, daemon=True)
+    thread.start()
+    result = await _measure(sock.getsockname(), packets, rate, done, lambda: received)
+    running = False
+    sock.close()
+    thread.join(1.0)
+    return result
+
+
+async def bench_receive_new(key_hex, nonce_hex, packets, rate):
+    loop = asyncio.get_running_loop()
+    received = 0
+    done = asyncio.Event()
+
+    def on_audio(data):
+        nonlocal received
+        received += 1
+        if received >= len(packets):
+            done.set()
+
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: UdpAudioProtocol(AesCtrCodec(key_hex, nonce_hex), on_audio),
+        local_addr=("127.0.0.1", 0),
+    )
+    result = await _measure(
+        transport.get_extra_info("sockname"), packets, rate, done, lambda: received
+    )
+    transport.close()
+    return result
+
+
+async def _measure(addr, packets, rate, done, get_received):
+    sender = multiprocessing.Process(target=blast, args=(packets, addr, rate), daemon=True)
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    sender.start()
+    try:
+        await asyncio.wait_for(done.wait(), timeout=len(packets) / rate + 5)
+    except asyncio.TimeoutError:
+        pass
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    sender.join(1.0)
+    received = get_received()
+    return received, received / wall, cpu / max(1, received) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kênh âm thanh UDP")
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=120, help="Kích thước khung Opus (byte)")
+    parser.add_argument("--rate", type=int, default=2000, help="Tốc độ gửi khi đo nhận (gói/s)")
+    args = parser.parse_args()
+
+    key_hex = os.urandom(16).hex()
+    nonce_hex = "01000000" + os.urandom(8).hex() + "00000000"
+    payload = os.urandom(args.size)
+
+    print("=" * 60)
+    print(f"  GỬI: mã hóa {args.packets} khung {args.size} byte")
+    print("=" * 60)
+    for name, (pps, cpu_us) in bench_send(key_hex, nonce_hex, payload, args.packets).items():
+        print(f"  {name:4s}: {pps:10.0f} gói/s, {cpu_us:6.2f} µs CPU/gói")
+
+    print("=" * 60)
+    print(f"  NHẬN: {args.packets} gói qua loopback @ {args.rate} gói/s (bên gửi ở tiến trình khác)")
+    print("=" * 60)
+    packets = make_packets(key_hex, nonce_hex, payload, args.packets)
+    for name, coro in (
+        ("cũ", bench_receive_legacy(key_hex, packets, args.rate)),
+        ("mới", bench_receive_new(key_hex, nonce_hex, packets, args.rate)),
+    ):
+        received, pps, cpu_us = asyncio.run(coro)
+        print(
+            f"  {name:4s}: nhận {received}/{args.packets}, {pps:10.0f} gói/s, "
+            f"{cpu_us:6.2f} µs CPU/gói"
+        )
+
+
+if __name__ == "__main__":
+    main()
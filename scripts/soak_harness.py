@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Soak test dài hạn: chạy hàng nghìn lượt hội thoại giả lập qua Application và phát hiện
+rò rỉ bộ nhớ / tác vụ.
+
+Thiết bị chạy liên tục hàng tuần; AudioCodec.clear_audio_queue còn phải gọi gc.collect()
+khi xóa nhiều khung, dấu hiệu từng có áp lực bộ nhớ. Script này:
+- Dựng Application thật (giao thức, McpPlugin, IoTPlugin) nhưng thay AudioPlugin bằng
+  FakeAudioPlugin (không cần sounddevice/opuslib), kết nối tới máy chủ giả lập
+  (scripts/standin_server.py) trên loopback.
+- Mỗi lượt: listen start -> gửi khung micro -> listen stop -> nhận stt + TTS -> IDLE.
+  Định kỳ chèn loạt MCP tools/list và ngắt kết nối (kiểm tra kết nối lại).
+- SoakMonitor lấy mẫu định kỳ: snapshot tracemalloc (gom theo phân hệ src.<gói>,
+  thư viện ngoài, stdlib), RSS và số asyncio task (theo nhóm tên).
+- Cuối cùng tính xu hướng tăng (hồi quy tuyến tính sau giai đoạn khởi động) cho từng
+  chuỗi, báo chuỗi tăng đều kèm các vị trí cấp phát tăng nhiều nhất.
+
+Chạy: python scripts/soak_harness.py [--conversations 2000] [--protocol websocket|mqtt]
+          [--sample-every 50] [--mcp-every 25] [--drop-every 200] [--jitter-ms 20] [--loss 1]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Thêm thư mục gốc dự án vào path
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from src.plugins.base import Plugin  # noqa: E402
+
+_SRC_ROOT = str(project_root / "src") + os.sep
+_TASK_SUFFIX = re.compile(r"[-_:]?\d+$")
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def classify_path(filename: str) -> str:
+    """
+    Quy đường dẫn file cấp phát về phân hệ: src.<gói>, lib:<gói ngoài>, stdlib hoặc other.
+    """
+    if filename.startswith(_SRC_ROOT):
+        parts = filename[len(_SRC_ROOT):].split(os.sep)
+        name = parts[0][:-3] if len(parts) == 1 and parts[0].endswith(".py") else parts[0]
+        return f"src.{name}"
+    marker = f"{os.sep}site-packages{os.sep}"
+    if marker in filename:
+        package = filename.split(marker, 1)[1].split(os.sep)[0]
+        return f"lib:{package.split('.')[0]}"
+    if filename.startswith(sys.base_prefix) or filename.startswith("<frozen"):
+        return "stdlib"
+    return "other"
+
+
+def task_group(name: str) -> str:
+    """
+    Nhóm tên task: "plugin:on_audio" -> "plugin", "Task-123" -> "Task".
+    """
+    base = name.split(":", 1)[0]
+    return _TASK_SUFFIX.sub("", base) or base
+
+
+def trend(xs: List[float], ys: List[float]) -> Tuple[float, float]:
+    """
+    Hồi quy tuyến tính: trả về (độ dốc, R²).
+    """
+    n = len(xs)
+    if n < 2:
+        return 0.0, 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return 0.0, 0.0
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    slope = sxy / sxx
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    r2 = (sxy * sxy) / (sxx * syy) if syy else 0.0
+    return slope, r2
+
+
+def read_rss_kb() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    except Exception:
+        return None
+
+
+def count_tasks() -> Dict[str, int]:
+    groups: Dict[str, int] = {}
+    for task in asyncio.all_tasks():
+        group = task_group(task.get_name())
+        groups[group] = groups.get(group, 0) + 1
+    return groups
+
+
+@dataclass
+class SoakSample:
+    iteration: int
+    elapsed: float
+    rss_kb: Optional[int]
+    tasks: Dict[str, int]
+    subsystems: Dict[str, int] = field(default_factory=dict)
+
+
+class SoakMonitor:
+    """
+    Lấy mẫu bộ nhớ/tác vụ theo lượt và phân tích xu hướng tăng.
+    """
+
+    def __init__(
+        self,
+        frames: int = 10,
+        top: int = 10,
+        warmup: float = 0.2,
+        baseline_after: int = 1,
+        min_r2: float = 0.6,
+        rss_reader: Callable[[], Optional[int]] = read_rss_kb,
+        task_counter: Callable[[], Dict[str, int]] = count_tasks,
+        trace: bool = True,
+    ):
+        self.frames = frames
+        self.top = top
+        self.warmup = warmup
+        self.baseline_after = max(1, baseline_after)
+        self.min_r2 = min_r2
+        self._rss_reader = rss_reader
+        self._task_counter = task_counter
+        self.trace = trace
+        self.samples: List[SoakSample] = []
+        self._started_at = time.monotonic()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._last: Optional[tracemalloc.Snapshot] = None
+
+    def start(self):
+        self._started_at = time.monotonic()
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def sample(self, iteration: int) -> SoakSample:
+        subsystems: Dict[str, int] = {}
+        if self.trace and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+            for stat in snapshot.statistics("filename"):
+                key = classify_path(stat.traceback[0].filename)
+                subsystems[key] = subsystems.get(key, 0) + stat.size
+            self._last = snapshot
+            if len(self.samples) < self.baseline_after or self._baseline is None:
+                # Mốc so sánh là mẫu cuối giai đoạn khởi động (bỏ cache nạp lần đầu)
+                self._baseline = snapshot
+        sample = SoakSample(
+            iteration=iteration,
+            elapsed=round(time.monotonic() - self._started_at, 2),
+            rss_kb=self._rss_reader(),
+            tasks=self._task_counter(),
+            subsystems=subsystems,
+        )
+        self.samples.append(sample)
+        return sample
+
+    def series(self) -> Dict[str, List[Tuple[int, float]]]:
+        """
+        Các chuỗi số theo lượt: rss_kb, tasks, tasks:<nhóm>, mem:<phân hệ>.
+        """
+        out: Dict[str, List[Tuple[int, float]]] = {}
+        for s in self.samples:
+            if s.rss_kb is not None:
+                out.setdefault("rss_kb", []).append((s.iteration, s.rss_kb))
+            out.setdefault("tasks", []).append((s.iteration, sum(s.tasks.values())))
+        groups = {g for s in self.samples for g in s.tasks}
+        subsystems = {k for s in self.samples for k in s.subsystems}
+        for s in self.samples:
+            for g in groups:
+                out.setdefault(f"tasks:{g}", []).append((s.iteration, s.tasks.get(g, 0)))
+            for k in subsystems:
+                out.setdefault(f"mem:{k}", []).append((s.iteration, s.subsystems.get(k, 0)))
+        return out
+
+    def analyze(self, min_growth: Optional[Dict[str, float]] = None) -> dict:
+        """
+        Báo cáo xu hướng: chuỗi nào tăng đều (độ dốc dương, R² cao, tăng vượt ngưỡng)
+        sau giai đoạn khởi động. Ngưỡng mặc định: 1 task, 256 KB RSS, 64 KB mỗi phân hệ.
+        """
+        thresholds = {"tasks": 1.0, "rss_kb": 256.0, "mem": 64 * 1024.0}
+        thresholds.update(min_growth or {})
+        results = {}
+        growing = []
+        for name, points in self.series().items():
+            skip = int(len(points) * self.warmup)
+            points = points[skip:]
+            if len(points) < 3:
+                continue
+            xs = [float(p[0]) for p in points]
+            ys = [float(p[1]) for p in points]
+            slope, r2 = trend(xs, ys)
+            growth = slope * (xs[-1] - xs[0])
+            kind = name.split(":", 1)[0]
+            entry = {
+                "start": ys[0],
+                "end": ys[-1],
+                "slope_per_1000": round(slope * 1000.0, 2),
+                "r2": round(r2, 3),
+                "growth": round(growth, 1),
+            }
+            results[name] = entry
+            if slope > 0 and r2 >= self.min_r2 and growth >= thresholds.get(kind, 0.0):
+                growing.append(name)
+        return {
+            "samples": len(self.samples),
+            "growing": sorted(growing),
+            "series": results,
+            "top_sites": self.top_sites(),
+        }
+
+    def top_sites(self) -> List[dict]:
+        """
+        Vị trí cấp phát tăng nhiều nhất giữa mốc sau khởi động và mẫu cuối.
+        """
+        if self._baseline is None or self._last is None or self._baseline is self._last:
+            return []
+        sites = []
+        for diff in self._last.compare_to(self._baseline, "lineno")[: self.top]:
+            if diff.size_diff <= 0:
+                continue
+            frame = diff.traceback[0]
+            sites.append(
+                {
+                    "site": f"{frame.filename}:{frame.lineno}",
+                    "subsystem": classify_path(frame.filename),
+                    "size_diff": diff.size_diff,
+                    "count_diff": diff.count_diff,
+                }
+            )
+        return sites
+
+
+class FakeAudioPlugin(Plugin):
+    """
+    Thay AudioPlugin: gửi khung "micro" khi đang nghe, nhận TTS và bỏ (không cần phần cứng).
+    """
+
+    name = "audio"
+    json_types = ("tts",)
+    ordered_events = ("audio",)
+
+    def __init__(self, frame_ms: int = 60, frame_bytes: int = 120):
+        super().__init__()
+        self.app = None
+        self.frame_ms = frame_ms
+        self.frame = b"\x00" * frame_bytes
+        self.frames_sent = 0
+        self.frames_received = 0
+        self.tts_stopped = asyncio.Event()
+
+    async def setup(self, app) -> None:
+        self.app = app
+
+    async def send_mic(self, frames: int):
+        for _ in range(frames):
+            await self.app.protocol.send_audio(self.frame)
+            self.frames_sent += 1
+            await asyncio.sleep(self.frame_ms / 1000.0)
+
+    async def on_incoming_audio(self, data: bytes) -> None:
+        self.frames_received += 1
+
+    async def on_incoming_json(self, message) -> None:
+        if isinstance(message, dict) and message.get("type") == "tts":
+            if message.get("state") == "stop":
+                self.tts_stopped.set()
+
+
+class _OverlayConfig:
+    """
+    Cấu hình trỏ giao thức về máy chủ giả lập mà không ghi đè config.json.
+    """
+
+    def __init__(self, base, overrides: dict):
+        self._base = base
+        self._overrides = overrides
+
+    def get_config(self, path: str, default=None):
+        if path in self._overrides:
+            return self._overrides[path]
+        return self._base.get_config(path, default)
+
+    def __getattr__(self, name):
+        return getattr(self._base, name)
+
+
+async def run_conversation(app, audio: FakeAudioPlugin, mic_frames: int, timeout: float) -> bool:
+    from src.constants.constants import DeviceState
+
+    audio.tts_stopped.clear()
+    await app.start_listening_manual()
+    if app.device_state != DeviceState.LISTENING:
+        return False
+    await audio.send_mic(mic_frames)
+    await app.stop_listening_manual()
+    try:
+        await asyncio.wait_for(audio.tts_stopped.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return False
+    # Chờ ứng dụng xử lý tts stop (task state:tts_stop_idle)
+    for _ in range(50):
+        if app.device_state == DeviceState.IDLE:
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+async def run(args) -> dict:
+    from scripts.standin_server import StandinConfig, StandinServer
+
+    # Application cần đủ phụ thuộc thật (paho, opuslib...), chỉ nạp khi chạy soak
+    from src.application import Application
+    from src.plugins.iot import IoTPlugin
+    from src.plugins.mcp import McpPlugin
+
+    server = StandinServer(
+        StandinConfig(
+            frame_ms=args.frame_ms,
+            tts_frames=args.tts_frames,
+            jitter_ms=args.jitter_ms,
+            loss_percent=args.loss,
+            seed=args.seed,
+        )
+    )
+    if args.protocol == "mqtt":
+        await server.start(ws_port=None)
+    else:
+        await server.start(mqtt_port=None)
+    client_config = server.client_config()
+
+    app = Application.get_instance()
+    app.running = True
+    app._main_loop = asyncio.get_running_loop()
+    app._initialize_async_objects()
+    app._set_protocol(args.protocol)
+    if args.protocol == "mqtt":
+        app.protocol.config = _OverlayConfig(
+            app.protocol.config,
+            {"SYSTEM_OPTIONS.NETWORK.MQTT_INFO": client_config["MQTT_INFO"]},
+        )
+    else:
+        app.protocol.WEBSOCKET_URL = client_config["WEBSOCKET_URL"]
+    app._setup_protocol_callbacks()
+    audio = FakeAudioPlugin(frame_ms=args.frame_ms)
+    app.plugins.register(McpPlugin(), IoTPlugin(), audio)
+    await app.plugins.setup_all(app)
+    await app.plugins.start_all()
+
+    total_samples = args.conversations // args.sample_every + 1
+    monitor = SoakMonitor(
+        frames=args.trace_frames,
+        baseline_after=int(total_samples * 0.2) + 1,
+        trace=not args.no_tracemalloc,
+    )
+    monitor.start()
+    failures = 0
+    started = time.monotonic()
+    try:
+        monitor.sample(0)
+        for i in range(1, args.conversations + 1):
+            if not await run_conversation(app, audio, args.mic_frames, timeout=10.0):
+                failures += 1
+            if args.mcp_every and i % args.mcp_every == 0 and server.sessions:
+                await server.sessions[-1].mcp_burst(args.mcp_burst)
+            if args.drop_every and i % args.drop_every == 0:
+                # Máy chủ đóng phiên: lượt sau phải tự kết nối lại
+                await app.protocol.close_audio_channel()
+            if i % args.sample_every == 0:
+                sample = monitor.sample(i)
+                print(
+                    f"  [{i}/{args.conversations}] RSS {sample.rss_kb} KB, "
+                    f"task {sum(sample.tasks.values())}, lỗi {failures}"
+                )
+    finally:
+        report = monitor.analyze()
+        monitor.stop()
+        report["conversations"] = args.conversations
+        report["failures"] = failures
+        report["duration_s"] = round(time.monotonic() - started, 1)
+        report["server"] = server.report()
+        report["audio"] = {"sent": audio.frames_sent, "received": audio.frames_received}
+        try:
+            await app.shutdown()
+        except Exception as e:
+            print(f"  ⚠️ Tắt Application lỗi: {e}")
+        await server.stop()
+    return report
+
+
+def print_report(report: dict):
+    print("\n" + "=" * 60)
+    print("  KẾT QUẢ SOAK")
+    print("=" * 60)
+    print(
+        f"  {report['conversations']} lượt, {report['failures']} lỗi, "
+        f"{report['duration_s']} s, {report['samples']} mẫu"
+    )
+    if not report["growing"]:
+        print("  ✅ Không phát hiện chuỗi tăng đều")
+    for name in report["growing"]:
+        entry = report["series"][name]
+        print(
+            f"  ❌ {name}: {entry['start']:.0f} -> {entry['end']:.0f} "
+            f"({entry['slope_per_1000']:+.1f}/1000 lượt, R²={entry['r2']})"
+        )
+    if report["top_sites"]:
+        print("\n  Vị trí cấp phát tăng nhiều nhất:")
+        for site in report["top_sites"]:
+            print(
+                f"    {site['size_diff'] / 1024:+9.1f} KB {site['count_diff']:+7d} khối  "
+                f"[{site['subsystem']}] {site['site']}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test Application với máy chủ giả lập")
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--protocol", default="websocket", choices=["websocket", "mqtt"])
+    parser.add_argument("--sample-every", type=int, default=50)
+    parser.add_argument("--mic-frames", type=int, default=3)
+    parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--tts-frames", type=int, default=10)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--mcp-every", type=int, default=25, help="0 để tắt")
+    parser.add_argument("--mcp-burst", type=int, default=5)
+    parser.add_argument("--drop-every", type=int, default=200, help="0 để tắt")
+    parser.add_argument("--trace-frames", type=int, default=10)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Chỉ đo RSS/task (nhanh hơn)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    sys.exit(1 if report["growing"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,837 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Máy chủ giọng nói giả lập cục bộ để thử tải và đo độ trễ giao thức (không cần mạng).
+
+Nói cùng bộ tin nhắn với máy chủ thật:
+- WebSocket: hello / listen / abort / stt / tts / mcp + khung âm thanh nhị phân.
+- MQTT + UDP: broker MQTT 3.1.1 tối giản chạy sẵn bên trong, hello trả về cấu hình
+  UDP (server/port/key/nonce), âm thanh UDP mã hóa AES-CTR như MqttProtocol.
+
+Có thể điều khiển bằng tham số/mã:
+- Phát TTS Opus với jitter và tỉ lệ mất gói cấu hình được (UDP có thể lệch thứ tự,
+  WebSocket giữ thứ tự như TCP).
+- Gửi loạt `tools/list` / `tools/call` MCP và đo thời gian client phản hồi.
+- Đo độ trễ hello, từ listen start đến khung âm thanh đầu tiên, phản hồi MCP.
+
+Cấu hình client trỏ về máy chủ này được in ra khi khởi động
+(SYSTEM_OPTIONS.NETWORK.WEBSOCKET_URL hoặc MQTT_INFO).
+
+Chạy: python scripts/standin_server.py [--ws-port 8765] [--mqtt-port 1883] [--udp-port 8884]
+          [--jitter-ms 30] [--loss 2] [--tts-frames 50] [--mcp-burst 20]
+          [--mcp-method tools/list] [--duration 60]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import struct
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import websockets
+
+# Thêm thư mục gốc dự án vào path
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from src.protocols.udp_audio import NONCE_SIZE, AesCtrCodec  # noqa: E402
+from src.utils import json_codec  # noqa: E402
+
+try:
+    import opuslib
+
+    OPUS_AVAILABLE = True
+except Exception:  # opuslib cần libopus; thiếu thì gửi khung giả
+    opuslib = None
+    OPUS_AVAILABLE = False
+
+
+@dataclass
+class StandinConfig:
+    sample_rate: int = 24000
+    frame_ms: int = 60
+    tts_frames: int = 50
+    jitter_ms: float = 0.0
+    loss_percent: float = 0.0
+    auto_tts: bool = True  # listen stop -> stt + phát TTS như máy chủ thật
+    mcp_timeout: float = 5.0
+    seed: Optional[int] = None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyStats:
+    """
+    Gom mẫu độ trễ (ms) theo tên, tóm tắt p50/p95/max.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, name: str, ms: float):
+        self.samples.setdefault(name, []).append(ms)
+
+    def summary(self) -> dict:
+        return {
+            name: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 2),
+                "p95": round(percentile(values, 95), 2),
+                "max": round(max(values), 2),
+            }
+            for name, values in self.samples.items()
+            if values
+        }
+
+
+def make_tts_frames(count: int, sample_rate: int, frame_ms: int) -> List[bytes]:
+    """
+    Khung Opus của một âm 440 Hz; không có opuslib thì dùng khung ngẫu nhiên cỡ tương đương
+    (client giải mã lỗi và bỏ khung, đường truyền vẫn đo được).
+    """
+    if not OPUS_AVAILABLE:
+        return [os.urandom(120) for _ in range(count)]
+    samples = sample_rate * frame_ms // 1000
+    encoder = opuslib.Encoder(sample_rate, 1, opuslib.APPLICATION_AUDIO)
+    frames = []
+    for i in range(count):
+        pcm = bytearray()
+        for n in range(samples):
+            t = (i * samples + n) / sample_rate
+            pcm += struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * t)))
+        frames.append(encoder.encode(bytes(pcm), samples))
+    return frames
+
+
+class StandinSession:
+    """
+    Một phiên thiết bị, không phụ thuộc transport (WebSocket hoặc MQTT + UDP).
+    """
+
+    def __init__(
+        self,
+        server: "StandinServer",
+        transport: str,
+        send_json: Callable[[dict], Awaitable[None]],
+        send_audio: Callable[[bytes, int], None],
+        datagram: bool,
+    ):
+        self.server = server
+        self.transport = transport
+        self.session_id = uuid.uuid4().hex[:12]
+        self._send_json = send_json
+        self._send_audio = send_audio
+        self.datagram = datagram
+        self.closed = asyncio.Event()
+
+        self._next_mcp_id = 1
+        self._pending_mcp: Dict[int, tuple] = {}
+        self._listen_started_at: Optional[float] = None
+        self._tts_task: Optional[asyncio.Task] = None
+        self._tts_handles: List[asyncio.TimerHandle] = []
+
+        self.audio_frames_in = 0
+        self.tts_frames_sent = 0
+        self.tts_frames_dropped = 0
+        self.aborts = 0
+        self.listens = 0
+
+    # ----- Tin nhắn từ client -----
+    async def handle_json(self, data: dict):
+        msg_type = data.get("type")
+        if msg_type == "listen":
+            state = data.get("state")
+            if state == "start":
+                self.listens += 1
+                self._listen_started_at = time.perf_counter()
+            elif state == "stop" and self.server.config.auto_tts:
+                self._listen_started_at = None
+                await self.send_json({"type": "stt", "text": "xin chào"})
+                self.start_tts()
+        elif msg_type == "abort":
+            self.aborts += 1
+            self.cancel_tts()
+        elif msg_type == "mcp":
+            self._resolve_mcp(data.get("payload") or {})
+        elif msg_type == "goodbye":
+            self.close()
+
+    def handle_audio(self, frame: bytes):
+        self.audio_frames_in += 1
+        if self._listen_started_at is not None:
+            self.server.stats.add(
+                f"{self.transport}_listen_to_first_audio_ms",
+                (time.perf_counter() - self._listen_started_at) * 1000.0,
+            )
+            self._listen_started_at = None
+
+    def _resolve_mcp(self, payload: dict):
+        entry = self._pending_mcp.pop(payload.get("id"), None)
+        if entry is None:
+            return
+        future, method, started = entry
+        self.server.stats.add(
+            f"{self.transport}_mcp_{method}_ms", (time.perf_counter() - started) * 1000.0
+        )
+        if not future.done():
+            future.set_result(payload)
+
+    # ----- Kịch bản phía máy chủ -----
+    async def send_json(self, data: dict):
+        data.setdefault("session_id", self.session_id)
+        await self._send_json(data)
+
+    async def mcp_request(self, method: str, params: Optional[dict] = None) -> Optional[dict]:
+        request_id = self._next_mcp_id
+        self._next_mcp_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending_mcp[request_id] = (future, method.replace("/", "_"), time.perf_counter())
+        payload = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}}
+        await self.send_json({"type": "mcp", "payload": payload})
+        try:
+            return await asyncio.wait_for(future, timeout=self.server.config.mcp_timeout)
+        except asyncio.TimeoutError:
+            self._pending_mcp.pop(request_id, None)
+            self.server.mcp_timeouts += 1
+            return None
+
+    async def mcp_burst(
+        self, count: int, method: str = "tools/list", params: Optional[dict] = None
+    ) -> int:
+        """
+        Gửi `count` yêu cầu MCP cùng lúc; trả về số phản hồi nhận được.
+        """
+        results = await asyncio.gather(
+            *(self.mcp_request(method, params) for _ in range(count))
+        )
+        return sum(1 for r in results if r is not None)
+
+    def start_tts(self, frames: Optional[List[bytes]] = None):
+        self.cancel_tts()
+        self._tts_task = asyncio.create_task(self.stream_tts(frames))
+
+    def cancel_tts(self):
+        for handle in self._tts_handles:
+            handle.cancel()
+        self._tts_handles = []
+        if self._tts_task and not self._tts_task.done():
+            self._tts_task.cancel()
+
+    async def stream_tts(self, frames: Optional[List[bytes]] = None):
+        """
+        Phát một lượt TTS: tts start -> khung Opus (jitter/mất gói) -> tts stop.
+        """
+        config = self.server.config
+        frames = frames if frames is not None else self.server.tts_frames
+        rng = self.server.rng
+        loop = asyncio.get_running_loop()
+        frame_s = config.frame_ms / 1000.0
+        jitter_s = config.jitter_ms / 1000.0
+
+        await self.send_json({"type": "tts", "state": "start"})
+        await self.send_json({"type": "tts", "state": "sentence_start", "text": "xin chào"})
+        start = loop.time()
+        previous = start
+        last = start
+        for index, frame in enumerate(frames):
+            if rng.random() * 100.0 < config.loss_percent:
+                self.tts_frames_dropped += 1
+                continue
+            at = start + index * frame_s + rng.uniform(0.0, jitter_s)
+            if not self.datagram:
+                # TCP không đảo thứ tự: jitter chỉ làm trễ, không vượt khung trước
+                at = max(at, previous)
+                previous = at
+            last = max(last, at)
+            self._tts_handles.append(
+                loop.call_at(at, self._emit_audio, frame, index + 1)
+            )
+        await asyncio.sleep(max(0.0, last - loop.time()) + frame_s)
+        self._tts_handles = []
+        await self.send_json({"type": "tts", "state": "stop"})
+
+    def _emit_audio(self, frame: bytes, sequence: int):
+        if self.closed.is_set():
+            return
+        self.tts_frames_sent += 1
+        self._send_audio(frame, sequence)
+
+    def close(self):
+        self.cancel_tts()
+        for future, _, _ in self._pending_mcp.values():
+            if not future.done():
+                future.cancel()
+        self._pending_mcp.clear()
+        self.closed.set()
+
+    def stats(self) -> dict:
+        return {
+            "transport": self.transport,
+            "session_id": self.session_id,
+            "listens": self.listens,
+            "audio_frames_in": self.audio_frames_in,
+            "tts_frames_sent": self.tts_frames_sent,
+            "tts_frames_dropped": self.tts_frames_dropped,
+            "aborts": self.aborts,
+        }
+
+
+class WebSocketFront:
+    """
+    Đầu WebSocket: một kết nối = một phiên.
+    """
+
+    def __init__(self, server: "StandinServer"):
+        self.server = server
+        self._server = None
+        self.port: Optional[int] = None
+
+    async def start(self, host: str, port: int):
+        self._server = await websockets.serve(self._handler, host, port, compression=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handler(self, websocket, path=None):
+        connected_at = time.perf_counter()
+
+        async def send_json(data):
+            await websocket.send(json_codec.dumps(data))
+
+        def send_audio(frame, sequence):
+            asyncio.ensure_future(websocket.send(frame))
+
+        session = StandinSession(self.server, "ws", send_json, send_audio, datagram=False)
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    session.handle_audio(message)
+                    continue
+                data = json_codec.loads(message)
+                if data.get("type") == "hello":
+                    self.server.stats.add(
+                        "ws_hello_ms", (time.perf_counter() - connected_at) * 1000.0
+                    )
+                    await send_json(
+                        {
+                            "type": "hello",
+                            "transport": "websocket",
+                            "session_id": session.session_id,
+                            "audio_params": self.server.audio_params(),
+                        }
+                    )
+                    self.server.session_opened(session)
+                else:
+                    await session.handle_json(data)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            session.close()
+            self.server.session_closed(session)
+
+
+# ----- Broker MQTT 3.1.1 tối giản -----
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+def encode_remaining_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def encode_string(value: str) -> bytes:
+    raw = value.encode("utf-8")
+    return struct.pack(">H", len(raw)) + raw
+
+
+def build_packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    return bytes([(packet_type << 4) | flags]) + encode_remaining_length(len(body)) + body
+
+
+async def read_packet(reader: asyncio.StreamReader):
+    """
+    Đọc một gói MQTT: trả về (type, flags, body).
+    """
+    first = (await reader.readexactly(1))[0]
+    multiplier, length = 1, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            break
+        multiplier *= 128
+    body = await reader.readexactly(length) if length else b""
+    return first >> 4, first & 0x0F, body
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class _MqttClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.client_id = ""
+        self.username: Optional[str] = None
+        self.subscriptions: List[str] = []
+        self.connected_at = time.perf_counter()
+        self.hello_seen = False
+
+    async def write(self, packet: bytes):
+        self.writer.write(packet)
+        await self.writer.drain()
+
+
+class MqttBroker:
+    """
+    Broker MQTT 3.1.1 tối giản: CONNECT, SUBSCRIBE, PUBLISH QoS 0/1/2, PING, DISCONNECT.
+    Không có retain, will hay phiên lưu trữ. Mọi PUBLISH từ client được giao cho
+    `on_publish` (vai cầu nối tới máy chủ giọng nói) và cho các client đã đăng ký.
+    """
+
+    def __init__(self, on_publish: Optional[Callable] = None):
+        self.on_publish = on_publish
+        self.clients: List[_MqttClient] = []
+        self._server = None
+        self.port: Optional[int] = None
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for client in list(self.clients):
+            client.writer.close()
+
+    async def publish(self, topic: str, payload: bytes, exclude: Optional[_MqttClient] = None):
+        packet = build_packet(PUBLISH, 0, encode_string(topic) + payload)
+        for client in list(self.clients):
+            if client is exclude:
+                continue
+            if any(topic_matches(sub, topic) for sub in client.subscriptions):
+                await client.write(packet)
+
+    async def send_to(self, client: _MqttClient, topic: str, payload: bytes):
+        await client.write(build_packet(PUBLISH, 0, encode_string(topic) + payload))
+
+    async def _handle_client(self, reader, writer):
+        client = _MqttClient(reader, writer)
+        try:
+            while True:
+                packet_type, flags, body = await read_packet(reader)
+                if packet_type == CONNECT:
+                    self._parse_connect(client, body)
+                    self.clients.append(client)
+                    await client.write(build_packet(CONNACK, 0, b"\x00\x00"))
+                elif packet_type == SUBSCRIBE:
+                    await self._handle_subscribe(client, body)
+                elif packet_type == UNSUBSCRIBE:
+                    packet_id = body[:2]
+                    offset = 2
+                    while offset < len(body):
+                        (length,) = struct.unpack_from(">H", body, offset)
+                        topic = body[offset + 2:offset + 2 + length].decode("utf-8")
+                        offset += 2 + length
+                        if topic in client.subscriptions:
+                            client.subscriptions.remove(topic)
+                    await client.write(build_packet(UNSUBACK, 0, packet_id))
+                elif packet_type == PUBLISH:
+                    await self._handle_publish(client, flags, body)
+                elif packet_type == PUBREL:
+                    await client.write(build_packet(PUBCOMP, 0, body[:2]))
+                elif packet_type == PINGREQ:
+                    await client.write(build_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if client in self.clients:
+                self.clients.remove(client)
+            writer.close()
+
+    @staticmethod
+    def _parse_connect(client: _MqttClient, body: bytes):
+        (name_len,) = struct.unpack_from(">H", body, 0)
+        offset = 2 + name_len + 1  # tên giao thức + level
+        connect_flags = body[offset]
+        offset += 3  # flags + keepalive
+
+        def take_string():
+            nonlocal offset
+            (length,) = struct.unpack_from(">H", body, offset)
+            value = body[offset + 2:offset + 2 + length]
+            offset += 2 + length
+            return value
+
+        client.client_id = take_string().decode("utf-8")
+        if connect_flags & 0x04:  # will
+            take_string()
+            take_string()
+        if connect_flags & 0x80:
+            client.username = take_string().decode("utf-8")
+        if connect_flags & 0x40:
+            take_string()
+
+    async def _handle_subscribe(self, client: _MqttClient, body: bytes):
+        packet_id = body[:2]
+        offset = 2
+        granted = bytearray()
+        while offset < len(body):
+            (length,) = struct.unpack_from(">H", body, offset)
+            topic = body[offset + 2:offset + 2 + length].decode("utf-8")
+            qos = body[offset + 2 + length]
+            offset += 3 + length
+            client.subscriptions.append(topic)
+            granted.append(min(qos, 1))
+        await client.write(build_packet(SUBACK, 0, packet_id + bytes(granted)))
+
+    async def _handle_publish(self, client: _MqttClient, flags: int, body: bytes):
+        qos = (flags >> 1) & 0x03
+        (length,) = struct.unpack_from(">H", body, 0)
+        topic = body[2:2 + length].decode("utf-8")
+        offset = 2 + length
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            ack = PUBACK if qos == 1 else PUBREC
+            await client.write(build_packet(ack, 0, packet_id))
+        payload = body[offset:]
+        await self.publish(topic, payload, exclude=client)
+        if self.on_publish is not None:
+            await self.on_publish(client, topic, payload)
+
+
+class _UdpAudioEndpoint(asyncio.DatagramProtocol):
+    def __init__(self, front: "MqttUdpFront"):
+        self.front = front
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.front.on_datagram(data, addr)
+
+
+class MqttUdpFront:
+    """
+    Đầu MQTT + UDP: hello qua broker, âm thanh qua UDP mã hóa AES-CTR.
+    """
+
+    def __init__(self, server: "StandinServer"):
+        self.server = server
+        self.broker = MqttBroker(on_publish=self._on_device_publish)
+        self._udp = None
+        self.host = "127.0.0.1"
+        self.udp_port: Optional[int] = None
+        self._by_client: Dict[int, tuple] = {}
+        self._by_ssrc: Dict[bytes, tuple] = {}
+
+    async def start(self, host: str, mqtt_port: int, udp_port: int):
+        self.host = host
+        await self.broker.start(host, mqtt_port)
+        loop = asyncio.get_running_loop()
+        transport, self._udp = await loop.create_datagram_endpoint(
+            lambda: _UdpAudioEndpoint(self), local_addr=(host, udp_port)
+        )
+        self.udp_port = transport.get_extra_info("sockname")[1]
+
+    async def stop(self):
+        await self.broker.stop()
+        if self._udp is not None and self._udp.transport is not None:
+            self._udp.transport.close()
+
+    async def _on_device_publish(self, client: _MqttClient, topic: str, payload: bytes):
+        try:
+            data = json_codec.loads(payload)
+        except json_codec.JSONDecodeError:
+            return
+        if data.get("type") == "hello":
+            await self._open_session(client)
+            return
+        entry = self._by_client.get(id(client))
+        if entry is None:
+            return
+        session = entry[0]
+        await session.handle_json(data)
+        if data.get("type") == "goodbye":
+            self._close_session(client)
+
+    async def _open_session(self, client: _MqttClient):
+        self._close_session(client)
+        key_hex = os.urandom(16).hex()
+        nonce_hex = "01000000" + os.urandom(8).hex() + "00000000"
+        codec = AesCtrCodec(key_hex, nonce_hex)
+        state = {"addr": None, "codec": codec}
+        reply_topic = client.subscriptions[0] if client.subscriptions else f"devices/p2p/{client.client_id}"
+
+        async def send_json(data):
+            await self.broker.send_to(client, reply_topic, json_codec.dumps_bytes(data))
+
+        def send_audio(frame, sequence):
+            if state["addr"] is None or self._udp is None:
+                return
+            self._udp.transport.sendto(codec.encrypt_packet(frame, sequence), state["addr"])
+
+        session = StandinSession(self.server, "mqtt", send_json, send_audio, datagram=True)
+        entry = (session, state)
+        self._by_client[id(client)] = entry
+        self._by_ssrc[bytes.fromhex(nonce_hex)[4:12]] = entry
+        await send_json(
+            {
+                "type": "hello",
+                "transport": "udp",
+                "session_id": session.session_id,
+                "audio_params": self.server.audio_params(),
+                "udp": {
+                    "server": self.host,
+                    "port": self.udp_port,
+                    "key": key_hex,
+                    "nonce": nonce_hex,
+                },
+            }
+        )
+        if not client.hello_seen:
+            # Từ CONNECT tới hello đầu tiên (các hello sau dùng lại kết nối broker)
+            client.hello_seen = True
+            self.server.stats.add(
+                "mqtt_connect_to_hello_ms", (time.perf_counter() - client.connected_at) * 1000.0
+            )
+        self.server.session_opened(session)
+
+    def _close_session(self, client: _MqttClient):
+        entry = self._by_client.pop(id(client), None)
+        if entry is None:
+            return
+        self._by_ssrc = {k: v for k, v in self._by_ssrc.items() if v is not entry}
+        entry[0].close()
+        self.server.session_closed(entry[0])
+
+    def on_datagram(self, data: bytes, addr):
+        if len(data) < NONCE_SIZE:
+            return
+        entry = self._by_ssrc.get(bytes(data[4:12]))
+        if entry is None:
+            return
+        session, state = entry
+        # Máy chủ học địa chỉ UDP của client từ gói đầu tiên
+        state["addr"] = addr
+        session.handle_audio(state["codec"].decrypt_packet(data))
+
+
+class StandinServer:
+    """
+    Máy chủ giả lập gồm đầu WebSocket và đầu MQTT + UDP dùng chung kịch bản và thống kê.
+    """
+
+    def __init__(self, config: Optional[StandinConfig] = None):
+        self.config = config or StandinConfig()
+        self.rng = random.Random(self.config.seed)
+        self.stats = LatencyStats()
+        self.ws = WebSocketFront(self)
+        self.mqtt = MqttUdpFront(self)
+        self.sessions: List[StandinSession] = []
+        self.finished_sessions: List[StandinSession] = []
+        self.mcp_timeouts = 0
+        self.tts_frames = make_tts_frames(
+            self.config.tts_frames, self.config.sample_rate, self.config.frame_ms
+        )
+        self._session_event = asyncio.Event()
+        self.host = "127.0.0.1"
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        ws_port: Optional[int] = 0,
+        mqtt_port: Optional[int] = 0,
+        udp_port: int = 0,
+    ):
+        """
+        Khởi động các đầu được yêu cầu (port None = tắt đầu đó, 0 = cổng tự chọn).
+        """
+        self.host = host
+        if ws_port is not None:
+            await self.ws.start(host, ws_port)
+        if mqtt_port is not None:
+            await self.mqtt.start(host, mqtt_port, udp_port)
+
+    async def stop(self):
+        for session in list(self.sessions):
+            session.close()
+        await self.ws.stop()
+        await self.mqtt.stop()
+
+    def audio_params(self) -> dict:
+        return {
+            "format": "opus",
+            "sample_rate": self.config.sample_rate,
+            "channels": 1,
+            "frame_duration": self.config.frame_ms,
+        }
+
+    def session_opened(self, session: StandinSession):
+        self.sessions.append(session)
+        self._session_event.set()
+
+    def session_closed(self, session: StandinSession):
+        if session in self.sessions:
+            self.sessions.remove(session)
+            self.finished_sessions.append(session)
+
+    async def wait_for_session(self, timeout: Optional[float] = None) -> StandinSession:
+        while not self.sessions:
+            self._session_event.clear()
+            await asyncio.wait_for(self._session_event.wait(), timeout=timeout)
+        return self.sessions[-1]
+
+    def client_config(self) -> dict:
+        """
+        Giá trị cấu hình để client kết nối tới máy chủ giả lập.
+        """
+        config = {}
+        if self.ws.port:
+            config["WEBSOCKET_URL"] = f"ws://{self.host}:{self.ws.port}/"
+        if self.mqtt.broker.port:
+            config["MQTT_INFO"] = {
+                "endpoint": f"{self.host}:{self.mqtt.broker.port}",
+                "client_id": "standin-client",
+                "username": "standin",
+                "password": "standin",
+                "publish_topic": "device-server",
+                "subscribe_topic": "devices/p2p/standin-client",
+            }
+        return config
+
+    def report(self) -> dict:
+        return {
+            "latency_ms": self.stats.summary(),
+            "sessions": [s.stats() for s in self.finished_sessions + self.sessions],
+            "mcp_timeouts": self.mcp_timeouts,
+        }
+
+
+def print_report(report: dict):
+    print("\n" + "=" * 60)
+    print("  BÁO CÁO MÁY CHỦ GIẢ LẬP")
+    print("=" * 60)
+    for name, summary in sorted(report["latency_ms"].items()):
+        print(
+            f"  {name:40s} n={summary['count']:<5d} p50={summary['p50']:8.2f} "
+            f"p95={summary['p95']:8.2f} max={summary['max']:8.2f} ms"
+        )
+    for session in report["sessions"]:
+        print(
+            f"  📡 {session['transport']} {session['session_id']}: listen={session['listens']} "
+            f"audio vào={session['audio_frames_in']} tts gửi={session['tts_frames_sent']} "
+            f"bỏ={session['tts_frames_dropped']} abort={session['aborts']}"
+        )
+    if report["mcp_timeouts"]:
+        print(f"  ⚠️ MCP quá thời gian: {report['mcp_timeouts']}")
+
+
+async def run(args):
+    config = StandinConfig(
+        frame_ms=args.frame_ms,
+        tts_frames=args.tts_frames,
+        jitter_ms=args.jitter_ms,
+        loss_percent=args.loss,
+        seed=args.seed,
+    )
+    server = StandinServer(config)
+    await server.start(
+        args.host,
+        ws_port=None if args.ws_port < 0 else args.ws_port,
+        mqtt_port=None if args.mqtt_port < 0 else args.mqtt_port,
+        udp_port=args.udp_port,
+    )
+    print("=" * 60)
+    print("  MÁY CHỦ GIẢ LẬP ĐANG CHẠY")
+    print("=" * 60)
+    print(f"  Opus: {'opuslib' if OPUS_AVAILABLE else 'khung giả (không có opuslib)'}")
+    print(f"  Jitter {config.jitter_ms} ms, mất gói {config.loss_percent}%")
+    print("  Cấu hình client (SYSTEM_OPTIONS.NETWORK):")
+    print("  " + json_codec.dumps(server.client_config()))
+
+    deadline = time.monotonic() + args.duration
+    try:
+        while time.monotonic() < deadline:
+            try:
+                session = await server.wait_for_session(timeout=deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            print(f"  ✅ Phiên {session.transport} {session.session_id} đã mở")
+            if args.mcp_burst:
+                params = {"name": args.mcp_tool, "arguments": {}} if args.mcp_method == "tools/call" else {}
+                ok = await session.mcp_burst(args.mcp_burst, args.mcp_method, params)
+                print(f"  🔧 MCP {args.mcp_method}: {ok}/{args.mcp_burst} phản hồi")
+            if args.tts_on_connect:
+                await session.stream_tts()
+            try:
+                await asyncio.wait_for(
+                    session.closed.wait(), timeout=max(0.0, deadline - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        print_report(server.report())
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Máy chủ giọng nói giả lập cục bộ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ws-port", type=int, default=8765, help="-1 để tắt")
+    parser.add_argument("--mqtt-port", type=int, default=1883, help="-1 để tắt")
+    parser.add_argument("--udp-port", type=int, default=8884)
+    parser.add_argument("--frame-ms", type=int, default=60)
+    parser.add_argument("--tts-frames", type=int, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0, help="Tỉ lệ mất gói TTS (%%)")
+    parser.add_argument("--mcp-burst", type=int, default=0, help="Số yêu cầu MCP mỗi phiên")
+    parser.add_argument("--mcp-method", default="tools/list", choices=["tools/list", "tools/call"])
+    parser.add_argument("--mcp-tool", default="self.get_device_status")
+    parser.add_argument("--tts-on-connect", action="store_true", help="Phát TTS ngay khi phiên mở")
+    parser.add_argument("--duration", type=float, default=60.0, help="Thời gian chạy (giây)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
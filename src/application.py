@@ -1,8 +1,9 @@
 import asyncio
 import sys
 import threading
+import time
 from pathlib import Path
-from typing import Any, Awaitable
+from typing import Any, Awaitable, Optional
 
 # Cho phép chạy trực tiếp như một script: thêm thư mục gốc của dự án vào sys.path (trên cùng src)
 try:
@@ -12,6 +13,7 @@ try:
 except Exception:
     pass
 
+from src.audio_processing.kws_model_registry import get_kws_model_registry
 from src.constants.constants import DeviceState, ListeningMode
 from src.plugins.calendar import CalendarPlugin
 from src.plugins.iot import IoTPlugin
@@ -19,12 +21,20 @@ from src.plugins.manager import PluginManager
 from src.plugins.mcp import McpPlugin
 from src.plugins.shortcuts import ShortcutsPlugin
 from src.plugins.ui import UIPlugin
+from src.network.dns_cache import get_dns_cache
+from src.network.link_quality import get_link_probe
 from src.plugins.wake_word import WakeWordPlugin
 from src.protocols.mqtt_protocol import MqttProtocol
+from src.protocols.warm_session import WarmSession
 from src.protocols.websocket_protocol import WebsocketProtocol
+from src.utils.command_runner import get_command_runner
 from src.utils.config_manager import ConfigManager
+from src.utils.event_loop import loop_impl_name
 from src.utils.logging_config import get_logger
+from src.utils.loop_monitor import get_loop_monitor
 from src.utils.opus_loader import setup_opus
+from src.utils.startup_timeline import StartupTimeline
+from src.utils.task_supervisor import TaskSupervisor
 
 logger = get_logger(__name__)
 setup_opus()
@@ -56,6 +66,7 @@ class Application:
         # Trạng thái
         self.running = False
         self.protocol = None
+        self._warm_session: Optional[WarmSession] = None
 
         # Trạng thái thiết bị (chỉ chương trình chính có thể sửa đổi, plugin chỉ đọc)
         self.device_state = DeviceState.IDLE
@@ -69,8 +80,8 @@ class Application:
         self.listening_mode = ListeningMode.REALTIME
         self.keep_listening = True  # Luôn lắng nghe tiếp sau khi nói xong
 
-        # Tập hợp nhiệm vụ đồng nhất (thay thế _main_tasks/_bg_tasks)
-        self._tasks: set[asyncio.Task] = set()
+        # Quản lý nhiệm vụ đồng nhất (thay thế _main_tasks/_bg_tasks): thống kê theo tên, nhóm có giới hạn
+        self.task_supervisor = TaskSupervisor()
 
         # Sự kiện dừng
         self._shutdown_event: asyncio.Event | None = None
@@ -85,14 +96,25 @@ class Application:
         # Plugin
         self.plugins = PluginManager()
 
+        # Timeline khởi động (tạo khi run bắt đầu)
+        self.startup_timeline: Optional[StartupTimeline] = None
+
     # -------------------------
     # Vòng đời
     # -------------------------
     async def run(self, *, protocol: str = "websocket", mode: str = "gui", no_audio: bool = False) -> int:
         logger.info("Khởi động Application, protocol=%s, no_audio=%s", protocol, no_audio)
         try:
+            timeline = self.startup_timeline = StartupTimeline()
+            if not no_audio:
+                # Nạp mô hình từ đánh thức trong nền càng sớm càng tốt, song song với setup plugin và chờ mạng
+                get_kws_model_registry().preload_from_config(self.config)
             self.running = True
             self._main_loop = asyncio.get_running_loop()
+            logger.info(f"Vòng lặp sự kiện: {loop_impl_name(self._main_loop)}")
+            # Lệnh hệ thống gọi từ luồng nền được chuyển về vòng lặp chính (giới hạn/cache dùng chung)
+            get_command_runner().bind_loop(self._main_loop)
+            self._start_loop_monitor()
             self._initialize_async_objects()
             self._set_protocol(protocol)
             self._setup_protocol_callbacks()
@@ -117,14 +139,17 @@ class Application:
 
             # Register plugins
             self.plugins.register(*plugins_list)
-            await self.plugins.setup_all(self)
+            with timeline.stage("plugins:setup"):
+                await self.plugins.setup_all(self, timeline)
             # Sau khi khởi động, phát sóng trạng thái ban đầu, đảm bảo UI sẵn sàng thấy "Đang chờ"
             try:
                 await self.plugins.notify_device_state_changed(self.device_state)
             except Exception:
                 pass
             # Plugin: start (phải start trước khi connect để wake word sẵn sàng)
-            await self.plugins.start_all()
+            with timeline.stage("plugins:start"):
+                await self.plugins.start_all(timeline)
+            network_started = time.monotonic()
             
             # Check network và khởi động Web Settings/Hotspot
             # Quy trình: 
@@ -154,7 +179,7 @@ class Application:
                     
                     # Hiển thị IP overlay và auto-hide sau 10s (non-blocking)
                     await self._update_gui_network_info(ip, "connected", qr_path_str)
-                    self.spawn(_hide_overlay_delayed(10), "hide-overlay-startup")
+                    self.spawn(_hide_overlay_delayed(10), "hide-overlay-startup", group="ui")
                     
                 else:
                     # ========== KHÔNG CÓ MẠNG ==========
@@ -195,10 +220,11 @@ class Application:
                         
                         # Hiển thị IP mới overlay và auto-hide sau 15s (non-blocking)
                         await self._update_gui_network_info(new_ip, "connected", qr_path_str)
-                        self.spawn(_hide_overlay_delayed(15), "hide-overlay-setup")
+                        self.spawn(_hide_overlay_delayed(15), "hide-overlay-setup", group="ui")
                     
             except Exception as e:
                 logger.warning(f"Network setup error: {e}")
+            timeline.record("network+web_settings", network_started)
             
             # Kết nối WebSocket (chỉ sau khi đã có mạng)
             if not no_audio:
@@ -208,7 +234,9 @@ class Application:
                 logger.info("Bỏ qua WebSocket Protocol (Voice) do NO_AUDIO mode")
             
             # Khởi động Cloud Agent (Remote Management)
-            await self._start_cloud_agent()
+            with timeline.stage("cloud_agent"):
+                await self._start_cloud_agent()
+            timeline.finish()
             # Chờ dừng
             await self._wait_shutdown()
             return 0
@@ -226,38 +254,45 @@ class Application:
         """
         Đảm bảo kênh giao thức được mở và phát sóng một lần trạng thái kênh đã sẵn sàng. Trả về liệu có mở hay không.
         """
-        # Nếu đã mở thì trả về ngay
+        started = time.monotonic()
+        # Nếu đã mở thì trả về ngay (phiên ấm: không cần bắt tay)
         try:
             if self.is_audio_channel_opened():
+                self._record_channel_open(started, warm=True)
                 return True
             if not self._connect_lock:
                 # Nếu chưa khởi tạo khóa, thử một lần
-                opened = await asyncio.wait_for(
-                    self.protocol.open_audio_channel(), timeout=12.0
-                )
-                if not opened:
-                    logger.error("Kết nối giao thức thất bại")
-                    return False
-                logger.info("Kết nối giao thức đã được thiết lập, nhấn Ctrl+C để thoát")
-                await self.plugins.notify_protocol_connected(self.protocol)
-                return True
+                return await self._open_protocol_channel(started)
 
             async with self._connect_lock:
                 if self.is_audio_channel_opened():
+                    self._record_channel_open(started, warm=True)
                     return True
-                opened = await asyncio.wait_for(
-                    self.protocol.open_audio_channel(), timeout=12.0
-                )
-                if not opened:
-                    logger.error("Kết nối giao thức thất bại")
-                    return False
-                logger.info("Kết nối giao thức đã được thiết lập, nhấn Ctrl+C để thoát")
-                await self.plugins.notify_protocol_connected(self.protocol)
-                return True
+                return await self._open_protocol_channel(started)
         except asyncio.TimeoutError:
             logger.error("Kết nối giao thức bị timeout")
             return False
 
+    async def _open_protocol_channel(self, started: float) -> bool:
+        opened = await asyncio.wait_for(
+            self.protocol.open_audio_channel(), timeout=12.0
+        )
+        if not opened:
+            logger.error("Kết nối giao thức thất bại")
+            return False
+        self._record_channel_open(started, warm=False)
+        logger.info("Kết nối giao thức đã được thiết lập, nhấn Ctrl+C để thoát")
+        await self.plugins.notify_protocol_connected(self.protocol)
+        return True
+
+    def _record_channel_open(self, started: float, warm: bool) -> None:
+        # Kết nối lại nền của WarmSession không tính vào độ trễ người dùng chờ
+        if self._warm_session and not self._warm_session.background_reconnecting:
+            self._warm_session.record_open(started, warm)
+
+    def get_warm_session_stats(self) -> Optional[dict]:
+        return self._warm_session.stats() if self._warm_session else None
+
     def _initialize_async_objects(self) -> None:
         logger.debug("Khởi tạo đối tượng bất đồng bộ")
         self._shutdown_event = asyncio.Event()
@@ -270,6 +305,11 @@ class Application:
             self.protocol = MqttProtocol(asyncio.get_running_loop())
         else:
             self.protocol = WebsocketProtocol()
+        self._warm_session = WarmSession(
+            self.protocol, is_idle=lambda: self.device_state == DeviceState.IDLE
+        )
+        # Đo chất lượng đường truyền cho bộ mã hóa / jitter buffer / kết nối lại
+        get_link_probe().start(self.protocol)
 
     # -------------------------
     # Nghe thủ công (giữ để nói)
@@ -305,6 +345,7 @@ class Application:
         try:
             ok = await self.connect_protocol()
             if not ok:
+                self.play_earcon("error")
                 return
 
             # Force REALTIME mode for continuous listening
@@ -329,12 +370,20 @@ class Application:
         """
         retry_delay = 3
         max_retries = 5
+        started = time.monotonic()
         for attempt in range(1, max_retries + 1):
             try:
                 logger.info(f"Attempting WebSocket connection (attempt {attempt}/{max_retries})...")
                 ok = await self.connect_protocol()
                 if ok:
                     logger.info("WebSocket connected successfully!")
+                    # Chỉ lần kết nối đầu tiên sau khởi động thuộc timeline
+                    if self.startup_timeline and not self.startup_timeline.has("protocol:connect"):
+                        stage = self.startup_timeline.record("protocol:connect", started)
+                        logger.info(f"⏱️ Kết nối giao thức sau +{stage['start_ms'] + stage['duration_ms']:.0f} ms")
+                    # Từ đây giữ phiên ấm: heartbeat + kết nối lại nền khi rớt
+                    if self._warm_session:
+                        self._warm_session.start(self.connect_protocol)
                     return
                 else:
                     logger.warning(f"WebSocket connection failed, retrying in {retry_delay}s...")
@@ -352,23 +401,34 @@ class Application:
     # -------------------------
     # Quản lý nhiệm vụ đồng nhất (tinh gọn)
     # -------------------------
-    def spawn(self, coro: Awaitable[Any], name: str) -> asyncio.Task:
+    def _start_loop_monitor(self) -> None:
+        """
+        Bật watchdog đo độ trễ vòng lặp (báo cáo trên dashboard và /api/metrics).
+        """
+        if not self.config.get_config("DIAGNOSTICS.LOOP_MONITOR", True):
+            return
+        try:
+            monitor = get_loop_monitor()
+            monitor.threshold_ms = float(
+                self.config.get_config("DIAGNOSTICS.LOOP_LAG_THRESHOLD_MS", 100)
+            )
+            monitor.start(self._main_loop)
+        except Exception as e:
+            logger.warning(f"Không thể bật theo dõi độ trễ vòng lặp: {e}")
+
+    def spawn(self, coro: Awaitable[Any], name: str, group: str | None = None) -> asyncio.Task:
         """
         Tạo nhiệm vụ và đăng ký, hủy bỏ khi dừng.
+
+        group: nhóm tác vụ ("audio-send", "plugin-notify", "plugin-audio", "ui"); nhóm có
+        max_pending (audio-send, ui) đầy thì bỏ nhiệm vụ và trả về None.
         """
         if not self.running or (self._shutdown_event and self._shutdown_event.is_set()):
             logger.debug(f"Bỏ qua việc tạo nhiệm vụ (ứng dụng đang đóng): {name}")
+            if hasattr(coro, "close"):
+                coro.close()
             return None
-        task = asyncio.create_task(coro, name=name)
-        self._tasks.add(task)
-
-        def _done(t: asyncio.Task):
-            self._tasks.discard(t)
-            if not t.cancelled() and t.exception():
-                logger.error(f"Nhiệm vụ {name} kết thúc với ngoại lệ: {t.exception()}", exc_info=True)
-
-        task.add_done_callback(_done)
-        return task
+        return self.task_supervisor.spawn(coro, name, group=group)
 
     def schedule_command_nowait(self, fn, *args, **kwargs) -> None:
         """Lên lịch "ngay lập tức": đưa bất kỳ callable nào trở lại vòng lặp chính để thực thi.
@@ -406,7 +466,7 @@ class Application:
     def _on_incoming_audio(self, data: bytes):
         logger.info(f"📥 Nhận audio từ server, độ dài: {len(data)} bytes")
         # Chuyển tiếp cho plugin
-        self.spawn(self.plugins.notify_incoming_audio(data), "plugin:on_audio")
+        self.spawn(self.plugins.notify_incoming_audio(data), "plugin:on_audio", group="plugin-audio")
 
     def _on_incoming_json(self, json_data):
         try:
@@ -457,17 +517,24 @@ class Application:
                             "state:tts_stop_idle",
                         )
             # Chuyển tiếp cho plugin
-            self.spawn(self.plugins.notify_incoming_json(json_data), "plugin:on_json")
+            self.spawn(self.plugins.notify_incoming_json(json_data), "plugin:on_json", group="plugin-notify")
         except Exception as e:
             logger.warning(f"Error processing JSON message: {e}")
 
     async def _on_audio_channel_opened(self):
         logger.info("Kênh giao thức đã mở")
+        if self._warm_session and self._warm_session.background_reconnecting:
+            # Làm ấm lại phiên trong nền: giữ nguyên trạng thái rảnh
+            return
         # Sau khi kênh mở vào LISTENING (đơn giản hóa thành đọc và ghi trực tiếp)
         await self.set_device_state(DeviceState.LISTENING)
 
     async def _on_audio_channel_closed(self):
         logger.info("Kênh giao thức đã đóng")
+        if self._warm_session:
+            self._warm_session.notify_closed()
+        # Khung micro còn xếp hàng không gửi được nữa
+        self.task_supervisor.cancel_group("audio-send")
         # Sau khi kênh đóng quay về IDLE
         await self.set_device_state(DeviceState.IDLE)
 
@@ -559,14 +626,45 @@ class Application:
             msg_type = "tts"
         payload = {"type": msg_type, "text": message}
         # Phát sóng bất đồng bộ qua bus sự kiện plugin
-        self.spawn(self.plugins.notify_incoming_json(payload), "ui:text_update")
+        self.spawn(self.plugins.notify_incoming_json(payload), "ui:text_update", group="plugin-notify")
+
+    def play_earcon(self, name: str) -> bool:
+        """
+        Phát âm báo ngắn (wake / error / alert / test) qua AudioCodec, nếu có âm thanh.
+        """
+        codec = getattr(self, "audio_codec", None)
+        if codec is None:
+            return False
+        try:
+            return codec.play_earcon(name)
+        except Exception as e:
+            logger.debug(f"Phát earcon '{name}' thất bại: {e}")
+            return False
+
+    def set_volume(self, volume: int, persist: bool = True) -> Optional[int]:
+        """
+        Đổi âm lượng loa bằng gain phần mềm của AudioCodec (không gọi amixer).
+
+        Trả về âm lượng đã áp dụng, None nếu không có AudioCodec.
+        """
+        codec = getattr(self, "audio_codec", None)
+        if codec is None:
+            return None
+        volume = codec.set_output_volume(volume)
+        if persist:
+            self.config.update_config("AUDIO.SPEAKER_VOLUME", volume)
+        return volume
+
+    def get_volume(self) -> Optional[int]:
+        codec = getattr(self, "audio_codec", None)
+        return codec.get_output_volume() if codec is not None else None
 
     def set_emotion(self, emotion: str) -> None:
         """
         Thiết lập cảm xúc: thông qua on_incoming_json của UIPlugin.
         """
         payload = {"type": "llm", "emotion": emotion}
-        self.spawn(self.plugins.notify_incoming_json(payload), "ui:emotion_update")
+        self.spawn(self.plugins.notify_incoming_json(payload), "ui:emotion_update", group="plugin-notify")
 
     async def _update_gui_network_info(self, ip: str, mode: str, qr_path: str = "") -> None:
         """
@@ -651,7 +749,7 @@ class Application:
                     try:
                         from src.network.wifi_manager import get_wifi_manager
                         wifi = get_wifi_manager()
-                        if wifi.is_hotspot_active():
+                        if await wifi.is_hotspot_active_async():
                             current_mode = "hotspot"
                             current_ip = "192.168.4.1"
                         else:
@@ -675,11 +773,19 @@ class Application:
                     
                     await self._update_gui_network_info(current_ip or "", current_mode, qr_path_str)
                     
+                    # Mạng đổi: làm mới nền bộ đệm DNS (vẫn dùng bản cũ trong lúc chờ)
+                    if current_mode == "connected":
+                        get_dns_cache().network_changed()
+
                     # Trigger WebSocket reconnect khi chuyển sang connected
                     if current_mode == "connected" and last_mode != "connected":
                         if not self.is_audio_channel_opened():
                             logger.info("Network connected - triggering WebSocket reconnect...")
                             self.spawn(self._auto_connect_protocol(), "network-reconnect")
+                    elif current_mode == "connected" and last_ip and current_ip != last_ip:
+                        # Đổi IP: socket cũ có thể đã chết mà chưa phát hiện
+                        if self._warm_session:
+                            self._warm_session.network_changed(f"IP {last_ip} -> {current_ip}")
                     
                     last_mode = current_mode
                     last_ip = current_ip
@@ -703,12 +809,15 @@ class Application:
 
         try:
             # Hủy tất cả nhiệm vụ đã đăng ký
-            if self._tasks:
-                for t in list(self._tasks):
-                    if not t.done():
-                        t.cancel()
-                await asyncio.gather(*self._tasks, return_exceptions=True)
-                self._tasks.clear()
+            await self.task_supervisor.cancel_all(timeout=5.0)
+
+            # Ghi nốt cấu hình đang chờ ghi trễ
+            self.config.flush()
+
+            if self._warm_session:
+                await self._warm_session.stop()
+            await get_link_probe().stop()
+            get_loop_monitor().stop()
 
             # Đóng giao thức (có thời gian giới hạn, tránh chặn thoát)
             if self.protocol:
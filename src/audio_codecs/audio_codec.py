@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import gc
 import os
 import subprocess
@@ -13,12 +14,25 @@ import soxr
 
 from src.audio_codecs.aec_processor import AECProcessor
 from src.audio_codecs.beamforming import BeamformingProcessor
+from src.audio_codecs.device_probe_cache import (
+    AudioProbeCache,
+    compute_hardware_signature,
+)
+from src.audio_codecs.earcons import EarconBank, EarconMixer
+from src.audio_codecs.music_bus import MusicBus, MusicDecoder
+from src.audio_codecs.output_gain import OutputGainStage
+from src.audio_codecs.stream_switcher import StreamRoute, SwitchRecorder
 from src.constants.constants import AudioConfig
+from src.network.link_quality import LinkEstimate, get_link_probe
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Khối callback đầu ra sounddevice: nhỏ hơn khung TTS (60ms trên Pi) để âm báo
+# bắt đầu trong <= 10ms thay vì phải chờ trọn một khung
+OUTPUT_BLOCK_MS = 10
+
 
 class AudioCodec:
     """
@@ -112,6 +126,55 @@ class AudioCodec:
         # Debug logging
         self._last_log_time = 0
 
+        # Audio probe cache (bỏ qua dò thiết bị khi phần cứng không đổi)
+        self._probe_cache = AudioProbeCache()
+        self._probe_validation_task = None
+        self._input_device_name = None
+        self._output_device_name = None
+
+        # Route luồng hiện tại (đổi thiết bị nóng, xem stream_switcher.py)
+        self._input_route: Optional[StreamRoute] = None
+        self._output_route: Optional[StreamRoute] = None
+        self._route_generation = 0
+        self._switch_lock = asyncio.Lock()
+        self._switch_recorder = SwitchRecorder(AudioConfig.FRAME_DURATION)
+
+        # Mã hóa theo chất lượng đường truyền: giá trị đích do event loop đặt,
+        # luồng callback đầu vào áp dụng trước khi mã hóa khung (encoder không an toàn đa luồng).
+        # Chỉ đổi bitrate và FEC; độ dài gói giữ đúng frame_duration đã báo trong hello
+        self._target_bitrate: Optional[int] = None
+        self._target_loss_percent = 0
+        self._encoder_bitrate: Optional[int] = None
+        self._encoder_loss_percent = 0
+        self._unsubscribe_link = None
+
+        # Earcon: âm báo giải mã sẵn, trộn thẳng vào đường ra (không dùng aplay/WAV tạm)
+        self._earcon_bank = EarconBank()
+        self._earcon_mixer = EarconMixer()  # Trộn trong callback sounddevice
+        self._aplay_earcon_mixer = EarconMixer()  # Trộn vào khung TTS ghi ra aplay
+        self._aplay_earcon_task = None
+        self._earcon_end_time = 0.0
+
+        # Âm lượng phần mềm + soft limiter (mixer phần cứng chỉ đặt một lần lúc khởi động)
+        speaker_volume = self.config.get_config("AUDIO.SPEAKER_VOLUME", 80)
+        self._output_gain = OutputGainStage(speaker_volume)  # Callback sounddevice
+        self._aplay_output_gain = OutputGainStage(speaker_volume)  # Khung ghi ra aplay
+
+        # Bus nhạc (MCP music) trộn vào đường ra, tự giảm khi TTS nói / đang nghe
+        self._music_bus = MusicBus()
+        self._music_decoder: Optional[MusicDecoder] = None
+        self._music_offset = 0.0  # Vị trí bắt đầu của phiên (sau khi tua)
+        self._music_via_callback = True
+        self._music_listen_duck = False
+        self._music_pump_task = None
+        self._music_error: Optional[str] = None
+        # Đồng hồ đường aplay: số mẫu đã ghi so với thời gian thực
+        self._aplay_clock_base = 0.0
+        self._aplay_written = 0
+        # Che lỗi gói mất (Opus PLC) cho kênh UDP
+        self._concealed_frames = 0
+        self._last_voice_frame_time = 0.0
+
     # -----------------------
     # Phương thức hỗ trợ tự động chọn thiết bị
     # -----------------------
@@ -333,6 +396,43 @@ class AudioCodec:
         except Exception as e:
             logger.warning(f"Set ALSA HDMI default failed: {e}")
     
+    def _init_hardware_mixer(self):
+        """
+        Đặt mixer phần cứng MỘT LẦN lúc khởi động: đường ra ở mức cố định 100%
+        (âm lượng do OutputGainStage xử lý), Capture theo AUDIO.MIC_VOLUME.
+        """
+        commands = []
+        if not (self._hdmi_audio and self._hdmi_device_name):
+            # HDMI đã được đặt PCM 100% trong _set_alsa_hdmi_default
+            commands.append(["amixer", "set", "Master", "100%"])
+        if self._jack_audio:
+            jack_card = self._jack_device_name or "Headphones"
+            commands.append(["amixer", "-c", jack_card, "set", "PCM", "100%"])
+        mic_volume = self.config.get_config("AUDIO.MIC_VOLUME", None)
+        if mic_volume is not None:
+            commands.append(["amixer", "set", "Capture", f"{int(mic_volume)}%"])
+
+        for cmd in commands:
+            try:
+                subprocess.run(cmd, capture_output=True, timeout=3)
+            except Exception as e:
+                logger.debug(f"{' '.join(cmd)} thất bại: {e}")
+        logger.info(
+            f"🎚️ Mixer phần cứng cố định, âm lượng phần mềm: {self._output_gain.volume:.0f}%"
+        )
+
+    def set_capture_volume(self, volume: int):
+        """
+        Đặt mức Capture phần cứng (chỉ gọi khi giá trị thay đổi, chạy ngoài event loop).
+        """
+        try:
+            subprocess.run(
+                ["amixer", "set", "Capture", f"{int(volume)}%"],
+                capture_output=True, timeout=3,
+            )
+        except Exception as e:
+            logger.debug(f"amixer set Capture thất bại: {e}")
+
     def _start_hdmi_aplay(self):
         """
         Khởi động audio subprocess cho HDMI output.
@@ -611,23 +711,49 @@ class AudioCodec:
         try:
             logger.info("=== Bắt đầu khởi tạo Audio Codec ===")
             
+            # 🗂️ Audio probe cache: phần cứng không đổi -> bỏ qua dò thiết bị
+            probe_started = time.perf_counter()
+            audio_config = self.config.get_config("AUDIO_DEVICES", {}) or {}
+            probe_signature = compute_hardware_signature(audio_config)
+            cached_probe = self._probe_cache.load(probe_signature)
+
             # 🔊 Audio Setup: Restart PulseAudio và các services
             # Giải quyết conflict giữa video (gstreamer) và AI audio (aplay)
             try:
                 from src.audio_codecs.audio_setup import setup_audio_environment
-                self._pulseaudio_enabled = setup_audio_environment()
+                self._pulseaudio_enabled = setup_audio_environment(
+                    quick=cached_probe is not None
+                )
                 if self._pulseaudio_enabled:
                     logger.info("✅ PulseAudio ready - sẽ dùng paplay cho audio output")
             except Exception as e:
                 logger.warning(f"Audio setup failed: {e}")
                 self._pulseaudio_enabled = False
-            
-            # Hiển thị và chọn thiết bị âm thanh (tự động chọn lần đầu và ghi vào cấu hình; không ghi đè sau đó)
-            await self._select_audio_devices()
-            
+
+            if cached_probe is not None:
+                self._load_audio_options(audio_config)
+                self._apply_cached_probe(cached_probe)
+            else:
+                # Hiển thị và chọn thiết bị âm thanh (tự động chọn lần đầu và ghi vào cấu hình; không ghi đè sau đó)
+                await self._select_audio_devices()
+                self._query_device_sample_rates()
+
             logger.info(f"MIC device ID: {self.mic_device_id}")
             logger.info(f"Speaker device ID: {self.speaker_device_id}")
-            
+
+            probe_ms = (time.perf_counter() - probe_started) * 1000
+            if cached_probe is not None:
+                self._probe_cache.record_hit(probe_ms)
+                saved = self._probe_cache.saved_ms
+                logger.info(
+                    f"⚡ Audio probe cache hit ({probe_ms:.0f}ms"
+                    + (f", tiết kiệm ~{saved:.0f}ms" if saved is not None else "")
+                    + ")"
+                )
+            else:
+                self._probe_cache.record_miss(probe_ms)
+                logger.info(f"Audio probe đầy đủ: {probe_ms:.0f}ms")
+
             # Set ALSA default device cho HDMI nếu enabled
             if self._hdmi_audio and self._hdmi_device_name:
                 self._set_alsa_hdmi_default()
@@ -646,51 +772,66 @@ class AudioCodec:
                 else:
                     logger.warning("⚠️ Jack aplay failed (không ảnh hưởng HDMI)")
 
-            # Lấy thông tin mặc định đầu vào/đầu ra an toàn (tránh -1)
-            try:
-                if self.mic_device_id is not None and self.mic_device_id >= 0:
-                    input_device_info = sd.query_devices(self.mic_device_id)
-                    logger.info(f"Input device: {input_device_info['name']}")
-                else:
-                    input_device_info = sd.query_devices(kind="input")
-                    logger.info(f"Using default input: {input_device_info['name']}")
-            except Exception as e:
-                logger.error(f"Lỗi query input device: {e}")
-                input_device_info = sd.query_devices(kind="input")
-
-            try:
-                if self.speaker_device_id is not None and self.speaker_device_id >= 0:
-                    output_device_info = sd.query_devices(self.speaker_device_id)
-                    logger.info(f"Output device: {output_device_info['name']}")
-                else:
-                    output_device_info = sd.query_devices(kind="output")
-                    logger.info(f"Using default output: {output_device_info['name']}")
-            except Exception as e:
-                logger.error(f"Lỗi query output device: {e}")
-                output_device_info = sd.query_devices(kind="output")
-
-            self.device_input_sample_rate = int(input_device_info["default_samplerate"])
-            self.device_output_sample_rate = int(
-                output_device_info["default_samplerate"]
-            )
-
-            frame_duration_sec = AudioConfig.FRAME_DURATION / 1000
-            self._device_input_frame_size = int(
-                self.device_input_sample_rate * frame_duration_sec
-            )
+            await asyncio.to_thread(self._init_hardware_mixer)
 
-            logger.info(
-                f"Tỷ lệ mẫu đầu vào: {self.device_input_sample_rate}Hz, Đầu ra: {self.device_output_sample_rate}Hz"
-            )
-
-            await self._create_resamplers()
+            await self._prepare_input_pipeline()
 
             # Không thay đổi mặc định toàn cục, để mỗi luồng tự mang device / samplerate
             sd.default.samplerate = None
             sd.default.channels = AudioConfig.CHANNELS
             sd.default.dtype = np.int16
 
-            await self._create_streams()
+            try:
+                await self._create_streams()
+            except Exception as e:
+                if cached_probe is None:
+                    raise
+                # Cache lỗi thời (thiết bị đổi chỉ mục/sample rate) -> dò lại đầy đủ một lần
+                logger.warning(f"Mở luồng với audio probe cache thất bại ({e}), dò lại thiết bị")
+                self._probe_cache.invalidate("mở luồng thất bại")
+                cached_probe = None
+                self._close_stream(self.input_stream)
+                self._close_stream(self.output_stream)
+                self.input_stream = self.output_stream = None
+                self._input_route = self._output_route = None
+                await self._cleanup_resampler(self.input_resampler, "input")
+                await self._cleanup_resampler(self.output_resampler, "output")
+                self.input_resampler = None
+                self.output_resampler = None
+
+                reprobe_started = time.perf_counter()
+                await self._select_audio_devices()
+                self._query_device_sample_rates()
+                self._probe_cache.record_miss(
+                    (time.perf_counter() - reprobe_started) * 1000
+                )
+                await self._prepare_input_pipeline()
+                await self._create_streams()
+
+            # Chỉ lưu probe sau khi luồng mở thành công (known-good).
+            # Tính lại chữ ký: lần dò đầu ghi input/output_device_id vào AUDIO_DEVICES,
+            # các khóa này nằm trong chữ ký nên chữ ký cũ sẽ không bao giờ khớp lần sau.
+            if cached_probe is None:
+                probe_signature = compute_hardware_signature(
+                    self.config.get_config("AUDIO_DEVICES", {}) or {}
+                )
+                self._probe_cache.store(
+                    probe_signature,
+                    self._build_probe_snapshot(),
+                    self._probe_cache.probe_ms or 0.0,
+                )
+            else:
+                self._probe_validation_task = asyncio.create_task(
+                    self._validate_cached_probe(cached_probe)
+                )
+
+            # Giải mã âm báo một lần theo sample rate đầu ra thực tế
+            try:
+                self._earcon_bank.preload(self._earcon_sample_rate())
+                if self._hdmi_use_aplay or self._jack_use_aplay:
+                    self._earcon_bank.preload(AudioConfig.OUTPUT_SAMPLE_RATE)
+            except Exception as e:
+                logger.warning(f"Nạp earcon thất bại: {e}")
 
             # Bộ giải mã Opus
             self.opus_encoder = opuslib.Encoder(
@@ -701,6 +842,7 @@ class AudioCodec:
             self.opus_decoder = opuslib.Decoder(
                 AudioConfig.OUTPUT_SAMPLE_RATE, AudioConfig.CHANNELS
             )
+            self._unsubscribe_link = get_link_probe().bus.subscribe(self._on_link_estimate)
 
             # Khởi tạo bộ xử lý AEC
             try:
@@ -717,30 +859,153 @@ class AudioCodec:
             await self.close()
             raise
 
+    async def _prepare_input_pipeline(self):
+        """
+        Tính kích thước khung thiết bị và tạo bộ lấy mẫu lại theo sample rate hiện tại.
+        """
+        frame_duration_sec = AudioConfig.FRAME_DURATION / 1000
+        self._device_input_frame_size = int(
+            self.device_input_sample_rate * frame_duration_sec
+        )
+
+        logger.info(
+            f"Tỷ lệ mẫu đầu vào: {self.device_input_sample_rate}Hz, Đầu ra: {self.device_output_sample_rate}Hz"
+        )
+
+        await self._create_resamplers()
+
+    def _query_device_sample_rates(self):
+        """
+        Lấy sample rate mặc định của thiết bị đầu vào/đầu ra an toàn (tránh -1).
+        """
+        try:
+            if self.mic_device_id is not None and self.mic_device_id >= 0:
+                input_device_info = sd.query_devices(self.mic_device_id)
+                logger.info(f"Input device: {input_device_info['name']}")
+            else:
+                input_device_info = sd.query_devices(kind="input")
+                logger.info(f"Using default input: {input_device_info['name']}")
+        except Exception as e:
+            logger.error(f"Lỗi query input device: {e}")
+            input_device_info = sd.query_devices(kind="input")
+
+        try:
+            if self.speaker_device_id is not None and self.speaker_device_id >= 0:
+                output_device_info = sd.query_devices(self.speaker_device_id)
+                logger.info(f"Output device: {output_device_info['name']}")
+            else:
+                output_device_info = sd.query_devices(kind="output")
+                logger.info(f"Using default output: {output_device_info['name']}")
+        except Exception as e:
+            logger.error(f"Lỗi query output device: {e}")
+            output_device_info = sd.query_devices(kind="output")
+
+        self.device_input_sample_rate = int(input_device_info["default_samplerate"])
+        self.device_output_sample_rate = int(
+            output_device_info["default_samplerate"]
+        )
+        self._input_device_name = input_device_info["name"]
+        self._output_device_name = output_device_info["name"]
+
+    # -----------------------
+    # Audio probe cache
+    # -----------------------
+    def _build_probe_snapshot(self) -> dict:
+        """
+        Ảnh chụp kết quả dò thiết bị đã mở luồng thành công (known-good).
+        """
+        return {
+            "mic_device_id": self.mic_device_id,
+            "speaker_device_id": self.speaker_device_id,
+            "input_device_name": self._input_device_name,
+            "output_device_name": self._output_device_name,
+            "input_sample_rate": self.device_input_sample_rate,
+            "output_sample_rate": self.device_output_sample_rate,
+            "input_channels": 2 if (self._i2s_enabled and self._i2s_stereo) else AudioConfig.CHANNELS,
+            "output_channels": AudioConfig.CHANNELS,
+            "hdmi_device_name": self._hdmi_device_name,
+        }
+
+    def _apply_cached_probe(self, probe: dict):
+        """
+        Dùng lại kết quả dò lần trước, không gọi sd.query_devices() / aplay -l.
+        """
+        self.mic_device_id = probe.get("mic_device_id")
+        self.speaker_device_id = probe.get("speaker_device_id")
+        self.device_input_sample_rate = int(probe["input_sample_rate"])
+        self.device_output_sample_rate = int(probe["output_sample_rate"])
+        self._input_device_name = probe.get("input_device_name")
+        self._output_device_name = probe.get("output_device_name")
+        if self._hdmi_audio:
+            self._hdmi_device_name = probe.get("hdmi_device_name")
+        logger.info(
+            f"⚡ Dùng audio probe cache: mic=[{self.mic_device_id}] {self._input_device_name}, "
+            f"speaker=[{self.speaker_device_id}] {self._output_device_name}"
+        )
+
+    async def _validate_cached_probe(self, probe: dict):
+        """
+        Xác thực nền probe cache với danh sách thiết bị thực tế.
+
+        Không khớp -> xóa cache để lần khởi động sau dò lại đầy đủ.
+        """
+
+        def _check() -> Optional[str]:
+            devices = sd.query_devices()
+            for kind, key, name_key, rate_key in (
+                ("input", "mic_device_id", "input_device_name", "input_sample_rate"),
+                ("output", "speaker_device_id", "output_device_name", "output_sample_rate"),
+            ):
+                idx = probe.get(key)
+                if idx is None or idx < 0:
+                    continue
+                if idx >= len(devices):
+                    return f"{kind} [{idx}] không còn tồn tại"
+                d = devices[idx]
+                channels_key = f"max_{kind}_channels"
+                if d[channels_key] <= 0:
+                    return f"{kind} [{idx}] không hỗ trợ {kind}"
+                if probe.get(name_key) and d["name"] != probe[name_key]:
+                    return f"{kind} [{idx}] đổi tên: {d['name']}"
+                if int(d["default_samplerate"]) != int(probe[rate_key]):
+                    return f"{kind} [{idx}] đổi sample rate: {d['default_samplerate']}"
+            return None
+
+        try:
+            problem = await asyncio.to_thread(_check)
+        except Exception as e:
+            logger.warning(f"Xác thực audio probe cache thất bại: {e}")
+            return
+
+        self._probe_cache.validated = problem is None
+        if problem:
+            logger.warning(f"⚠️ Audio probe cache không còn đúng: {problem}")
+            self._probe_cache.invalidate(problem)
+        else:
+            logger.debug("Audio probe cache đã được xác thực")
+
+    def get_probe_stats(self) -> dict:
+        """
+        Thống kê audio probe cache của lần khởi động hiện tại (hit/miss, thời gian tiết kiệm).
+        """
+        return self._probe_cache.get_stats()
+
     async def _create_resamplers(self):
         """
         Tạo bộ lấy mẫu lại. Đầu vào: Tỷ lệ mẫu thiết bị -> 16kHz (để mã hóa). Đầu ra: 24kHz -> Tỷ lệ mẫu thiết bị (để phát).
         """
         # Bộ lấy mẫu lại đầu vào: Tỷ lệ mẫu thiết bị -> 16kHz (để mã hóa)
-        if self.device_input_sample_rate != AudioConfig.INPUT_SAMPLE_RATE:
-            self.input_resampler = soxr.ResampleStream(
-                self.device_input_sample_rate,
-                AudioConfig.INPUT_SAMPLE_RATE,
-                AudioConfig.CHANNELS,
-                dtype="int16",
-                quality="QQ",
-            )
+        self.input_resampler = self._make_resampler(
+            "input", self.device_input_sample_rate
+        )
+        if self.input_resampler is not None:
             logger.info(f"Lấy mẫu lại đầu vào: {self.device_input_sample_rate}Hz -> 16kHz")
 
         # Bộ lấy mẫu lại đầu ra: 24kHz -> Tỷ lệ mẫu thiết bị
-        if self.device_output_sample_rate != AudioConfig.OUTPUT_SAMPLE_RATE:
-            self.output_resampler = soxr.ResampleStream(
-                AudioConfig.OUTPUT_SAMPLE_RATE,
-                self.device_output_sample_rate,
-                AudioConfig.CHANNELS,
-                dtype="int16",
-                quality="QQ",
-            )
+        self.output_resampler = self._make_resampler(
+            "output", self.device_output_sample_rate
+        )
+        if self.output_resampler is not None:
             logger.info(
                 f"Lấy mẫu lại đầu ra: {AudioConfig.OUTPUT_SAMPLE_RATE}Hz -> {self.device_output_sample_rate}Hz"
             )
@@ -752,36 +1017,7 @@ class AudioCodec:
         """
         try:
             audio_config = self.config.get_config("AUDIO_DEVICES", {}) or {}
-            
-            # Load I2S configuration
-            self._i2s_enabled = audio_config.get("i2s_enabled", False)
-            self._i2s_stereo = audio_config.get("i2s_stereo", False)
-            
-            # Load beamforming configuration
-            self._beamforming_enabled = audio_config.get("beamforming_enabled", False)
-            self._mic_distance = audio_config.get("mic_distance", 8.0)
-            self._speaker_angle = audio_config.get("speaker_angle", 180.0)
-            
-            if self._i2s_enabled:
-                logger.info(f"I2S Mode: {'Stereo (2 INMP441)' if self._i2s_stereo else 'Mono (1 INMP441)'}")
-            
-            # Cấu hình beamforming nếu stereo enabled
-            if self._i2s_stereo and self._beamforming_enabled:
-                self.beamforming.set_mic_distance(self._mic_distance)
-                self.beamforming.enable(True)
-                self.beamforming.enable_null_steering(True)
-                logger.info(f"Beamforming enabled: mic_distance={self._mic_distance}cm, speaker_angle={self._speaker_angle}°")
-
-            # HDMI audio configuration
-            self._hdmi_audio = audio_config.get("hdmi_audio", False)
-            if self._hdmi_audio:
-                logger.info("HDMI Audio output enabled")
-            
-            # 3.5mm Jack audio configuration (có thể dùng đồng thời với HDMI)
-            self._jack_audio = audio_config.get("jack_audio", False)
-            if self._jack_audio:
-                self._jack_device_name = audio_config.get("jack_device_name", "Headphones")
-                logger.info(f"3.5mm Jack audio enabled: {self._jack_device_name}")
+            self._load_audio_options(audio_config)
 
             # Có cấu hình rõ ràng chưa (quyết định có ghi lại hay không)
             had_cfg_input = "input_device_id" in audio_config
@@ -913,6 +1149,40 @@ class AudioCodec:
                 else None
             )
 
+    def _load_audio_options(self, audio_config: dict):
+        """
+        Đọc các tùy chọn I2S / beamforming / HDMI / Jack từ AUDIO_DEVICES (không truy vấn thiết bị).
+        """
+        # Load I2S configuration
+        self._i2s_enabled = audio_config.get("i2s_enabled", False)
+        self._i2s_stereo = audio_config.get("i2s_stereo", False)
+        
+        # Load beamforming configuration
+        self._beamforming_enabled = audio_config.get("beamforming_enabled", False)
+        self._mic_distance = audio_config.get("mic_distance", 8.0)
+        self._speaker_angle = audio_config.get("speaker_angle", 180.0)
+        
+        if self._i2s_enabled:
+            logger.info(f"I2S Mode: {'Stereo (2 INMP441)' if self._i2s_stereo else 'Mono (1 INMP441)'}")
+        
+        # Cấu hình beamforming nếu stereo enabled
+        if self._i2s_stereo and self._beamforming_enabled:
+            self.beamforming.set_mic_distance(self._mic_distance)
+            self.beamforming.enable(True)
+            self.beamforming.enable_null_steering(True)
+            logger.info(f"Beamforming enabled: mic_distance={self._mic_distance}cm, speaker_angle={self._speaker_angle}°")
+
+        # HDMI audio configuration
+        self._hdmi_audio = audio_config.get("hdmi_audio", False)
+        if self._hdmi_audio:
+            logger.info("HDMI Audio output enabled")
+        
+        # 3.5mm Jack audio configuration (có thể dùng đồng thời với HDMI)
+        self._jack_audio = audio_config.get("jack_audio", False)
+        if self._jack_audio:
+            self._jack_device_name = audio_config.get("jack_device_name", "Headphones")
+            logger.info(f"3.5mm Jack audio enabled: {self._jack_device_name}")
+
     async def _save_default_audio_config(
         self, input_device_id: Optional[int], output_device_id: Optional[int]
     ):
@@ -963,30 +1233,16 @@ class AudioCodec:
         """
         Tạo luồng âm thanh.
         """
+        input_route = output_route = None
         try:
             # Luồng đầu vào micro
-            self.input_stream = sd.InputStream(
-                device=self.mic_device_id,  # None=mặc định hệ thống; hoặc chỉ mục cố định
-                samplerate=self.device_input_sample_rate,
-                channels=AudioConfig.CHANNELS,
-                dtype=np.int16,
-                blocksize=self._device_input_frame_size,
-                callback=self._input_callback,
-                finished_callback=self._input_finished_callback,
-                latency="low",
+            input_route = self._build_route(
+                "input",
+                self.mic_device_id,  # None=mặc định hệ thống; hoặc chỉ mục cố định
+                self.device_input_sample_rate,
+                self.input_resampler,
             )
-
-            # Chọn tỷ lệ mẫu đầu ra dựa trên tỷ lệ mẫu được thiết bị hỗ trợ
-            if self.device_output_sample_rate == AudioConfig.OUTPUT_SAMPLE_RATE:
-                # Thiết bị hỗ trợ 24kHz, sử dụng trực tiếp
-                output_sample_rate = AudioConfig.OUTPUT_SAMPLE_RATE
-                device_output_frame_size = AudioConfig.OUTPUT_FRAME_SIZE
-            else:
-                # Thiết bị không hỗ trợ 24kHz, sử dụng tỷ lệ mẫu mặc định của thiết bị và bật lấy mẫu lại
-                output_sample_rate = self.device_output_sample_rate
-                device_output_frame_size = int(
-                    self.device_output_sample_rate * (AudioConfig.FRAME_DURATION / 1000)
-                )
+            self._open_route_stream(input_route, start=False)
 
             # Log thông tin output device
             if self.speaker_device_id is not None:
@@ -998,23 +1254,25 @@ class AudioCodec:
             # vì aplay đã xử lý output rồi
             if self._hdmi_use_aplay:
                 logger.info("🔊 Bỏ qua sounddevice OutputStream - dùng aplay cho HDMI")
-                self.output_stream = None
             elif self._hdmi_audio and not self._hdmi_use_aplay:
                 # HDMI được bật nhưng aplay fail (có thể device busy bởi video)
                 # Skip sounddevice vì cũng sẽ fail với cùng lý do
                 logger.warning("⚠️ HDMI audio enabled nhưng aplay không khởi động được - skip output")
-                self.output_stream = None
             else:
-                self.output_stream = sd.OutputStream(
-                    device=self.speaker_device_id,  # None=mặc định hệ thống; hoặc chỉ mục cố định
-                    samplerate=output_sample_rate,
-                    channels=AudioConfig.CHANNELS,
-                    dtype=np.int16,
-                    blocksize=device_output_frame_size,
-                    callback=self._output_callback,
-                    finished_callback=self._output_finished_callback,
-                    latency="low",
+                output_route = self._build_route(
+                    "output",
+                    self.speaker_device_id,  # None=mặc định hệ thống; hoặc chỉ mục cố định
+                    self.device_output_sample_rate,
+                    self.output_resampler,
                 )
+                self._open_route_stream(output_route, start=False)
+
+            self._activate_route(input_route)
+            if output_route:
+                self._activate_route(output_route)
+            else:
+                self._output_route = None
+                self.output_stream = None
 
             self.input_stream.start()
             if self.output_stream:
@@ -1024,18 +1282,300 @@ class AudioCodec:
 
         except Exception as e:
             logger.error(f"Tạo luồng âm thanh thất bại: {e}")
+            # Không để lại luồng đã mở nhưng chưa kích hoạt
+            for route in (input_route, output_route):
+                if route is not None and route is not self._input_route and route is not self._output_route:
+                    self._close_stream(route.stream)
             raise
 
-    def _input_callback(self, indata, frames, time_info, status):
+    # -----------------------
+    # Route luồng & đổi thiết bị nóng
+    # -----------------------
+    def _build_route(
+        self, kind: str, device_id: Optional[int], sample_rate: int, resampler
+    ) -> StreamRoute:
         """
-        Callback ghi âm, driver phần cứng gọi quy trình xử lý: âm thanh gốc -> lấy mẫu lại 16kHz -> mã hóa gửi + phát hiện từ đánh thức.
+        Tạo route mới (chưa mở luồng) với generation tăng dần.
         """
-        if status and "overflow" not in str(status).lower():
-            logger.warning(f"Trạng thái luồng đầu vào: {status}")
+        self._route_generation += 1
+        if kind == "output" and sample_rate == AudioConfig.OUTPUT_SAMPLE_RATE:
+            # Thiết bị hỗ trợ 24kHz, sử dụng trực tiếp
+            frame_size = AudioConfig.OUTPUT_FRAME_SIZE
+        else:
+            # Thiết bị không hỗ trợ 24kHz, sử dụng tỷ lệ mẫu mặc định của thiết bị và bật lấy mẫu lại
+            frame_size = int(sample_rate * (AudioConfig.FRAME_DURATION / 1000))
+        return StreamRoute(
+            kind,
+            self._route_generation,
+            device_id,
+            sample_rate,
+            frame_size,
+            resampler=resampler,
+        )
+
+    def _open_route_stream(self, route: StreamRoute, start: bool = True):
+        """
+        Mở luồng sounddevice cho route. Callback mang theo generation của route,
+        nên luồng chưa được kích hoạt (hoặc đã bị thay) không đụng vào pipeline.
+        """
+        if route.kind == "input":
+            route.stream = sd.InputStream(
+                device=route.device_id,
+                samplerate=route.sample_rate,
+                channels=AudioConfig.CHANNELS,
+                dtype=np.int16,
+                blocksize=route.frame_size,
+                callback=functools.partial(
+                    self._input_callback, generation=route.generation
+                ),
+                finished_callback=self._input_finished_callback,
+                latency="low",
+            )
+        else:
+            # Khối nhỏ hơn khung TTS: khung được cắt dần qua route.pending
+            route.stream = sd.OutputStream(
+                device=route.device_id,
+                samplerate=route.sample_rate,
+                channels=AudioConfig.CHANNELS,
+                dtype=np.int16,
+                blocksize=max(1, route.sample_rate * OUTPUT_BLOCK_MS // 1000),
+                callback=functools.partial(
+                    self._output_callback, generation=route.generation
+                ),
+                finished_callback=self._output_finished_callback,
+                latency="low",
+            )
+        if start:
+            route.stream.start()
 
+    def _activate_route(self, route: StreamRoute):
+        """
+        Chuyển pipeline sang route (một phép gán -> callback thấy ngay ở khung kế tiếp).
+        """
+        if route.kind == "input":
+            self._input_route = route
+            self.input_stream = route.stream
+            self.input_resampler = route.resampler
+            self._resample_input_buffer = route.buffer
+            self.mic_device_id = route.device_id
+            self.device_input_sample_rate = route.sample_rate
+            self._device_input_frame_size = route.frame_size
+        else:
+            self._output_route = route
+            self.output_stream = route.stream
+            self.output_resampler = route.resampler
+            self._resample_output_buffer = route.buffer
+            self.speaker_device_id = route.device_id
+            self.device_output_sample_rate = route.sample_rate
+
+    def _make_resampler(self, kind: str, sample_rate: int):
+        if kind == "input" and sample_rate != AudioConfig.INPUT_SAMPLE_RATE:
+            return soxr.ResampleStream(
+                sample_rate,
+                AudioConfig.INPUT_SAMPLE_RATE,
+                AudioConfig.CHANNELS,
+                dtype="int16",
+                quality="QQ",
+            )
+        if kind == "output" and sample_rate != AudioConfig.OUTPUT_SAMPLE_RATE:
+            return soxr.ResampleStream(
+                AudioConfig.OUTPUT_SAMPLE_RATE,
+                sample_rate,
+                AudioConfig.CHANNELS,
+                dtype="int16",
+                quality="QQ",
+            )
+        return None
+
+    @staticmethod
+    def _close_stream(stream):
+        if stream is None:
+            return
+        try:
+            if stream.active:
+                stream.stop()
+        except Exception as e:
+            logger.debug(f"Dừng luồng cũ thất bại: {e}")
+        try:
+            stream.close()
+        except Exception as e:
+            logger.debug(f"Đóng luồng cũ thất bại: {e}")
+
+    async def switch_stream(
+        self,
+        kind: str,
+        device_id: Optional[int],
+        sample_rate: Optional[int] = None,
+    ) -> Optional[dict]:
+        """
+        Đổi thiết bị của luồng đầu vào/đầu ra mà không dừng pipeline.
+
+        Luồng mới được mở song song, pipeline chuyển sang nó đúng ranh giới khung rồi
+        mới đóng luồng cũ. Nếu thiết bị không cho mở hai luồng cùng lúc (ALSA hw độc quyền),
+        đóng luồng cũ trước rồi mở luồng mới. Trả về bản ghi chuyển đổi (gap đo sau khung đầu).
+        """
+        assert kind in ("input", "output")
+        if self._is_closing:
+            return None
+
+        async with self._switch_lock:
+            old = self._input_route if kind == "input" else self._output_route
+            if kind == "output" and old is None:
+                logger.info("Không có sounddevice OutputStream (aplay/HDMI), bỏ qua đổi luồng đầu ra")
+                return None
+
+            if sample_rate is None:
+                sample_rate = await asyncio.to_thread(
+                    self._query_default_rate, kind, device_id
+                )
+            # Cùng sample rate -> dùng lại resampler + bộ đệm, không mất mẫu dở dang
+            if old is not None and old.sample_rate == sample_rate:
+                resampler = old.resampler
+            else:
+                resampler = self._make_resampler(kind, sample_rate)
+            route = self._build_route(kind, device_id, sample_rate, resampler)
+
+            open_started = time.perf_counter()
+            parallel = True
+            try:
+                await asyncio.to_thread(self._open_route_stream, route)
+            except Exception as e:
+                if old is None:
+                    raise
+                logger.warning(
+                    f"Không mở song song được luồng {kind} [{device_id}] ({e}), đóng luồng cũ trước"
+                )
+                parallel = False
+                await asyncio.to_thread(self._close_stream, old.stream)
+                try:
+                    await asyncio.to_thread(self._open_route_stream, route)
+                except Exception:
+                    # Khôi phục luồng cũ để không mất hẳn âm thanh
+                    old_restore = self._build_route(
+                        kind, old.device_id, old.sample_rate, old.resampler
+                    )
+                    await asyncio.to_thread(self._open_route_stream, old_restore)
+                    old_restore.buffer = old.buffer
+                    self._activate_route(old_restore)
+                    raise
+            open_ms = (time.perf_counter() - open_started) * 1000
+
+            if old is not None and kind == "input":
+                # Mẫu 16kHz dở dang của route cũ vẫn hợp lệ -> chuyển sang route mới
+                route.buffer.extend(old.buffer)
+            elif old is not None and resampler is old.resampler:
+                route.buffer.extend(old.buffer)
+
+            self._switch_recorder.flipped(
+                kind,
+                route.generation,
+                old.device_id if old else None,
+                device_id,
+                parallel,
+                open_ms,
+            )
+            self._activate_route(route)
+
+            if old is not None:
+                if parallel:
+                    await asyncio.to_thread(self._close_stream, old.stream)
+                if old.resampler is not None and old.resampler is not resampler:
+                    await self._cleanup_resampler(old.resampler, kind)
+
+            if (
+                kind == "output"
+                and self._music_bus.playing
+                and self._music_via_callback
+                and self._music_bus.sample_rate != sample_rate
+            ):
+                # Bus nhạc giải mã theo sample rate của route -> giải mã lại từ vị trí hiện tại
+                self.seek_music(self.music_position())
+
+            logger.info(
+                f"🔀 Đã chuyển luồng {kind}: [{old.device_id if old else None}] -> "
+                f"[{device_id}] @ {sample_rate}Hz (mở {open_ms:.0f}ms, "
+                f"{'song song' if parallel else 'tuần tự'})"
+            )
+            return {
+                "kind": kind,
+                "device_id": device_id,
+                "sample_rate": sample_rate,
+                "parallel": parallel,
+                "open_ms": round(open_ms, 1),
+            }
+
+    def _query_default_rate(self, kind: str, device_id: Optional[int]) -> int:
+        if device_id is not None and device_id >= 0:
+            info = sd.query_devices(device_id)
+        else:
+            info = sd.query_devices(kind=kind)
+        return int(info["default_samplerate"])
+
+    async def apply_audio_config(self) -> dict:
+        """
+        Áp dụng lại AUDIO_DEVICES (dashboard /api/audio/restart) bằng cách đổi luồng nóng.
+
+        Chỉ đổi luồng có thiết bị thay đổi; wake word / uplink nhận khung liên tục.
+        """
+        audio_config = self.config.get_config("AUDIO_DEVICES", {}) or {}
+        # Đường ra HDMI/Jack (aplay) không đổi nóng được: giữ nguyên cờ hiện tại,
+        # chỉ báo cần khởi động lại ứng dụng
+        output_path = (self._hdmi_audio, self._jack_audio, self._jack_device_name)
+        self._load_audio_options(audio_config)
+        requested_path = (self._hdmi_audio, self._jack_audio, self._jack_device_name)
+        self._hdmi_audio, self._jack_audio, self._jack_device_name = output_path
+        self.beamforming.set_mic_distance(self._mic_distance)
+        self.beamforming.enable(self._i2s_stereo and self._beamforming_enabled)
+
+        result = {"input": None, "output": None, "restart_required": False}
+        if requested_path != output_path:
+            result["restart_required"] = True
+            logger.warning("Đổi đường ra HDMI/Jack cần khởi động lại ứng dụng để có hiệu lực")
+        devices = await asyncio.to_thread(sd.query_devices)
+
+        def _valid(idx, channels_key) -> bool:
+            return (
+                isinstance(idx, int)
+                and 0 <= idx < len(devices)
+                and devices[idx][channels_key] > 0
+            )
+
+        input_id = audio_config.get("input_device_id")
+        if self._i2s_enabled and input_id is None:
+            input_id = self._find_i2s_device(devices)
+        if _valid(input_id, "max_input_channels") and input_id != self.mic_device_id:
+            result["input"] = await self.switch_stream("input", input_id)
+
+        output_id = audio_config.get("output_device_id")
+        if _valid(output_id, "max_output_channels") and output_id != self.speaker_device_id:
+            result["output"] = await self.switch_stream("output", output_id)
+
+        return result
+
+    def get_switch_stats(self) -> dict:
+        """
+        Thống kê đổi luồng: tổng số lần và lịch sử gần đây (gap_ms, song song hay tuần tự, thời gian mở).
+        """
+        return {
+            "total": self._switch_recorder.total,
+            "history": self._switch_recorder.history(),
+        }
+
+    def _input_callback(self, indata, frames, time_info, status, generation=None):
+        """
+        Callback ghi âm, driver phần cứng gọi quy trình xử lý: âm thanh gốc -> lấy mẫu lại 16kHz -> mã hóa gửi + phát hiện từ đánh thức.
+        """
         if self._is_closing:
             return
 
+        # Chỉ route đang hoạt động mới đưa dữ liệu vào pipeline (luồng song song khi đổi thiết bị bị bỏ qua)
+        route = self._input_route
+        if route is None or route.generation != generation:
+            return
+
+        if status and "overflow" not in str(status).lower():
+            logger.warning(f"Trạng thái luồng đầu vào: {status}")
+
         try:
             # Echo Suppression: Kiểm tra xem có đang phát hay không
             current_time = time.time()
@@ -1049,7 +1589,13 @@ class AudioCodec:
                     self._is_playing = False
                     self._playback_end_time = current_time
             
-            is_echo_period = self._is_playing or (current_time - self._playback_end_time) < self._echo_guard_duration
+            is_echo_period = (
+                self._is_playing
+                or (current_time - self._playback_end_time) < self._echo_guard_duration
+                or current_time < self._earcon_end_time
+                # Nhạc phát to (chưa giảm) cũng là echo; khi nghe người dùng nhạc được giảm
+                or (self._music_bus.active and not self._music_bus.ducked)
+            )
             
             audio_data = indata.copy()
             
@@ -1068,11 +1614,13 @@ class AudioCodec:
                 audio_data = audio_data.flatten()
 
             # Lấy mẫu lại về 16kHz (nếu thiết bị không phải 16kHz)
-            if self.input_resampler is not None:
-                audio_data = self._process_input_resampling(audio_data)
+            if route.resampler is not None:
+                audio_data = self._process_input_resampling(audio_data, route)
                 if audio_data is None:
                     return
 
+            self._switch_recorder.note_frame("input", generation)
+
             # Apply software gain cho MIC (I2S INMP441 có output thấp)
             if self._mic_gain > 1.0 and self._i2s_enabled:
                 # Chuyển sang float để tránh overflow
@@ -1110,9 +1658,7 @@ class AudioCodec:
                 ):
                     try:
                         pcm_data = audio_data.astype(np.int16).tobytes()
-                        encoded_data = self.opus_encoder.encode(
-                            pcm_data, AudioConfig.INPUT_FRAME_SIZE
-                        )
+                        encoded_data = self._encode_frame(pcm_data)
                         if encoded_data:
                             self._encoded_audio_callback(encoded_data)
                     except Exception as e:
@@ -1124,22 +1670,61 @@ class AudioCodec:
         except Exception as e:
             logger.error(f"Lỗi callback đầu vào: {e}")
 
-    def _process_input_resampling(self, audio_data):
+    def _on_link_estimate(self, estimate: LinkEstimate):
+        """
+        Nhận ước lượng đường truyền: đặt bitrate Opus và mức FEC đích.
+
+        Không gộp khung thành gói dài hơn: máy chủ định cỡ bộ giải mã và jitter
+        theo frame_duration trong hello.
+        """
+        self._target_bitrate = estimate.bitrate_bps
+        self._target_loss_percent = estimate.expected_loss_percent
+
+    def _apply_encoder_settings(self):
+        if self._target_bitrate is not None and self._target_bitrate != self._encoder_bitrate:
+            try:
+                self.opus_encoder.bitrate = self._target_bitrate
+                self._encoder_bitrate = self._target_bitrate
+                logger.info(f"Bitrate Opus: {self._target_bitrate} bps")
+            except Exception as e:
+                logger.warning(f"Không đổi được bitrate Opus: {e}")
+                self._target_bitrate = self._encoder_bitrate
+        if self._target_loss_percent != self._encoder_loss_percent:
+            try:
+                # In-band FEC: gói sau mang bản dự phòng của gói trước, bên nhận
+                # khôi phục được khi mất một gói (không đổi độ dài gói)
+                self.opus_encoder.packet_loss_perc = self._target_loss_percent
+                self.opus_encoder.inband_fec = 1 if self._target_loss_percent else 0
+                self._encoder_loss_percent = self._target_loss_percent
+                logger.info(f"Opus FEC: mất gói dự kiến {self._target_loss_percent}%")
+            except Exception as e:
+                logger.warning(f"Không đổi được FEC Opus: {e}")
+                self._target_loss_percent = self._encoder_loss_percent
+
+    def _encode_frame(self, pcm_data: bytes) -> Optional[bytes]:
+        """
+        Mã hóa một khung thu (chạy trên luồng callback đầu vào).
+        """
+        self._apply_encoder_settings()
+        return self.opus_encoder.encode(pcm_data, AudioConfig.INPUT_FRAME_SIZE)
+
+    def _process_input_resampling(self, audio_data, route: StreamRoute):
         """
         Lấy mẫu lại đầu vào về 16kHz.
         """
         try:
-            resampled_data = self.input_resampler.resample_chunk(audio_data, last=False)
+            buffer = route.buffer
+            resampled_data = route.resampler.resample_chunk(audio_data, last=False)
             if len(resampled_data) > 0:
-                self._resample_input_buffer.extend(resampled_data.astype(np.int16))
+                buffer.extend(resampled_data.astype(np.int16))
 
             expected_frame_size = AudioConfig.INPUT_FRAME_SIZE
-            if len(self._resample_input_buffer) < expected_frame_size:
+            if len(buffer) < expected_frame_size:
                 return None
 
             frame_data = []
             for _ in range(expected_frame_size):
-                frame_data.append(self._resample_input_buffer.popleft())
+                frame_data.append(buffer.popleft())
 
             return np.array(frame_data, dtype=np.int16)
 
@@ -1160,86 +1745,135 @@ class AudioCodec:
             except asyncio.QueueEmpty:
                 queue.put_nowait(audio_data)
 
-    def _output_callback(self, outdata: np.ndarray, frames: int, time_info, status):
+    def _output_callback(
+        self, outdata: np.ndarray, frames: int, time_info, status, generation=None
+    ):
         """
         Callback phát lại, driver phần cứng gọi lấy dữ liệu từ hàng đợi phát xuất ra loa.
         """
+        # Route không hoạt động phát im lặng, không lấy khung khỏi hàng đợi phát
+        route = self._output_route
+        if route is None or route.generation != generation:
+            outdata.fill(0)
+            return
+
         if status:
             if "underflow" not in str(status).lower():
                 logger.warning(f"Trạng thái luồng đầu ra: {status}")
 
         try:
-            if self.output_resampler is not None:
+            self._switch_recorder.note_frame("output", generation)
+            if route.resampler is not None:
                 # Cần lấy mẫu lại: 24kHz -> Tỷ lệ mẫu thiết bị
-                self._output_callback_with_resample(outdata, frames)
+                self._output_callback_with_resample(outdata, frames, route)
             else:
                 # Phát trực tiếp: 24kHz
-                self._output_callback_direct(outdata, frames)
+                self._output_callback_direct(outdata, frames, route)
+
+            # Nhạc là một bus riêng, giảm xuống khi TTS đang phát
+            mixed = outdata
+            if self._music_bus.active and self._music_via_callback:
+                self._music_bus.set_ducked(self._is_playing or self._music_listen_duck)
+                mixed = self._music_bus.mix_wide(mixed)
+
+            # Âm báo trộn đè lên TTS (hoặc im lặng) ngay ở khối kế tiếp,
+            # kèm độ trễ tới DAC để đo thời điểm âm báo thực sự ra loa
+            if self._earcon_mixer.active:
+                mixed = self._earcon_mixer.mix_wide(
+                    mixed, self._output_dac_delay(time_info, route)
+                )
+            # Âm lượng phần mềm + limiter cho tổng đã trộn
+            processed = self._output_gain.process(mixed, route.sample_rate)
+            if processed is not outdata:
+                outdata[:] = processed
 
         except Exception as e:
             logger.error(f"Lỗi callback đầu ra: {e}")
             outdata.fill(0)
 
-    def _output_callback_direct(self, outdata: np.ndarray, frames: int):
+    @staticmethod
+    def _output_dac_delay(time_info, route: StreamRoute) -> float:
         """
-        Phát trực tiếp dữ liệu 24kHz (khi thiết bị hỗ trợ 24kHz)
+        Số giây từ callback hiện tại tới lúc khối ra DAC (PortAudio), 0 nếu driver không báo.
         """
         try:
-            # Lấy dữ liệu âm thanh từ hàng đợi phát
-            audio_data = self._output_buffer.get_nowait()
-            
+            delay = time_info.outputBufferDacTime - time_info.currentTime
+            if time_info.currentTime > 0 and 0 <= delay < 1.0:
+                return delay
+            return float(route.stream.latency or 0.0)
+        except Exception:
+            return 0.0
+
+    def _output_callback_direct(
+        self, outdata: np.ndarray, frames: int, route: StreamRoute
+    ):
+        """
+        Phát trực tiếp dữ liệu 24kHz (khi thiết bị hỗ trợ 24kHz).
+
+        Khối callback nhỏ hơn khung TTS: phần khung chưa phát nằm trong route.pending.
+        """
+        need = frames * AudioConfig.CHANNELS
+        pending = route.pending
+        while pending is None or len(pending) < need:
+            try:
+                # Lấy dữ liệu âm thanh từ hàng đợi phát
+                audio_data = self._output_buffer.get_nowait()
+            except asyncio.QueueEmpty:
+                break
             # Đánh dấu đang phát (cho echo suppression)
             self._is_playing = True
-
-            if len(audio_data) >= frames * AudioConfig.CHANNELS:
-                output_frames = audio_data[: frames * AudioConfig.CHANNELS]
-                outdata[:] = output_frames.reshape(-1, AudioConfig.CHANNELS)
+            if pending is None or len(pending) == 0:
+                pending = audio_data
             else:
-                out_len = len(audio_data) // AudioConfig.CHANNELS
-                if out_len > 0:
-                    outdata[:out_len] = audio_data[
-                        : out_len * AudioConfig.CHANNELS
-                    ].reshape(-1, AudioConfig.CHANNELS)
-                if out_len < frames:
-                    outdata[out_len:] = 0
+                pending = np.concatenate((pending, audio_data))
 
-        except asyncio.QueueEmpty:
+        if pending is None or len(pending) == 0:
+            route.pending = None
             # Xuất im lặng khi không có dữ liệu
             outdata.fill(0)
             # Đánh dấu ngừng phát và lưu thời điểm
             if self._is_playing:
                 self._is_playing = False
                 self._playback_end_time = time.time()
+            return
 
-    def _output_callback_with_resample(self, outdata: np.ndarray, frames: int):
+        take = min(need, len(pending)) // AudioConfig.CHANNELS
+        outdata[:take] = pending[: take * AudioConfig.CHANNELS].reshape(
+            -1, AudioConfig.CHANNELS
+        )
+        if take < frames:
+            outdata[take:] = 0
+        rest = pending[take * AudioConfig.CHANNELS :]
+        route.pending = rest if len(rest) else None
+
+    def _output_callback_with_resample(
+        self, outdata: np.ndarray, frames: int, route: StreamRoute
+    ):
         """
         Phát lấy mẫu lại (24kHz -> Tỷ lệ mẫu thiết bị)
         """
         had_data = False
+        buffer = route.buffer
         try:
             # Tiếp tục xử lý dữ liệu 24kHz để lấy mẫu lại
-            while len(self._resample_output_buffer) < frames * AudioConfig.CHANNELS:
+            while len(buffer) < frames * AudioConfig.CHANNELS:
                 try:
                     audio_data = self._output_buffer.get_nowait()
                     had_data = True
                     # Đánh dấu đang phát
                     self._is_playing = True
                     # Lấy mẫu lại 24kHz -> Tỷ lệ mẫu thiết bị
-                    resampled_data = self.output_resampler.resample_chunk(
+                    resampled_data = route.resampler.resample_chunk(
                         audio_data, last=False
                     )
                     if len(resampled_data) > 0:
-                        self._resample_output_buffer.extend(
-                            resampled_data.astype(np.int16)
-                        )
+                        buffer.extend(resampled_data.astype(np.int16))
                 except asyncio.QueueEmpty:
                     break
 
             need = frames * AudioConfig.CHANNELS
-            if len(self._resample_output_buffer) >= need:
-                frame_data = [
-                    self._resample_output_buffer.popleft() for _ in range(need)
-                ]
+            if len(buffer) >= need:
+                frame_data = [buffer.popleft() for _ in range(need)]
                 output_array = np.array(frame_data, dtype=np.int16)
                 outdata[:] = output_array.reshape(-1, AudioConfig.CHANNELS)
             else:
@@ -1275,58 +1909,24 @@ class AudioCodec:
     async def reinitialize_stream(self, is_input=True):
         """
         Khởi tạo lại luồng âm thanh.
+
+        Mở luồng mới song song rồi mới đóng luồng cũ (xem switch_stream), nên wake word
+        và uplink không bị ngắt quãng.
         """
         if self._is_closing:
             return False if is_input else None
 
         try:
             if is_input:
-                if self.input_stream:
-                    self.input_stream.stop()
-                    self.input_stream.close()
-
-                self.input_stream = sd.InputStream(
-                    device=self.mic_device_id,  # <- Sửa lỗi: Mang theo chỉ mục thiết bị, tránh rơi vào endpoint mặc định không ổn định
-                    samplerate=self.device_input_sample_rate,
-                    channels=AudioConfig.CHANNELS,
-                    dtype=np.int16,
-                    blocksize=self._device_input_frame_size,
-                    callback=self._input_callback,
-                    finished_callback=self._input_finished_callback,
-                    latency="low",
+                await self.switch_stream(
+                    "input", self.mic_device_id, self.device_input_sample_rate
                 )
-                self.input_stream.start()
                 logger.info("Khởi tạo lại luồng đầu vào thành công")
                 return True
             else:
-                if self.output_stream:
-                    self.output_stream.stop()
-                    self.output_stream.close()
-
-                # Chọn tỷ lệ mẫu đầu ra dựa trên tỷ lệ mẫu được thiết bị hỗ trợ
-                if self.device_output_sample_rate == AudioConfig.OUTPUT_SAMPLE_RATE:
-                    # Thiết bị hỗ trợ 24kHz, sử dụng trực tiếp
-                    output_sample_rate = AudioConfig.OUTPUT_SAMPLE_RATE
-                    device_output_frame_size = AudioConfig.OUTPUT_FRAME_SIZE
-                else:
-                    # Thiết bị không hỗ trợ 24kHz, sử dụng tỷ lệ mẫu mặc định của thiết bị và bật lấy mẫu lại
-                    output_sample_rate = self.device_output_sample_rate
-                    device_output_frame_size = int(
-                        self.device_output_sample_rate
-                        * (AudioConfig.FRAME_DURATION / 1000)
-                    )
-
-                self.output_stream = sd.OutputStream(
-                    device=self.speaker_device_id,  # Chỉ định ID thiết bị loa
-                    samplerate=output_sample_rate,
-                    channels=AudioConfig.CHANNELS,
-                    dtype=np.int16,
-                    blocksize=device_output_frame_size,
-                    callback=self._output_callback,
-                    finished_callback=self._output_finished_callback,
-                    latency="low",
+                await self.switch_stream(
+                    "output", self.speaker_device_id, self.device_output_sample_rate
                 )
-                self.output_stream.start()
                 logger.info("Khởi tạo lại luồng đầu ra thành công")
                 return None
         except Exception as e:
@@ -1410,11 +2010,362 @@ class AudioCodec:
         logger.info(f"Trạng thái AEC: {'Bật' if self._aec_enabled else 'Tắt'}")
         return self._aec_enabled
 
+    # -----------------------
+    # Earcon (âm báo)
+    # -----------------------
+    def _earcon_sample_rate(self) -> int:
+        route = self._output_route
+        return route.sample_rate if route is not None else AudioConfig.OUTPUT_SAMPLE_RATE
+
+    def play_earcon(self, name: str, gain: float = 1.0) -> bool:
+        """
+        Phát âm báo đã giải mã sẵn qua đường ra hiện tại.
+
+        - sounddevice: trộn vào callback đầu ra ở khối kế tiếp (khối 10ms, trễ tới
+          DAC đo qua time_info của PortAudio).
+        - aplay (HDMI/Jack): đang ghi TTS/nhạc thì trộn vào khung kế tiếp, còn lại
+          ghi thẳng vào pipe. aplay không có callback nên âm báo luôn đứng sau phần
+          đã ghi trước vào pipe (TTS được ghi nhanh hơn thời gian thực) và đệm ALSA
+          của aplay: độ trễ ghi nhận = chờ trộn + phần pipe còn tồn, không đạt mức
+          <20ms như đường sounddevice.
+        Micro coi thời gian phát âm báo là echo period để không gửi ngược lên server.
+        """
+        if self._is_closing:
+            return False
+
+        played = False
+        now = time.time()
+
+        if self._output_route is not None:
+            samples = self._earcon_bank.get(name, self._output_route.sample_rate)
+            if samples is None:
+                logger.warning(f"Không có earcon '{name}'")
+                return False
+            self._earcon_mixer.play(samples, gain)
+            self._earcon_end_time = max(
+                self._earcon_end_time, now + len(samples) / self._output_route.sample_rate
+            )
+            played = True
+
+        if self._hdmi_use_aplay or self._jack_use_aplay:
+            samples = self._earcon_bank.get(name, AudioConfig.OUTPUT_SAMPLE_RATE)
+            if samples is None:
+                logger.warning(f"Không có earcon '{name}'")
+                return played
+            self._aplay_earcon_mixer.play(samples, gain)
+            self._kick_aplay_earcons()
+            self._earcon_end_time = max(
+                self._earcon_end_time,
+                now + len(samples) / AudioConfig.OUTPUT_SAMPLE_RATE,
+            )
+            played = True
+
+        if not played:
+            logger.debug(f"Không có đường ra để phát earcon '{name}'")
+        return played
+
+    def _aplay_writer_active(self) -> bool:
+        """
+        TTS hoặc bơm nhạc đang ghi khung vào aplay (âm báo sẽ được trộn vào khung đó).
+        """
+        frame_s = AudioConfig.FRAME_DURATION / 1000
+        tts_active = self._is_playing and (
+            time.time() - self._last_audio_write_time
+        ) < frame_s * 1.5
+        return tts_active or self._music_pump_running()
+
+    def _kick_aplay_earcons(self):
+        """
+        Đảm bảo âm báo trên đường aplay được ghi ra: rảnh thì ghi ngay, đang có TTS
+        thì để write_audio trộn; nếu TTS dừng trước khi trộn hết thì tác vụ nền ghi nốt.
+        """
+        if not self._aplay_writer_active():
+            self._drain_aplay_earcons()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._drain_aplay_earcons()
+            return
+        if self._aplay_earcon_task is None or self._aplay_earcon_task.done():
+            self._aplay_earcon_task = loop.create_task(self._aplay_earcon_pump())
+
+    async def _aplay_earcon_pump(self):
+        frame_s = AudioConfig.FRAME_DURATION / 1000
+        try:
+            while self._aplay_earcon_mixer.active and not self._is_closing:
+                if self._aplay_writer_active():
+                    await asyncio.sleep(frame_s)
+                    continue
+                self._drain_aplay_earcons()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Ghi âm báo ra aplay lỗi: {e}")
+
+    def _drain_aplay_earcons(self):
+        """
+        Ghi phần âm báo còn lại thẳng vào pipe aplay.
+        """
+        ahead = self._aplay_ahead_seconds()
+        chunk = self._aplay_earcon_mixer.render(
+            self._aplay_earcon_mixer.remaining_samples(), output_delay=ahead
+        )
+        if chunk is None:
+            return
+        out = self._aplay_output_gain.process(chunk, AudioConfig.OUTPUT_SAMPLE_RATE)
+        if self._hdmi_use_aplay and self._hdmi_aplay_process:
+            self._write_hdmi_audio(out)
+            self._flush_hdmi_buffer()
+        if self._jack_use_aplay and self._jack_aplay_process:
+            self._write_jack_audio(out)
+        self._aplay_written += len(out)
+
+    # -----------------------
+    # Âm lượng phần mềm
+    # -----------------------
+    def set_output_volume(self, volume: int) -> int:
+        """
+        Đổi âm lượng đầu ra (0-100): chỉ cập nhật tham số trong bộ nhớ,
+        gain được ramp ở các khung kế tiếp, không gọi amixer.
+        """
+        volume = max(0, min(100, int(volume)))
+        self._output_gain.set_volume(volume)
+        self._aplay_output_gain.set_volume(volume)
+        logger.info(f"🔈 Âm lượng phần mềm: {volume}%")
+        return volume
+
+    def get_output_volume(self) -> int:
+        return int(round(self._output_gain.volume))
+
+    def get_output_gain_stats(self) -> dict:
+        return {
+            "volume": self.get_output_volume(),
+            "gain": round(self._output_gain.gain, 4),
+            "limited_samples": self._output_gain.limited_samples
+            + self._aplay_output_gain.limited_samples,
+        }
+
+    def get_earcon_stats(self) -> dict:
+        """
+        Độ trễ âm báo gần nhất theo đường ra: start = tới lúc được trộn,
+        device = tới lúc ra loa (gồm đệm PortAudio hoặc phần pipe aplay còn tồn).
+        """
+        return {
+            "names": self._earcon_bank.names(),
+            "block_ms": OUTPUT_BLOCK_MS,
+            "last_start_latency_ms": self._earcon_mixer.last_start_latency_ms,
+            "last_device_latency_ms": self._earcon_mixer.last_device_latency_ms,
+            "aplay_last_start_latency_ms": self._aplay_earcon_mixer.last_start_latency_ms,
+            "aplay_last_device_latency_ms": self._aplay_earcon_mixer.last_device_latency_ms,
+        }
+
+    # -----------------------
+    # Bus nhạc
+    # -----------------------
+    def play_music(self, path, start_seconds: float = 0.0) -> bool:
+        """
+        Phát tệp nhạc qua bộ trộn đầu ra (giải mã dần trong worker thread).
+        """
+        if self._is_closing:
+            return False
+        via_callback = self._output_route is not None and not self._hdmi_use_aplay
+        if not via_callback and not (self._hdmi_use_aplay or self._jack_use_aplay):
+            self._music_error = "Không có đường ra âm thanh để phát nhạc"
+            logger.warning(f"🎵 {self._music_error}")
+            return False
+        reason = MusicDecoder.unavailable_reason(path)
+        if reason:
+            self._music_error = reason
+            logger.error(f"🎵 {reason}")
+            return False
+        self._music_error = None
+
+        self._stop_music_decoder()
+        rate = (
+            self._output_route.sample_rate
+            if via_callback
+            else AudioConfig.OUTPUT_SAMPLE_RATE
+        )
+        self._music_via_callback = via_callback
+        self._music_offset = max(0.0, start_seconds)
+        session = self._music_bus.start(rate)
+        self._music_decoder = MusicDecoder(self._music_bus, path, rate, start_seconds)
+        self._music_decoder.start(session)
+        if not via_callback:
+            self._ensure_music_pump()
+        logger.info(
+            f"🎵 Phát nhạc qua {'sounddevice' if via_callback else 'aplay'} @ {rate}Hz"
+        )
+        return True
+
+    @property
+    def music_error(self) -> Optional[str]:
+        """
+        Lỗi của lần phát nhạc gần nhất (không bắt đầu được hoặc giải mã thất bại).
+        """
+        return self._music_error or self._music_bus.error
+
+    async def wait_music_started(self, timeout: float = 1.5) -> Optional[str]:
+        """
+        Chờ bộ giải mã đưa ra dữ liệu đầu tiên; trả về lỗi nếu giải mã hỏng ngay từ đầu.
+        Bộ giải mã chậm (hết timeout) không bị coi là lỗi.
+        """
+        bus = self._music_bus
+        deadline = time.monotonic() + timeout
+        while bus.playing and time.monotonic() < deadline:
+            if bus.started:
+                return None
+            if bus.error:
+                return bus.error
+            if bus.drained:
+                return "Tệp nhạc không có dữ liệu âm thanh"
+            await asyncio.sleep(0.05)
+        return None
+
+    def pause_music(self):
+        self._music_bus.set_paused(True)
+
+    def resume_music(self):
+        self._music_bus.set_paused(False)
+        if self._music_bus.playing and not self._music_via_callback:
+            self._ensure_music_pump()
+
+    def stop_music(self):
+        self._stop_music_decoder()
+        self._music_bus.stop()
+
+    def seek_music(self, seconds: float) -> bool:
+        if self._music_decoder is None:
+            return False
+        paused = self._music_bus.paused
+        if not self.play_music(self._music_decoder.path, seconds):
+            return False
+        self._music_bus.set_paused(paused)
+        return True
+
+    def music_position(self) -> float:
+        return self._music_offset + self._music_bus.position_seconds()
+
+    @property
+    def is_music_playing(self) -> bool:
+        return self._music_bus.active
+
+    @property
+    def music_finished(self) -> bool:
+        """
+        Bộ giải mã đã hết dữ liệu và bus đã phát hết.
+        """
+        return self._music_bus.playing and self._music_bus.drained
+
+    def duck_music(self, ducked: bool):
+        """
+        Giảm nhạc khi đang nghe người dùng (để micro không bị nhạc lấn át).
+        """
+        self._music_listen_duck = ducked
+        self._music_bus.set_ducked(ducked or self._is_playing)
+
+    def get_concealed_frames(self) -> int:
+        """
+        Số khung TTS được Opus PLC nội suy thay cho gói UDP bị mất.
+        """
+        return self._concealed_frames
+
+    def get_music_stats(self) -> dict:
+        bus = self._music_bus
+        return {
+            "playing": bus.active,
+            "ducked": bus.ducked,
+            "buffered_ms": round(bus.buffered_ms, 1),
+            "underruns": bus.underruns,
+            "position": round(self.music_position(), 2),
+        }
+
+    def _stop_music_decoder(self):
+        if self._music_decoder is not None:
+            self._music_decoder.stop()
+            self._music_decoder = None
+
+    def _music_pump_running(self) -> bool:
+        return self._music_pump_task is not None and not self._music_pump_task.done()
+
+    def _ensure_music_pump(self):
+        if not self._music_pump_running():
+            self._music_pump_task = asyncio.create_task(self._music_pump())
+
+    def _aplay_ahead_seconds(self) -> float:
+        """
+        Lượng âm thanh đã ghi vào aplay đi trước thời gian thực (giây).
+        """
+        now = time.perf_counter()
+        ahead = self._aplay_written / AudioConfig.OUTPUT_SAMPLE_RATE - (
+            now - self._aplay_clock_base
+        )
+        if ahead < 0:
+            # aplay đã phát hết dữ liệu -> đặt lại đồng hồ
+            self._aplay_clock_base = now
+            self._aplay_written = 0
+            ahead = 0.0
+        return ahead
+
+    async def _music_pump(self):
+        """
+        Đường aplay không có callback: bơm nhạc theo đồng hồ thực (đi trước tối đa 200ms).
+        Khi TTS đang ghi, write_audio trộn nhạc vào khung TTS nên bơm tạm nghỉ.
+        """
+        frame = AudioConfig.OUTPUT_FRAME_SIZE
+        frame_s = frame / AudioConfig.OUTPUT_SAMPLE_RATE
+        silence = np.zeros(frame, dtype=np.int16)
+        try:
+            while (
+                self._music_bus.playing
+                and not self._music_bus.drained
+                and not self._is_closing
+            ):
+                now = time.time()
+                tts_active = self._is_playing and (now - self._last_audio_write_time) < 0.3
+                if (
+                    tts_active
+                    or self._music_bus.paused
+                    or self._aplay_ahead_seconds() > 0.2
+                ):
+                    await asyncio.sleep(frame_s)
+                    continue
+
+                self._music_bus.set_ducked(self._music_listen_duck)
+                mixed = self._music_bus.mix_wide(silence)
+                if self._aplay_earcon_mixer.active:
+                    mixed = self._aplay_earcon_mixer.mix_wide(
+                        mixed, self._aplay_ahead_seconds()
+                    )
+                out = self._aplay_output_gain.process(
+                    mixed, AudioConfig.OUTPUT_SAMPLE_RATE
+                )
+                if self._hdmi_use_aplay and self._hdmi_aplay_process:
+                    self._write_hdmi_audio(out)
+                if self._jack_use_aplay and self._jack_aplay_process:
+                    self._write_jack_audio(out)
+                self._aplay_written += frame
+            if self._hdmi_use_aplay:
+                self._flush_hdmi_buffer()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"🎵 Bơm nhạc ra aplay lỗi: {e}")
+
     async def write_audio(self, opus_data: bytes):
         """
         Giải mã âm thanh và phát Dữ liệu Opus nhận từ mạng -> Giải mã 24kHz -> Hàng đợi phát.
         """
         try:
+            if not opus_data:
+                # Khung rỗng = gói bị mất trên UDP: Opus PLC (độ dài 0) nội suy một khung.
+                # Chỉ che lỗi giữa câu TTS, không sinh âm sau khi luồng đã dừng hẳn.
+                if time.monotonic() - self._last_voice_frame_time > 0.5:
+                    return
+                self._concealed_frames += 1
+            else:
+                self._last_voice_frame_time = time.monotonic()
             # Giải mã Opus thành dữ liệu PCM 24kHz
             pcm_data = self.opus_decoder.decode(
                 opus_data, AudioConfig.OUTPUT_FRAME_SIZE
@@ -1429,6 +2380,23 @@ class AudioCodec:
                 )
                 return
 
+            # Đường aplay không có callback: trộn âm báo + gain/limiter ngay tại đây
+            aplay_array = audio_array
+            if self._hdmi_audio or self._jack_audio:
+                use_aplay = self._hdmi_use_aplay or self._jack_use_aplay
+                ahead = self._aplay_ahead_seconds() if use_aplay else 0.0
+                mixed = audio_array
+                if self._music_bus.active and not self._music_via_callback:
+                    self._music_bus.set_ducked(True)
+                    mixed = self._music_bus.mix_wide(mixed)
+                if self._aplay_earcon_mixer.active:
+                    mixed = self._aplay_earcon_mixer.mix_wide(mixed, ahead)
+                aplay_array = self._aplay_output_gain.process(
+                    mixed, AudioConfig.OUTPUT_SAMPLE_RATE
+                )
+                if use_aplay:
+                    self._aplay_written += len(aplay_array)
+
             # Nếu HDMI aplay được sử dụng, ghi trực tiếp vào aplay
             if self._hdmi_use_aplay:
                 if not self._hdmi_aplay_process:
@@ -1437,7 +2405,7 @@ class AudioCodec:
                     self._start_hdmi_aplay()
                 
                 if self._hdmi_aplay_process:
-                    self._write_hdmi_audio(audio_array)
+                    self._write_hdmi_audio(aplay_array)
                     self._is_playing = True
                     self._last_audio_write_time = time.time()  # Track để timeout
                 else:
@@ -1447,7 +2415,7 @@ class AudioCodec:
                 logger.info("🔊 HDMI enabled but aplay not active, starting...")
                 self._start_hdmi_aplay()
                 if self._hdmi_use_aplay and self._hdmi_aplay_process:
-                    self._write_hdmi_audio(audio_array)
+                    self._write_hdmi_audio(aplay_array)
                     self._is_playing = True
                     self._last_audio_write_time = time.time()  # Track để timeout
             else:
@@ -1460,12 +2428,12 @@ class AudioCodec:
                     if not self._jack_aplay_process:
                         self._start_jack_aplay()
                     if self._jack_aplay_process:
-                        self._write_jack_audio(audio_array)
+                        self._write_jack_audio(aplay_array)
                 elif not self._jack_use_aplay:
                     # Thử start lần đầu
                     self._start_jack_aplay()
                     if self._jack_aplay_process:
-                        self._write_jack_audio(audio_array)
+                        self._write_jack_audio(aplay_array)
 
         except opuslib.OpusError as e:
             logger.warning(f"Giải mã Opus thất bại, bỏ qua khung này: {e}")
@@ -1620,6 +2588,18 @@ class AudioCodec:
 
         self._is_closing = True
         logger.info("Đang đóng audio codec...")
+
+        if self._probe_validation_task and not self._probe_validation_task.done():
+            self._probe_validation_task.cancel()
+        if self._unsubscribe_link is not None:
+            self._unsubscribe_link()
+            self._unsubscribe_link = None
+
+        self.stop_music()
+        if self._music_pump_running():
+            self._music_pump_task.cancel()
+        if self._aplay_earcon_task and not self._aplay_earcon_task.done():
+            self._aplay_earcon_task.cancel()
         
         # Stop HDMI aplay nếu đang chạy
         if self._hdmi_use_aplay:
@@ -1677,6 +2657,8 @@ class AudioCodec:
             # 7. 显式置 None（断开 Python 引用）
             self.input_resampler = None
             self.output_resampler = None
+            self._input_route = None
+            self._output_route = None
 
             # 8. 第二次 GC，释放 resampler 对象（触发 nanobind 析构）
             gc.collect()
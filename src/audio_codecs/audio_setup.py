@@ -174,7 +174,7 @@ def set_default_sink(sink_name: str) -> bool:
         return False
 
 
-def setup_audio_environment():
+def setup_audio_environment(quick: bool = False):
     """
     Main setup function - gọi khi app khởi động.
     
@@ -184,6 +184,9 @@ def setup_audio_environment():
     3. Restart PulseAudio
     4. Set environment để video không chiếm HDMI
     5. Return True để dùng aplay trực tiếp
+
+    quick=True (audio probe cache hit): bỏ qua kiểm tra dependencies và rút
+    ngắn thời gian chờ, vì phần cứng/phần mềm đã được xác thực lần khởi động trước.
     """
     if not is_raspberry_pi():
         logger.info("Not on Raspberry Pi, skip audio setup")
@@ -192,11 +195,12 @@ def setup_audio_environment():
     logger.info("=== Audio Setup: Starting ===")
     
     # Step 0: Check and install dependencies (skip nếu đã check trước đó)
-    try:
-        from src.utils.dependency_checker import check_all_dependencies
-        check_all_dependencies()
-    except Exception as e:
-        logger.warning(f"Dependency check failed: {e}")
+    if not quick:
+        try:
+            from src.utils.dependency_checker import check_all_dependencies
+            check_all_dependencies()
+        except Exception as e:
+            logger.warning(f"Dependency check failed: {e}")
     
     # Step 1: Kill stale audio processes để giải phóng HDMI
     kill_audio_processes()
@@ -208,8 +212,8 @@ def setup_audio_environment():
     logger.info("📺 Video audio disabled (GST_AUDIO_SINK=fakesink)")
     
     # Step 3: Đợi một chút để các process cũ release device
-    import time
-    time.sleep(1)
+    # pkill -9 giải phóng device gần như ngay lập tức, 1s chỉ cần cho lần dò đầy đủ
+    time.sleep(0.2 if quick else 1)
     
     logger.info("=== Audio Setup: Complete - HDMI ready for AI audio ===")
     return True  # Báo hiệu dùng aplay trực tiếp, không cần PulseAudio
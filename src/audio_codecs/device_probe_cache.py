@@ -0,0 +1,203 @@
+"""
+Audio Device Probe Cache - Lưu kết quả dò thiết bị âm thanh giữa các lần khởi động.
+
+Vấn đề:
+- Mỗi lần khởi động AudioCodec đều gọi sd.query_devices(), parse `aplay -l`,
+  tìm HDMI card number và chạy setup_audio_environment() (sleep 1s).
+- Trên Pi phần cứng hầu như không đổi giữa các lần boot.
+
+Giải pháp:
+- Tạo chữ ký phần cứng rẻ: nội dung /proc/asound/cards + danh sách USB VID:PID
+  + các khóa AUDIO_DEVICES ảnh hưởng tới việc chọn thiết bị.
+- Cache hit: dùng lại ngay chỉ mục thiết bị, sample rate, số kênh đã biết là tốt,
+  việc xác thực lại chạy nền.
+- Cache miss: dò đầy đủ như cũ rồi lưu lại kèm thời gian dò để đo thời gian tiết kiệm.
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.utils.logging_config import get_logger
+from src.utils.resource_finder import get_project_root
+
+logger = get_logger(__name__)
+
+# Tăng khi thay đổi định dạng file cache
+CACHE_VERSION = 1
+
+ASOUND_CARDS_PATH = Path("/proc/asound/cards")
+USB_DEVICES_PATH = Path("/sys/bus/usb/devices")
+
+# Các khóa cấu hình quyết định thiết bị được chọn
+SIGNATURE_CONFIG_KEYS = (
+    "input_device_id",
+    "output_device_id",
+    "i2s_enabled",
+    "i2s_stereo",
+    "hdmi_audio",
+    "jack_audio",
+    "jack_device_name",
+)
+
+# Các trường probe bắt buộc phải có để coi là cache hợp lệ
+REQUIRED_PROBE_FIELDS = (
+    "mic_device_id",
+    "speaker_device_id",
+    "input_sample_rate",
+    "output_sample_rate",
+)
+
+
+def _read_text(path: Path) -> str:
+    try:
+        return path.read_text(errors="replace")
+    except Exception:
+        return ""
+
+
+def _usb_ids(usb_root: Path) -> list:
+    """
+    Đọc danh sách VID:PID của thiết bị USB (mic/sound card USB thay đổi -> chữ ký đổi).
+    """
+    ids = []
+    try:
+        for dev in usb_root.iterdir():
+            vendor = _read_text(dev / "idVendor").strip()
+            product = _read_text(dev / "idProduct").strip()
+            if vendor and product:
+                ids.append(f"{vendor}:{product}")
+    except Exception:
+        pass
+    return sorted(ids)
+
+
+def compute_hardware_signature(
+    audio_config: Optional[Dict[str, Any]] = None,
+    cards_path: Path = ASOUND_CARDS_PATH,
+    usb_root: Path = USB_DEVICES_PATH,
+) -> str:
+    """
+    Tính chữ ký phần cứng âm thanh (sha1 rút gọn).
+
+    Chỉ đọc file trong procfs/sysfs nên tốn dưới 1ms, không gọi subprocess.
+    """
+    audio_config = audio_config or {}
+    relevant = {k: audio_config.get(k) for k in SIGNATURE_CONFIG_KEYS}
+    payload = "\n".join(
+        [
+            f"v{CACHE_VERSION}",
+            _read_text(cards_path).strip(),
+            ",".join(_usb_ids(usb_root)),
+            json.dumps(relevant, sort_keys=True),
+        ]
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class AudioProbeCache:
+    """
+    Cache kết quả dò thiết bị âm thanh, lưu tại cache/audio_probe.json.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None):
+        self.cache_file = cache_file or (
+            get_project_root() / "cache" / "audio_probe.json"
+        )
+        self._data: Optional[Dict[str, Any]] = None
+
+        # Thống kê cho lần khởi động hiện tại
+        self.hit = False
+        self.probe_ms: Optional[float] = None
+        self.saved_ms: Optional[float] = None
+        self.validated: Optional[bool] = None
+
+    def _read(self) -> Dict[str, Any]:
+        if self._data is None:
+            try:
+                self._data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+                if not isinstance(self._data, dict):
+                    self._data = {}
+            except FileNotFoundError:
+                self._data = {}
+            except Exception as e:
+                logger.warning(f"Đọc audio probe cache thất bại: {e}")
+                self._data = {}
+        return self._data
+
+    def load(self, signature: str) -> Optional[Dict[str, Any]]:
+        """
+        Trả về probe đã lưu nếu chữ ký khớp, ngược lại None.
+        """
+        data = self._read()
+        if data.get("version") != CACHE_VERSION or data.get("signature") != signature:
+            return None
+        probe = data.get("probe")
+        if not isinstance(probe, dict):
+            return None
+        if any(field not in probe for field in REQUIRED_PROBE_FIELDS):
+            return None
+        return probe
+
+    def store(self, signature: str, probe: Dict[str, Any], probe_ms: float) -> bool:
+        """
+        Lưu probe đã xác thực kèm thời gian dò đầy đủ (dùng để tính thời gian tiết kiệm).
+        """
+        data = {
+            "version": CACHE_VERSION,
+            "signature": signature,
+            "probe": probe,
+            "full_probe_ms": round(probe_ms, 1),
+            "saved_at": time.time(),
+        }
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            tmp.replace(self.cache_file)
+            self._data = data
+            return True
+        except Exception as e:
+            logger.warning(f"Ghi audio probe cache thất bại: {e}")
+            return False
+
+    def invalidate(self, reason: str = ""):
+        """
+        Xóa cache (ví dụ khi xác thực nền phát hiện thiết bị đã đổi).
+        """
+        self._data = {}
+        try:
+            self.cache_file.unlink(missing_ok=True)
+            logger.info(f"🗑️ Đã xóa audio probe cache{f': {reason}' if reason else ''}")
+        except Exception as e:
+            logger.warning(f"Xóa audio probe cache thất bại: {e}")
+
+    @property
+    def full_probe_ms(self) -> Optional[float]:
+        value = self._read().get("full_probe_ms")
+        return float(value) if isinstance(value, (int, float)) else None
+
+    def record_hit(self, elapsed_ms: float):
+        """
+        Ghi nhận cache hit: thời gian tiết kiệm = dò đầy đủ lần trước - thời gian hit.
+        """
+        self.hit = True
+        self.probe_ms = elapsed_ms
+        full = self.full_probe_ms
+        self.saved_ms = max(0.0, full - elapsed_ms) if full is not None else None
+
+    def record_miss(self, elapsed_ms: float):
+        self.hit = False
+        self.probe_ms = elapsed_ms
+        self.saved_ms = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "hit": self.hit,
+            "probe_ms": round(self.probe_ms, 1) if self.probe_ms is not None else None,
+            "full_probe_ms": self.full_probe_ms,
+            "saved_ms": round(self.saved_ms, 1) if self.saved_ms is not None else None,
+            "validated": self.validated,
+        }
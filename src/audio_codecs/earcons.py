@@ -0,0 +1,279 @@
+"""
+Earcons - Âm báo ngắn (wake, lỗi, hẹn giờ/nhắc nhở, test loa) phát trực tiếp qua đường ra của AudioCodec.
+
+Trước đây âm báo được tạo thành file WAV tạm rồi gọi `aplay` (mất 100-300ms khởi động
+process, tranh chấp thiết bị với aplay đang phát TTS).
+
+Ở đây:
+- EarconBank giải mã/tạo âm báo MỘT LẦN thành mảng int16 đúng sample rate đầu ra.
+  File `assets/sounds/<tên>.wav` (nếu có) ghi đè âm tổng hợp mặc định.
+- EarconMixer giữ các "voice" đang phát và cộng chúng vào khung đầu ra
+  (trộn đè lên TTS), gọi được từ callback âm thanh.
+"""
+
+import asyncio
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.logging_config import get_logger
+from src.utils.resource_finder import find_assets_dir
+
+logger = get_logger(__name__)
+
+# Mỗi âm: danh sách (tần số Hz, thời lượng giây); tần số 0 = khoảng lặng
+EARCON_PATTERNS: Dict[str, List[Tuple[float, float]]] = {
+    "wake": [(880.0, 0.07), (0.0, 0.02), (1320.0, 0.09)],
+    "error": [(440.0, 0.12), (0.0, 0.03), (330.0, 0.18)],
+    "alert": [(988.0, 0.15), (0.0, 0.1), (988.0, 0.15), (0.0, 0.1), (988.0, 0.15)],
+    "test": [(880.0, 0.3), (0.0, 0.15), (880.0, 0.3), (0.0, 0.15), (880.0, 0.3)],
+}
+
+EARCON_AMPLITUDE = 12000  # ~ -8.7 dBFS, đủ nghe mà không át TTS
+FADE_SECONDS = 0.005
+
+
+def synthesize_earcon(pattern: List[Tuple[float, float]], sample_rate: int) -> np.ndarray:
+    """
+    Tạo âm báo từ chuỗi tone; mỗi tone có fade in/out để không bị click.
+    """
+    parts = []
+    fade = max(1, int(sample_rate * FADE_SECONDS))
+    for freq, duration in pattern:
+        n = int(sample_rate * duration)
+        if n <= 0:
+            continue
+        if freq <= 0:
+            parts.append(np.zeros(n, dtype=np.float32))
+            continue
+        t = np.arange(n, dtype=np.float32) / sample_rate
+        tone = np.sin(2 * np.pi * freq * t).astype(np.float32) * EARCON_AMPLITUDE
+        f = min(fade, n // 2)
+        if f > 0:
+            ramp = np.linspace(0.0, 1.0, f, dtype=np.float32)
+            tone[:f] *= ramp
+            tone[-f:] *= ramp[::-1]
+        parts.append(tone)
+    if not parts:
+        return np.zeros(0, dtype=np.int16)
+    return np.concatenate(parts).astype(np.int16)
+
+
+def resample_linear(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """
+    Lấy mẫu lại tuyến tính (đủ tốt cho âm báo ngắn, chỉ chạy một lần lúc nạp).
+    """
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples.astype(np.int16, copy=False)
+    n_out = int(round(len(samples) * dst_rate / src_rate))
+    x_old = np.arange(len(samples), dtype=np.float64)
+    x_new = np.linspace(0, len(samples) - 1, n_out)
+    return np.interp(x_new, x_old, samples.astype(np.float64)).astype(np.int16)
+
+
+def load_wav_mono(path: Path, sample_rate: int) -> Optional[np.ndarray]:
+    """
+    Đọc WAV PCM 16-bit, downmix mono và đưa về sample_rate.
+    """
+    try:
+        with wave.open(str(path), "rb") as wav:
+            if wav.getsampwidth() != 2:
+                logger.warning(f"Earcon {path.name}: chỉ hỗ trợ PCM 16-bit")
+                return None
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            data = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        if channels > 1:
+            data = data.reshape(-1, channels).mean(axis=1).astype(np.int16)
+        return resample_linear(data, rate, sample_rate)
+    except Exception as e:
+        logger.warning(f"Đọc earcon {path} thất bại: {e}")
+        return None
+
+
+class EarconBank:
+    """
+    Bộ nhớ đệm âm báo đã giải mã, theo (tên, sample rate).
+    """
+
+    def __init__(self, sounds_dir: Optional[Path] = None):
+        if sounds_dir is None:
+            assets = find_assets_dir()
+            sounds_dir = assets / "sounds" if assets else None
+        self.sounds_dir = sounds_dir
+        self._cache: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def names(self) -> List[str]:
+        names = set(EARCON_PATTERNS)
+        if self.sounds_dir and self.sounds_dir.is_dir():
+            names.update(p.stem for p in self.sounds_dir.glob("*.wav"))
+        return sorted(names)
+
+    def preload(self, sample_rate: int):
+        """
+        Giải mã toàn bộ âm báo cho sample rate đầu ra (gọi một lần lúc khởi động).
+        """
+        for name in self.names():
+            self.get(name, sample_rate)
+        logger.info(f"🔔 Đã nạp {len(self.names())} earcon @ {sample_rate}Hz")
+
+    def get(self, name: str, sample_rate: int) -> Optional[np.ndarray]:
+        key = (name, sample_rate)
+        samples = self._cache.get(key)
+        if samples is not None:
+            return samples
+
+        if self.sounds_dir:
+            wav_path = self.sounds_dir / f"{name}.wav"
+            if wav_path.is_file():
+                samples = load_wav_mono(wav_path, sample_rate)
+        if samples is None and name in EARCON_PATTERNS:
+            samples = synthesize_earcon(EARCON_PATTERNS[name], sample_rate)
+        if samples is None:
+            return None
+
+        samples.setflags(write=False)
+        self._cache[key] = samples
+        return samples
+
+
+class EarconMixer:
+    """
+    Trộn các âm báo đang phát vào khung đầu ra.
+
+    play() gọi từ event loop; mix_into()/render() gọi từ callback âm thanh hoặc write_audio.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._voices: List[List] = []  # [samples, vị trí, gain, thời điểm yêu cầu]
+        # Độ trễ từ play() tới khi mẫu đầu tiên được trộn vào khối đầu ra
+        self.last_start_latency_ms: Optional[float] = None
+        # Như trên cộng phần đệm phía sau (PortAudio/pipe aplay): tới lúc mẫu ra loa
+        self.last_device_latency_ms: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self._voices)
+
+    def play(self, samples: np.ndarray, gain: float = 1.0):
+        with self._lock:
+            self._voices.append([samples, 0, gain, time.perf_counter()])
+
+    def clear(self):
+        with self._lock:
+            self._voices = []
+
+    def remaining_samples(self) -> int:
+        with self._lock:
+            return max((len(v[0]) - v[1] for v in self._voices), default=0)
+
+    def _pull(self, n: int, output_delay: float = 0.0) -> Optional[np.ndarray]:
+        """
+        Lấy n mẫu tiếp theo của tổng các voice (int32, chưa bão hòa).
+
+        output_delay: số giây từ lúc khối này được trộn tới lúc ra loa (đệm thiết bị).
+        """
+        with self._lock:
+            if not self._voices:
+                return None
+            acc = np.zeros(n, dtype=np.int32)
+            alive = []
+            for voice in self._voices:
+                samples, pos, gain, requested_at = voice
+                if pos == 0:
+                    self.last_start_latency_ms = (
+                        time.perf_counter() - requested_at
+                    ) * 1000
+                    self.last_device_latency_ms = (
+                        self.last_start_latency_ms + max(0.0, output_delay) * 1000
+                    )
+                chunk = samples[pos : pos + n]
+                if gain == 1.0:
+                    acc[: len(chunk)] += chunk
+                else:
+                    acc[: len(chunk)] += (chunk * gain).astype(np.int32)
+                voice[1] = pos + n
+                if voice[1] < len(samples):
+                    alive.append(voice)
+            self._voices = alive
+            return acc
+
+    def mix_wide(self, frame: np.ndarray, output_delay: float = 0.0) -> np.ndarray:
+        """
+        Cộng âm báo vào khung int16 nhưng giữ tổng int32 chưa bão hòa
+        (để gain/limiter phía sau xử lý), không có voice thì trả nguyên khung.
+        """
+        flat = frame.reshape(-1)
+        acc = self._pull(len(flat), output_delay)
+        if acc is None:
+            return frame
+        acc += flat
+        return acc.reshape(frame.shape)
+
+    def mix_into(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Cộng âm báo vào khung int16 (1 chiều hoặc (n, 1)), trả về khung mới đã bão hòa.
+        """
+        acc = self.mix_wide(frame)
+        if acc is frame:
+            return frame
+        np.clip(acc, -32768, 32767, out=acc)
+        return acc.astype(np.int16)
+
+    def render(self, n: int, output_delay: float = 0.0) -> Optional[np.ndarray]:
+        """
+        Lấy n mẫu âm báo thuần (khi không có TTS), None nếu không có gì để phát.
+        """
+        acc = self._pull(n, output_delay)
+        if acc is None:
+            return None
+        np.clip(acc, -32768, 32767, out=acc)
+        return acc.astype(np.int16)
+
+
+async def play_earcon_standalone(
+    name: str, hdmi_cards: Optional[List[str]] = None, sample_rate: int = 48000
+) -> str:
+    """
+    Phát âm báo khi không có AudioCodec (ví dụ chạy --no-audio hoặc trang cài đặt lần đầu).
+
+    Dữ liệu PCM được đẩy thẳng qua stdin của aplay (không tạo file WAV tạm);
+    không có HDMI thì dùng sounddevice. Trả về mô tả thiết bị đã phát, lỗi thì raise.
+    """
+    samples = EarconBank().get(name, sample_rate)
+    if samples is None:
+        raise ValueError(f"Không có earcon '{name}'")
+
+    if hdmi_cards:
+        pcm = samples.tobytes()
+        for device in [f"plughw:CARD={card}" for card in hdmi_cards] + ["default"]:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    "aplay", "-D", device, "-f", "S16_LE", "-r", str(sample_rate),
+                    "-c", "1", "-q", "-",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                _, stderr = await asyncio.wait_for(proc.communicate(pcm), timeout=10)
+            except Exception as e:
+                logger.debug(f"aplay {device} thất bại: {e}")
+                continue
+            if proc.returncode == 0:
+                return device
+            logger.debug(f"aplay {device} thất bại: {stderr.decode(errors='replace').strip()}")
+        raise RuntimeError("Không thể phát qua HDMI")
+
+    import sounddevice as sd
+
+    def _play():
+        sd.play(samples, sample_rate)
+        sd.wait()
+
+    await asyncio.to_thread(_play)
+    return "sounddevice"
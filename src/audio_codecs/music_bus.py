@@ -0,0 +1,318 @@
+"""
+Music Bus - Nhạc (công cụ MCP music) phát qua bộ trộn đầu ra của AudioCodec.
+
+Trước đây MusicPlayer mở pygame mixer riêng ở OUTPUT_SAMPLE_RATE, tranh chấp thiết bị
+ALSA với AudioCodec (và aplay trên HDMI), không thể giảm nhạc khi TTS nói.
+
+Ở đây:
+- MusicDecoder giải mã tệp dần dần trong worker thread (ffmpeg -> PCM s16le mono,
+  WAV đọc trực tiếp khi không có ffmpeg) và đẩy vào MusicBus. Lỗi giải mã được ghi
+  vào MusicBus.error để người gọi báo lại (install_*.sh cài sẵn ffmpeg).
+- MusicBus là hàng đợi PCM có giới hạn (producer bị chặn khi đầy) + ducking có ramp;
+  pull()/mix_wide() gọi từ callback đầu ra hoặc đường aplay.
+"""
+
+import shutil
+import subprocess
+import threading
+import wave
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.audio_codecs.earcons import resample_linear
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DUCK_GAIN = 0.2  # ~ -14 dB khi TTS nói / đang nghe người dùng
+DUCK_RAMP_MS = 150.0
+DECODE_CHUNK_BYTES = 8192
+
+
+class MusicBus:
+    """
+    Bus nhạc: bộ đệm PCM int16 giới hạn theo thời lượng + gain ducking.
+
+    push()/finish() gọi từ thread giải mã; pull()/mix_wide() từ callback âm thanh.
+    """
+
+    def __init__(self, capacity_ms: float = 2000.0):
+        self.capacity_ms = capacity_ms
+        self._cond = threading.Condition()
+        self._chunks: deque = deque()
+        self._buffered = 0
+        self.sample_rate = 0
+        self._capacity = 0
+        self._session = 0
+        self.playing = False
+        self.paused = False
+        self._finished = False
+        self.error: Optional[str] = None
+        self.played_samples = 0
+        self.underruns = 0
+        self._duck_target = 1.0
+        self._duck_gain = 1.0
+
+    # ----- Điều khiển (event loop) -----
+    def start(self, sample_rate: int) -> int:
+        """
+        Bắt đầu phiên phát mới, trả về mã phiên (producer cũ bị loại).
+        """
+        with self._cond:
+            self._session += 1
+            self._chunks.clear()
+            self._buffered = 0
+            self.sample_rate = sample_rate
+            self._capacity = int(sample_rate * self.capacity_ms / 1000)
+            self.playing = True
+            self.paused = False
+            self._finished = False
+            self.error = None
+            self.played_samples = 0
+            self._cond.notify_all()
+            return self._session
+
+    def stop(self):
+        with self._cond:
+            self._session += 1
+            self._chunks.clear()
+            self._buffered = 0
+            self.playing = False
+            self.paused = False
+            self._cond.notify_all()
+
+    def set_paused(self, paused: bool):
+        self.paused = paused
+
+    def set_ducked(self, ducked: bool):
+        self._duck_target = DUCK_GAIN if ducked else 1.0
+
+    @property
+    def ducked(self) -> bool:
+        return self._duck_target < 1.0
+
+    @property
+    def active(self) -> bool:
+        """
+        Đang phát ra loa (có phiên, không tạm dừng, chưa hết dữ liệu).
+        """
+        return self.playing and not self.paused and not self.drained
+
+    @property
+    def drained(self) -> bool:
+        return self._finished and self._buffered == 0
+
+    @property
+    def started(self) -> bool:
+        """
+        Bộ giải mã đã đưa ra dữ liệu (đang đệm hoặc đã phát được một phần).
+        """
+        return self._buffered > 0 or self.played_samples > 0
+
+    @property
+    def buffered_ms(self) -> float:
+        return self._buffered * 1000 / self.sample_rate if self.sample_rate else 0.0
+
+    # ----- Producer (thread giải mã) -----
+    def push(self, session: int, samples: np.ndarray, timeout: float = 0.5) -> bool:
+        """
+        Đẩy PCM vào bus, chờ khi bus đầy. Trả về False nếu phiên đã bị thay thế.
+        """
+        with self._cond:
+            while session == self._session and self._buffered >= self._capacity:
+                self._cond.wait(timeout)
+            if session != self._session:
+                return False
+            self._chunks.append(samples)
+            self._buffered += len(samples)
+            return True
+
+    def finish(self, session: int, error: Optional[str] = None):
+        with self._cond:
+            if session == self._session:
+                self._finished = True
+                self.error = error
+
+    # ----- Consumer (callback âm thanh) -----
+    def _duck_curve(self, n: int) -> Optional[np.ndarray]:
+        current, target = self._duck_gain, self._duck_target
+        if current == target:
+            return None
+        step = (1.0 - DUCK_GAIN) / max(1, self.sample_rate * DUCK_RAMP_MS / 1000)
+        step = step if target > current else -step
+        gains = current + step * np.arange(1, n + 1, dtype=np.float32)
+        gains = np.minimum(gains, target) if step > 0 else np.maximum(gains, target)
+        self._duck_gain = float(gains[-1])
+        return gains
+
+    def pull(self, n: int) -> Optional[np.ndarray]:
+        """
+        Lấy n mẫu nhạc (float32, đã áp ducking); None nếu bus không phát.
+        Thiếu dữ liệu (giải mã chậm) thì phần còn lại là im lặng.
+        """
+        if not self.active:
+            return None
+        out = np.zeros(n, dtype=np.float32)
+        filled = 0
+        with self._cond:
+            while filled < n and self._chunks:
+                chunk = self._chunks[0]
+                take = min(n - filled, len(chunk))
+                out[filled : filled + take] = chunk[:take]
+                if take == len(chunk):
+                    self._chunks.popleft()
+                else:
+                    self._chunks[0] = chunk[take:]
+                filled += take
+            self._buffered -= filled
+            self._cond.notify_all()
+        self.played_samples += filled
+        if filled < n and not self._finished:
+            self.underruns += 1
+
+        gains = self._duck_curve(n)
+        if gains is not None:
+            out *= gains
+        elif self._duck_gain != 1.0:
+            out *= self._duck_gain
+        return out
+
+    def mix_wide(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Cộng nhạc vào khung (int16/int32, 1 chiều hoặc (n, 1)), trả tổng int32 chưa bão hòa.
+        """
+        flat = frame.reshape(-1)
+        music = self.pull(len(flat))
+        if music is None:
+            return frame
+        acc = flat.astype(np.int32)
+        acc += music.astype(np.int32)
+        return acc.reshape(frame.shape)
+
+    def position_seconds(self) -> float:
+        return self.played_samples / self.sample_rate if self.sample_rate else 0.0
+
+
+class MusicDecoder:
+    """
+    Giải mã tệp nhạc dần dần trong worker thread và đẩy PCM vào MusicBus.
+    """
+
+    def __init__(self, bus: MusicBus, path: Path, sample_rate: int, start_seconds: float = 0.0):
+        self.bus = bus
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.start_seconds = max(0.0, start_seconds)
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session = 0
+        self._stopped = False
+
+    @staticmethod
+    def unavailable_reason(path) -> Optional[str]:
+        """
+        Lý do không thể giải mã tệp (không có tệp / không có ffmpeg cho định dạng nén),
+        None nếu giải mã được.
+        """
+        path = Path(path)
+        if not path.exists():
+            return f"Tệp nhạc không tồn tại: {path.name}"
+        if shutil.which("ffmpeg") or path.suffix.lower() == ".wav":
+            return None
+        return f"Không có ffmpeg để giải mã {path.suffix} (cài gói ffmpeg)"
+
+    def start(self, session: int):
+        self._session = session
+        self._thread = threading.Thread(
+            target=self._run, name="music-decoder", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        proc = self._process
+        if proc is not None and proc.poll() is None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
+    def _run(self):
+        error = None
+        try:
+            if shutil.which("ffmpeg"):
+                self._decode_ffmpeg()
+            elif self.path.suffix.lower() == ".wav":
+                self._decode_wav()
+            else:
+                error = "Không có ffmpeg để giải mã " + self.path.suffix
+                logger.error(f"🎵 {error}")
+        except Exception as e:
+            error = str(e)
+            logger.error(f"🎵 Giải mã nhạc thất bại: {e}")
+        finally:
+            self.bus.finish(self._session, error)
+
+    def _decode_ffmpeg(self):
+        cmd = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+        if self.start_seconds > 0:
+            cmd += ["-ss", f"{self.start_seconds:.2f}"]
+        cmd += [
+            "-i", str(self.path),
+            "-f", "s16le", "-ac", "1", "-ar", str(self.sample_rate), "-",
+        ]
+        # -loglevel error: stderr chỉ có vài dòng lỗi, đọc sau khi stdout đóng
+        self._process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        pending = b""
+        pushed = 0
+        try:
+            while True:
+                data = self._process.stdout.read(DECODE_CHUNK_BYTES)
+                if not data:
+                    break
+                data = pending + data
+                usable = len(data) - (len(data) % 2)
+                pending = data[usable:]
+                samples = np.frombuffer(data[:usable], dtype=np.int16)
+                if not self.bus.push(self._session, samples):
+                    break  # Phiên bị thay thế (stop/seek/bài mới)
+                pushed += len(samples)
+        finally:
+            stopped = self._stopped
+            self.stop()
+            try:
+                self._process.wait(timeout=2)
+                stderr = self._process.stderr.read().decode("utf-8", errors="ignore")
+            except Exception:
+                stderr = ""
+        if not stopped and self._process.returncode not in (0, None) and pushed == 0:
+            # ffmpeg không mở/giải mã được tệp (hỏng, định dạng lạ)
+            lines = stderr.strip().splitlines()
+            raise RuntimeError(
+                lines[-1] if lines else f"ffmpeg thoát với mã {self._process.returncode}"
+            )
+
+    def _decode_wav(self):
+        with wave.open(str(self.path), "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError("WAV chỉ hỗ trợ PCM 16-bit")
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            if self.start_seconds > 0:
+                wav.setpos(min(wav.getnframes(), int(self.start_seconds * rate)))
+            frames_per_chunk = rate // 10  # 100ms mỗi lần đọc
+            while True:
+                data = wav.readframes(frames_per_chunk)
+                if not data:
+                    break
+                samples = np.frombuffer(data, dtype=np.int16)
+                if channels > 1:
+                    samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+                samples = resample_linear(samples, rate, self.sample_rate)
+                if not self.bus.push(self._session, samples):
+                    break
@@ -0,0 +1,115 @@
+"""
+Output Gain - Âm lượng phần mềm + soft limiter cho đường ra của AudioCodec.
+
+Trước đây mỗi lần đổi âm lượng gọi `amixer`/`pactl`/`wpctl` (vài chục ms mỗi lần,
+đôi khi nhầm card khi dùng HDMI). Giờ:
+- Mixer phần cứng chỉ đặt một lần lúc khởi động (mức cố định).
+- Âm lượng là tham số trong bộ nhớ; mỗi khung được nhân gain bằng numpy.
+- Gain thay đổi được ramp tuyến tính (mặc định 30ms) để không bị click.
+- Soft limiter (tanh knee) nén phần vượt ngưỡng khi TTS + earcon + nhạc cộng lại.
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+INT16_MAX = 32767.0
+
+# Dải âm lượng 0-100 ánh xạ theo dB (100 = 0dB, 1 = -39.6dB, 0 = tắt tiếng)
+VOLUME_RANGE_DB = 40.0
+
+
+def volume_to_gain(volume: float) -> float:
+    """
+    Ánh xạ âm lượng 0-100 sang hệ số khuếch đại tuyến tính (cảm nhận đều theo dB).
+    """
+    volume = max(0.0, min(100.0, float(volume)))
+    if volume <= 0:
+        return 0.0
+    return 10 ** ((volume - 100.0) / 100.0 * VOLUME_RANGE_DB / 20.0)
+
+
+class OutputGainStage:
+    """
+    Gain có ramp + soft limiter, xử lý vector hóa trên từng khung.
+
+    set_volume() gọi từ event loop (chỉ gán float), process() gọi từ callback âm thanh.
+    """
+
+    def __init__(
+        self,
+        volume: float = 100.0,
+        ramp_ms: float = 30.0,
+        limiter_threshold: float = 0.9,
+    ):
+        self.ramp_ms = ramp_ms
+        self._threshold = limiter_threshold * INT16_MAX
+        self._knee = INT16_MAX - self._threshold
+        self.volume = max(0.0, min(100.0, float(volume)))
+        self._target = volume_to_gain(self.volume)
+        self._current = self._target
+        self._ramp_target = self._target
+        self._step = 0.0
+        self.limited_samples = 0  # Số mẫu đã bị limiter nén (để theo dõi)
+
+    @property
+    def gain(self) -> float:
+        return self._current
+
+    def set_volume(self, volume: float):
+        self.volume = max(0.0, min(100.0, float(volume)))
+        self._target = volume_to_gain(self.volume)
+
+    def _gain_curve(self, n: int, sample_rate: int) -> Optional[np.ndarray]:
+        """
+        Trả về mảng gain theo mẫu khi đang ramp, None nếu gain không đổi trong khung.
+        """
+        current, target = self._current, self._target
+        if current == target:
+            return None
+        if target != self._ramp_target:
+            # Mục tiêu mới: bước cố định để đi hết quãng đường trong ramp_ms
+            ramp_samples = max(1, int(sample_rate * self.ramp_ms / 1000))
+            self._ramp_target = target
+            self._step = (target - current) / ramp_samples
+        step = self._step
+        k = min(n, math.ceil(abs(target - current) / abs(step)))
+        gains = np.full(n, target, dtype=np.float32)
+        gains[:k] = current + step * np.arange(1, k + 1, dtype=np.float32)
+        if step > 0:
+            np.minimum(gains, target, out=gains)
+        else:
+            np.maximum(gains, target, out=gains)
+        self._current = target if k < n else float(gains[-1])
+        return gains
+
+    def process(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        Áp dụng gain + limiter. `samples` có thể là int16 hoặc tổng int32/float chưa bão hòa
+        (1 chiều hoặc (n, 1)); trả về int16 cùng shape.
+        """
+        shape = samples.shape
+        flat = samples.reshape(-1)
+        gains = self._gain_curve(len(flat), sample_rate)
+
+        # Đường nhanh: gain = 1, dữ liệu int16 sẵn -> không đụng vào TTS
+        if gains is None and self._current == 1.0 and flat.dtype == np.int16:
+            return samples
+
+        x = flat.astype(np.float32)
+        if gains is not None:
+            x *= gains
+        elif self._current != 1.0:
+            x *= self._current
+
+        a = np.abs(x)
+        over = a > self._threshold
+        if over.any():
+            self.limited_samples += int(np.count_nonzero(over))
+            x[over] = np.sign(x[over]) * (
+                self._threshold
+                + self._knee * np.tanh((a[over] - self._threshold) / self._knee)
+            )
+        np.clip(x, -32768.0, INT16_MAX, out=x)
+        return x.astype(np.int16).reshape(shape)
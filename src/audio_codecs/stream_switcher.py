@@ -0,0 +1,138 @@
+"""
+Stream Switcher - Đổi thiết bị âm thanh nóng mà không làm gián đoạn pipeline.
+
+Trước đây đổi thiết bị = đóng luồng cũ -> tạo resampler mới -> mở luồng mới,
+KWS/uplink mất vài trăm ms âm thanh và khung trong bộ đệm lấy mẫu lại bị bỏ.
+
+Cách làm mới:
+- Mỗi luồng gắn với một StreamRoute (stream + resampler + bộ đệm riêng + generation).
+- Luồng mới được mở song song; callback của route chưa kích hoạt bỏ qua dữ liệu.
+- Chuyển route bằng một phép gán (nguyên tử với callback) -> chuyển đúng ranh giới khung.
+- Luồng cũ chỉ đóng sau khi route mới đã hoạt động.
+- SwitchRecorder đo khoảng trống thực tế giữa khung cuối của route cũ và khung đầu của route mới.
+"""
+
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class StreamRoute:
+    """
+    Một tuyến âm thanh: luồng sounddevice và trạng thái lấy mẫu lại đi kèm.
+    """
+
+    __slots__ = (
+        "kind",
+        "generation",
+        "stream",
+        "device_id",
+        "sample_rate",
+        "frame_size",
+        "resampler",
+        "buffer",
+        "pending",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        generation: int,
+        device_id: Optional[int],
+        sample_rate: int,
+        frame_size: int,
+        resampler=None,
+        buffer: Optional[deque] = None,
+    ):
+        self.kind = kind
+        self.generation = generation
+        self.stream = None
+        self.device_id = device_id
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.resampler = resampler
+        self.buffer = buffer if buffer is not None else deque()
+        self.pending = None  # Phần khung đầu ra chưa phát (khối callback < khung)
+
+    def __repr__(self) -> str:
+        return (
+            f"StreamRoute({self.kind}, gen={self.generation}, "
+            f"device={self.device_id}, rate={self.sample_rate})"
+        )
+
+
+class SwitchRecorder:
+    """
+    Ghi nhận khoảng trống (gap) của mỗi lần đổi luồng.
+
+    note_frame() được gọi từ callback âm thanh cho mỗi khung của route đang hoạt động,
+    nên chỉ làm vài phép gán đơn giản.
+    """
+
+    def __init__(self, frame_ms: float, history: int = 20):
+        self.frame_ms = frame_ms
+        self._last_frame: Dict[str, float] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._history: deque = deque(maxlen=history)
+        self.total = 0
+
+    def note_frame(self, kind: str, generation: int, now: Optional[float] = None):
+        now = time.perf_counter() if now is None else now
+        pending = self._pending.get(kind) if self._pending else None
+        if pending is not None and pending["generation"] == generation:
+            del self._pending[kind]
+            # Khung trước đó là khung cuối cùng của route cũ
+            last = self._last_frame.get(kind)
+            if last is not None:
+                interval_ms = (now - last) * 1000
+                # Khoảng trống = phần vượt quá chu kỳ khung bình thường
+                pending["gap_ms"] = round(max(0.0, interval_ms - self.frame_ms), 1)
+            pending["first_frame_after_ms"] = round(
+                (now - pending.pop("_flipped_at")) * 1000, 1
+            )
+            self._history.append(pending)
+            logger.info(
+                f"🔀 Đổi luồng {kind} hoàn tất: gap={pending['gap_ms']}ms "
+                f"({'song song' if pending['parallel'] else 'tuần tự'})"
+            )
+        self._last_frame[kind] = now
+
+    def flipped(
+        self,
+        kind: str,
+        generation: int,
+        from_device: Optional[int],
+        to_device: Optional[int],
+        parallel: bool,
+        open_ms: float,
+    ):
+        """
+        Đánh dấu chuyển sang route `generation`; gap được tính khi khung đầu tiên của route đó tới.
+
+        Gọi ngay trước khi gán route mới.
+        """
+        self.total += 1
+        self._pending[kind] = {
+            "kind": kind,
+            "generation": generation,
+            "from_device": from_device,
+            "to_device": to_device,
+            "parallel": parallel,
+            "open_ms": round(open_ms, 1),
+            "gap_ms": None,
+            "at": time.time(),
+            "_flipped_at": time.perf_counter(),
+        }
+
+    def history(self) -> List[Dict[str, Any]]:
+        return list(self._history)
+
+    def last(self, kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        for record in reversed(self._history):
+            if kind is None or record["kind"] == kind:
+                return record
+        return None
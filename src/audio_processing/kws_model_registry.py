@@ -0,0 +1,198 @@
+"""
+KWS Model Registry - Nạp mô hình Sherpa-ONNX KeywordSpotter trong nền, dùng chung toàn tiến trình.
+
+Trước đây WakeWordDetector nạp encoder/decoder/joiner ONNX đồng bộ khi được tạo, và mỗi lần
+tạo lại detector (đổi ngưỡng, bật lại từ đánh thức) là nạp lại toàn bộ mô hình.
+
+Ở đây:
+- preload() gửi việc nạp (kể cả import sherpa_onnx) vào executor riêng ngay khi Application
+  bắt đầu chạy, song song với setup plugin và giai đoạn chờ mạng/hotspot.
+- Mô hình đã nạp được giữ theo KwsModelSpec (thư mục mô hình + tham số dựng mô hình); đổi từ
+  khóa/ngưỡng chỉ cần biên dịch lại đồ thị từ khóa (create_stream(keywords)) trên mô hình sẵn có.
+- Thời gian nạp mô hình được đo riêng, không lẫn với thời gian biên dịch từ khóa.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from src.utils.config_manager import ConfigManager
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_FILES = ("encoder.onnx", "decoder.onnx", "joiner.onnx", "tokens.txt", "keywords.txt")
+
+# Giá trị mặc định cho đồ thị từ khóa dựng sẵn từ keywords.txt; detector luôn tạo stream với
+# điểm số/ngưỡng của riêng nó nên các giá trị này không nằm trong khóa mô hình.
+DEFAULT_KEYWORDS_SCORE = 1.8
+DEFAULT_KEYWORDS_THRESHOLD = 0.2
+
+
+@dataclass(frozen=True)
+class KwsModelSpec:
+    """
+    Tham số dựng mô hình; hai spec bằng nhau dùng chung một KeywordSpotter.
+    """
+
+    model_dir: str
+    num_threads: int = 4
+    provider: str = "cpu"
+    max_active_paths: int = 2
+    num_trailing_blanks: int = 1
+    sample_rate: int = 16000
+
+    @classmethod
+    def from_config(cls, config: Optional[ConfigManager] = None) -> "KwsModelSpec":
+        from src.constants.constants import AudioConfig
+        from src.utils.resource_finder import resource_finder
+
+        config = config or ConfigManager.get_instance()
+        model_path = config.get_config("WAKE_WORD_OPTIONS.MODEL_PATH", "models")
+        model_dir = resource_finder.find_directory(model_path)
+        if model_dir is None:
+            # Phương án dự phòng: thử sử dụng đường dẫn trực tiếp
+            model_dir = Path(model_path)
+            logger.warning(
+                f"ResourceFinder không tìm thấy thư mục mô hình, sử dụng đường dẫn gốc: {model_dir}"
+            )
+        return cls(
+            model_dir=str(model_dir),
+            num_threads=config.get_config("WAKE_WORD_OPTIONS.NUM_THREADS", 4),
+            provider=config.get_config("WAKE_WORD_OPTIONS.PROVIDER", "cpu"),
+            max_active_paths=config.get_config("WAKE_WORD_OPTIONS.MAX_ACTIVE_PATHS", 2),
+            num_trailing_blanks=config.get_config("WAKE_WORD_OPTIONS.NUM_TRAILING_BLANKS", 1),
+            sample_rate=AudioConfig.INPUT_SAMPLE_RATE,
+        )
+
+
+def build_keyword_spotter(spec: KwsModelSpec) -> Any:
+    """
+    Dựng sherpa_onnx.KeywordSpotter cho spec (chạy trong luồng executor).
+    """
+    import sherpa_onnx
+
+    model_dir = Path(spec.model_dir)
+    for name in MODEL_FILES:
+        if not (model_dir / name).exists():
+            raise FileNotFoundError(f"Tệp tin mô hình không tồn tại: {model_dir / name}")
+
+    logger.info(f"Đang tải mô hình Sherpa-ONNX KeywordSpotter: {model_dir}")
+    return sherpa_onnx.KeywordSpotter(
+        tokens=str(model_dir / "tokens.txt"),
+        encoder=str(model_dir / "encoder.onnx"),
+        decoder=str(model_dir / "decoder.onnx"),
+        joiner=str(model_dir / "joiner.onnx"),
+        keywords_file=str(model_dir / "keywords.txt"),
+        num_threads=spec.num_threads,
+        sample_rate=spec.sample_rate,
+        feature_dim=80,
+        max_active_paths=spec.max_active_paths,
+        keywords_score=DEFAULT_KEYWORDS_SCORE,
+        keywords_threshold=DEFAULT_KEYWORDS_THRESHOLD,
+        num_trailing_blanks=spec.num_trailing_blanks,
+        provider=spec.provider,
+    )
+
+
+class KwsModelRegistry:
+    _instance = None
+
+    def __init__(self, builder: Callable[[KwsModelSpec], Any] = build_keyword_spotter):
+        self._builder = builder
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._entries: Dict[KwsModelSpec, dict] = {}
+        self.hits = 0
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def get_instance(cls) -> "KwsModelRegistry":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def _submit(self, spec: KwsModelSpec, preloaded: bool) -> Future:
+        with self._lock:
+            entry = self._entries.get(spec)
+            if entry is not None:
+                self.hits += 1
+                return entry["future"]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kws-model")
+            entry = {"future": None, "load_ms": None, "preloaded": preloaded}
+            self._entries[spec] = entry
+            entry["future"] = self._executor.submit(self._load, spec, entry)
+            return entry["future"]
+
+    def _load(self, spec: KwsModelSpec, entry: dict) -> Any:
+        started = time.perf_counter()
+        try:
+            spotter = self._builder(spec)
+        except Exception as e:
+            # Bỏ mục lỗi để lần get() sau thử nạp lại (ví dụ file mô hình vừa được chép vào)
+            with self._lock:
+                self._entries.pop(spec, None)
+            self.last_error = str(e)
+            logger.error(f"Nạp mô hình KWS thất bại: {e}")
+            raise
+        entry["load_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        how = "nạp trước" if entry["preloaded"] else "nạp khi cần"
+        logger.info(f"🧠 Mô hình KWS sẵn sàng ({how}) sau {entry['load_ms']:.0f} ms")
+        return spotter
+
+    def preload(self, spec: KwsModelSpec) -> Future:
+        """
+        Bắt đầu nạp mô hình trong nền (không chờ); gọi lại với cùng spec không nạp lần hai.
+        """
+        return self._submit(spec, preloaded=True)
+
+    def preload_from_config(self, config: Optional[ConfigManager] = None) -> Optional[Future]:
+        """
+        Nạp trước mô hình theo cấu hình nếu từ đánh thức đang bật.
+        """
+        config = config or ConfigManager.get_instance()
+        if not config.get_config("WAKE_WORD_OPTIONS.USE_WAKE_WORD", False):
+            return None
+        try:
+            return self.preload(KwsModelSpec.from_config(config))
+        except Exception as e:
+            logger.warning(f"Không thể nạp trước mô hình KWS: {e}")
+            return None
+
+    def get(self, spec: KwsModelSpec, timeout: Optional[float] = None) -> Any:
+        """
+        Lấy KeywordSpotter cho spec, chờ nếu đang nạp (gọi từ luồng, không gọi trên vòng lặp).
+        """
+        return self._submit(spec, preloaded=False).result(timeout)
+
+    def load_ms(self, spec: KwsModelSpec) -> Optional[float]:
+        entry = self._entries.get(spec)
+        return entry["load_ms"] if entry else None
+
+    def is_loaded(self, spec: KwsModelSpec) -> bool:
+        entry = self._entries.get(spec)
+        return bool(entry and entry["future"].done() and entry["load_ms"] is not None)
+
+    def stats(self) -> dict:
+        models = []
+        for spec, entry in list(self._entries.items()):
+            models.append(
+                {
+                    "model_dir": spec.model_dir,
+                    "provider": spec.provider,
+                    "num_threads": spec.num_threads,
+                    "loaded": entry["load_ms"] is not None,
+                    "preloaded": entry["preloaded"],
+                    "load_ms": entry["load_ms"],
+                }
+            )
+        return {"models": models, "hits": self.hits, "last_error": self.last_error}
+
+
+def get_kws_model_registry() -> KwsModelRegistry:
+    """Lấy instance KwsModelRegistry dùng chung"""
+    return KwsModelRegistry.get_instance()
@@ -4,12 +4,11 @@ from pathlib import Path
 from typing import Callable, Optional
 
 import numpy as np
-import sherpa_onnx
 
+from src.audio_processing.kws_model_registry import KwsModelSpec, get_kws_model_registry
 from src.constants.constants import AudioConfig
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
-from src.utils.resource_finder import resource_finder
 
 logger = get_logger(__name__)
 
@@ -46,6 +45,12 @@ class WakeWordDetector:
         self.keyword_spotter = None
         self.stream = None
 
+        # Thời gian nạp mô hình và biên dịch từ khóa (đo riêng)
+        self.model_load_ms = None
+        self.model_wait_ms = None
+        self.keyword_compile_ms = None
+        self.keyword_compiles = 0
+
         # Khởi tạo cấu hình
         self._load_config(config)
         self._init_kws_model()
@@ -55,34 +60,26 @@ class WakeWordDetector:
         """
         Tải tham số cấu hình.
         """
-        # Cấu hình đường dẫn mô hình
-        model_path = config.get_config("WAKE_WORD_OPTIONS.MODEL_PATH", "models")
-        self.model_dir = resource_finder.find_directory(model_path)
+        # Tham số dựng mô hình (đường dẫn, số luồng...) - dùng làm khóa trong KwsModelRegistry
+        self.model_spec = KwsModelSpec.from_config(config)
+        self.model_dir = Path(self.model_spec.model_dir)
+        self.num_threads = self.model_spec.num_threads
+        self.provider = self.model_spec.provider
+        self.max_active_paths = self.model_spec.max_active_paths
+        self.num_trailing_blanks = self.model_spec.num_trailing_blanks
 
-        if self.model_dir is None:
-            # Phương án dự phòng: thử sử dụng đường dẫn trực tiếp
-            self.model_dir = Path(model_path)
-            logger.warning(
-                f"ResourceFinder không tìm thấy thư mục mô hình, sử dụng đường dẫn gốc: {self.model_dir}"
-            )
+        self._load_keyword_options(config)
 
-        # Cấu hình tham số KWS - tối ưu hóa tốc độ
-        self.num_threads = config.get_config(
-            "WAKE_WORD_OPTIONS.NUM_THREADS", 4
-        )  # Tăng số luồng
-        self.provider = config.get_config("WAKE_WORD_OPTIONS.PROVIDER", "cpu")
-        self.max_active_paths = config.get_config(
-            "WAKE_WORD_OPTIONS.MAX_ACTIVE_PATHS", 2
-        )  # Giảm đường dẫn tìm kiếm
+    def _load_keyword_options(self, config):
+        """
+        Tải điểm số/ngưỡng từ khóa - chỉ ảnh hưởng đồ thị từ khóa, không cần nạp lại mô hình.
+        """
         self.keywords_score = config.get_config(
             "WAKE_WORD_OPTIONS.KEYWORDS_SCORE", 1.8
         )  # Giảm điểm số để tăng tốc độ
         self.keywords_threshold = config.get_config(
             "WAKE_WORD_OPTIONS.KEYWORDS_THRESHOLD", 0.2
         )  # Giảm ngưỡng để tăng độ nhạy
-        self.num_trailing_blanks = config.get_config(
-            "WAKE_WORD_OPTIONS.NUM_TRAILING_BLANKS", 1
-        )
 
         logger.info(
             f"Đã tải cấu hình KWS - Ngưỡng: {self.keywords_threshold}, Điểm số: {self.keywords_score}"
@@ -90,60 +87,70 @@ class WakeWordDetector:
 
     def _init_kws_model(self):
         """
-        Khởi tạo mô hình Sherpa-ONNX KeywordSpotter.
+        Lấy mô hình Sherpa-ONNX KeywordSpotter từ registry (chờ nếu đang nạp trước trong nền).
         """
         try:
-            # Kiểm tra tệp mô hình
-            encoder_path = self.model_dir / "encoder.onnx"
-            decoder_path = self.model_dir / "decoder.onnx"
-            joiner_path = self.model_dir / "joiner.onnx"
-            tokens_path = self.model_dir / "tokens.txt"
-            keywords_path = self.model_dir / "keywords.txt"
-
-            required_files = [
-                encoder_path,
-                decoder_path,
-                joiner_path,
-                tokens_path,
-                keywords_path,
-            ]
-            for file_path in required_files:
-                if not file_path.exists():
-                    raise FileNotFoundError(f"Tệp tin mô hình không tồn tại: {file_path}")
-
-            logger.info(f"Đang tải mô hình Sherpa-ONNX KeywordSpotter: {self.model_dir}")
-
-            # Tạo KeywordSpotter
-            self.keyword_spotter = sherpa_onnx.KeywordSpotter(
-                tokens=str(tokens_path),
-                encoder=str(encoder_path),
-                decoder=str(decoder_path),
-                joiner=str(joiner_path),
-                keywords_file=str(keywords_path),
-                num_threads=self.num_threads,
-                sample_rate=self.sample_rate,
-                feature_dim=80,
-                max_active_paths=self.max_active_paths,
-                keywords_score=self.keywords_score,
-                keywords_threshold=self.keywords_threshold,
-                num_trailing_blanks=self.num_trailing_blanks,
-                provider=self.provider,
+            registry = get_kws_model_registry()
+            started = time.perf_counter()
+            self.keyword_spotter = registry.get(self.model_spec)
+            self.model_wait_ms = round((time.perf_counter() - started) * 1000.0, 1)
+            self.model_load_ms = registry.load_ms(self.model_spec)
+
+            logger.info(
+                f"Tải mô hình Sherpa-ONNX KeywordSpotter thành công "
+                f"(nạp {self.model_load_ms or 0:.0f} ms, chờ {self.model_wait_ms:.0f} ms)"
             )
 
-            logger.info("Tải mô hình Sherpa-ONNX KeywordSpotter thành công")
-            
-            # Log keywords configuration
-            try:
-                with open(keywords_path, 'r') as f:
-                    keywords_content = f.read().strip()
-                    logger.info(f"Keywords configured:\n{keywords_content}")
-            except Exception:
-                pass
-
         except Exception as e:
             logger.error(f"Khởi tạo Sherpa-ONNX KeywordSpotter thất bại: {e}", exc_info=True)
             self.enabled = False
 
+    def _keywords_text(self) -> str:
+        """
+        Từ khóa từ keywords.txt kèm điểm số (:) và ngưỡng (#) hiện tại, định dạng create_stream.
+        """
+        lines = []
+        with open(self.model_dir / "keywords.txt", "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                parts = line.split()
+                # Dòng đã tự khai báo điểm số/ngưỡng thì giữ nguyên; thêm vào trước "@cụm từ"
+                if not any(part[:1] in (":", "#") for part in parts):
+                    at = next((i for i, p in enumerate(parts) if p.startswith("@")), len(parts))
+                    parts[at:at] = [f":{self.keywords_score}", f"#{self.keywords_threshold}"]
+                lines.append(" ".join(parts))
+        return "/".join(lines)
+
+    def _create_stream(self):
+        """
+        Biên dịch đồ thị từ khóa và tạo stream mới trên mô hình đã nạp.
+        """
+        started = time.perf_counter()
+        keywords = self._keywords_text()
+        stream = self.keyword_spotter.create_stream(keywords)
+        self.keyword_compile_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        self.keyword_compiles += 1
+        logger.info(
+            f"Biên dịch {keywords.count('/') + 1} từ khóa trong {self.keyword_compile_ms:.1f} ms"
+        )
+        logger.debug(f"Keywords configured: {keywords}")
+        return stream
+
+    async def reload_keywords(self):
+        """
+        Áp dụng lại từ khóa/ngưỡng từ cấu hình mà không nạp lại mô hình.
+        """
+        if not self.enabled or not self.keyword_spotter:
+            return False
+        self._load_keyword_options(ConfigManager.get_instance())
+        self._validate_config()
+        stream = await asyncio.to_thread(self._create_stream)
+        # Đổi stream trên vòng lặp sự kiện; vòng phát hiện dùng stream mới ở lượt kế tiếp
+        self.stream = stream
+        return True
+
     def on_detected(self, callback: Callable):
         """
         Thiết lập hàm callback khi phát hiện từ đánh thức.
@@ -168,7 +175,7 @@ class WakeWordDetector:
             self.paused = False
 
             # Tạo luồng phát hiện
-            self.stream = self.keyword_spotter.create_stream()
+            self.stream = self._create_stream()
 
             # Khởi động tác vụ phát hiện
             self.detection_task = asyncio.create_task(self._detection_loop())
@@ -397,6 +404,10 @@ class WakeWordDetector:
             "keywords_threshold": self.keywords_threshold,
             "keywords_score": self.keywords_score,
             "is_running": self.is_running(),
+            "model_load_ms": self.model_load_ms,
+            "model_wait_ms": self.model_wait_ms,
+            "keyword_compile_ms": self.keyword_compile_ms,
+            "keyword_compiles": self.keyword_compiles,
         }
 
     def clear_cache(self):
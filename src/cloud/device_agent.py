@@ -17,12 +17,16 @@ import subprocess
 import time
 from typing import Optional, Callable
 from io import BytesIO
+from urllib.parse import urlparse
 
 try:
     import websockets
 except ImportError:
     websockets = None
 
+from src.network.dns_cache import open_racing_socket
+from src.utils.command_runner import get_command_runner
+from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
 from src.utils.resource_finder import get_project_root
 
@@ -187,6 +191,16 @@ class CloudAgent:
             logger.error(f"Set background error: {e}")
             return {"status": "error", "message": str(e)}
     
+    async def _connect_target(self) -> dict:
+        """Socket TCP mở qua DnsCache chung + đua IPv4/IPv6 (lỗi thì để websockets tự kết nối)."""
+        try:
+            parsed = urlparse(self.server_url)
+            port = parsed.port or (443 if parsed.scheme == "wss" else 80)
+            return {"sock": await open_racing_socket(parsed.hostname, port)}
+        except Exception as e:
+            logger.debug(f"Racing connect failed, falling back to default connect: {e}")
+            return {}
+
     async def connect(self) -> bool:
         """Kết nối tới Cloud Server."""
         if not websockets:
@@ -198,7 +212,8 @@ class CloudAgent:
             self.ws = await websockets.connect(
                 self.server_url,
                 ping_interval=30,
-                ping_timeout=10
+                ping_timeout=10,
+                **(await self._connect_target()),
             )
             self.connected = True
             logger.info("Connected to Cloud Server!")
@@ -342,7 +357,6 @@ class CloudAgent:
             
         # Network Config Info (For Cloud Dashboard)
         try:
-            from src.utils.config_manager import ConfigManager
             config = ConfigManager.get_instance()
             info['language'] = config.get_config("SYSTEM_OPTIONS.LANGUAGE", "vi-VN")
             # Default OTA URL if missing
@@ -383,24 +397,23 @@ class CloudAgent:
     async def _cmd_restart(self, params: dict):
         """Restart app."""
         logger.info("Executing restart command from cloud...")
+        # systemctl/reboot dừng app bằng SIGTERM (không chạy atexit): ghi nốt cấu hình trước
+        ConfigManager.get_instance().flush()
         subprocess.Popen(["sudo", "systemctl", "restart", "smartc"])
         return {"status": "restarting"}
     
     async def _cmd_reboot(self, params: dict):
         """Reboot Pi."""
         logger.info("Executing reboot command from cloud...")
+        ConfigManager.get_instance().flush()
         subprocess.Popen(["sudo", "reboot"])
         return {"status": "rebooting"}
     
     async def _cmd_update(self, params: dict):
         """Update từ Git."""
         logger.info("Executing update command from cloud...")
-        result = subprocess.run(
-            ["git", "pull", "origin", "main"],
-            cwd=str(get_project_root()),
-            capture_output=True,
-            text=True,
-            timeout=60
+        result = await get_command_runner().run(
+            ["git", "pull", "origin", "main"], cwd=str(get_project_root()), timeout=60
         )
         return {
             "status": "completed" if result.returncode == 0 else "failed",
@@ -408,22 +421,23 @@ class CloudAgent:
         }
     
     async def _cmd_get_config(self, params: dict):
-        """Lấy config hiện tại."""
+        """Lấy config hiện tại (trong bộ nhớ, gồm cả thay đổi chưa ghi xuống tệp)."""
         try:
-            config_file = get_project_root() / "config" / "config.json"
-            if config_file.exists():
-                with open(config_file) as f:
-                    config = json.load(f)
-                return {"config": config}
+            return {"config": ConfigManager.get_instance().snapshot()}
         except Exception as e:
             return {"error": str(e)}
-        return {"error": "Config not found"}
     
     async def _cmd_set_volume(self, params: dict):
         """Set volume."""
         volume = params.get("volume", 80)
-        subprocess.run(["amixer", "set", "Master", f"{volume}%"], capture_output=True)
-        return {"status": "ok", "volume": volume}
+        from src.application import Application
+        app = Application._instance
+        applied = app.set_volume(volume) if app else None
+        if applied is None:
+            # Không có AudioCodec: dùng mixer hệ thống
+            await get_command_runner().run(["amixer", "set", "Master", f"{volume}%"], timeout=3)
+            applied = volume
+        return {"status": "ok", "volume": applied}
     
     async def _cmd_set_video(self, params: dict):
         """Set video background."""
@@ -492,34 +506,14 @@ class CloudAgent:
         logger.info(f"Testing speaker from cloud (HDMI={hdmi_audio})...")
         
         try:
-            # Play test beep
-            import numpy as np
-            import wave
-            import tempfile
-            
-            sample_rate = 44100
-            duration = 0.3
-            frequency = 880
-            
-            t = np.linspace(0, duration, int(sample_rate * duration), False)
-            beep = (np.sin(2 * np.pi * frequency * t) * 20000).astype(np.int16)
-            
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-                temp_wav = f.name
-            
-            with wave.open(temp_wav, 'w') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(sample_rate)
-                wav_file.writeframes(beep.tobytes())
-            
-            if hdmi_audio:
-                subprocess.run(["aplay", "-D", "plughw:CARD=vc4hdmi0", temp_wav], 
-                              capture_output=True, timeout=5)
-            else:
-                subprocess.run(["aplay", temp_wav], capture_output=True, timeout=5)
-            
-            os.unlink(temp_wav)
+            # Play test beep (earcon giải mã sẵn, không tạo WAV tạm)
+            from src.application import Application
+            app = Application._instance
+            if not (app and app.play_earcon("test")):
+                from src.audio_codecs.earcons import play_earcon_standalone
+                await play_earcon_standalone(
+                    "test", hdmi_cards=["vc4hdmi0"] if hdmi_audio else None
+                )
             return {"status": "ok", "message": "Speaker test played"}
             
         except Exception as e:
@@ -570,8 +564,12 @@ class CloudAgent:
             else:
                 cmd = ["sudo", "nmcli", "device", "wifi", "connect", ssid]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
+            runner = get_command_runner()
+            try:
+                result = await runner.run(cmd, timeout=60)
+            finally:
+                runner.invalidate("nmcli")
+
             if result.returncode == 0:
                 return {"status": "ok", "message": f"Connected to {ssid}"}
             else:
@@ -625,9 +623,8 @@ class CloudAgent:
             # Read last N lines
             # Use 'tail' command for efficiency on Linux
             try:
-                result = subprocess.run(
-                    ["tail", "-n", str(lines), str(log_file)],
-                    capture_output=True, text=True, timeout=5
+                result = await get_command_runner().run(
+                    ["tail", "-n", str(lines), str(log_file)], timeout=5
                 )
                 if result.returncode == 0:
                     return {"status": "ok", "logs": result.stdout}
@@ -712,12 +709,8 @@ class CloudAgent:
         """Kiểm tra update khi khởi động."""
         try:
             logger.info("Checking for startup updates...")
-            result = subprocess.run(
-                ["git", "pull", "origin", "main"],
-                cwd=str(get_project_root()),
-                capture_output=True,
-                text=True,
-                timeout=60
+            result = await get_command_runner().run(
+                ["git", "pull", "origin", "main"], cwd=str(get_project_root()), timeout=60
             )
             
             output = result.stdout or ""
@@ -725,6 +718,7 @@ class CloudAgent:
                 logger.info("✨ Startup Update found! Updating and restarting...")
                 # Log to file or send to server could be added here
                 # Restart service to apply changes
+                ConfigManager.get_instance().flush()
                 subprocess.Popen(["sudo", "systemctl", "restart", "smartc"])
                 return True
             else:
@@ -6,6 +6,8 @@ import ssl
 import aiohttp
 
 from src.constants.system import SystemConstants
+from src.core.warm_start import response_meta
+from src.network.dns_cache import CachedResolver
 from src.utils.config_manager import ConfigManager
 from src.utils.device_fingerprint import DeviceFingerprint
 from src.utils.logging_config import get_logger
@@ -23,6 +25,8 @@ class Ota:
         self.ota_version_url = None
         self.local_ip = None
         self.system_info = None
+        # ETag/Last-Modified/max-age của phản hồi OTA gần nhất (dùng cho warm-start snapshot)
+        self.last_response_meta = {}
 
     @classmethod
     async def get_instance(cls):
@@ -120,9 +124,11 @@ class Ota:
 
         return headers
 
-    async def get_ota_config(self):
+    async def get_ota_config(self, validators=None):
         """
         Lấy thông tin cấu hình từ máy chủ OTA (MQTT, WebSocket, v.v.)
+
+        validators: header If-None-Match/If-Modified-Since; máy chủ trả 304 thì trả về None.
         """
         if not self.mac_addr:
             self.logger.error("ID thiết bị (địa chỉ MAC) chưa được cấu hình")
@@ -133,6 +139,8 @@ class Ota:
             raise ValueError("URL OTA chưa được cấu hình")
 
         headers = self.build_headers()
+        if validators:
+            headers.update(validators)
         payload = self.build_payload()
 
         try:
@@ -143,13 +151,20 @@ class Ota:
 
             # Sử dụng aiohttp để gửi yêu cầu một cách bất đồng bộ
             timeout = aiohttp.ClientTimeout(total=10)
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
+            # DnsCache chung + aiohttp tự đua các địa chỉ IPv4/IPv6 (Happy Eyeballs)
+            connector = aiohttp.TCPConnector(ssl=ssl_context, resolver=CachedResolver())
             async with aiohttp.ClientSession(
                 timeout=timeout, connector=connector
             ) as session:
                 async with session.post(
                     self.ota_version_url, headers=headers, json=payload
                 ) as response:
+                    # Phản hồi không đổi so với snapshot (yêu cầu có điều kiện)
+                    if response.status == 304 and validators:
+                        self.last_response_meta = response_meta(response.headers)
+                        self.logger.info("Cấu hình OTA không đổi (304)")
+                        return None
+
                     # Kiểm tra mã trạng thái HTTP
                     if response.status != 200:
                         self.logger.error(f"Lỗi từ máy chủ OTA: HTTP {response.status}")
@@ -157,6 +172,7 @@ class Ota:
 
                     # Phân tích dữ liệu JSON
                     response_data = await response.json()
+                    self.last_response_meta = response_meta(response.headers)
 
                     # Thông tin gỡ lỗi: in toàn bộ phản hồi OTA
                     self.logger.debug(
@@ -227,13 +243,22 @@ class Ota:
 
         return None
 
-    async def fetch_and_update_config(self):
+    async def fetch_and_update_config(self, validators=None):
         """
         Lấy và cập nhật tất cả thông tin cấu hình.
+
+        Với validators, máy chủ trả 304 thì không cập nhật gì và trả về not_modified=True.
         """
         try:
             # Lấy cấu hình OTA
-            response_data = await self.get_ota_config()
+            response_data = await self.get_ota_config(validators)
+            if response_data is None:
+                return {
+                    "response_data": None,
+                    "mqtt_config": None,
+                    "websocket_config": None,
+                    "not_modified": True,
+                }
 
             # AUTHORIZATION_URL: nếu máy chủ trả về domain cũ (xiaozhi.me) thì tự động chuẩn hóa.
             try:
@@ -293,6 +318,7 @@ class Ota:
                 "response_data": response_data,
                 "mqtt_config": mqtt_config,
                 "websocket_config": websocket_config,
+                "not_modified": False,
             }
 
         except Exception as e:
@@ -7,11 +7,13 @@ Quy trình kích hoạt do người dùng tự thực hiện.
 
 import asyncio
 import json
+import time
 from pathlib import Path
 from typing import Dict
 
-from src.constants.system import InitializationStage
+from src.constants.system import InitializationStage, SystemConstants
 from src.core.ota import Ota
+from src.core.warm_start import get_warm_start
 from src.utils.config_manager import ConfigManager
 from src.utils.device_fingerprint import DeviceFingerprint
 from src.utils.logging_config import get_logger
@@ -49,8 +51,9 @@ class SystemInitializer:
             # Giai đoạn 2: Khởi tạo quản lý cấu hình
             await self.stage_2_config_management()
 
-            # Giai đoạn 3: Lấy cấu hình OTA
-            await self.stage_3_ota_config()
+            # Giai đoạn 3: Lấy cấu hình OTA (từ warm-start snapshot nếu có, làm mới trong nền)
+            if not await self.stage_3_from_snapshot():
+                await self.stage_3_ota_config()
 
             # Lấy cấu hình phiên bản kích hoạt
             activation_version = self.config_manager.get_config(
@@ -169,10 +172,14 @@ class SystemInitializer:
 
         # Khởi tạo OTA
         self.ota = await Ota.get_instance()
+        snapshot = get_warm_start()
 
         # Lấy và cập nhật cấu hình
         try:
+            started = time.monotonic()
             config_result = await self.ota.fetch_and_update_config()
+            snapshot.boot_source = "network"
+            snapshot.ota_fetch_ms = round((time.monotonic() - started) * 1000.0, 1)
 
             logger.info("Kết quả lấy cấu hình OTA:")
             mqtt_status = "Đã lấy" if config_result["mqtt_config"] else "Chưa lấy"
@@ -203,6 +210,11 @@ class SystemInitializer:
                 self.activation_data = None
                 # Máy chủ cho rằng thiết bị đã được kích hoạt
                 self.activation_status["server_activated"] = True
+                # Lưu snapshot cho lần khởi động sau
+                if self._warm_start_enabled():
+                    snapshot.save(
+                        self._snapshot_identity(), response_data, self.ota.last_response_meta
+                    )
 
         except Exception as e:
             logger.error(f"Lấy cấu hình OTA thất bại: {e}")
@@ -210,6 +222,92 @@ class SystemInitializer:
 
         logger.info(f"Hoàn thành {self.current_stage.value}")
 
+    def _warm_start_enabled(self) -> bool:
+        return bool(
+            self.config_manager.get_config("SYSTEM_OPTIONS.NETWORK.WARM_START", True)
+        )
+
+    def _snapshot_identity(self) -> Dict:
+        """
+        Các giá trị mà phản hồi OTA phụ thuộc vào; đổi bất kỳ giá trị nào thì snapshot mất hiệu lực.
+        """
+        get = self.config_manager.get_config
+        return {
+            "ota_url": get("SYSTEM_OPTIONS.NETWORK.OTA_VERSION_URL"),
+            "device_id": get("SYSTEM_OPTIONS.DEVICE_ID"),
+            "client_id": get("SYSTEM_OPTIONS.CLIENT_ID"),
+            "activation_version": get("SYSTEM_OPTIONS.NETWORK.ACTIVATION_VERSION", "v1"),
+            "app_version": SystemConstants.APP_VERSION,
+        }
+
+    async def stage_3_from_snapshot(self) -> bool:
+        """
+        Giai đoạn 3 (warm start): dùng phản hồi OTA đã lưu, không chờ mạng.
+
+        Returns:
+            bool: True nếu đã khởi động từ snapshot
+        """
+        if not self._warm_start_enabled():
+            return False
+        activation_version = self.config_manager.get_config(
+            "SYSTEM_OPTIONS.NETWORK.ACTIVATION_VERSION", "v1"
+        )
+        # Thiết bị chưa kích hoạt cần phản hồi OTA thật (mã kích hoạt)
+        if activation_version != "v1" and not self.activation_status["local_activated"]:
+            return False
+
+        snapshot = get_warm_start()
+        data = snapshot.load(self._snapshot_identity())
+        if data is None:
+            return False
+
+        self.current_stage = InitializationStage.OTA_CONFIG
+        written = snapshot.apply_to_config(self.config_manager, data)
+        self.activation_data = None
+        self.activation_status["server_activated"] = True
+
+        age = snapshot.age(data)
+        fresh = snapshot.is_fresh(data)
+        snapshot.boot_source = "snapshot"
+        snapshot.boot_age_s = age
+        logger.info(
+            f"⚡ Khởi động từ warm-start snapshot (tuổi {age / 60:.0f} phút, "
+            f"{'còn hạn' if fresh else 'làm mới trong nền'}, ghi {written} khóa cấu hình)"
+        )
+        if not fresh:
+            snapshot.track(asyncio.create_task(self._refresh_snapshot(data)))
+        return True
+
+    async def _refresh_snapshot(self, data: Dict) -> None:
+        """
+        Làm mới snapshot trong nền bằng yêu cầu có điều kiện; lỗi mạng thì dùng tiếp snapshot cũ.
+        """
+        snapshot = get_warm_start()
+        started = time.monotonic()
+        try:
+            self.ota = await Ota.get_instance()
+            result = await self.ota.fetch_and_update_config(snapshot.validators(data))
+            if result["not_modified"]:
+                snapshot.touch(data, self.ota.last_response_meta)
+                outcome = "not_modified"
+            elif "activation" in result["response_data"]:
+                logger.warning("Máy chủ trả về dữ liệu kích hoạt, lần khởi động sau sẽ chạy quy trình kích hoạt")
+                snapshot.invalidate("máy chủ yêu cầu kích hoạt")
+                outcome = "activation_required"
+            else:
+                snapshot.save(
+                    self._snapshot_identity(), result["response_data"], self.ota.last_response_meta
+                )
+                outcome = "updated"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Làm mới warm-start snapshot thất bại, dùng tiếp snapshot cũ: {e}")
+            outcome = "failed"
+        elapsed_ms = (time.monotonic() - started) * 1000.0
+        snapshot.record_refresh(outcome, elapsed_ms)
+        logger.info(f"🔄 Làm mới warm-start snapshot: {outcome} ({elapsed_ms:.0f} ms)")
+
     def analyze_activation_status(self) -> Dict:
         """Phân tích trạng thái kích hoạt, quyết định quy trình tiếp theo.
 
@@ -0,0 +1,230 @@
+"""
+Warm Start Snapshot - Lưu trạng thái khởi động lần trước để bỏ qua yêu cầu OTA khi boot.
+
+Trước đây mỗi lần khởi động SystemInitializer đều chờ Ota.get_ota_config (aiohttp, timeout
+10s) trước khi giao thức có thể bắt đầu, dù phản hồi hầu như không đổi giữa các lần boot.
+
+Ở đây:
+- Sau mỗi lần lấy OTA thành công (thiết bị đã kích hoạt), phản hồi được lưu vào
+  cache/warm_start.json cùng ETag/Last-Modified, hạn dùng (Cache-Control max-age hoặc
+  mặc định), URL + token WebSocket, thông tin MQTT và trạng thái kích hoạt.
+- Lần boot sau, nếu snapshot khớp danh tính (URL OTA, Device-Id, Client-Id, phiên bản) và
+  chưa quá MAX_STALE, khởi động tiếp ngay từ snapshot; snapshot đã hết hạn được làm mới
+  trong nền bằng yêu cầu có điều kiện (If-None-Match / If-Modified-Since, 304 = giữ nguyên).
+- Thiết bị chưa kích hoạt hoặc máy chủ trả về dữ liệu kích hoạt thì không dùng snapshot.
+"""
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from src.utils.logging_config import get_logger
+from src.utils.resource_finder import get_project_root
+
+logger = get_logger(__name__)
+
+# Tăng khi thay đổi định dạng file snapshot
+SNAPSHOT_VERSION = 1
+
+# Hạn dùng khi máy chủ không gửi Cache-Control: max-age
+DEFAULT_TTL = 3600.0
+# Snapshot cũ hơn mức này không dùng để boot (buộc lấy OTA đồng bộ như trước)
+MAX_STALE = 7 * 24 * 3600.0
+
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def response_meta(headers: Any) -> Dict[str, Any]:
+    """
+    Trích ETag/Last-Modified/max-age từ header phản hồi OTA.
+    """
+    cache_control = headers.get("Cache-Control", "") or ""
+    max_age = None
+    match = _MAX_AGE_RE.search(cache_control)
+    if match:
+        max_age = float(match.group(1))
+    if "no-store" in cache_control.lower():
+        max_age = 0.0
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "max_age": max_age,
+    }
+
+
+class WarmStartSnapshot:
+    _instance = None
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        clock: Callable[[], float] = time.time,
+        default_ttl: float = DEFAULT_TTL,
+        max_stale: float = MAX_STALE,
+    ):
+        self.path = path or (get_project_root() / "cache" / "warm_start.json")
+        self._clock = clock
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+
+        # Thống kê cho lần khởi động hiện tại
+        self.boot_source: Optional[str] = None  # "snapshot" | "network"
+        self.boot_age_s: Optional[float] = None
+        self.ota_fetch_ms: Optional[float] = None
+        self.refresh_counts: Dict[str, int] = {}
+        self.last_refresh_ms: Optional[float] = None
+        # Giữ tham chiếu tác vụ làm mới nền (SystemInitializer không sống lâu hơn lúc boot)
+        self._background: set = set()
+
+    @classmethod
+    def get_instance(cls) -> "WarmStartSnapshot":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    # ----- đọc/ghi -----
+    def _read(self) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Đọc warm-start snapshot thất bại: {e}")
+            return None
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+            return None
+        return data
+
+    def _write(self, data: Dict[str, Any]) -> bool:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+            return True
+        except Exception as e:
+            logger.warning(f"Ghi warm-start snapshot thất bại: {e}")
+            return False
+
+    def load(self, identity: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Trả về snapshot dùng được để boot (khớp danh tính, chưa quá max_stale), ngược lại None.
+        """
+        data = self._read()
+        if data is None:
+            return None
+        if data.get("identity") != identity:
+            logger.info("Warm-start snapshot không khớp danh tính/cấu hình hiện tại, bỏ qua")
+            return None
+        if not data.get("activated") or "activation" in (data.get("response") or {}):
+            return None
+        age = self.age(data)
+        if age < 0 or age > self.max_stale:
+            logger.info(f"Warm-start snapshot đã quá cũ ({age / 3600:.1f} giờ), bỏ qua")
+            return None
+        return data
+
+    def is_fresh(self, data: Dict[str, Any]) -> bool:
+        return self._clock() < float(data.get("expires_at", 0))
+
+    def age(self, data: Dict[str, Any]) -> float:
+        return self._clock() - float(data.get("saved_at", 0))
+
+    def save(self, identity: Dict[str, Any], response: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Lưu phản hồi OTA mới (200) kèm validator và hạn dùng.
+        """
+        meta = meta or {}
+        now = self._clock()
+        ttl = meta.get("max_age")
+        websocket = response.get("websocket") or {}
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "identity": identity,
+            "saved_at": now,
+            "expires_at": now + (self.default_ttl if ttl is None else ttl),
+            "etag": meta.get("etag"),
+            "last_modified": meta.get("last_modified"),
+            "response": response,
+            "websocket": {"url": websocket.get("url"), "token": websocket.get("token")},
+            "mqtt": response.get("mqtt"),
+            "activated": "activation" not in response,
+        }
+        return self._write(data)
+
+    def touch(self, data: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Máy chủ trả 304: giữ phản hồi cũ, gia hạn và cập nhật validator nếu có.
+        """
+        meta = meta or {}
+        now = self._clock()
+        ttl = meta.get("max_age")
+        data = dict(data)
+        data["saved_at"] = now
+        data["expires_at"] = now + (self.default_ttl if ttl is None else ttl)
+        data["etag"] = meta.get("etag") or data.get("etag")
+        data["last_modified"] = meta.get("last_modified") or data.get("last_modified")
+        return self._write(data)
+
+    def invalidate(self, reason: str = "") -> None:
+        try:
+            self.path.unlink(missing_ok=True)
+            logger.info(f"🗑️ Đã xóa warm-start snapshot{f': {reason}' if reason else ''}")
+        except Exception as e:
+            logger.warning(f"Xóa warm-start snapshot thất bại: {e}")
+
+    @staticmethod
+    def validators(data: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Header cho yêu cầu có điều kiện.
+        """
+        headers = {}
+        if data.get("etag"):
+            headers["If-None-Match"] = data["etag"]
+        if data.get("last_modified"):
+            headers["If-Modified-Since"] = data["last_modified"]
+        return headers
+
+    @staticmethod
+    def apply_to_config(config: Any, data: Dict[str, Any]) -> int:
+        """
+        Ghi WebSocket/MQTT từ snapshot vào cấu hình nếu khác (thường đã khớp); trả về số khóa đã ghi.
+        """
+        websocket = data.get("websocket") or {}
+        wanted = {"SYSTEM_OPTIONS.NETWORK.MQTT_INFO": data.get("mqtt")}
+        if websocket.get("url"):
+            wanted["SYSTEM_OPTIONS.NETWORK.WEBSOCKET_URL"] = websocket["url"]
+        if "websocket" in (data.get("response") or {}):
+            wanted["SYSTEM_OPTIONS.NETWORK.WEBSOCKET_ACCESS_TOKEN"] = websocket.get("token") or "test-token"
+        written = 0
+        for path, value in wanted.items():
+            if value and config.get_config(path) != value:
+                config.update_config(path, value)
+                written += 1
+        return written
+
+    def track(self, task: Any) -> None:
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    # ----- thống kê -----
+    def record_refresh(self, outcome: str, elapsed_ms: float) -> None:
+        self.refresh_counts[outcome] = self.refresh_counts.get(outcome, 0) + 1
+        self.last_refresh_ms = round(elapsed_ms, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "boot_source": self.boot_source,
+            "boot_age_s": round(self.boot_age_s, 1) if self.boot_age_s is not None else None,
+            "ota_fetch_ms": self.ota_fetch_ms,
+            "refresh": dict(self.refresh_counts),
+            "last_refresh_ms": self.last_refresh_ms,
+        }
+
+
+def get_warm_start() -> WarmStartSnapshot:
+    """Lấy instance WarmStartSnapshot dùng chung"""
+    return WarmStartSnapshot.get_instance()
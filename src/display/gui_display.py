@@ -68,6 +68,8 @@ class GuiDisplay(BaseDisplay, QObject, metaclass=CombinedMeta):
         self._slide_index = 0
         self._slide_timer = QTimer(self)
         self._slide_timer.timeout.connect(self._next_slide)
+        # Hủy đăng ký thay đổi cấu hình nền (ConfigManager.subscribe)
+        self._background_unsubscribe = None
 
         # Trạng thái kéo cửa sổ
         self._dragging = False
@@ -214,6 +216,9 @@ class GuiDisplay(BaseDisplay, QObject, metaclass=CombinedMeta):
         Xử lý đóng cửa sổ.
         """
         self._running = False
+        if self._background_unsubscribe:
+            self._background_unsubscribe()
+            self._background_unsubscribe = None
         if self.system_tray:
             self.system_tray.hide()
         if self.root:
@@ -222,6 +227,14 @@ class GuiDisplay(BaseDisplay, QObject, metaclass=CombinedMeta):
     # =========================================================================
     # Video (camera / mp4) trong GUI
     # =========================================================================
+    def _on_background_config_changed(self, changes: dict) -> None:
+        """Cấu hình nền (DISPLAY/VIDEO_BACKGROUND) đã đổi: nạp lại video hoặc slideshow."""
+        self.logger.info(f"[BG] Cấu hình nền thay đổi: {', '.join(changes)}")
+        try:
+            self._start_video_from_config()
+        except Exception as e:
+            self.logger.error(f"Áp dụng cấu hình nền thất bại: {e}", exc_info=True)
+
     def _start_video_from_config(self) -> None:
         """Đọc cấu hình DISPLAY/VIDEO để set background (Video hoặc Slideshow)."""
         from src.utils.config_manager import ConfigManager
@@ -598,6 +611,14 @@ class GuiDisplay(BaseDisplay, QObject, metaclass=CombinedMeta):
         except Exception as e:
             self.logger.error(f"Khởi động video thất bại: {e}", exc_info=True)
 
+        # Dashboard web/device agent đổi nền thì tự áp dụng, không cần gọi reload thủ công
+        from src.utils.config_manager import ConfigManager
+
+        self._background_unsubscribe = ConfigManager.get_instance().subscribe(
+            ("DISPLAY.BACKGROUND_MODE", "DISPLAY.SLIDE_IMAGES", "DISPLAY.SLIDE_INTERVAL", "VIDEO_BACKGROUND"),
+            self._on_background_config_changed,
+        )
+
         # Quyết định chế độ hiển thị dựa trên cấu hình
         if getattr(self, "_is_fullscreen", False):
             self.root.showFullScreen()
@@ -1,8 +1,8 @@
 import asyncio
-import json
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from src.iot.thing import Thing
+from src.utils import json_codec
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -34,23 +34,28 @@ class ThingManager:
     def add_thing(self, thing: Thing) -> None:
         self.things.append(thing)
 
-    async def get_descriptors_json(self) -> str:
+    async def get_descriptors(self) -> List[Dict[str, Any]]:
         """
-        Lấy JSON mô tả của tất cả các thiết bị.
+        Lấy mô tả của tất cả các thiết bị (danh sách dict, chưa serialize).
         """
         # Vì get_descriptor_json() là phương thức đồng bộ (trả về dữ liệu tĩnh),
         # ở đây giữ cách gọi đồng bộ đơn giản
-        descriptors = [thing.get_descriptor_json() for thing in self.things]
-        return json.dumps(descriptors)
+        return [thing.get_descriptor_json() for thing in self.things]
 
-    async def get_states_json(self, delta=False) -> Tuple[bool, str]:
-        """Lấy JSON trạng thái của tất cả các thiết bị.
+    async def get_descriptors_json(self) -> str:
+        """
+        Lấy JSON mô tả của tất cả các thiết bị.
+        """
+        return json_codec.dumps(await self.get_descriptors())
+
+    async def get_states(self, delta=False) -> Tuple[bool, List[Dict[str, Any]]]:
+        """Lấy trạng thái của tất cả các thiết bị (danh sách dict, chưa serialize).
 
         Args:
             delta: Có chỉ trả về phần thay đổi hay không, True nghĩa là chỉ trả về phần thay đổi
 
         Returns:
-            Tuple[bool, str]: Trả về boolean có thay đổi trạng thái hay không và chuỗi JSON
+            Tuple[bool, list]: Có thay đổi trạng thái hay không và danh sách trạng thái
         """
         if not delta:
             self.last_states.clear()
@@ -62,26 +67,32 @@ class ThingManager:
 
         states = []
         for i, thing in enumerate(self.things):
-            state_json = states_results[i]
+            # Trạng thái dạng chuỗi JSON (thiết bị cũ) thì parse một lần rồi so sánh dict
+            state = json_codec.ensure_obj(states_results[i])
 
             if delta:
                 # Kiểm tra trạng thái có thay đổi không
                 is_same = (
                     thing.name in self.last_states
-                    and self.last_states[thing.name] == state_json
+                    and self.last_states[thing.name] == state
                 )
                 if is_same:
                     continue
                 changed = True
-                self.last_states[thing.name] = state_json
+                self.last_states[thing.name] = state
+
+            states.append(state)
 
-            # Kiểm tra state_json đã là đối tượng dictionary chưa
-            if isinstance(state_json, dict):
-                states.append(state_json)
-            else:
-                states.append(json.loads(state_json))  # Chuyển đổi chuỗi JSON thành dictionary
+        return changed, states
+
+    async def get_states_json(self, delta=False) -> Tuple[bool, str]:
+        """Lấy JSON trạng thái của tất cả các thiết bị.
 
-        return changed, json.dumps(states)
+        Returns:
+            Tuple[bool, str]: Trả về boolean có thay đổi trạng thái hay không và chuỗi JSON
+        """
+        changed, states = await self.get_states(delta)
+        return changed, json_codec.dumps(states)
 
     async def get_states_json_str(self) -> str:
         """
@@ -4,13 +4,17 @@ Reference: https://modelcontextprotocol.io/specification/2024-11-05
 """
 
 import asyncio
-import json
+import logging
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 from src.constants.system import SystemConstants
+from src.mcp.tool_registry import ToolPackage, ToolRegistry
+from src.utils import json_codec
 from src.utils.logging_config import get_logger
+from src.utils.resource_finder import get_user_cache_dir
 
 logger = get_logger(__name__)
 
@@ -154,6 +158,18 @@ class McpTool:
     description: str
     properties: PropertyList
     callback: Callable[[Dict[str, Any]], ReturnValue]
+    _json_cache: Optional[Tuple[Dict[str, Any], int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def json_with_size(self) -> Tuple[Dict[str, Any], int]:
+        """
+        Mô tả công cụ kèm độ dài JSON, tính một lần (tools/list không dumps lại mỗi lần).
+        """
+        if self._json_cache is None:
+            tool_json = self.to_json()
+            self._json_cache = (tool_json, len(json_codec.dumps(tool_json)))
+        return self._json_cache
 
     def to_json(self) -> Dict[str, Any]:
         """
@@ -171,7 +187,13 @@ class McpTool:
 
     async def call(self, arguments: Dict[str, Any]) -> str:
         """
-        Gọi công cụ.
+        Gọi công cụ, trả về chuỗi JSON (giữ cho mã cũ như timer_service).
+        """
+        return json_codec.dumps(await self.call_obj(arguments))
+
+    async def call_obj(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Gọi công cụ, trả về dict kết quả (không serialize).
         """
         try:
             # Phân tích tham số
@@ -191,15 +213,170 @@ class McpTool:
             else:
                 text = str(result)
 
-            return json.dumps(
-                {"content": [{"type": "text", "text": text}], "isError": False}
-            )
+            return {"content": [{"type": "text", "text": text}], "isError": False}
 
         except Exception as e:
             logger.error(f"Error calling tool {self.name}: {e}", exc_info=True)
-            return json.dumps(
-                {"content": [{"type": "text", "text": str(e)}], "isError": True}
-            )
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+
+
+class LazyMcpTool(McpTool):
+    """
+    Công cụ chỉ có mô tả (từ manifest); gói thật được import ở lần gọi đầu tiên.
+    """
+
+    def __init__(
+        self,
+        descriptor: Dict[str, Any],
+        package: str,
+        resolver: Callable[[str, str], Awaitable[McpTool]],
+    ):
+        super().__init__(
+            descriptor["name"], descriptor.get("description", ""), PropertyList(), None
+        )
+        self.descriptor = descriptor
+        self.package = package
+        self._resolver = resolver
+
+    def to_json(self) -> Dict[str, Any]:
+        return self.descriptor
+
+    async def call_obj(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            tool = await self._resolver(self.name, self.package)
+        except Exception as e:
+            logger.error(f"Không nạp được gói công cụ {self.package}: {e}", exc_info=True)
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        return await tool.call_obj(arguments)
+
+
+def _as_tool(tool: Union[McpTool, Tuple[str, str, PropertyList, Callable]]) -> McpTool:
+    if isinstance(tool, tuple):
+        name, description, properties, callback = tool
+        return McpTool(name, description, properties, callback)
+    return tool
+
+
+# ----- Gói công cụ chung (thứ tự = thứ tự trong tools/list) -----
+def _load_system_tools(add_tool):
+    from src.mcp.tools.system import get_system_tools_manager
+
+    get_system_tools_manager().init_tools(add_tool, PropertyList, Property, PropertyType)
+
+
+def _load_calendar_tools(add_tool):
+    from src.mcp.tools.calendar import get_calendar_manager
+
+    get_calendar_manager().init_tools(add_tool, PropertyList, Property, PropertyType)
+
+
+def _load_timer_tools(add_tool):
+    from src.mcp.tools.timer import get_timer_manager
+
+    get_timer_manager().init_tools(add_tool, PropertyList, Property, PropertyType)
+
+
+def _load_music_tools(add_tool):
+    from src.mcp.tools.music import get_music_tools_manager
+
+    get_music_tools_manager().init_tools(add_tool, PropertyList, Property, PropertyType)
+
+
+def _load_camera_tools(add_tool):
+    from src.mcp.tools.camera import take_photo
+
+    properties = PropertyList([Property("question", PropertyType.STRING)])
+    VISION_DESC = (
+        "【Hình ảnh/Nhận dạng/OCR/Hỏi đáp】Khi người dùng đề cập đến: chụp ảnh, nhận dạng hình ảnh, đọc/trích xuất văn bản, OCR, dịch văn bản hình ảnh, "
+        "xem hình ảnh/ảnh chụp màn hình này, đây là gì, đếm xem, nhận dạng mã QR/mã vạch, so sánh hai hình ảnh, phân tích cảnh/ảnh chụp màn hình lỗi, "
+        "trích xuất thông tin bảng/hóa đơn, hỏi đáp hình ảnh thì gọi công cụ này."
+        "Chức năng: ①Chụp ảnh hoặc nhận hình ảnh/ảnh chụp màn hình/URL có sẵn; ②Nhận dạng vật thể/cảnh/nhãn; ③OCR (đa ngôn ngữ) và dịch; ④Đếm/vị trí; "
+        "⑤Đọc mã QR/mã vạch; ⑥Trích xuất thông tin chính (bảng/hóa đơn); ⑦So sánh hai hình; ⑧Trả lời câu hỏi dựa trên hình ảnh."
+        "Gợi ý đầu vào: { mode:'capture'|'upload'|'url', image?, url?, question?, target_lang? }; "
+        "Nếu người dùng không cung cấp hình ảnh và cho phép, có thể kích hoạt chụp ảnh (mode='capture'). "
+        "Tránh: Hỏi đáp kiến thức thuần văn bản, yêu cầu không liên quan đến hình ảnh."
+        "English: Vision/OCR/QA tool. Use when the user provides or asks about a photo/screenshot/image: "
+        "describe, classify, OCR, translate, count objects, read QR/barcodes, extract tables/receipts, "
+        "compare two images, image QA. Inputs as above. Do NOT use for pure text queries."
+        "Examples: 'Bức ảnh này là gì', 'OCR hóa đơn này và dịch sang tiếng Anh', 'Đếm xem có bao nhiêu con mèo trong hình', 'Đọc mã QR này', "
+        "'So sánh sự khác biệt giữa hai ảnh chụp màn hình UI này', 'Trích xuất bảng trong ảnh chụp màn hình thành CSV'."
+    )
+
+    add_tool(
+        McpTool(
+            "take_photo",  # Giữ nguyên tên để tương thích
+            VISION_DESC,
+            properties,
+            take_photo,
+        )
+    )
+
+
+def _load_screenshot_tools(add_tool):
+    from src.mcp.tools.screenshot import take_screenshot
+
+    screenshot_properties = PropertyList(
+        [
+            Property("question", PropertyType.STRING),
+            Property("display", PropertyType.STRING, default_value=None),
+        ]
+    )
+    SCREENSHOT_DESC = (
+        "【Chụp màn hình/Phân tích màn hình】Khi người dùng đề cập đến: chụp màn hình, phân tích màn hình, trên bàn làm việc có gì, "
+        "ảnh chụp màn hình, xem giao diện hiện tại, phân tích trang hiện tại, đọc nội dung màn hình, OCR màn hình thì gọi công cụ này. "
+        "Chức năng: ①Chụp toàn bộ màn hình desktop; ②Nhận dạng và phân tích nội dung màn hình; ③Trích xuất văn bản OCR màn hình; ④Phân tích phần tử giao diện; "
+        "⑤Nhận dạng ứng dụng; ⑥Phân tích ảnh chụp màn hình lỗi; ⑦Kiểm tra trạng thái desktop; ⑧Chụp ảnh nhiều màn hình. "
+        "Thông số: { question: 'Câu hỏi của bạn về desktop/màn hình', display: 'Lựa chọn màn hình (tùy chọn)' }; "
+        "Giá trị display: 'main'/'chính'/'laptop'(màn hình chính), 'secondary'/'phụ'/'ngoài'(màn hình phụ), hoặc để trống (tất cả màn hình); "
+        "Tình huống áp dụng: Chụp ảnh màn hình desktop, phân tích màn hình, chẩn đoán vấn đề giao diện, xem trạng thái ứng dụng, phân tích ảnh chụp màn hình lỗi, v.v. "
+        "Lưu ý: Công cụ này sẽ chụp ảnh desktop, vui lòng đảm bảo người dùng đồng ý thao tác chụp ảnh. "
+        "English: Desktop screenshot/screen analysis tool. Use when user mentions: screenshot, screen capture, "
+        "desktop analysis, screen content, current interface, screen OCR, etc. "
+        "Functions: ①Full desktop capture; ②Screen content recognition; ③Screen OCR; ④Interface analysis; "
+        "⑤Application identification; ⑥Error screenshot analysis; ⑦Desktop status check. "
+        "Parameters: { question: 'Question about desktop/screen', display: 'Display selection (optional)' }; "
+        "Display options: 'main'(primary), 'secondary'(external), or empty(all displays). "
+        "Examples: 'Chụp ảnh màn hình chính', 'Xem màn hình phụ có gì', 'Phân tích nội dung màn hình hiện tại', 'Đọc văn bản trên màn hình'."
+    )
+
+    add_tool(
+        McpTool(
+            "take_screenshot",
+            SCREENSHOT_DESC,
+            screenshot_properties,
+            take_screenshot,
+        )
+    )
+
+
+def _load_bazi_tools(add_tool):
+    from src.mcp.tools.bazi import get_bazi_manager
+
+    get_bazi_manager().init_tools(add_tool, PropertyList, Property, PropertyType)
+
+
+def _create_tool_registry() -> ToolRegistry:
+    packages = [
+        ToolPackage("system", "src.mcp.tools.system", _load_system_tools),
+        ToolPackage("calendar", "src.mcp.tools.calendar", _load_calendar_tools),
+        ToolPackage("timer", "src.mcp.tools.timer", _load_timer_tools),
+        ToolPackage("music", "src.mcp.tools.music", _load_music_tools),
+        ToolPackage("camera", "src.mcp.tools.camera", _load_camera_tools),
+        ToolPackage("screenshot", "src.mcp.tools.screenshot", _load_screenshot_tools),
+        ToolPackage("bazi", "src.mcp.tools.bazi", _load_bazi_tools),
+    ]
+    try:
+        manifest_path = get_user_cache_dir() / "mcp_tools_manifest.json"
+    except Exception:
+        manifest_path = None
+    return ToolRegistry(
+        packages,
+        manifest_path=manifest_path,
+        normalize=_as_tool,
+        # Mô tả take_photo/take_screenshot nằm ngay trong file này
+        extra_files=[Path(__file__)],
+        version=SystemConstants.APP_VERSION,
+    )
 
 
 class McpServer:
@@ -222,6 +399,7 @@ class McpServer:
         self.tools: List[McpTool] = []
         self._send_callback: Optional[Callable] = None
         self._camera = None
+        self.tool_registry = _create_tool_registry()
 
     def set_send_callback(self, callback: Callable):
         """
@@ -233,10 +411,8 @@ class McpServer:
         """
         Thêm công cụ.
         """
-        if isinstance(tool, tuple):
-            # Tạo McpTool từ tham số
-            name, description, properties, callback = tool
-            tool = McpTool(name, description, properties, callback)
+        # Tạo McpTool từ tham số nếu là tuple
+        tool = _as_tool(tool)
 
         # Kiểm tra xem đã tồn tại chưa
         if any(t.name == tool.name for t in self.tools):
@@ -249,124 +425,61 @@ class McpServer:
     def add_common_tools(self):
         """
         Thêm các công cụ phổ biến.
+
+        Gói công cụ đã có trong manifest được đăng ký lười (chỉ mô tả), import khi tools/call
+        đầu tiên; tắt bằng MCP.LAZY_TOOLS = false.
         """
+        from src.utils.config_manager import ConfigManager
+
         # Sao lưu danh sách công cụ ban đầu
         original_tools = self.tools.copy()
         self.tools.clear()
 
-        # Thêm công cụ hệ thống
-        from src.mcp.tools.system import get_system_tools_manager
-
-        system_manager = get_system_tools_manager()
-        system_manager.init_tools(self.add_tool, PropertyList, Property, PropertyType)
-
-        # Thêm công cụ quản lý lịch trình
-        from src.mcp.tools.calendar import get_calendar_manager
-
-        calendar_manager = get_calendar_manager()
-        calendar_manager.init_tools(self.add_tool, PropertyList, Property, PropertyType)
-
-        # Thêm công cụ đếm ngược
-        from src.mcp.tools.timer import get_timer_manager
-
-        timer_manager = get_timer_manager()
-        timer_manager.init_tools(self.add_tool, PropertyList, Property, PropertyType)
-
-        # Thêm công cụ phát nhạc
-        from src.mcp.tools.music import get_music_tools_manager
-
-        music_manager = get_music_tools_manager()
-        music_manager.init_tools(self.add_tool, PropertyList, Property, PropertyType)
-
-        # Thêm công cụ camera
-        from src.mcp.tools.camera import take_photo
-
-        # Đăng ký công cụ take_photo
-        properties = PropertyList([Property("question", PropertyType.STRING)])
-        VISION_DESC = (
-            "【Hình ảnh/Nhận dạng/OCR/Hỏi đáp】Khi người dùng đề cập đến: chụp ảnh, nhận dạng hình ảnh, đọc/trích xuất văn bản, OCR, dịch văn bản hình ảnh, "
-            "xem hình ảnh/ảnh chụp màn hình này, đây là gì, đếm xem, nhận dạng mã QR/mã vạch, so sánh hai hình ảnh, phân tích cảnh/ảnh chụp màn hình lỗi, "
-            "trích xuất thông tin bảng/hóa đơn, hỏi đáp hình ảnh thì gọi công cụ này."
-            "Chức năng: ①Chụp ảnh hoặc nhận hình ảnh/ảnh chụp màn hình/URL có sẵn; ②Nhận dạng vật thể/cảnh/nhãn; ③OCR (đa ngôn ngữ) và dịch; ④Đếm/vị trí; "
-            "⑤Đọc mã QR/mã vạch; ⑥Trích xuất thông tin chính (bảng/hóa đơn); ⑦So sánh hai hình; ⑧Trả lời câu hỏi dựa trên hình ảnh."
-            "Gợi ý đầu vào: { mode:'capture'|'upload'|'url', image?, url?, question?, target_lang? }; "
-            "Nếu người dùng không cung cấp hình ảnh và cho phép, có thể kích hoạt chụp ảnh (mode='capture'). "
-            "Tránh: Hỏi đáp kiến thức thuần văn bản, yêu cầu không liên quan đến hình ảnh."
-            "English: Vision/OCR/QA tool. Use when the user provides or asks about a photo/screenshot/image: "
-            "describe, classify, OCR, translate, count objects, read QR/barcodes, extract tables/receipts, "
-            "compare two images, image QA. Inputs as above. Do NOT use for pure text queries."
-            "Examples: 'Bức ảnh này là gì', 'OCR hóa đơn này và dịch sang tiếng Anh', 'Đếm xem có bao nhiêu con mèo trong hình', 'Đọc mã QR này', "
-            "'So sánh sự khác biệt giữa hai ảnh chụp màn hình UI này', 'Trích xuất bảng trong ảnh chụp màn hình thành CSV'."
-        )
-
-        self.add_tool(
-            McpTool(
-                "take_photo",  # Giữ nguyên tên để tương thích
-                VISION_DESC,
-                properties,
-                take_photo,
-            )
-        )
+        lazy = bool(ConfigManager.get_instance().get_config("MCP.LAZY_TOOLS", True))
+        self.tool_registry.register_all(self.add_tool, self._make_lazy_tool, lazy=lazy)
 
-        # Thêm công cụ chụp ảnh màn hình desktop
-        from src.mcp.tools.screenshot import take_screenshot
-
-        # Đăng ký công cụ take_screenshot
-        screenshot_properties = PropertyList(
-            [
-                Property("question", PropertyType.STRING),
-                Property("display", PropertyType.STRING, default_value=None),
-            ]
-        )
-        SCREENSHOT_DESC = (
-            "【Chụp màn hình/Phân tích màn hình】Khi người dùng đề cập đến: chụp màn hình, phân tích màn hình, trên bàn làm việc có gì, "
-            "ảnh chụp màn hình, xem giao diện hiện tại, phân tích trang hiện tại, đọc nội dung màn hình, OCR màn hình thì gọi công cụ này. "
-            "Chức năng: ①Chụp toàn bộ màn hình desktop; ②Nhận dạng và phân tích nội dung màn hình; ③Trích xuất văn bản OCR màn hình; ④Phân tích phần tử giao diện; "
-            "⑤Nhận dạng ứng dụng; ⑥Phân tích ảnh chụp màn hình lỗi; ⑦Kiểm tra trạng thái desktop; ⑧Chụp ảnh nhiều màn hình. "
-            "Thông số: { question: 'Câu hỏi của bạn về desktop/màn hình', display: 'Lựa chọn màn hình (tùy chọn)' }; "
-            "Giá trị display: 'main'/'chính'/'laptop'(màn hình chính), 'secondary'/'phụ'/'ngoài'(màn hình phụ), hoặc để trống (tất cả màn hình); "
-            "Tình huống áp dụng: Chụp ảnh màn hình desktop, phân tích màn hình, chẩn đoán vấn đề giao diện, xem trạng thái ứng dụng, phân tích ảnh chụp màn hình lỗi, v.v. "
-            "Lưu ý: Công cụ này sẽ chụp ảnh desktop, vui lòng đảm bảo người dùng đồng ý thao tác chụp ảnh. "
-            "English: Desktop screenshot/screen analysis tool. Use when user mentions: screenshot, screen capture, "
-            "desktop analysis, screen content, current interface, screen OCR, etc. "
-            "Functions: ①Full desktop capture; ②Screen content recognition; ③Screen OCR; ④Interface analysis; "
-            "⑤Application identification; ⑥Error screenshot analysis; ⑦Desktop status check. "
-            "Parameters: { question: 'Question about desktop/screen', display: 'Display selection (optional)' }; "
-            "Display options: 'main'(primary), 'secondary'(external), or empty(all displays). "
-            "Examples: 'Chụp ảnh màn hình chính', 'Xem màn hình phụ có gì', 'Phân tích nội dung màn hình hiện tại', 'Đọc văn bản trên màn hình'."
-        )
-
-        self.add_tool(
-            McpTool(
-                "take_screenshot",
-                SCREENSHOT_DESC,
-                screenshot_properties,
-                take_screenshot,
-            )
-        )
+        # Khôi phục các công cụ cũ
+        self.tools.extend(original_tools)
 
-        # Thêm công cụ Bát tự (Mệnh lý)
-        from src.mcp.tools.bazi import get_bazi_manager
+    def _make_lazy_tool(self, descriptor: Dict[str, Any], package: str) -> "LazyMcpTool":
+        return LazyMcpTool(descriptor, package, self._resolve_lazy_tool)
 
-        bazi_manager = get_bazi_manager()
-        bazi_manager.init_tools(self.add_tool, PropertyList, Property, PropertyType)
+    async def _resolve_lazy_tool(self, name: str, package: str) -> McpTool:
+        """
+        Nạp gói của công cụ lười và thay các công cụ lười của gói bằng công cụ thật (giữ thứ tự).
+        """
+        tools = await self.tool_registry.ensure_loaded(package)
+        by_name = {tool.name: tool for tool in tools}
+        for i, tool in enumerate(self.tools):
+            if isinstance(tool, LazyMcpTool) and tool.name in by_name:
+                self.tools[i] = by_name.pop(tool.name)
+        # Công cụ mới không có trong manifest cũ
+        for tool in by_name.values():
+            self.add_tool(tool)
+        for tool in tools:
+            if tool.name == name:
+                return tool
+        raise RuntimeError(f"Tool {name} no longer provided by package {package}")
 
-        # Khôi phục các công cụ cũ
-        self.tools.extend(original_tools)
+    def get_tool_stats(self) -> Dict[str, Any]:
+        """
+        Thống kê gói công cụ: đã nạp chưa, thời gian import, RSS (và RSS tiết kiệm được).
+        """
+        return self.tool_registry.stats()
 
     async def parse_message(self, message: Union[str, Dict[str, Any]]):
         """
         Phân tích tin nhắn MCP.
         """
         try:
-            if isinstance(message, str):
-                data = json.loads(message)
-            else:
-                data = message
+            data = json_codec.ensure_obj(message)
 
+            # Không dumps cả tin nhắn (indent=2) ở mức INFO cho mọi request
             logger.info(
-                f"[MCP] Phân tích tin nhắn: {json.dumps(data, ensure_ascii=False, indent=2)}"
+                f"[MCP] Nhận tin nhắn: method={data.get('method')}, id={data.get('id')}"
             )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"[MCP] Nội dung tin nhắn: {json_codec.dumps(data)}")
 
             # Kiểm tra phiên bản JSONRPC
             if data.get("jsonrpc") != "2.0":
@@ -449,8 +562,7 @@ class McpServer:
                     continue
 
             # Kiểm tra kích thước
-            tool_json = tool.to_json()
-            tool_size = len(json.dumps(tool_json))
+            tool_json, tool_size = tool.json_with_size()
 
             if total_size + tool_size + 100 > max_payload_size:
                 next_cursor = tool.name
@@ -496,9 +608,9 @@ class McpServer:
 
         # Gọi công cụ bất đồng bộ
         try:
-            result = await tool.call(arguments)
+            result = await tool.call_obj(arguments)
             logger.info(f"[MCP] Công cụ {tool_name} thực thi thành công, Kết quả: {result}")
-            await self._reply_result(id, json.loads(result))
+            await self._reply_result(id, result)
         except Exception as e:
             logger.error(f"[MCP] Công cụ {tool_name} thực thi thất bại: {e}", exc_info=True)
             await self._reply_error(id, str(e))
@@ -512,14 +624,19 @@ class McpServer:
             url = vision.get("url")
             token = vision.get("token")
             if url:
-                from src.mcp.tools.camera import get_camera_instance
 
-                camera = get_camera_instance()
-                if hasattr(camera, "set_explain_url"):
-                    camera.set_explain_url(url)
-                if token and hasattr(camera, "set_explain_token"):
-                    camera.set_explain_token(token)
-                logger.info(f"Vision service configured with URL: {url}")
+                def _configure_camera():
+                    from src.mcp.tools.camera import get_camera_instance
+
+                    camera = get_camera_instance()
+                    if hasattr(camera, "set_explain_url"):
+                        camera.set_explain_url(url)
+                    if token and hasattr(camera, "set_explain_token"):
+                        camera.set_explain_token(token)
+                    logger.info(f"Vision service configured with URL: {url}")
+
+                # Không import gói camera (cv2) chỉ để lưu URL: áp dụng khi gói được nạp
+                self.tool_registry.when_loaded("camera", _configure_camera)
 
     async def _reply_result(self, id: int, result: Any):
         """
@@ -527,11 +644,11 @@ class McpServer:
         """
         payload = {"jsonrpc": "2.0", "id": id, "result": result}
 
-        result_len = len(json.dumps(result))
-        logger.info(f"[MCP] Gửi phản hồi thành công: ID={id}, Độ dài kết quả={result_len}")
+        logger.info(f"[MCP] Gửi phản hồi thành công: ID={id}")
 
         if self._send_callback:
-            await self._send_callback(json.dumps(payload))
+            # Gửi dict, transport serialize đúng một lần
+            await self._send_callback(payload)
         else:
             logger.error("[MCP] Callback gửi chưa được thiết lập!")
 
@@ -544,4 +661,4 @@ class McpServer:
         logger.error(f"[MCP] Gửi phản hồi lỗi: ID={id}, Lỗi={message}")
 
         if self._send_callback:
-            await self._send_callback(json.dumps(payload))
+            await self._send_callback(payload)
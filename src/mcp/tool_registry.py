@@ -0,0 +1,281 @@
+"""
+Tool Registry - Nạp gói công cụ MCP theo yêu cầu.
+
+Trước đây add_common_tools import mọi gói công cụ khi khởi động (nhạc kéo theo pygame,
+mutagen, requests; camera kéo cv2; bát tự kéo lunar_python và các bảng lớn), tốn thời gian
+khởi động và RAM ngay cả khi không bao giờ dùng.
+
+Ở đây:
+- Mô tả công cụ (tên, mô tả, inputSchema) của từng gói được lưu vào manifest trong thư mục
+  cache người dùng, kèm dấu vân tay mã nguồn của gói (kích thước + mtime các file .py).
+- Khi khởi động, gói có manifest khớp chỉ đăng ký công cụ "lười" từ mô tả; gói chưa có
+  manifest hoặc đã đổi mã nguồn được nạp ngay như trước và manifest được ghi lại.
+- tools/call đầu tiên tới một công cụ lười import gói trong luồng riêng (single-flight),
+  rồi đăng ký công cụ thật trên vòng lặp sự kiện.
+- Thời gian import và RSS tăng thêm của từng gói được đo và lưu; gói chưa nạp được báo là
+  RAM đã tiết kiệm.
+"""
+
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_VERSION = 1
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def read_rss_kb() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class ToolPackage:
+    """
+    Một gói công cụ: module cần import và hàm đăng ký công cụ (add_tool) sau khi import.
+    """
+
+    name: str
+    module: str
+    loader: Callable[[Callable[[Any], None]], None]
+
+    @property
+    def path(self) -> Path:
+        return _PROJECT_ROOT.joinpath(*self.module.split("."))
+
+
+class ToolRegistry:
+    def __init__(
+        self,
+        packages: Iterable[ToolPackage],
+        manifest_path: Optional[Path] = None,
+        normalize: Callable[[Any], Any] = lambda tool: tool,
+        extra_files: Iterable[Path] = (),
+        version: str = "",
+    ):
+        self.packages: Dict[str, ToolPackage] = {p.name: p for p in packages}
+        self.manifest_path = manifest_path
+        self._normalize = normalize
+        self._extra_files = [Path(p) for p in extra_files]
+        self._version = version
+        self._manifest: Dict[str, dict] = self._read_manifest()
+        self._loaded: Dict[str, List[Any]] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._lazy: set = set()
+        self._listeners: Dict[str, List[Callable[[], None]]] = {}
+        self._tool_package: Dict[str, str] = {}
+
+    # ----- manifest -----
+    def _read_manifest(self) -> Dict[str, dict]:
+        if not self.manifest_path or not self.manifest_path.exists():
+            return {}
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if data.get("version") != MANIFEST_VERSION:
+                return {}
+            return data.get("packages", {})
+        except Exception as e:
+            logger.warning(f"Không đọc được manifest công cụ MCP: {e}")
+            return {}
+
+    def _write_manifest(self) -> None:
+        if not self.manifest_path:
+            return
+        try:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest_path.with_suffix(".tmp")
+            tmp.write_text(
+                json.dumps(
+                    {"version": MANIFEST_VERSION, "packages": self._manifest},
+                    ensure_ascii=False,
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.manifest_path)
+        except Exception as e:
+            logger.warning(f"Không ghi được manifest công cụ MCP: {e}")
+
+    def fingerprint(self, package: ToolPackage) -> str:
+        """
+        Dấu vân tay mã nguồn gói (chỉ stat file, không import).
+        """
+        digest = hashlib.sha1(self._version.encode())
+        files = list(self._extra_files)
+        root = package.path
+        if root.is_dir():
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+                files.extend(Path(dirpath) / f for f in sorted(filenames) if f.endswith(".py"))
+        else:
+            files.append(root.with_suffix(".py"))
+        for path in files:
+            try:
+                st = path.stat()
+                digest.update(f"{path}:{st.st_size}:{st.st_mtime_ns};".encode())
+            except OSError:
+                digest.update(f"{path}:missing;".encode())
+        return digest.hexdigest()
+
+    # ----- đăng ký -----
+    def register_all(
+        self,
+        add_tool: Callable[[Any], None],
+        make_lazy: Callable[[dict, str], Any],
+        lazy: bool = True,
+    ) -> None:
+        """
+        Đăng ký công cụ của mọi gói theo thứ tự: gói có manifest khớp -> công cụ lười,
+        còn lại nạp ngay (và cập nhật manifest).
+        """
+        changed = False
+        for package in self.packages.values():
+            entry = self._manifest.get(package.name)
+            fingerprint = self.fingerprint(package)
+            if lazy and entry and entry.get("fingerprint") == fingerprint and package.name not in self._loaded:
+                for descriptor in entry.get("tools", []):
+                    self._tool_package[descriptor["name"]] = package.name
+                    add_tool(make_lazy(descriptor, package.name))
+                self._lazy.add(package.name)
+                continue
+            try:
+                tools = self.load_sync(package.name, fingerprint)
+            except Exception as e:
+                logger.error(f"Nạp gói công cụ {package.name} thất bại: {e}", exc_info=True)
+                continue
+            for tool in tools:
+                add_tool(tool)
+            changed = True
+        if changed:
+            self._write_manifest()
+        if self._lazy:
+            logger.info(f"🧰 Công cụ MCP nạp lười: {', '.join(sorted(self._lazy))}")
+
+    def package_for(self, tool_name: str) -> Optional[str]:
+        return self._tool_package.get(tool_name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def when_loaded(self, name: str, callback: Callable[[], None]) -> None:
+        """
+        Gọi callback khi gói đã nạp (ngay lập tức nếu đã nạp).
+        """
+        if name in self._loaded:
+            self._call_listener(name, callback)
+        else:
+            self._listeners.setdefault(name, []).append(callback)
+
+    def _call_listener(self, name: str, callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Callback sau khi nạp gói {name} lỗi: {e}")
+
+    # ----- nạp -----
+    def _import(self, package: ToolPackage) -> dict:
+        rss_before = read_rss_kb()
+        started = time.perf_counter()
+        importlib.import_module(package.module)
+        import_ms = (time.perf_counter() - started) * 1000.0
+        rss_after = read_rss_kb()
+        rss_kb = None
+        if rss_before is not None and rss_after is not None:
+            rss_kb = max(0, rss_after - rss_before)
+        return {"import_ms": round(import_ms, 1), "rss_kb": rss_kb}
+
+    def _register(self, package: ToolPackage, cost: dict, fingerprint: str) -> List[Any]:
+        tools: List[Any] = []
+        package.loader(lambda tool: tools.append(self._normalize(tool)))
+        for tool in tools:
+            self._tool_package[tool.name] = package.name
+        self._loaded[package.name] = tools
+        self._manifest[package.name] = {
+            "fingerprint": fingerprint,
+            "tools": [tool.to_json() for tool in tools],
+            "import_ms": cost["import_ms"],
+            "rss_kb": cost["rss_kb"],
+        }
+        lazy = " (lười)" if package.name in self._lazy else ""
+        logger.info(
+            f"🧰 Nạp gói công cụ {package.name}{lazy}: {len(tools)} công cụ, "
+            f"import {cost['import_ms']:.0f} ms, RSS +{cost['rss_kb'] or 0} KB"
+        )
+        for callback in self._listeners.pop(package.name, []):
+            self._call_listener(package.name, callback)
+        return tools
+
+    def load_sync(self, name: str, fingerprint: Optional[str] = None) -> List[Any]:
+        """
+        Nạp gói ngay trên luồng hiện tại (dùng khi khởi động, manifest chưa có).
+        """
+        if name in self._loaded:
+            return self._loaded[name]
+        package = self.packages[name]
+        cost = self._import(package)
+        return self._register(package, cost, fingerprint or self.fingerprint(package))
+
+    async def ensure_loaded(self, name: str) -> List[Any]:
+        """
+        Nạp gói (import trong luồng riêng, đăng ký trên vòng lặp); các lời gọi đồng thời
+        dùng chung một lần nạp.
+        """
+        if name in self._loaded:
+            return self._loaded[name]
+        future = self._loading.get(name)
+        if future is None:
+            future = asyncio.ensure_future(self._load_async(name))
+            self._loading[name] = future
+            future.add_done_callback(lambda _f: self._loading.pop(name, None))
+        return await asyncio.shield(future)
+
+    async def _load_async(self, name: str) -> List[Any]:
+        package = self.packages[name]
+        cost = await asyncio.to_thread(self._import, package)
+        tools = self._register(package, cost, self.fingerprint(package))
+        self._write_manifest()
+        return tools
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None) -> None:
+        """
+        Nạp trước các gói lười (mặc định: tất cả) trong nền.
+        """
+        targets = list(names) if names is not None else list(self._lazy)
+        for name in targets:
+            if name not in self.packages or name in self._loaded:
+                continue
+            try:
+                await self.ensure_loaded(name)
+            except Exception as e:
+                logger.warning(f"Làm ấm gói công cụ {name} thất bại: {e}")
+
+    def stats(self) -> dict:
+        packages = {}
+        saved_kb = 0
+        for name in self.packages:
+            entry = self._manifest.get(name, {})
+            loaded = name in self._loaded
+            rss_kb = entry.get("rss_kb")
+            if not loaded and rss_kb:
+                saved_kb += rss_kb
+            packages[name] = {
+                "loaded": loaded,
+                "lazy": name in self._lazy,
+                "tools": len(entry.get("tools", [])),
+                "import_ms": entry.get("import_ms"),
+                "rss_kb": rss_kb,
+            }
+        return {"packages": packages, "rss_saved_kb": saved_kb}
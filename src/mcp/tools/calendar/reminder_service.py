@@ -171,6 +171,8 @@ class CalendarReminderService:
 
             # Lấy instance ứng dụng và gọi TTS
             application = self._get_application()
+            if application and hasattr(application, "play_earcon"):
+                application.play_earcon("alert")
             if application and hasattr(application, "_send_text_tts"):
                 await application._send_text_tts(reminder_json)
                 logger.info(f"Đã gửi nhắc nhở: {title} ({time_str})")
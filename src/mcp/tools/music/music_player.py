@@ -10,10 +10,8 @@ import time
 from pathlib import Path
 from typing import List, Optional, Tuple
 
-import pygame
 import requests
 
-from src.constants.constants import AudioConfig
 from src.utils.logging_config import get_logger
 from src.utils.resource_finder import get_user_cache_dir
 
@@ -115,9 +113,6 @@ class MusicPlayer:
     """
 
     def __init__(self):
-        # Tối ưu hóa khởi tạo pygame music tùy theo loại máy chủ
-        self._init_pygame_mixer()
-
         # Trạng thái phát cốt lõi
         self.current_song = ""
         self.current_url = ""
@@ -126,7 +121,7 @@ class MusicPlayer:
         self.is_playing = False
         self.paused = False
         self.current_position = 0
-        self.start_play_time = 0
+        self._last_error: Optional[str] = None
 
         # Liên quan đến lời bài hát
         self.lyrics = []  # Danh sách lời bài hát, định dạng [(thời gian, văn bản), ...]
@@ -165,34 +160,6 @@ class MusicPlayer:
 
         logger.info("Khởi tạo singleton trình phát nhạc hoàn tất")
 
-    def _init_pygame_mixer(self):
-        """
-        Tối ưu hóa khởi tạo pygame music tùy theo loại máy chủ.
-        """
-        try:
-
-            # Khởi tạo trước mixer để thiết lập bộ đệm
-            pygame.mixer.pre_init(
-                frequency=AudioConfig.OUTPUT_SAMPLE_RATE,
-                size=-16,  # 16-bit có dấu
-                channels=AudioConfig.CHANNELS,
-                buffer=1024,
-            )
-
-            # Khởi tạo chính thức
-            pygame.mixer.init()
-
-            logger.info(
-                f"Khởi tạo pygame mixer hoàn tất - Tần số lấy mẫu: {AudioConfig.OUTPUT_SAMPLE_RATE}Hz"
-            )
-
-        except Exception as e:
-            logger.warning(f"Tối ưu hóa khởi tạo pygame thất bại, sử dụng cấu hình mặc định: {e}")
-            # Quay lại cấu hình mặc định
-            pygame.mixer.init(
-                frequency=AudioConfig.OUTPUT_SAMPLE_RATE, channels=AudioConfig.CHANNELS
-            )
-
     def _initialize_app_reference(self):
         """
         Khởi tạo tham chiếu ứng dụng.
@@ -205,6 +172,35 @@ class MusicPlayer:
             logger.warning(f"Lấy instance Application thất bại: {e}")
             self.app = None
 
+    def _get_codec(self):
+        """
+        Nhạc phát qua bus nhạc của AudioCodec (không mở thiết bị âm thanh riêng).
+        """
+        return getattr(self.app, "audio_codec", None) if self.app else None
+
+    async def _start_codec_playback(self, file_path: Path) -> Optional[str]:
+        """
+        Bắt đầu phát qua AudioCodec và chờ bộ giải mã chạy được.
+
+        Trả về thông báo lỗi (không có đường ra, thiếu ffmpeg, tệp hỏng), None nếu thành công.
+        """
+        codec = self._get_codec()
+        if codec is None:
+            logger.error("Không có AudioCodec để phát nhạc")
+            return "Không có AudioCodec để phát nhạc"
+        if not codec.play_music(file_path):
+            return codec.music_error or "Không có đường ra âm thanh để phát nhạc"
+        error = await codec.wait_music_started()
+        if error:
+            codec.stop_music()
+            logger.error(f"Giải mã nhạc thất bại: {error}")
+            return error
+        return None
+
+    def _playback_position(self) -> float:
+        codec = self._get_codec()
+        return codec.music_position() if codec is not None else self.current_position
+
     def _init_cache_dirs(self):
         """
         Khởi tạo thư mục cache.
@@ -414,13 +410,10 @@ class MusicPlayer:
             if MUTAGEN_AVAILABLE:
                 metadata.extract_metadata()
 
-            # Dừng phát hiện tại
-            if self.is_playing:
-                pygame.mixer.music.stop()
-
-            # Tải và phát
-            pygame.mixer.music.load(str(file_path))
-            pygame.mixer.music.play()
+            # Tải và phát (bài mới thay thế phiên hiện tại trên bus nhạc)
+            error = await self._start_codec_playback(file_path)
+            if error:
+                return {"status": "error", "message": f"Phát thất bại: {error}"}
 
             # Cập nhật trạng thái phát
             title = metadata.title or "Tiêu đề không xác định"
@@ -432,7 +425,6 @@ class MusicPlayer:
             self.is_playing = True
             self.paused = False
             self.current_position = 0
-            self.start_play_time = time.time()
             self.current_lyric_index = -1
             self.lyrics = []  # Tệp cục bộ tạm thời không hỗ trợ lời bài hát
 
@@ -468,10 +460,13 @@ class MusicPlayer:
         if not self.is_playing or self.paused:
             return self.current_position
 
-        current_pos = min(self.total_duration, time.time() - self.start_play_time)
+        current_pos = self._playback_position()
+        if self.total_duration > 0:
+            current_pos = min(self.total_duration, current_pos)
 
-        # Kiểm tra xem đã phát xong chưa
-        if current_pos >= self.total_duration and self.total_duration > 0:
+        # Kiểm tra xem đã phát xong chưa (bus nhạc đã phát hết dữ liệu giải mã)
+        codec = self._get_codec()
+        if codec is not None and codec.music_finished:
             await self._handle_playback_finished()
 
         return current_pos
@@ -491,7 +486,9 @@ class MusicPlayer:
         """
         if self.is_playing:
             logger.info(f"Bài hát đã phát xong: {self.current_song}")
-            pygame.mixer.music.stop()
+            codec = self._get_codec()
+            if codec is not None:
+                codec.stop_music()
             self.is_playing = False
             self.paused = False
             self.current_position = self.total_duration
@@ -520,7 +517,7 @@ class MusicPlayer:
                     "message": f"Đang phát: {self.current_song}",
                 }
             else:
-                return {"status": "error", "message": "Phát thất bại"}
+                return {"status": "error", "message": self._failure_message()}
 
         except Exception as e:
             logger.error(f"Tìm kiếm và phát thất bại: {e}")
@@ -537,15 +534,18 @@ class MusicPlayer:
                 return {
                     "status": "success" if success else "error",
                     "message": (
-                        f"Bắt đầu phát: {self.current_song}" if success else "Phát thất bại"
+                        f"Bắt đầu phát: {self.current_song}"
+                        if success
+                        else self._failure_message()
                     ),
                 }
 
             elif self.is_playing and self.paused:
                 # Tiếp tục phát
-                pygame.mixer.music.unpause()
+                codec = self._get_codec()
+                if codec is not None:
+                    codec.resume_music()
                 self.paused = False
-                self.start_play_time = time.time() - self.current_position
 
                 # Cập nhật UI
                 if self.app and hasattr(self.app, "set_chat_message"):
@@ -558,9 +558,11 @@ class MusicPlayer:
 
             elif self.is_playing and not self.paused:
                 # Tạm dừng phát
-                pygame.mixer.music.pause()
+                codec = self._get_codec()
+                if codec is not None:
+                    codec.pause_music()
                 self.paused = True
-                self.current_position = time.time() - self.start_play_time
+                self.current_position = self._playback_position()
 
                 # Cập nhật UI
                 if self.app and hasattr(self.app, "set_chat_message"):
@@ -587,7 +589,9 @@ class MusicPlayer:
             if not self.is_playing:
                 return {"status": "info", "message": "Không có bài hát đang phát"}
 
-            pygame.mixer.music.stop()
+            codec = self._get_codec()
+            if codec is not None:
+                codec.stop_music()
             current_song = self.current_song
             self.is_playing = False
             self.paused = False
@@ -613,13 +617,11 @@ class MusicPlayer:
 
             position = max(0, min(position, self.total_duration))
             self.current_position = position
-            self.start_play_time = time.time() - position
 
-            pygame.mixer.music.rewind()
-            pygame.mixer.music.set_pos(position)
-
-            if self.paused:
-                pygame.mixer.music.pause()
+            # Giải mã lại từ vị trí mới (giữ trạng thái tạm dừng)
+            codec = self._get_codec()
+            if codec is None or not codec.seek_music(position):
+                return {"status": "error", "message": "Tua thất bại"}
 
             # Cập nhật UI
             pos_str = self._format_time(position)
@@ -756,14 +758,19 @@ class MusicPlayer:
             logger.error(f"Tìm kiếm bài hát thất bại: {e}")
             return "", ""
 
+    def _failure_message(self) -> str:
+        return f"Phát thất bại: {self._last_error}" if self._last_error else "Phát thất bại"
+
     async def _play_url(self, url: str) -> bool:
         """
-        Phát URL chỉ định.
+        Phát URL chỉ định (lỗi chi tiết lưu ở self._last_error).
         """
+        self._last_error = None
         try:
             # Dừng phát hiện tại
-            if self.is_playing:
-                pygame.mixer.music.stop()
+            codec = self._get_codec()
+            if self.is_playing and codec is not None:
+                codec.stop_music()
 
             # Kiểm tra cache hoặc tải về
             file_path = await self._get_or_download_file(url)
@@ -771,14 +778,15 @@ class MusicPlayer:
                 return False
 
             # Tải và phát
-            pygame.mixer.music.load(str(file_path))
-            pygame.mixer.music.play()
+            error = await self._start_codec_playback(file_path)
+            if error:
+                self._last_error = error
+                return False
 
             self.current_url = url
             self.is_playing = True
             self.paused = False
             self.current_position = 0
-            self.start_play_time = time.time()
             self.current_lyric_index = -1  # Đặt lại chỉ mục lời bài hát
 
             logger.info(f"Bắt đầu phát: {self.current_song}")
@@ -794,6 +802,7 @@ class MusicPlayer:
 
         except Exception as e:
             logger.error(f"Phát thất bại: {e}")
+            self._last_error = str(e)
             return False
 
     async def _get_or_download_file(self, url: str) -> Optional[Path]:
@@ -945,10 +954,11 @@ class MusicPlayer:
                     await asyncio.sleep(0.5)
                     continue
 
-                current_time = time.time() - self.start_play_time
+                current_time = self._playback_position()
 
                 # Kiểm tra xem đã phát xong chưa
-                if current_time >= self.total_duration:
+                codec = self._get_codec()
+                if codec is not None and codec.music_finished:
                     await self._handle_playback_finished()
                     break
 
@@ -996,7 +1006,7 @@ class MusicPlayer:
             time_sec, text = self.lyrics[current_index]
 
             # Thêm thông tin thời gian và tiến độ trước lời bài hát
-            position_str = self._format_time(time.time() - self.start_play_time)
+            position_str = self._format_time(self._playback_position())
             duration_str = self._format_time(self.total_duration)
             display_text = f"[{position_str}/{duration_str}] {text}"
 
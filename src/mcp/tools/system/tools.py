@@ -59,7 +59,15 @@ async def set_volume(args: Dict[str, Any]) -> bool:
             logger.warning(f"[SystemTools] Giá trị âm lượng nằm ngoài phạm vi: {volume}")
             return False
 
-        # Sử dụng trực tiếp VolumeController để đặt âm lượng
+        # Ưu tiên gain phần mềm của AudioCodec (cập nhật trong bộ nhớ, không gọi subprocess)
+        from src.application import Application
+
+        app = Application._instance
+        if app is not None and app.set_volume(volume) is not None:
+            logger.info(f"[SystemTools] Thiết lập âm lượng thành công: {volume}")
+            return True
+
+        # Không có AudioCodec (ví dụ --no-audio): dùng mixer hệ thống
         from src.utils.volume_controller import VolumeController
 
         # Kiểm tra sự phụ thuộc và tạo bộ điều khiển âm lượng
@@ -85,6 +93,17 @@ async def _get_audio_status() -> Dict[str, Any]:
     Lấy trạng thái âm thanh.
     """
     try:
+        from src.application import Application
+
+        app = Application._instance
+        current_volume = app.get_volume() if app is not None else None
+        if current_volume is not None:
+            return {
+                "volume": current_volume,
+                "muted": current_volume == 0,
+                "available": True,
+            }
+
         from src.utils.volume_controller import VolumeController
 
         if VolumeController.check_dependencies():
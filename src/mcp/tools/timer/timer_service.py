@@ -315,6 +315,7 @@ class TimerTask:
                     message = f"{self.description} thất bại"
 
             print("Đếm ngược:", message)
+            app.play_earcon("alert" if success else "error")
             await app._send_text_tts(message)
         except Exception as e:
             logger.warning(f"Thông báo kết quả timer thất bại: {e}")
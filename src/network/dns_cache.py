@@ -0,0 +1,351 @@
+"""
+DNS Cache - Bộ đệm phân giải tên miền dùng chung + kết nối đua IPv4/IPv6.
+
+Trước đây WebsocketProtocol, OTA, MqttProtocol và CloudAgent tự gọi resolver hệ
+thống mỗi lần kết nối/kết nối lại; trên WiFi chập chờn của Pi, DNS thường là bước
+chậm nhất (có khi vài giây, hoặc lỗi hẳn ngay sau khi roam).
+
+Ở đây:
+- DnsCache: TTL cố định (resolver hệ thống không trả TTL), làm mới nền khi bản ghi
+  sắp hết hạn, stale-while-revalidate (trả bản cũ ngay, làm mới phía sau) và dùng
+  bản cũ khi DNS lỗi. Các lời gọi đồng thời cho cùng host dùng chung một lần tra.
+- race_connect / open_racing_socket: thử các địa chỉ ứng viên song song kiểu
+  Happy Eyeballs (RFC 8305): xen kẽ IPv6/IPv4, cách nhau 250ms, thử ngay địa chỉ
+  kế tiếp khi một địa chỉ lỗi; socket đầu tiên kết nối được sẽ thắng.
+- CachedResolver: resolver cho aiohttp (OTA) đọc từ cùng bộ đệm.
+"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    from aiohttp.abc import AbstractResolver
+except ImportError:  # aiohttp là tùy chọn cho các thành phần không dùng OTA
+    AbstractResolver = object
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TTL = 300.0  # Bản ghi coi là mới trong 5 phút
+STALE_TTL = 86400.0  # Còn được dùng (và làm mới nền) thêm 1 ngày
+REFRESH_AHEAD = 0.8  # Làm mới nền khi đã dùng 80% TTL
+HAPPY_EYEBALLS_DELAY = 0.25
+
+# (family, sockaddr)
+Address = Tuple[int, tuple]
+
+
+def _ip_literal(host: str) -> Optional[int]:
+    try:
+        ip = ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return None
+    return socket.AF_INET6 if ip.version == 6 else socket.AF_INET
+
+
+def interleave_families(addrs: List[Address]) -> List[Address]:
+    """
+    Xen kẽ họ địa chỉ (RFC 8305), giữ thứ tự ưu tiên của getaddrinfo trong mỗi họ.
+    """
+    if not addrs:
+        return []
+    first_family = addrs[0][0]
+    primary = [a for a in addrs if a[0] == first_family]
+    secondary = [a for a in addrs if a[0] != first_family]
+    result = []
+    for i in range(max(len(primary), len(secondary))):
+        if i < len(primary):
+            result.append(primary[i])
+        if i < len(secondary):
+            result.append(secondary[i])
+    return result
+
+
+class _Entry:
+    __slots__ = ("addrs", "resolved_at")
+
+    def __init__(self, addrs: List[Address], resolved_at: float):
+        self.addrs = addrs
+        self.resolved_at = resolved_at
+
+
+class DnsCache:
+    """
+    Bộ đệm phân giải bất đồng bộ dùng chung cho mọi kết nối ra ngoài.
+    """
+
+    _instance = None
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        stale_ttl: float = STALE_TTL,
+        lookup: Optional[Callable[[str, int], Awaitable[List[Address]]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lookup_fn = lookup or self._system_lookup
+        self._clock = clock
+        self._entries: Dict[Tuple[str, int], _Entry] = {}
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._background = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    @classmethod
+    def get_instance(cls) -> "DnsCache":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    async def _system_lookup(host: str, port: int) -> List[Address]:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+        seen = set()
+        addrs = []
+        for family, _, _, _, sockaddr in infos:
+            key = (family, sockaddr[0])
+            if key not in seen:
+                seen.add(key)
+                addrs.append((family, sockaddr))
+        return interleave_families(addrs)
+
+    async def resolve(self, host: str, port: int) -> List[Address]:
+        """
+        Trả về danh sách (family, sockaddr) đã xen kẽ họ địa chỉ.
+        """
+        family = _ip_literal(host)
+        if family is not None:
+            return [(family, (host.strip("[]"), port))]
+
+        key = (host.lower(), port)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self._clock() - entry.resolved_at
+            if age < self.ttl:
+                self.hits += 1
+                if age > self.ttl * REFRESH_AHEAD:
+                    self._refresh_background(key)
+                return entry.addrs
+            if age < self.ttl + self.stale_ttl:
+                # Stale-while-revalidate: không bắt người gọi chờ DNS
+                self.stale_hits += 1
+                self._refresh_background(key)
+                return entry.addrs
+
+        self.misses += 1
+        return await self._lookup(key)
+
+    def prefetch(self, host: str, port: int):
+        """
+        Phân giải trước trong nền (không chờ), ví dụ khi mạng vừa lên.
+        """
+        if _ip_literal(host) is not None:
+            return
+        self._refresh_background((host.lower(), port))
+
+    def invalidate(self, host: str, port: Optional[int] = None):
+        """
+        Bỏ bản ghi sau khi mọi địa chỉ đều kết nối thất bại.
+        """
+        host = host.lower()
+        for key in [k for k in self._entries if k[0] == host and (port is None or k[1] == port)]:
+            self._entries.pop(key, None)
+
+    def promote(self, host: str, port: int, sockaddr: tuple):
+        """
+        Đưa địa chỉ vừa kết nối thành công lên đầu để lần sau thử trước.
+        """
+        entry = self._entries.get((host.lower(), port))
+        if entry is None:
+            return
+        for i, (_, addr) in enumerate(entry.addrs):
+            if addr[0] == sockaddr[0]:
+                if i:
+                    entry.addrs = [entry.addrs[i]] + entry.addrs[:i] + entry.addrs[i + 1:]
+                return
+
+    def network_changed(self):
+        """
+        Mạng vừa đổi (roam/đổi WiFi): làm mới nền mọi bản ghi, vẫn dùng bản cũ trong lúc chờ.
+        """
+        for key in list(self._entries):
+            self._refresh_background(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+    async def _lookup(self, key: Tuple[str, int]) -> List[Address]:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._do_lookup(key))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _f, k=key: self._inflight.pop(k, None))
+        return await asyncio.shield(future)
+
+    async def _do_lookup(self, key: Tuple[str, int]) -> List[Address]:
+        host, port = key
+        try:
+            addrs = await self._lookup_fn(host, port)
+            if not addrs:
+                raise socket.gaierror(f"Không có địa chỉ cho {host}")
+        except Exception as e:
+            self.failures += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                # DNS lỗi (WiFi chập chờn): dùng tạm bản ghi cũ
+                logger.warning(f"Phân giải {host} thất bại ({e}), dùng địa chỉ đã lưu")
+                return entry.addrs
+            raise
+        self._entries[key] = _Entry(addrs, self._clock())
+        return addrs
+
+    def _refresh_background(self, key: Tuple[str, int]):
+        if key in self._inflight:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.refreshes += 1
+
+        async def refresh():
+            try:
+                await self._lookup(key)
+            except Exception as e:
+                logger.debug(f"Làm mới DNS nền cho {key[0]} thất bại: {e}")
+
+        task = loop.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+def get_dns_cache() -> DnsCache:
+    """Lấy instance DnsCache dùng chung"""
+    return DnsCache.get_instance()
+
+
+async def _attempt(loop, family: int, sockaddr: tuple) -> socket.socket:
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        await loop.sock_connect(sock, sockaddr)
+        return sock
+    except BaseException:
+        sock.close()
+        raise
+
+
+async def race_connect(
+    addrs: List[Address], delay: float = HAPPY_EYEBALLS_DELAY
+) -> socket.socket:
+    """
+    Kết nối TCP đua nhiều địa chỉ (Happy Eyeballs), trả về socket thắng (non-blocking).
+    """
+    if not addrs:
+        raise OSError("Không có địa chỉ để kết nối")
+    loop = asyncio.get_running_loop()
+    queue = list(addrs)
+    tasks = set()
+    errors = []
+    winner: Optional[socket.socket] = None
+    try:
+        while queue or tasks:
+            if queue:
+                family, sockaddr = queue.pop(0)
+                tasks.add(loop.create_task(_attempt(loop, family, sockaddr)))
+            done, _ = await asyncio.wait(
+                tasks,
+                timeout=delay if queue else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                elif winner is None:
+                    winner = task.result()
+                else:
+                    task.result().close()
+            if winner is not None:
+                return winner
+    finally:
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, socket.socket):
+                result.close()
+    raise OSError(f"Kết nối thất bại tới mọi địa chỉ: {errors}")
+
+
+async def open_racing_socket(
+    host: str,
+    port: int,
+    timeout: float = 10.0,
+    cache: Optional[DnsCache] = None,
+) -> socket.socket:
+    """
+    Phân giải qua bộ đệm rồi đua kết nối; lỗi toàn bộ thì xóa bản ghi để lần sau tra lại.
+    """
+    cache = cache or get_dns_cache()
+    addrs = await asyncio.wait_for(cache.resolve(host, port), timeout)
+    try:
+        sock = await asyncio.wait_for(race_connect(addrs), timeout)
+    except (OSError, asyncio.TimeoutError):
+        cache.invalidate(host, port)
+        raise
+    try:
+        cache.promote(host, port, sock.getpeername())
+    except OSError:
+        pass
+    return sock
+
+
+class CachedResolver(AbstractResolver):
+    """
+    Resolver aiohttp dùng DnsCache chung (aiohttp tự đua các địa chỉ trả về).
+    """
+
+    def __init__(self, cache: Optional[DnsCache] = None):
+        self._cache = cache or get_dns_cache()
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET):
+        addrs = await self._cache.resolve(host, port)
+        results = []
+        for addr_family, sockaddr in addrs:
+            if family not in (0, socket.AF_UNSPEC) and addr_family != family:
+                continue
+            results.append(
+                {
+                    "hostname": host,
+                    "host": sockaddr[0],
+                    "port": sockaddr[1],
+                    "family": addr_family,
+                    "proto": 0,
+                    "flags": socket.AI_NUMERICHOST,
+                }
+            )
+        if not results:
+            raise OSError(f"Không có địa chỉ phù hợp cho {host}")
+        return results
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,369 @@
+"""
+Link Quality - Đo chất lượng đường truyền và phát ước lượng cho bộ mã hóa, jitter buffer, kết nối lại.
+
+Trước đây ngoài ping/pong của websockets không có phép đo nào về đường truyền: độ dài
+khung, bitrate Opus và độ sâu jitter buffer đều cố định bất kể WiFi mạnh hay yếu.
+
+Ở đây:
+- LinkQualityProbe nhận RTT từ heartbeat (WebsocketProtocol, WarmSession), định kỳ đọc
+  lượng dữ liệu còn kẹt trong bộ đệm gửi, tỉ lệ mất gói UDP (MQTT) và - nếu có -
+  cường độ/tốc độ WiFi từ WiFiManager.
+- Các số đo được làm mượt (RTT theo RFC 6298, còn lại EWMA) rồi quy về điểm 0..1 và
+  mức good/fair/poor; mức chỉ đổi khi mức mới lặp lại liên tiếp (tránh dao động).
+- Mỗi lần lấy mẫu, LinkEstimate (kèm cấu hình khuyến nghị theo mức) được phát trên
+  LinkQualityBus; AudioCodec, MqttProtocol và WarmSession tự đăng ký nhận.
+"""
+
+import asyncio
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SAMPLE_INTERVAL = 5.0
+WIFI_INTERVAL = 30.0  # nmcli chậm trên Pi, đọc thưa hơn
+GRADE_HOLD = 2  # Số mẫu liên tiếp cần để đổi mức
+
+# Ngưỡng (tốt, xấu) của từng thành phần; nằm giữa thì nội suy tuyến tính
+RTT_RANGE_MS = (80.0, 600.0)
+JITTER_RANGE_MS = (20.0, 200.0)
+BACKLOG_RANGE_BYTES = (4096.0, 65536.0)
+SIGNAL_RANGE = (70.0, 30.0)
+LOSS_RANGE_PERCENT = (1.0, 10.0)
+
+# Cấu hình khuyến nghị theo mức chất lượng
+GRADE_POLICY: Dict[str, dict] = {
+    "good": {
+        "expected_loss_percent": 0,
+        "bitrate_bps": 24000,
+        "jitter_window": 4,
+        "jitter_max_delay_ms": 40.0,
+        "reconnect_backoff": 1.0,
+    },
+    "fair": {
+        "expected_loss_percent": 10,
+        "bitrate_bps": 16000,
+        "jitter_window": 6,
+        "jitter_max_delay_ms": 80.0,
+        "reconnect_backoff": 2.0,
+    },
+    "poor": {
+        "expected_loss_percent": 20,
+        "bitrate_bps": 12000,
+        "jitter_window": 8,
+        "jitter_max_delay_ms": 160.0,
+        "reconnect_backoff": 5.0,
+    },
+}
+
+
+def _factor(value: Optional[float], good: float, bad: float) -> Optional[float]:
+    """
+    Quy một số đo về 0..1 (1 = tốt), None nếu chưa có số đo.
+    """
+    if value is None:
+        return None
+    if good < bad:
+        if value <= good:
+            return 1.0
+        if value >= bad:
+            return 0.0
+    else:
+        if value >= good:
+            return 1.0
+        if value <= bad:
+            return 0.0
+    return round((value - bad) / (good - bad), 3)
+
+
+def grade_for(score: float) -> str:
+    if score >= 0.7:
+        return "good"
+    if score >= 0.4:
+        return "fair"
+    return "poor"
+
+
+@dataclass
+class LinkEstimate:
+    """
+    Ước lượng chất lượng đường truyền đã làm mượt và cấu hình khuyến nghị.
+    """
+
+    score: float
+    grade: str
+    rtt_ms: Optional[float] = None
+    rtt_jitter_ms: Optional[float] = None
+    backlog_bytes: float = 0.0
+    loss_percent: Optional[float] = None
+    wifi_signal: Optional[float] = None
+    wifi_bitrate_mbps: Optional[float] = None
+    # Tỷ lệ mất gói dự kiến cho Opus in-band FEC (0 = tắt FEC)
+    expected_loss_percent: int = 0
+    bitrate_bps: int = 24000
+    jitter_window: int = 4
+    jitter_max_delay_ms: float = 40.0
+    reconnect_backoff: float = 1.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class LinkQualityBus:
+    """
+    Kênh phát ước lượng nội bộ: callback đồng bộ, lỗi của một bên nhận không ảnh hưởng bên khác.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[LinkEstimate], None]] = []
+        self.latest: Optional[LinkEstimate] = None
+
+    def subscribe(
+        self, callback: Callable[[LinkEstimate], None], replay: bool = True
+    ) -> Callable[[], None]:
+        """
+        Đăng ký nhận ước lượng; trả về hàm hủy đăng ký. replay=True gửi ngay bản mới nhất.
+        """
+        self._subscribers.append(callback)
+        if replay and self.latest is not None:
+            self._deliver(callback, self.latest)
+
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def publish(self, estimate: LinkEstimate):
+        self.latest = estimate
+        for callback in list(self._subscribers):
+            self._deliver(callback, estimate)
+
+    @staticmethod
+    def _deliver(callback, estimate: LinkEstimate):
+        try:
+            callback(estimate)
+        except Exception as e:
+            logger.warning(f"Bên nhận ước lượng đường truyền lỗi: {e}")
+
+
+class LinkQualityProbe:
+    """
+    Thu thập số đo đường truyền, làm mượt và phát LinkEstimate lên bus.
+    """
+
+    _instance = None
+
+    def __init__(
+        self,
+        bus: Optional[LinkQualityBus] = None,
+        sample_interval: float = SAMPLE_INTERVAL,
+        wifi_interval: float = WIFI_INTERVAL,
+        wifi_reader: Optional[Callable[[], Optional[dict]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bus = bus or LinkQualityBus()
+        self.sample_interval = sample_interval
+        self.wifi_interval = wifi_interval
+        self._wifi_reader = wifi_reader or self._read_wifi
+        self._clock = clock
+        self._protocol = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_wifi_read: Optional[float] = None
+
+        # Giá trị đã làm mượt
+        self.srtt_ms: Optional[float] = None
+        self.rttvar_ms: Optional[float] = None
+        self.backlog_bytes = 0.0
+        self.loss_percent: Optional[float] = None
+        self.wifi_signal: Optional[float] = None
+        self.wifi_bitrate_mbps: Optional[float] = None
+
+        self.grade = "good"
+        self._pending_grade: Optional[str] = None
+        self._pending_count = 0
+        self.samples = 0
+        self.grade_changes = 0
+
+    @classmethod
+    def get_instance(cls) -> "LinkQualityProbe":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    # ----- Số đo -----
+    def record_rtt(self, rtt_seconds: float):
+        """
+        Ghi một mẫu RTT heartbeat (giây), làm mượt kiểu RFC 6298.
+        """
+        rtt_ms = rtt_seconds * 1000.0
+        if self.srtt_ms is None:
+            self.srtt_ms = rtt_ms
+            self.rttvar_ms = rtt_ms / 2.0
+        else:
+            self.rttvar_ms += (abs(self.srtt_ms - rtt_ms) - self.rttvar_ms) / 4.0
+            self.srtt_ms += (rtt_ms - self.srtt_ms) / 8.0
+
+    def record_backlog(self, backlog_bytes: float):
+        self.backlog_bytes += (max(0.0, backlog_bytes) - self.backlog_bytes) * 0.3
+
+    def record_loss(self, loss_percent: Optional[float]):
+        if loss_percent is None:
+            return
+        if self.loss_percent is None:
+            self.loss_percent = float(loss_percent)
+        else:
+            self.loss_percent += (loss_percent - self.loss_percent) * 0.3
+
+    def record_wifi(self, info: Optional[dict]):
+        if not info:
+            return
+        signal = info.get("signal")
+        if signal is not None:
+            if self.wifi_signal is None:
+                self.wifi_signal = float(signal)
+            else:
+                self.wifi_signal += (signal - self.wifi_signal) * 0.5
+        if info.get("bitrate_mbps") is not None:
+            self.wifi_bitrate_mbps = float(info["bitrate_mbps"])
+
+    # ----- Ước lượng -----
+    def estimate(self) -> LinkEstimate:
+        """
+        Tính điểm hiện tại (thành phần kém nhất quyết định) và áp dụng trễ đổi mức.
+        """
+        factors = [
+            _factor(self.srtt_ms, *RTT_RANGE_MS),
+            _factor(self.rttvar_ms, *JITTER_RANGE_MS),
+            _factor(self.backlog_bytes, *BACKLOG_RANGE_BYTES),
+            _factor(self.loss_percent, *LOSS_RANGE_PERCENT),
+            _factor(self.wifi_signal, *SIGNAL_RANGE),
+        ]
+        known = [f for f in factors if f is not None]
+        score = min(known) if known else 1.0
+        self._update_grade(grade_for(score))
+
+        def rounded(value):
+            return round(value, 1) if value is not None else None
+
+        return LinkEstimate(
+            score=round(score, 3),
+            grade=self.grade,
+            rtt_ms=rounded(self.srtt_ms),
+            rtt_jitter_ms=rounded(self.rttvar_ms),
+            backlog_bytes=round(self.backlog_bytes, 1),
+            loss_percent=rounded(self.loss_percent),
+            wifi_signal=rounded(self.wifi_signal),
+            wifi_bitrate_mbps=self.wifi_bitrate_mbps,
+            **GRADE_POLICY[self.grade],
+        )
+
+    def _update_grade(self, candidate: str):
+        if candidate == self.grade:
+            self._pending_grade = None
+            self._pending_count = 0
+            return
+        if candidate != self._pending_grade:
+            self._pending_grade = candidate
+            self._pending_count = 0
+        self._pending_count += 1
+        if self._pending_count >= GRADE_HOLD:
+            logger.info(f"📶 Chất lượng đường truyền: {self.grade} -> {candidate}")
+            self.grade = candidate
+            self.grade_changes += 1
+            self._pending_grade = None
+            self._pending_count = 0
+
+    # ----- Vòng lấy mẫu -----
+    def start(self, protocol):
+        """
+        Bắt đầu lấy mẫu định kỳ cho giao thức hiện tại (gọi lại khi đổi giao thức).
+        """
+        self._protocol = protocol
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sample_loop(), name="link-quality")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def sample(self) -> LinkEstimate:
+        """
+        Lấy một mẫu từ giao thức/WiFi rồi phát ước lượng.
+        """
+        protocol = self._protocol
+        if protocol is not None:
+            try:
+                self.record_backlog(protocol.get_send_backlog())
+            except Exception as e:
+                logger.debug(f"Không đọc được bộ đệm gửi: {e}")
+            stats_fn = getattr(protocol, "get_udp_stream_stats", None)
+            if stats_fn is not None:
+                try:
+                    stats = stats_fn()
+                    if stats and stats.get("received"):
+                        self.record_loss(stats.get("loss_percent"))
+                except Exception as e:
+                    logger.debug(f"Không đọc được thống kê UDP: {e}")
+
+        now = self._clock()
+        if self._last_wifi_read is None or now - self._last_wifi_read >= self.wifi_interval:
+            self._last_wifi_read = now
+            try:
+                if asyncio.iscoroutinefunction(self._wifi_reader):
+                    self.record_wifi(await self._wifi_reader())
+                else:
+                    loop = asyncio.get_running_loop()
+                    self.record_wifi(await loop.run_in_executor(None, self._wifi_reader))
+            except Exception as e:
+                logger.debug(f"Không đọc được thông tin WiFi: {e}")
+
+        self.samples += 1
+        estimate = self.estimate()
+        self.bus.publish(estimate)
+        return estimate
+
+    async def _sample_loop(self):
+        try:
+            while True:
+                await self.sample()
+                await asyncio.sleep(self.sample_interval)
+        except asyncio.CancelledError:
+            logger.debug("Tác vụ đo chất lượng đường truyền bị hủy")
+            raise
+        except Exception as e:
+            logger.error(f"Vòng đo chất lượng đường truyền ngoại lệ: {e}", exc_info=True)
+
+    @staticmethod
+    async def _read_wifi() -> Optional[dict]:
+        if shutil.which("nmcli") is None:
+            # Không có NetworkManager (máy dev, Ethernet thuần): bỏ qua thành phần WiFi
+            return None
+        try:
+            from src.network.wifi_manager import get_wifi_manager
+
+            return await get_wifi_manager().get_link_info_async()
+        except Exception:
+            return None
+
+    def stats(self) -> dict:
+        latest = self.bus.latest
+        return {
+            "samples": self.samples,
+            "grade_changes": self.grade_changes,
+            "estimate": latest.to_dict() if latest else None,
+        }
+
+
+def get_link_probe() -> LinkQualityProbe:
+    """Lấy instance LinkQualityProbe dùng chung"""
+    return LinkQualityProbe.get_instance()
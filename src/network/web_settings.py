@@ -18,6 +18,7 @@ from typing import Optional
 
 from aiohttp import web
 
+from src.utils.command_runner import get_command_runner
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
 from src.utils.resource_finder import get_project_root
@@ -371,6 +372,16 @@ DASHBOARD_HTML = """
                 </div>
                 <div id="updateStatus"></div>
             </div>
+
+            <div class="card">
+                <h2>🐢 Độ trễ vòng lặp</h2>
+                <div id="loopLagSummary" style="font-size: 13px;">Đang tải...</div>
+                <div id="loopLagCulprits" style="margin-top: 10px; font-size: 12px;"></div>
+                <div class="form-group" style="margin-top: 10px;">
+                    <button class="btn btn-primary" onclick="loadLoopLag()">↻ Làm mới</button>
+                    <button class="btn btn-danger" onclick="resetLoopLag()">🗑️ Xóa thống kê</button>
+                </div>
+            </div>
         </div>
 
         <!-- WIFI TAB -->
@@ -1213,11 +1224,52 @@ DASHBOARD_HTML = """
             }
         }
         
+        // ========== LOOP LAG ==========
+        function escapeHtml(text) {
+            const div = document.createElement('div');
+            div.textContent = text;
+            return div.innerHTML;
+        }
+
+        async function loadLoopLag() {
+            try {
+                const resp = await fetch('/api/loop_lag');
+                const data = await resp.json();
+                if (data.error) {
+                    document.getElementById('loopLagSummary').textContent = data.error;
+                    return;
+                }
+                const lag = data.lag_ms;
+                document.getElementById('loopLagSummary').innerHTML = `
+                    <div>${data.running ? '🟢 Đang theo dõi' : '⚪ Không chạy'} (ngưỡng ${data.threshold_ms} ms)</div>
+                    <div>Trễ: TB ${lag.avg} ms · p95 ${lag.p95} ms · p99 ${lag.p99} ms · max ${lag.max} ms</div>
+                    <div>Bị chặn: ${data.blocks} lần, tổng ${(data.blocked_ms / 1000).toFixed(1)} s</div>
+                `;
+                const rows = data.culprits.map(c => `
+                    <details style="margin-bottom: 6px;">
+                        <summary><b>${c.total_ms.toFixed(0)} ms</b> (${c.count} lần, max ${c.max_ms.toFixed(0)} ms) — ${escapeHtml(c.site)}
+                            <div style="opacity: 0.7;">↳ ${escapeHtml(c.calls.join(', '))}</div>
+                        </summary>
+                        <pre style="white-space: pre-wrap; font-size: 11px;">${escapeHtml((c.stack || []).join('\\n'))}</pre>
+                    </details>
+                `).join('');
+                document.getElementById('loopLagCulprits').innerHTML = rows || '✅ Chưa phát hiện lời gọi chặn vòng lặp';
+            } catch (e) {}
+        }
+
+        async function resetLoopLag() {
+            try {
+                await fetch('/api/loop_lag', {method: 'DELETE'});
+                loadLoopLag();
+            } catch (e) {}
+        }
+
         loadStatus();
         loadAudioDevices();
         loadWakeWord();
         loadWindowMode();
         loadSystem();
+        loadLoopLag();
         scanWifi();
         setInterval(loadStatus, 30000);
     </script>
@@ -1297,6 +1349,9 @@ class WebSettingsServer:
         # Health & Setup
         self.app.router.add_get('/api/health', self._handle_health)
         self.app.router.add_get('/api/metrics', self._handle_metrics)
+        self.app.router.add_get('/api/loop_lag', self._handle_loop_lag)
+        self.app.router.add_delete('/api/loop_lag', self._handle_loop_lag_reset)
+        self.app.router.add_get('/api/tasks', self._handle_tasks)
         self.app.router.add_get('/api/setup/status', self._handle_setup_status)
         self.app.router.add_post('/api/setup/complete', self._handle_setup_complete)
         self.app.router.add_get('/setup', self._handle_setup_wizard)
@@ -1346,22 +1401,18 @@ class WebSettingsServer:
             
             logger.info(f"Saving video path: {path}")
             
-            # Set mode to video
-            self.config.update_config("DISPLAY.BACKGROUND_MODE", "video")
+            # Một lần ghi config.json; GUI đăng ký VIDEO_BACKGROUND/DISPLAY nên tự nạp lại video
+            with self.config.transaction():
+                # Set mode to video
+                self.config.update_config("DISPLAY.BACKGROUND_MODE", "video")
+                self.config.update_config("VIDEO_BACKGROUND.ENABLED", bool(path))
+                self.config.update_config("VIDEO_BACKGROUND.SOURCE_TYPE", "file")
+                self.config.update_config("VIDEO_BACKGROUND.VIDEO_FILE_PATH", path)
+                self.config.update_config("VIDEO_BACKGROUND.YOUTUBE_URL", "")
             
-            result1 = self.config.update_config("VIDEO_BACKGROUND.ENABLED", bool(path))
-            result2 = self.config.update_config("VIDEO_BACKGROUND.SOURCE_TYPE", "file")
-            result3 = self.config.update_config("VIDEO_BACKGROUND.VIDEO_FILE_PATH", path)
-            result4 = self.config.update_config("VIDEO_BACKGROUND.YOUTUBE_URL", "")
-            
-            logger.info(f"Save results: ENABLED={result1}, SOURCE_TYPE={result2}, PATH={result3}, YOUTUBE={result4}")
-            
-            if not all([result1, result2, result3, result4]):
+            if not self.config.flush():
                 return web.json_response({"success": False, "message": "Lỗi ghi config file!"})
             
-            # Reload video trong app
-            self._reload_video()
-            
             return web.json_response({"success": True, "message": "Đã lưu và áp dụng!"})
         except Exception as e:
             logger.error(f"Save video failed: {e}", exc_info=True)
@@ -1482,12 +1533,11 @@ class WebSettingsServer:
                 else:
                     clean_images.append(img)
 
-            self.config.update_config("DISPLAY.BACKGROUND_MODE", "slide")
-            self.config.update_config("DISPLAY.SLIDE_INTERVAL", interval)
-            self.config.update_config("DISPLAY.SLIDE_IMAGES", clean_images)
-            
-            self._reload_video()
-            
+            with self.config.transaction():
+                self.config.update_config("DISPLAY.BACKGROUND_MODE", "slide")
+                self.config.update_config("DISPLAY.SLIDE_INTERVAL", interval)
+                self.config.update_config("DISPLAY.SLIDE_IMAGES", clean_images)
+
             return web.json_response({"success": True, "message": "Đã lưu cài đặt Slideshow"})
         except Exception as e:
             return web.json_response({"success": False, "message": str(e)})
@@ -1544,13 +1594,12 @@ class WebSettingsServer:
             data = await request.json()
             url = data.get("url", "")
             
-            self.config.update_config("VIDEO_BACKGROUND.ENABLED", bool(url))
-            self.config.update_config("VIDEO_BACKGROUND.SOURCE_TYPE", "youtube")
-            self.config.update_config("VIDEO_BACKGROUND.YOUTUBE_URL", url)
-            self.config.update_config("VIDEO_BACKGROUND.VIDEO_FILE_PATH", "")
-            
-            self._reload_video()
-            
+            with self.config.transaction():
+                self.config.update_config("VIDEO_BACKGROUND.ENABLED", bool(url))
+                self.config.update_config("VIDEO_BACKGROUND.SOURCE_TYPE", "youtube")
+                self.config.update_config("VIDEO_BACKGROUND.YOUTUBE_URL", url)
+                self.config.update_config("VIDEO_BACKGROUND.VIDEO_FILE_PATH", "")
+
             return web.json_response({"success": True, "message": "Đã lưu YouTube URL!"})
         except Exception as e:
             return web.json_response({"success": False, "message": str(e)})
@@ -1590,8 +1639,9 @@ class WebSettingsServer:
             mode = data.get("mode", "screen_100")
             
             # Lưu vào SYSTEM_OPTIONS.WINDOW_SIZE_MODE (đúng với gui_display.py)
-            result = self.config.update_config("SYSTEM_OPTIONS.WINDOW_SIZE_MODE", mode)
-            
+            self.config.update_config("SYSTEM_OPTIONS.WINDOW_SIZE_MODE", mode)
+            result = self.config.flush()
+
             if result:
                 return web.json_response({"success": True, "message": "Đã lưu! Restart app để áp dụng."})
             else:
@@ -1672,67 +1722,73 @@ class WebSettingsServer:
             speaker_angle = float(data.get("speakerAngle", 180.0))
             hdmi_audio = data.get("hdmiAudio", False)
             
-            self.config.update_config("AUDIO.INPUT_DEVICE_INDEX", mic_device)
-            self.config.update_config("AUDIO.OUTPUT_DEVICE_INDEX", speaker_device)
-            self.config.update_config("AUDIO.MIC_VOLUME", mic_volume)
-            self.config.update_config("AUDIO.SPEAKER_VOLUME", speaker_volume)
-            
-            # I2S & Beamforming & HDMI settings trong AUDIO_DEVICES
-            audio_devices = self.config.get_config("AUDIO_DEVICES", {}) or {}
-            audio_devices["i2s_enabled"] = i2s_enabled
-            audio_devices["i2s_stereo"] = i2s_stereo
-            audio_devices["beamforming_enabled"] = beamforming_enabled
-            audio_devices["mic_distance"] = mic_distance
-            audio_devices["speaker_angle"] = speaker_angle
-            audio_devices["hdmi_audio"] = hdmi_audio
-            
-            import sounddevice as sd
-            devices = sd.query_devices()
-            
-            # Khi I2S enabled, tìm và set input device là I2S mic
-            if i2s_enabled:
-                i2s_keywords = ["googlevoicehat", "simple-card", "i2s", "inmp441", "snd_rpi"]
-                for i, d in enumerate(devices):
-                    if d['max_input_channels'] > 0:
-                        name_lower = d['name'].lower()
-                        if any(kw in name_lower for kw in i2s_keywords):
-                            audio_devices["input_device_id"] = i
-                            audio_devices["input_device_name"] = d['name']
-                            logger.info(f"🎤 I2S MIC device set: [{i}] {d['name']}")
-                            break
-            
-            # Khi HDMI enabled, tìm và set output device là HDMI
-            if hdmi_audio:
-                for i, d in enumerate(devices):
-                    if d['max_output_channels'] > 0:
-                        name_lower = d['name'].lower()
-                        if 'hdmi' in name_lower or 'vc4hdmi' in name_lower:
-                            audio_devices["output_device_id"] = i
-                            audio_devices["output_device_name"] = d['name']
-                            logger.info(f"🔊 HDMI device set: [{i}] {d['name']}")
-                            break
-            
-            self.config.update_config("AUDIO_DEVICES", audio_devices)
-            
-            # Áp dụng volume ngay bằng amixer
-            try:
-                subprocess.run(["amixer", "set", "Capture", f"{mic_volume}%"], capture_output=True, timeout=5)
-                subprocess.run(["amixer", "set", "Master", f"{speaker_volume}%"], capture_output=True, timeout=5)
-            except Exception:
-                pass
+            # Một transaction: một lần ghi config.json cho cả AUDIO.* và AUDIO_DEVICES
+            with self.config.transaction():
+                self.config.update_config("AUDIO.INPUT_DEVICE_INDEX", mic_device)
+                self.config.update_config("AUDIO.OUTPUT_DEVICE_INDEX", speaker_device)
+                previous_mic_volume = self.config.get_config("AUDIO.MIC_VOLUME", 100)
+                self.config.update_config("AUDIO.MIC_VOLUME", mic_volume)
+                self.config.update_config("AUDIO.SPEAKER_VOLUME", speaker_volume)
+            
+                # I2S & Beamforming & HDMI settings trong AUDIO_DEVICES
+                audio_devices = self.config.get_config("AUDIO_DEVICES", {}) or {}
+                audio_devices["i2s_enabled"] = i2s_enabled
+                audio_devices["i2s_stereo"] = i2s_stereo
+                audio_devices["beamforming_enabled"] = beamforming_enabled
+                audio_devices["mic_distance"] = mic_distance
+                audio_devices["speaker_angle"] = speaker_angle
+                audio_devices["hdmi_audio"] = hdmi_audio
             
-            # Apply HDMI audio output setting
-            try:
+                import sounddevice as sd
+                devices = sd.query_devices()
+            
+                # Khi I2S enabled, tìm và set input device là I2S mic
+                if i2s_enabled:
+                    i2s_keywords = ["googlevoicehat", "simple-card", "i2s", "inmp441", "snd_rpi"]
+                    for i, d in enumerate(devices):
+                        if d['max_input_channels'] > 0:
+                            name_lower = d['name'].lower()
+                            if any(kw in name_lower for kw in i2s_keywords):
+                                audio_devices["input_device_id"] = i
+                                audio_devices["input_device_name"] = d['name']
+                                logger.info(f"🎤 I2S MIC device set: [{i}] {d['name']}")
+                                break
+            
+                # Khi HDMI enabled, tìm và set output device là HDMI
                 if hdmi_audio:
-                    # Set HDMI as default output
-                    subprocess.run(["amixer", "-c", "vc4hdmi0", "set", "PCM", f"{speaker_volume}%"], capture_output=True, timeout=5)
-                    logger.info("HDMI audio enabled")
-                else:
-                    # Use headphone jack
-                    subprocess.run(["amixer", "set", "Headphone", f"{speaker_volume}%"], capture_output=True, timeout=5)
-                    logger.info("Headphone jack audio enabled")
+                    for i, d in enumerate(devices):
+                        if d['max_output_channels'] > 0:
+                            name_lower = d['name'].lower()
+                            if 'hdmi' in name_lower or 'vc4hdmi' in name_lower:
+                                audio_devices["output_device_id"] = i
+                                audio_devices["output_device_name"] = d['name']
+                                logger.info(f"🔊 HDMI device set: [{i}] {d['name']}")
+                                break
+            
+                self.config.update_config("AUDIO_DEVICES", audio_devices)
+            
+            # Âm lượng loa: gain phần mềm trong AudioCodec (không gọi amixer mỗi lần đổi),
+            # cùng đường với device_agent và MCP set_volume
+            from src.application import Application
+            app = Application._instance
+            codec = getattr(app, "audio_codec", None) if app else None
+            applied = app.set_volume(speaker_volume, persist=False) if app else None
+            try:
+                if applied is None:
+                    # Không có AudioCodec (ví dụ --no-audio): dùng mixer hệ thống
+                    await get_command_runner().run(
+                        ["amixer", "set", "Master", f"{speaker_volume}%"], timeout=3
+                    )
+                # Capture chỉ đặt lại khi giá trị thay đổi
+                if mic_volume != previous_mic_volume:
+                    if codec is not None:
+                        await asyncio.to_thread(codec.set_capture_volume, mic_volume)
+                    else:
+                        await get_command_runner().run(
+                            ["amixer", "set", "Capture", f"{mic_volume}%"], timeout=3
+                        )
             except Exception as e:
-                logger.warning(f"HDMI audio switch failed: {e}")
+                logger.warning(f"Đặt âm lượng qua amixer thất bại: {e}")
             
             msg = "Đã lưu cài đặt âm thanh!"
             if i2s_enabled:
@@ -1777,57 +1833,39 @@ class WebSettingsServer:
                     "message": "Audio chưa khởi tạo. Config đã lưu - vui lòng restart app để áp dụng."
                 })
             
-            # Stop current streams (nếu có method)
-            logger.info("Stopping audio streams for restart...")
-            try:
-                if hasattr(codec, "stop_streams"):
-                    await codec.stop_streams()
-                elif hasattr(codec, "close"):
-                    await codec.close()
-            except Exception as e:
-                logger.warning(f"Stop streams warning: {e}")
-            
             # Reload config
             self.config.reload_config()
             
-            # Reinitialize codec với config mới
-            logger.info("Reinitializing audio codec...")
-            
             # Check I2S & Beamforming settings
             audio_devices = self.config.get_config("AUDIO_DEVICES", {}) or {}
             i2s_enabled = audio_devices.get("i2s_enabled", False)
             i2s_stereo = audio_devices.get("i2s_stereo", False)
             beamforming_enabled = audio_devices.get("beamforming_enabled", False)
             mic_distance = audio_devices.get("mic_distance", 8.0)
-            speaker_angle = audio_devices.get("speaker_angle", 180.0)
-            
-            # Update beamforming processor if exists
-            if hasattr(codec, "beamforming") and codec.beamforming:
-                codec.beamforming.set_mic_distance(mic_distance)
-                codec.beamforming.enable(beamforming_enabled)
-                logger.info(f"Beamforming updated: enabled={beamforming_enabled}, distance={mic_distance}cm")
-            elif beamforming_enabled and i2s_stereo:
-                # Create new beamforming processor
-                from src.audio_codecs.beamforming import BeamformingProcessor
-                codec.beamforming = BeamformingProcessor(
-                    mic_distance=mic_distance / 100.0,
-                    sample_rate=16000
-                )
-                codec.beamforming.enable(True)
-                logger.info(f"Beamforming created: distance={mic_distance}cm")
             
-            # Restart streams
-            logger.info("Starting audio streams...")
-            await codec.start_streams()
+            # Đổi luồng nóng: mở thiết bị mới song song, wake word không bị ngắt
+            logger.info("Applying audio config (hot swap)...")
+            switched = await codec.apply_audio_config()
             
             msg = "Audio System đã khởi động lại!"
             if i2s_enabled:
                 msg += f" | I2S: {'Stereo' if i2s_stereo else 'Mono'}"
             if beamforming_enabled:
                 msg += f" | Beamforming: ON ({mic_distance}cm)"
+            for kind, label in (("input", "Mic"), ("output", "Loa")):
+                record = switched.get(kind)
+                if record:
+                    msg += f" | {label} → [{record['device_id']}]"
+            if switched.get("restart_required"):
+                msg += " | Đổi HDMI/Jack: cần khởi động lại ứng dụng để áp dụng"
             
             logger.info(msg)
-            return web.json_response({"success": True, "message": msg})
+            return web.json_response({
+                "success": True,
+                "message": msg,
+                "switched": switched,
+                "switches": codec.get_switch_stats(),
+            })
             
         except Exception as e:
             logger.error(f"Audio restart failed: {e}", exc_info=True)
@@ -1855,8 +1893,21 @@ class WebSettingsServer:
             enabled = data.get("enabled", False)
             threshold = float(data.get("sensitivity", 0.25))
             
-            self.config.update_config("WAKE_WORD_OPTIONS.USE_WAKE_WORD", enabled)
-            self.config.update_config("WAKE_WORD_OPTIONS.KEYWORDS_THRESHOLD", threshold)
+            with self.config.transaction():
+                self.config.update_config("WAKE_WORD_OPTIONS.USE_WAKE_WORD", enabled)
+                self.config.update_config("WAKE_WORD_OPTIONS.KEYWORDS_THRESHOLD", threshold)
+
+            # Detector đang chạy: chỉ biên dịch lại đồ thị từ khóa, mô hình giữ nguyên trong registry
+            if enabled:
+                from src.application import Application
+                app = Application._instance
+                plugin = app.plugins.get_plugin("wake_word") if app else None
+                if plugin and await plugin.reload_keywords():
+                    compile_ms = plugin.detector.keyword_compile_ms or 0
+                    return web.json_response({
+                        "success": True,
+                        "message": f"Đã lưu và áp dụng ({compile_ms:.0f} ms).",
+                    })
             
             return web.json_response({"success": True, "message": "Đã lưu! Restart app để áp dụng."})
         except Exception as e:
@@ -1869,12 +1920,10 @@ class WebSettingsServer:
             # Lấy mạng hiện tại
             current_ssid = None
             current_ip = self._get_ip()
-            
+            runner = get_command_runner()
+
             try:
-                result = subprocess.run(
-                    ["iwgetid", "-r"],
-                    capture_output=True, text=True, timeout=5
-                )
+                result = await runner.run(["iwgetid", "-r"], timeout=5, cache_ttl=2)
                 if result.returncode == 0 and result.stdout.strip():
                     current_ssid = result.stdout.strip()
             except Exception:
@@ -1883,9 +1932,8 @@ class WebSettingsServer:
             # Lấy danh sách mạng đã lưu (saved connections)
             saved_ssids = set()
             try:
-                result = subprocess.run(
-                    ["nmcli", "-t", "-f", "NAME,TYPE", "connection", "show"],
-                    capture_output=True, text=True, timeout=5
+                result = await runner.run(
+                    ["nmcli", "-t", "-f", "NAME,TYPE", "connection", "show"], timeout=5, cache_ttl=2
                 )
                 if result.returncode == 0:
                     for line in result.stdout.strip().split('\n'):
@@ -1898,13 +1946,13 @@ class WebSettingsServer:
             # Quét mạng khả dụng dùng nmcli (tốt hơn iwlist và có security info)
             networks = []
             try:
-                # Rescan trước
-                subprocess.run(["sudo", "nmcli", "device", "wifi", "rescan"], timeout=5)
+                # Rescan trước (nhiều tab quét cùng lúc dùng chung một lần rescan)
+                await runner.run(["sudo", "nmcli", "device", "wifi", "rescan"], timeout=5)
                 await asyncio.sleep(1) # Chờ 1 chút
-                
-                result = subprocess.run(
+
+                result = await runner.run(
                     ["sudo", "nmcli", "-t", "-f", "SSID,SIGNAL,SECURITY,IN-USE", "device", "wifi", "list"],
-                    capture_output=True, text=True, timeout=15
+                    timeout=15,
                 )
                 
                 if result.returncode == 0:
@@ -1991,8 +2039,13 @@ class WebSettingsServer:
                 cmd = ["sudo", "nmcli", "device", "wifi", "connect", ssid]
             
             # Tăng timeout lên 60s để an toàn
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
+            runner = get_command_runner()
+            try:
+                result = await runner.run(cmd, timeout=60)
+            finally:
+                # Kết quả truy vấn nmcli đã cache không còn đúng
+                runner.invalidate("nmcli")
+
             if result.returncode == 0:
                 logger.info(f"Connected to WiFi: {ssid}")
                 return web.json_response({"success": True, "message": f"✅ Đã kết nối {ssid}!"})
@@ -2081,18 +2134,21 @@ class WebSettingsServer:
         """Lưu cài đặt hệ thống."""
         try:
             data = await request.json()
-            self.config.update_config("SYSTEM_OPTIONS.LANGUAGE", data.get("language", "vi-VN"))
-            
-            # OTA URL
-            if data.get("otaUrl"):
-                self.config.update_config("SYSTEM_OPTIONS.NETWORK.OTA_VERSION_URL", data.get("otaUrl"))
-            
-            # WebSocket (Cloud Management URL)
-            if data.get("wsUrl"):
-                self.config.update_config("SYSTEM_OPTIONS.NETWORK.CLOUD_MANAGEMENT_URL", data.get("wsUrl"))
-            if data.get("wsToken"):
-                self.config.update_config("SYSTEM_OPTIONS.NETWORK.WEBSOCKET_ACCESS_TOKEN", data.get("wsToken"))
+            with self.config.transaction():
+                self.config.update_config("SYSTEM_OPTIONS.LANGUAGE", data.get("language", "vi-VN"))
+                
+                # OTA URL
+                if data.get("otaUrl"):
+                    self.config.update_config("SYSTEM_OPTIONS.NETWORK.OTA_VERSION_URL", data.get("otaUrl"))
+                
+                # WebSocket (Cloud Management URL)
+                if data.get("wsUrl"):
+                    self.config.update_config("SYSTEM_OPTIONS.NETWORK.CLOUD_MANAGEMENT_URL", data.get("wsUrl"))
+                if data.get("wsToken"):
+                    self.config.update_config("SYSTEM_OPTIONS.NETWORK.WEBSOCKET_ACCESS_TOKEN", data.get("wsToken"))
             
+            if not self.config.flush():
+                return web.json_response({"success": False, "message": "Lỗi ghi config!"})
             return web.json_response({"success": True, "message": "Đã lưu! Restart app để áp dụng."})
         except Exception as e:
             return web.json_response({"success": False, "message": str(e)})
@@ -2102,26 +2158,19 @@ class WebSettingsServer:
         try:
             project_root = str(get_project_root())
             
+            runner = get_command_runner()
+
             # Fetch trước để check có update không
-            fetch_result = subprocess.run(
-                ["git", "-C", project_root, "fetch", "origin"],
-                capture_output=True, text=True, timeout=30
-            )
-            
+            fetch_result = await runner.run(["git", "-C", project_root, "fetch", "origin"], timeout=30)
+
             # Check xem có commits mới không
-            status_result = subprocess.run(
-                ["git", "-C", project_root, "status", "-uno"],
-                capture_output=True, text=True, timeout=10
-            )
+            status_result = await runner.run(["git", "-C", project_root, "status", "-uno"], timeout=10)
             
             if "Your branch is up to date" in status_result.stdout:
                 return web.json_response({"success": True, "message": "✅ Đã là phiên bản mới nhất!"})
             
             # Có update -> pull
-            pull_result = subprocess.run(
-                ["git", "-C", project_root, "pull", "--ff-only"],
-                capture_output=True, text=True, timeout=60
-            )
+            pull_result = await runner.run(["git", "-C", project_root, "pull", "--ff-only"], timeout=60)
             
             if pull_result.returncode == 0:
                 # Đếm số files thay đổi
@@ -2151,6 +2200,8 @@ class WebSettingsServer:
     
     async def _handle_reboot(self, request):
         """Reboot Pi."""
+        # Tiến trình bị SIGTERM (không chạy atexit): ghi nốt cấu hình đang chờ ghi trễ
+        self.config.flush()
         subprocess.Popen(["sudo", "reboot"])
         return web.json_response({"success": True, "message": "Đang reboot..."})
     
@@ -2162,7 +2213,8 @@ class WebSettingsServer:
             if not os.path.isdir(app_home):
                 app_home = os.path.expanduser("~/.xiaozhi")
             
-            # Backup config
+            # Backup config (ghi nốt thay đổi đang chờ ghi trễ trước khi sao lưu)
+            self.config.flush()
             config_backup = "/tmp/smartc_config_backup"
             os.makedirs(config_backup, exist_ok=True)
             
@@ -2173,21 +2225,10 @@ class WebSettingsServer:
                 logger.info("Config backed up")
             
             # Git pull
-            result = subprocess.run(
-                ["git", "fetch", "origin", "main"],
-                cwd=app_home,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            result = subprocess.run(
-                ["git", "reset", "--hard", "origin/main"],
-                cwd=app_home,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            runner = get_command_runner()
+            result = await runner.run(["git", "fetch", "origin", "main"], cwd=app_home, timeout=30)
+
+            result = await runner.run(["git", "reset", "--hard", "origin/main"], cwd=app_home, timeout=30)
             
             if result.returncode != 0:
                 return web.json_response({
@@ -2222,28 +2263,10 @@ class WebSettingsServer:
     async def _do_restart(self):
         """Thực hiện restart."""
         await asyncio.sleep(1)
+        # execv bỏ qua atexit: ghi nốt cấu hình đang chờ ghi trễ
+        self.config.flush()
         os.execv("/usr/bin/python3", ["python3", "main.py", "--mode", "gui"])
     
-    def _reload_video(self):
-        """Reload video trong GUI."""
-        try:
-            from src.application import Application
-            app = Application._instance  # Dùng _instance trực tiếp thay vì get_instance()
-            
-            logger.info(f"Application._instance = {app}")
-            if app:
-                logger.info(f"app.display = {getattr(app, 'display', 'NOT FOUND')}")
-            
-            if app and hasattr(app, 'display') and app.display:
-                logger.info("Calling reload_video_from_config...")
-                app.display.reload_video_from_config()
-                logger.info("Video reload completed")
-            else:
-                logger.warning("Application or display not available for video reload")
-                logger.info("Video sẽ được áp dụng sau khi restart app")
-        except Exception as e:
-            logger.error(f"Reload video failed: {e}", exc_info=True)
-    
     def _apply_rotation(self, rotation: str):
         """Apply xrandr rotation."""
         env = os.environ.copy()
@@ -2440,87 +2463,33 @@ class WebSettingsServer:
     async def _handle_test_speaker(self, request):
         """Test speaker - phát âm thanh beep."""
         try:
-            import numpy as np
-            import wave
-            import tempfile
-            import os
-            
             # Lấy output device từ config
             audio_config = self.config.get_config("AUDIO_DEVICES", {}) or {}
             hdmi_audio = audio_config.get("hdmi_audio", False)
             
             logger.info(f"Test Speaker: HDMI={hdmi_audio}")
             
-            # Tạo beep tone
-            sample_rate = 44100
-            duration = 0.3
-            frequency = 880  # A5 note - higher pitch, easier to hear
-            
-            t = np.linspace(0, duration, int(sample_rate * duration), False)
-            beep = np.sin(2 * np.pi * frequency * t) * 20000
-            fade_samples = int(sample_rate * 0.02)
-            beep[:fade_samples] *= np.linspace(0, 1, fade_samples)
-            beep[-fade_samples:] *= np.linspace(1, 0, fade_samples)
-            beep = beep.astype(np.int16)
-            
-            # Tạo 3 beeps với khoảng cách
-            silence = np.zeros(int(sample_rate * 0.15), dtype=np.int16)
-            full_audio = np.concatenate([beep, silence, beep, silence, beep])
-            
-            # Lưu thành WAV file
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-                temp_wav = f.name
-            
-            with wave.open(temp_wav, 'w') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)  # 16-bit
-                wav_file.setframerate(sample_rate)
-                wav_file.writeframes(full_audio.tobytes())
-            
-            if hdmi_audio:
-                # Dùng aplay với HDMI device
-                device_name = "HDMI (vc4hdmi)"
-                # Thử các HDMI device names phổ biến trên Pi
-                hdmi_devices = ['vc4hdmi0', 'vc4hdmi1', 'vc4hdmi', 'hdmi']
-                played = False
-                
-                for hdmi_dev in hdmi_devices:
-                    cmd = f'aplay -D plughw:CARD={hdmi_dev} {temp_wav} 2>&1'
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10)
-                    if result.returncode == 0:
-                        device_name = f"HDMI ({hdmi_dev})"
-                        played = True
-                        logger.info(f"Played via: {cmd}")
-                        break
-                    else:
-                        logger.debug(f"Failed {hdmi_dev}: {result.stderr}")
-                
-                if not played:
-                    # Fallback: aplay với default
-                    cmd = f'aplay {temp_wav} 2>&1'
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10)
-                    if result.returncode == 0:
-                        device_name = "Default (ALSA)"
-                        played = True
-                
-                if not played:
-                    os.unlink(temp_wav)
+            # Ưu tiên phát qua AudioCodec đang chạy: earcon đã giải mã sẵn, không tranh chấp thiết bị
+            from src.application import Application
+            app = Application._instance
+            if app and app.play_earcon("test"):
+                device_name = "HDMI" if hdmi_audio else "Loa"
+                if audio_config.get("jack_audio", False):
+                    device_name += " + Jack 3.5mm"
+            else:
+                # Chưa có audio codec: phát trực tiếp qua aplay stdin / sounddevice
+                from src.audio_codecs.earcons import play_earcon_standalone
+                try:
+                    played_on = await play_earcon_standalone(
+                        "test",
+                        hdmi_cards=['vc4hdmi0', 'vc4hdmi1', 'vc4hdmi', 'hdmi'] if hdmi_audio else None,
+                    )
+                except RuntimeError:
                     return web.json_response({
                         "success": False,
                         "message": "❌ Không thể phát qua HDMI. Kiểm tra kết nối và volume TV."
                     })
-            else:
-                # Dùng sounddevice cho headphone jack
-                import sounddevice as sd
-                device_name = "Headphone (3.5mm)"
-                sd.play(full_audio, sample_rate)
-                sd.wait()
-            
-            # Cleanup
-            try:
-                os.unlink(temp_wav)
-            except:
-                pass
+                device_name = f"HDMI ({played_on})" if hdmi_audio else "Headphone (3.5mm)"
             
             return web.json_response({
                 "success": True, 
@@ -2704,8 +2673,8 @@ class WebSettingsServer:
             ip = get_current_ip() if connected else None
             
             wifi = get_wifi_manager()
-            hotspot_active = wifi.is_hotspot_active() if wifi else False
-            current_ssid = wifi.get_current_ssid() if wifi else None
+            hotspot_active = await wifi.is_hotspot_active_async() if wifi else False
+            current_ssid = await wifi.get_current_ssid_async() if wifi else None
             
             health["checks"]["network"] = {
                 "status": "ok" if connected else ("warning" if hotspot_active else "error"),
@@ -2722,7 +2691,7 @@ class WebSettingsServer:
             from src.application import Application
             app = Application._instance
             if app and hasattr(app, 'plugins'):
-                wakeword_plugin = app.plugins.get_plugin("wakeword")
+                wakeword_plugin = app.plugins.get_plugin("wake_word")
                 if wakeword_plugin:
                     enabled = getattr(wakeword_plugin, 'enabled', False)
                     listening = getattr(wakeword_plugin, 'is_listening', lambda: False)()
@@ -2785,6 +2754,35 @@ class WebSettingsServer:
         except:
             return "Unknown"
     
+    async def _handle_loop_lag(self, request):
+        """Báo cáo độ trễ vòng lặp và các vị trí gây chặn."""
+        try:
+            from src.utils.loop_monitor import get_loop_monitor
+            top = int(request.query.get("top", 10))
+            return web.json_response(get_loop_monitor().report(top=top))
+        except Exception as e:
+            return web.json_response({"error": str(e)})
+
+    async def _handle_loop_lag_reset(self, request):
+        """Xóa thống kê độ trễ vòng lặp (ví dụ sau khi sửa một lời gọi chặn)."""
+        try:
+            from src.utils.loop_monitor import get_loop_monitor
+            get_loop_monitor().reset()
+            return web.json_response({"success": True})
+        except Exception as e:
+            return web.json_response({"success": False, "message": str(e)})
+
+    async def _handle_tasks(self, request):
+        """Thống kê nhiệm vụ của Application.spawn (theo tên, nhóm, quá hạn, rò rỉ)."""
+        try:
+            from src.application import Application
+            app = Application._instance
+            if app is None:
+                return web.json_response({"error": "Application chưa chạy"})
+            return web.json_response(app.task_supervisor.stats())
+        except Exception as e:
+            return web.json_response({"error": str(e)})
+
     async def _handle_metrics(self, request):
         """
         System metrics endpoint (Prometheus-style format).
@@ -2867,7 +2865,442 @@ class WebSettingsServer:
                 metrics.append(f"smartc_websocket_connected {ws_connected}")
             except Exception:
                 pass
-            
+
+            # Audio probe cache
+            try:
+                from src.application import Application
+                app = Application._instance
+                codec = getattr(app, "audio_codec", None) if app else None
+                if codec:
+                    probe = codec.get_probe_stats()
+                    metrics.append(f"# HELP smartc_audio_probe_cache_hit Audio device probe served from cache")
+                    metrics.append(f"# TYPE smartc_audio_probe_cache_hit gauge")
+                    metrics.append(f"smartc_audio_probe_cache_hit {1 if probe['hit'] else 0}")
+                    if probe["probe_ms"] is not None:
+                        metrics.append(f"smartc_audio_probe_ms {probe['probe_ms']}")
+                    if probe["saved_ms"] is not None:
+                        metrics.append(f"# HELP smartc_audio_probe_saved_ms Startup time saved by the probe cache")
+                        metrics.append(f"# TYPE smartc_audio_probe_saved_ms gauge")
+                        metrics.append(f"smartc_audio_probe_saved_ms {probe['saved_ms']}")
+                    switch_stats = codec.get_switch_stats()
+                    metrics.append(f"# HELP smartc_audio_stream_switches_total Hot stream switches since start")
+                    metrics.append(f"# TYPE smartc_audio_stream_switches_total counter")
+                    metrics.append(f"smartc_audio_stream_switches_total {switch_stats['total']}")
+                    history = switch_stats["history"]
+                    if history and history[-1].get("gap_ms") is not None:
+                        last = history[-1]
+                        metrics.append(f"# HELP smartc_audio_stream_switch_gap_ms Frame gap of the last stream switch")
+                        metrics.append(f"# TYPE smartc_audio_stream_switch_gap_ms gauge")
+                        metrics.append(f"smartc_audio_stream_switch_gap_ms{{kind=\"{last['kind']}\"}} {last['gap_ms']}")
+                    gain_stats = codec.get_output_gain_stats()
+                    metrics.append(f"# HELP smartc_audio_output_volume Software output volume (0-100)")
+                    metrics.append(f"# TYPE smartc_audio_output_volume gauge")
+                    metrics.append(f"smartc_audio_output_volume {gain_stats['volume']}")
+                    metrics.append(f"# HELP smartc_audio_limited_samples_total Samples compressed by the output soft limiter")
+                    metrics.append(f"# TYPE smartc_audio_limited_samples_total counter")
+                    metrics.append(f"smartc_audio_limited_samples_total {gain_stats['limited_samples']}")
+                    music = codec.get_music_stats()
+                    metrics.append(f"# HELP smartc_music_playing Music bus is playing through the output mixer")
+                    metrics.append(f"# TYPE smartc_music_playing gauge")
+                    metrics.append(f"smartc_music_playing {1 if music['playing'] else 0}")
+                    metrics.append(f"# HELP smartc_music_underruns_total Music bus blocks short of decoded PCM")
+                    metrics.append(f"# TYPE smartc_music_underruns_total counter")
+                    metrics.append(f"smartc_music_underruns_total {music['underruns']}")
+                    metrics.append(f"# HELP smartc_audio_concealed_frames_total TTS frames concealed by Opus PLC after UDP loss")
+                    metrics.append(f"# TYPE smartc_audio_concealed_frames_total counter")
+                    metrics.append(f"smartc_audio_concealed_frames_total {codec.get_concealed_frames()}")
+                    earcon = codec.get_earcon_stats()
+                    earcon_rows = [
+                        ("sounddevice", earcon["last_device_latency_ms"]),
+                        ("aplay", earcon["aplay_last_device_latency_ms"]),
+                    ]
+                    if any(v is not None for _, v in earcon_rows):
+                        metrics.append(f"# HELP smartc_earcon_latency_ms Last earcon latency from request to speaker")
+                        metrics.append(f"# TYPE smartc_earcon_latency_ms gauge")
+                        for path, value in earcon_rows:
+                            if value is not None:
+                                metrics.append(f"smartc_earcon_latency_ms{{path=\"{path}\"}} {value:.1f}")
+            except Exception:
+                pass
+
+            # Warm protocol session (channel-open latency)
+            try:
+                from src.application import Application
+                app = Application._instance
+                warm = app.get_warm_session_stats() if app else None
+                if warm:
+                    metrics.append(f"# HELP smartc_channel_opens_total Audio channel open requests by path (warm = no handshake)")
+                    metrics.append(f"# TYPE smartc_channel_opens_total counter")
+                    metrics.append(f"smartc_channel_opens_total{{path=\"warm\"}} {warm['warm_opens']}")
+                    metrics.append(f"smartc_channel_opens_total{{path=\"cold\"}} {warm['cold_opens']}")
+                    if warm["last_open_ms"] is not None:
+                        metrics.append(f"# HELP smartc_channel_open_ms Latency of the last audio channel open request")
+                        metrics.append(f"# TYPE smartc_channel_open_ms gauge")
+                        metrics.append(f"smartc_channel_open_ms {warm['last_open_ms']}")
+                    metrics.append(f"# HELP smartc_channel_background_reconnects_total Sessions re-warmed in the background")
+                    metrics.append(f"# TYPE smartc_channel_background_reconnects_total counter")
+                    metrics.append(f"smartc_channel_background_reconnects_total {warm['background_reconnects']}")
+                    if warm["rtt_ms"] is not None:
+                        metrics.append(f"# HELP smartc_protocol_rtt_ms Idle heartbeat round-trip time")
+                        metrics.append(f"# TYPE smartc_protocol_rtt_ms gauge")
+                        metrics.append(f"smartc_protocol_rtt_ms {warm['rtt_ms']}")
+            except Exception:
+                pass
+
+            # Outbound message queue (replay across reconnects)
+            try:
+                from src.application import Application
+                app = Application._instance
+                protocol = getattr(app, "protocol", None) if app else None
+                outbound = protocol.get_outbound_stats() if protocol else None
+                if outbound:
+                    metrics.append(f"# HELP smartc_outbound_queue_depth Messages held while the protocol is disconnected")
+                    metrics.append(f"# TYPE smartc_outbound_queue_depth gauge")
+                    metrics.append(f"smartc_outbound_queue_depth {outbound['depth']}")
+                    metrics.append(f"# HELP smartc_outbound_messages_total Held messages by outcome")
+                    metrics.append(f"# TYPE smartc_outbound_messages_total counter")
+                    for outcome in ("queued", "replayed", "expired", "evicted", "coalesced"):
+                        metrics.append(f"smartc_outbound_messages_total{{outcome=\"{outcome}\"}} {outbound[outcome]}")
+                    metrics.append(f"# HELP smartc_outbound_audio_dropped_total Audio frames dropped while disconnected (never replayed)")
+                    metrics.append(f"# TYPE smartc_outbound_audio_dropped_total counter")
+                    metrics.append(f"smartc_outbound_audio_dropped_total {outbound['audio_dropped']}")
+            except Exception:
+                pass
+
+            # JSON backend used by the protocol/MCP/IoT path
+            try:
+                from src.utils import json_codec
+                metrics.append(f"# HELP smartc_json_backend_info JSON codec backend (orjson or stdlib json)")
+                metrics.append(f"# TYPE smartc_json_backend_info gauge")
+                metrics.append(f"smartc_json_backend_info{{backend=\"{json_codec.backend_name()}\"}} 1")
+            except Exception:
+                pass
+
+            # Link quality estimate (drives Opus bitrate/packet size, jitter buffer, reconnect backoff)
+            try:
+                from src.network.link_quality import get_link_probe
+                link = get_link_probe().stats()
+                estimate = link["estimate"]
+                if estimate:
+                    metrics.append(f"# HELP smartc_link_quality_score Smoothed link quality (0 = poor, 1 = good)")
+                    metrics.append(f"# TYPE smartc_link_quality_score gauge")
+                    metrics.append(f"smartc_link_quality_score{{grade=\"{estimate['grade']}\"}} {estimate['score']}")
+                    for key in ("rtt_ms", "rtt_jitter_ms", "backlog_bytes", "loss_percent", "wifi_signal"):
+                        if estimate[key] is not None:
+                            metrics.append(f"# HELP smartc_link_{key} Smoothed link measurement")
+                            metrics.append(f"# TYPE smartc_link_{key} gauge")
+                            metrics.append(f"smartc_link_{key} {estimate[key]}")
+                    metrics.append(f"# HELP smartc_link_bitrate_bps Recommended Opus bitrate")
+                    metrics.append(f"# TYPE smartc_link_bitrate_bps gauge")
+                    metrics.append(f"smartc_link_bitrate_bps {estimate['bitrate_bps']}")
+                    metrics.append(f"# HELP smartc_link_grade_changes_total Link grade transitions")
+                    metrics.append(f"# TYPE smartc_link_grade_changes_total counter")
+                    metrics.append(f"smartc_link_grade_changes_total {link['grade_changes']}")
+            except Exception:
+                pass
+
+            # Shared DNS cache
+            try:
+                from src.network.dns_cache import get_dns_cache
+                dns = get_dns_cache().stats()
+                metrics.append(f"# HELP smartc_dns_cache_lookups_total Resolver cache lookups by result")
+                metrics.append(f"# TYPE smartc_dns_cache_lookups_total counter")
+                for result in ("hits", "stale_hits", "misses"):
+                    metrics.append(f"smartc_dns_cache_lookups_total{{result=\"{result}\"}} {dns[result]}")
+                metrics.append(f"# HELP smartc_dns_cache_failures_total System resolver failures (stale entry served if available)")
+                metrics.append(f"# TYPE smartc_dns_cache_failures_total counter")
+                metrics.append(f"smartc_dns_cache_failures_total {dns['failures']}")
+            except Exception:
+                pass
+
+            # UDP audio stream (MQTT + UDP)
+            try:
+                from src.application import Application
+                app = Application._instance
+                protocol = getattr(app, "protocol", None) if app else None
+                get_stats = getattr(protocol, "get_udp_stream_stats", None)
+                udp = get_stats() if get_stats else None
+                if udp:
+                    metrics.append(f"# HELP smartc_udp_audio_packets_total UDP audio packets by outcome (current/last session)")
+                    metrics.append(f"# TYPE smartc_udp_audio_packets_total counter")
+                    for outcome in ("received", "delivered", "lost", "duplicates", "stale", "reordered", "invalid"):
+                        metrics.append(f"smartc_udp_audio_packets_total{{outcome=\"{outcome}\"}} {udp[outcome]}")
+                    metrics.append(f"# HELP smartc_udp_audio_loss_percent UDP audio packet loss")
+                    metrics.append(f"# TYPE smartc_udp_audio_loss_percent gauge")
+                    metrics.append(f"smartc_udp_audio_loss_percent {udp['loss_percent']}")
+                    metrics.append(f"# HELP smartc_udp_audio_jitter_ms UDP audio interarrival jitter (RFC 3550)")
+                    metrics.append(f"# TYPE smartc_udp_audio_jitter_ms gauge")
+                    metrics.append(f"smartc_udp_audio_jitter_ms {udp['jitter_ms']}")
+            except Exception:
+                pass
+
+            # Plugin event bus
+            try:
+                from src.application import Application
+                app = Application._instance
+                plugins = getattr(app, "plugins", None) if app else None
+                if plugins is not None:
+                    events = plugins.event_stats()
+                    metrics.append(f"# HELP smartc_plugin_events_published_total Plugin events published by type")
+                    metrics.append(f"# TYPE smartc_plugin_events_published_total counter")
+                    for event, count in events["published"].items():
+                        metrics.append(f"smartc_plugin_events_published_total{{event=\"{event}\"}} {count}")
+                    metrics.append(f"# HELP smartc_plugin_events_unrouted_total Plugin events with no subscriber")
+                    metrics.append(f"# TYPE smartc_plugin_events_unrouted_total counter")
+                    for route, count in events["unrouted"].items():
+                        metrics.append(f"smartc_plugin_events_unrouted_total{{route=\"{route}\"}} {count}")
+                    metrics.append(f"# HELP smartc_plugin_handler_calls_total Plugin handler calls by outcome")
+                    metrics.append(f"# TYPE smartc_plugin_handler_calls_total counter")
+                    metrics.append(f"# HELP smartc_plugin_handler_latency_ms Plugin handler dispatch latency")
+                    metrics.append(f"# TYPE smartc_plugin_handler_latency_ms gauge")
+                    for h in events["handlers"]:
+                        labels = f"handler=\"{h['handler']}\",event=\"{h['event']}\""
+                        ok = h["calls"] - h["errors"] - h["timeouts"]
+                        metrics.append(f"smartc_plugin_handler_calls_total{{{labels},outcome=\"ok\"}} {ok}")
+                        metrics.append(f"smartc_plugin_handler_calls_total{{{labels},outcome=\"error\"}} {h['errors']}")
+                        metrics.append(f"smartc_plugin_handler_calls_total{{{labels},outcome=\"timeout\"}} {h['timeouts']}")
+                        metrics.append(f"smartc_plugin_handler_latency_ms{{{labels},stat=\"avg\"}} {h['avg_ms']}")
+                        metrics.append(f"smartc_plugin_handler_latency_ms{{{labels},stat=\"max\"}} {h['max_ms']}")
+            except Exception:
+                pass
+
+            # MCP tool packages (lazy loading)
+            try:
+                from src.mcp.mcp_server import McpServer
+                server = McpServer._instance
+                if server is not None:
+                    tools = server.get_tool_stats()
+                    metrics.append(f"# HELP smartc_mcp_tool_package_loaded Tool package imported in this process (0 = lazy, not yet used)")
+                    metrics.append(f"# TYPE smartc_mcp_tool_package_loaded gauge")
+                    metrics.append(f"# HELP smartc_mcp_tool_package_import_ms Last measured import time per tool package")
+                    metrics.append(f"# TYPE smartc_mcp_tool_package_import_ms gauge")
+                    metrics.append(f"# HELP smartc_mcp_tool_package_rss_kb Last measured RSS growth when importing the package")
+                    metrics.append(f"# TYPE smartc_mcp_tool_package_rss_kb gauge")
+                    for name, pkg in tools["packages"].items():
+                        metrics.append(f"smartc_mcp_tool_package_loaded{{package=\"{name}\"}} {int(pkg['loaded'])}")
+                        if pkg["import_ms"] is not None:
+                            metrics.append(f"smartc_mcp_tool_package_import_ms{{package=\"{name}\"}} {pkg['import_ms']}")
+                        if pkg["rss_kb"] is not None:
+                            metrics.append(f"smartc_mcp_tool_package_rss_kb{{package=\"{name}\"}} {pkg['rss_kb']}")
+                    metrics.append(f"# HELP smartc_mcp_tool_rss_saved_kb RSS not spent on tool packages that are still lazy")
+                    metrics.append(f"# TYPE smartc_mcp_tool_rss_saved_kb gauge")
+                    metrics.append(f"smartc_mcp_tool_rss_saved_kb {tools['rss_saved_kb']}")
+            except Exception:
+                pass
+
+            # Hiện thực vòng lặp sự kiện (uvloop / asyncio / qasync)
+            try:
+                from src.utils.event_loop import loop_impl_name
+                metrics.append(f"# HELP smartc_event_loop_info Event loop implementation in use")
+                metrics.append(f"# TYPE smartc_event_loop_info gauge")
+                metrics.append(f"smartc_event_loop_info{{impl=\"{loop_impl_name()}\"}} 1")
+            except Exception:
+                pass
+
+            # Event loop lag (watchdog)
+            try:
+                from src.utils.loop_monitor import LoopLagMonitor
+                monitor = LoopLagMonitor._instance
+                if monitor is not None and monitor.beats:
+                    lag = monitor.report(top=5)
+                    metrics.append(f"# HELP smartc_loop_lag_ms Event loop scheduling lag (recent window)")
+                    metrics.append(f"# TYPE smartc_loop_lag_ms gauge")
+                    for stat, value in lag["lag_ms"].items():
+                        metrics.append(f"smartc_loop_lag_ms{{stat=\"{stat}\"}} {value}")
+                    metrics.append(f"# HELP smartc_loop_blocks_total Heartbeats delayed past the lag threshold")
+                    metrics.append(f"# TYPE smartc_loop_blocks_total counter")
+                    metrics.append(f"smartc_loop_blocks_total {lag['blocks']}")
+                    metrics.append(f"# HELP smartc_loop_blocked_ms_total Total time the loop was blocked past the threshold")
+                    metrics.append(f"# TYPE smartc_loop_blocked_ms_total counter")
+                    metrics.append(f"smartc_loop_blocked_ms_total {lag['blocked_ms']}")
+                    metrics.append(f"# HELP smartc_loop_block_site_ms Blocked time attributed to a code site (top 5)")
+                    metrics.append(f"# TYPE smartc_loop_block_site_ms gauge")
+                    for culprit in lag["culprits"]:
+                        site = culprit["site"].replace('"', "'")
+                        metrics.append(f"smartc_loop_block_site_ms{{site=\"{site}\"}} {culprit['total_ms']}")
+            except Exception:
+                pass
+
+            # Nhiệm vụ của Application.spawn (TaskSupervisor)
+            try:
+                from src.application import Application
+                app = Application._instance
+                if app is not None:
+                    tasks = app.task_supervisor.stats()
+                    metrics.append(f"# HELP smartc_tasks_active Live tasks per spawn group")
+                    metrics.append(f"# TYPE smartc_tasks_active gauge")
+                    for group, g in tasks["groups"].items():
+                        metrics.append(f"smartc_tasks_active{{group=\"{group}\"}} {g['active']}")
+                    metrics.append(f"# HELP smartc_tasks_dropped_total Tasks rejected because their group was full")
+                    metrics.append(f"# TYPE smartc_tasks_dropped_total counter")
+                    for group, g in tasks["groups"].items():
+                        metrics.append(f"smartc_tasks_dropped_total{{group=\"{group}\"}} {g['dropped']}")
+                    # 15 tên được tạo nhiều nhất
+                    top_names = sorted(tasks["names"].items(), key=lambda kv: -kv[1]["spawned"])[:15]
+                    metrics.append(f"# HELP smartc_task_spawned_total Tasks spawned per name (top 15)")
+                    metrics.append(f"# TYPE smartc_task_spawned_total counter")
+                    for name, t in top_names:
+                        metrics.append(f"smartc_task_spawned_total{{name=\"{name}\"}} {t['spawned']}")
+                    metrics.append(f"# HELP smartc_task_failed_total Tasks that ended with an exception per name (top 15)")
+                    metrics.append(f"# TYPE smartc_task_failed_total counter")
+                    for name, t in top_names:
+                        metrics.append(f"smartc_task_failed_total{{name=\"{name}\"}} {t['failed']}")
+                    metrics.append(f"# HELP smartc_task_duration_ms Task lifetime per name (top 15)")
+                    metrics.append(f"# TYPE smartc_task_duration_ms gauge")
+                    for name, t in top_names:
+                        metrics.append(f"smartc_task_duration_ms{{name=\"{name}\",stat=\"avg\"}} {t['avg_ms']}")
+                        metrics.append(f"smartc_task_duration_ms{{name=\"{name}\",stat=\"max\"}} {t['max_ms']}")
+                    metrics.append(f"# HELP smartc_tasks_long_running Tasks running past their group's expected duration")
+                    metrics.append(f"# TYPE smartc_tasks_long_running gauge")
+                    metrics.append(f"smartc_tasks_long_running {len(tasks['long_running'])}")
+                    metrics.append(f"# HELP smartc_tasks_leaked Cancelled tasks still running past the grace period")
+                    metrics.append(f"# TYPE smartc_tasks_leaked gauge")
+                    metrics.append(f"smartc_tasks_leaked {len(tasks['leaked'])}")
+            except Exception:
+                pass
+
+            # Lệnh hệ thống qua CommandRunner (nmcli, amixer, git, ...)
+            try:
+                from src.utils.command_runner import CommandRunner
+                runner = CommandRunner._instance
+                commands = runner.stats() if runner is not None else {}
+                if commands:
+                    metrics.append(f"# HELP smartc_command_runs_total Subprocesses started per program")
+                    metrics.append(f"# TYPE smartc_command_runs_total counter")
+                    for program, s in commands.items():
+                        metrics.append(f"smartc_command_runs_total{{program=\"{program}\"}} {s['calls']}")
+                    metrics.append(f"# HELP smartc_command_reused_total Calls served without a new subprocess")
+                    metrics.append(f"# TYPE smartc_command_reused_total counter")
+                    for program, s in commands.items():
+                        metrics.append(f"smartc_command_reused_total{{program=\"{program}\",via=\"cache\"}} {s['cache_hits']}")
+                        metrics.append(f"smartc_command_reused_total{{program=\"{program}\",via=\"inflight\"}} {s['deduped']}")
+                    metrics.append(f"# HELP smartc_command_failures_total Non-zero exits and timeouts per program")
+                    metrics.append(f"# TYPE smartc_command_failures_total counter")
+                    for program, s in commands.items():
+                        metrics.append(f"smartc_command_failures_total{{program=\"{program}\",kind=\"exit\"}} {s['errors']}")
+                        metrics.append(f"smartc_command_failures_total{{program=\"{program}\",kind=\"timeout\"}} {s['timeouts']}")
+                    metrics.append(f"# HELP smartc_command_duration_ms Subprocess wall time per program")
+                    metrics.append(f"# TYPE smartc_command_duration_ms gauge")
+                    for program, s in commands.items():
+                        metrics.append(f"smartc_command_duration_ms{{program=\"{program}\",stat=\"avg\"}} {s['avg_ms']}")
+                        metrics.append(f"smartc_command_duration_ms{{program=\"{program}\",stat=\"max\"}} {s['max_ms']}")
+                    metrics.append(f"# HELP smartc_command_waiting Calls queued behind the per-program concurrency limit")
+                    metrics.append(f"# TYPE smartc_command_waiting gauge")
+                    for program, s in commands.items():
+                        metrics.append(f"smartc_command_waiting{{program=\"{program}\"}} {s['waiting']}")
+                    metrics.append(f"# HELP smartc_command_on_loop_total run_blocking calls that blocked the event loop thread")
+                    metrics.append(f"# TYPE smartc_command_on_loop_total counter")
+                    for program, s in commands.items():
+                        metrics.append(f"smartc_command_on_loop_total{{program=\"{program}\"}} {s['on_loop']}")
+            except Exception:
+                pass
+
+            # Warm start: boot từ snapshot OTA và kết quả làm mới nền
+            try:
+                from src.core.warm_start import WarmStartSnapshot
+                snapshot = WarmStartSnapshot._instance
+                if snapshot is not None and snapshot.boot_source is not None:
+                    warm = snapshot.stats()
+                    metrics.append(f"# HELP smartc_warm_start_hit Boot used the warm-start snapshot instead of waiting for OTA")
+                    metrics.append(f"# TYPE smartc_warm_start_hit gauge")
+                    metrics.append(f"smartc_warm_start_hit {1 if warm['boot_source'] == 'snapshot' else 0}")
+                    if warm["boot_age_s"] is not None:
+                        metrics.append(f"# HELP smartc_warm_start_age_seconds Snapshot age at boot")
+                        metrics.append(f"# TYPE smartc_warm_start_age_seconds gauge")
+                        metrics.append(f"smartc_warm_start_age_seconds {warm['boot_age_s']}")
+                    if warm["ota_fetch_ms"] is not None:
+                        metrics.append(f"# HELP smartc_ota_fetch_ms Blocking OTA fetch time at boot (no usable snapshot)")
+                        metrics.append(f"# TYPE smartc_ota_fetch_ms gauge")
+                        metrics.append(f"smartc_ota_fetch_ms {warm['ota_fetch_ms']}")
+                    metrics.append(f"# HELP smartc_warm_start_refresh_total Background snapshot refreshes by outcome")
+                    metrics.append(f"# TYPE smartc_warm_start_refresh_total counter")
+                    for outcome, count in warm["refresh"].items():
+                        metrics.append(f"smartc_warm_start_refresh_total{{outcome=\"{outcome}\"}} {count}")
+                    if warm["last_refresh_ms"] is not None:
+                        metrics.append(f"# HELP smartc_warm_start_refresh_ms Last background refresh duration")
+                        metrics.append(f"# TYPE smartc_warm_start_refresh_ms gauge")
+                        metrics.append(f"smartc_warm_start_refresh_ms {warm['last_refresh_ms']}")
+            except Exception:
+                pass
+
+            # ConfigManager: số lần ghi config.json thật sự và số lần được gom bởi ghi trễ
+            try:
+                from src.utils.config_manager import ConfigManager
+                cfg_manager = ConfigManager._instance
+                if cfg_manager is not None and getattr(cfg_manager, "_initialized", False):
+                    cfg = cfg_manager.stats()
+                    metrics.append(f"# HELP smartc_config_writes_total Atomic config.json writes")
+                    metrics.append(f"# TYPE smartc_config_writes_total counter")
+                    metrics.append(f"smartc_config_writes_total {cfg['writes']}")
+                    metrics.append(f"# HELP smartc_config_coalesced_total Updates folded into a pending debounced write")
+                    metrics.append(f"# TYPE smartc_config_coalesced_total counter")
+                    metrics.append(f"smartc_config_coalesced_total {cfg['coalesced']}")
+                    metrics.append(f"# HELP smartc_config_write_pending Changes waiting for the debounced write")
+                    metrics.append(f"# TYPE smartc_config_write_pending gauge")
+                    metrics.append(f"smartc_config_write_pending {1 if cfg['pending'] else 0}")
+                    metrics.append(f"# HELP smartc_config_last_write_ok Last config.json write succeeded")
+                    metrics.append(f"# TYPE smartc_config_last_write_ok gauge")
+                    metrics.append(f"smartc_config_last_write_ok {1 if cfg['last_save_ok'] else 0}")
+            except Exception:
+                pass
+
+            # Wake word: thời gian nạp mô hình tách riêng với biên dịch từ khóa
+            try:
+                from src.audio_processing.kws_model_registry import KwsModelRegistry
+                registry = KwsModelRegistry._instance
+                if registry is not None:
+                    kws = registry.stats()
+                    metrics.append(f"# HELP smartc_wakeword_model_load_ms KWS model load time (encoder/decoder/joiner)")
+                    metrics.append(f"# TYPE smartc_wakeword_model_load_ms gauge")
+                    for model in kws["models"]:
+                        if model["load_ms"] is not None:
+                            labels = f"provider=\"{model['provider']}\",preloaded=\"{str(model['preloaded']).lower()}\""
+                            metrics.append(f"smartc_wakeword_model_load_ms{{{labels}}} {model['load_ms']}")
+                    metrics.append(f"# HELP smartc_wakeword_model_reuse_total Detector builds served by an already loaded/preloading model")
+                    metrics.append(f"# TYPE smartc_wakeword_model_reuse_total counter")
+                    metrics.append(f"smartc_wakeword_model_reuse_total {kws['hits']}")
+                from src.application import Application
+                app = Application._instance
+                plugin = app.plugins.get_plugin("wake_word") if app else None
+                detector = getattr(plugin, "detector", None)
+                if detector is not None:
+                    perf = detector.get_performance_stats()
+                    if perf["model_wait_ms"] is not None:
+                        metrics.append(f"# HELP smartc_wakeword_model_wait_ms Time the detector blocked waiting for the model")
+                        metrics.append(f"# TYPE smartc_wakeword_model_wait_ms gauge")
+                        metrics.append(f"smartc_wakeword_model_wait_ms {perf['model_wait_ms']}")
+                    if perf["keyword_compile_ms"] is not None:
+                        metrics.append(f"# HELP smartc_wakeword_keyword_compile_ms Last keyword graph compile time")
+                        metrics.append(f"# TYPE smartc_wakeword_keyword_compile_ms gauge")
+                        metrics.append(f"smartc_wakeword_keyword_compile_ms {perf['keyword_compile_ms']}")
+                    metrics.append(f"# HELP smartc_wakeword_keyword_compiles_total Keyword graph compiles (start + reloads)")
+                    metrics.append(f"# TYPE smartc_wakeword_keyword_compiles_total counter")
+                    metrics.append(f"smartc_wakeword_keyword_compiles_total {perf['keyword_compiles']}")
+            except Exception:
+                pass
+
+            # Startup timeline
+            try:
+                from src.application import Application
+                app = Application._instance
+                timeline = getattr(app, "startup_timeline", None) if app else None
+                if timeline is not None:
+                    startup = timeline.stats()
+                    if startup["total_ms"] is not None:
+                        metrics.append(f"# HELP smartc_startup_total_ms Time from Application.run to ready")
+                        metrics.append(f"# TYPE smartc_startup_total_ms gauge")
+                        metrics.append(f"smartc_startup_total_ms {startup['total_ms']}")
+                    metrics.append(f"# HELP smartc_startup_stage_start_ms Startup stage start offset")
+                    metrics.append(f"# TYPE smartc_startup_stage_start_ms gauge")
+                    metrics.append(f"# HELP smartc_startup_stage_duration_ms Startup stage duration (stages may overlap)")
+                    metrics.append(f"# TYPE smartc_startup_stage_duration_ms gauge")
+                    for stage in startup["stages"]:
+                        labels = f"stage=\"{stage['stage']}\",ok=\"{str(stage['ok']).lower()}\""
+                        metrics.append(f"smartc_startup_stage_start_ms{{{labels}}} {stage['start_ms']}")
+                        metrics.append(f"smartc_startup_stage_duration_ms{{{labels}}} {stage['duration_ms']}")
+            except Exception:
+                pass
+
         except Exception as e:
             metrics.append(f"# Error collecting metrics: {e}")
         
@@ -2882,8 +3315,8 @@ class WebSettingsServer:
             from src.network.wifi_manager import get_wifi_manager
             
             wifi = get_wifi_manager()
-            saved = wifi.get_saved_networks()
-            current = wifi.get_current_ssid()
+            saved = await wifi.get_saved_networks_async()
+            current = await wifi.get_current_ssid_async()
             
             networks = []
             for ssid in saved:
@@ -2911,7 +3344,7 @@ class WebSettingsServer:
             from src.network.wifi_manager import get_wifi_manager
             
             wifi = get_wifi_manager()
-            if wifi.delete_saved_network(ssid):
+            if await wifi.delete_saved_network_async(ssid):
                 return web.json_response({"success": True, "message": f"Đã xóa {ssid}"})
             else:
                 return web.json_response({"success": False, "message": f"Không thể xóa {ssid}"})
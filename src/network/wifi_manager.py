@@ -16,12 +16,16 @@ import re
 import subprocess
 from dataclasses import dataclass
 from enum import Enum
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional
 
+from src.utils.command_runner import CommandResult, get_command_runner
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Thời gian dùng lại kết quả truy vấn nmcli (chế độ -t, chỉ đọc)
+NMCLI_QUERY_TTL = 2.0
+
 
 class WiFiState(Enum):
     """Trạng thái kết nối WiFi"""
@@ -94,11 +98,10 @@ class WiFiManager:
     def _detect_wifi_interface(self) -> str:
         """Phát hiện interface WiFi (thường là wlan0)"""
         try:
-            result = subprocess.run(
+            result = get_command_runner().run_blocking(
                 ["nmcli", "-t", "-f", "DEVICE,TYPE", "device"],
-                capture_output=True,
-                text=True,
-                timeout=10
+                timeout=10,
+                cache_ttl=NMCLI_QUERY_TTL,
             )
             if result.returncode == 0:
                 for line in result.stdout.strip().split('\n'):
@@ -133,18 +136,38 @@ class WiFiManager:
             except Exception as e:
                 logger.error(f"Lỗi callback trạng thái WiFi: {e}")
     
-    def _run_nmcli(self, args: List[str], timeout: int = 30) -> subprocess.CompletedProcess:
-        """Chạy lệnh nmcli"""
+    @staticmethod
+    def _is_query(args: List[str]) -> bool:
+        """Truy vấn nmcli trong module này đều dùng chế độ -t; các lệnh còn lại thay đổi trạng thái"""
+        return "-t" in args
+
+    def _run_nmcli(self, args: List[str], timeout: int = 30) -> CommandResult:
+        """Chạy lệnh nmcli (đồng bộ, qua CommandRunner dùng chung)"""
         cmd = ["nmcli"] + args
-        logger.debug(f"Chạy lệnh: {' '.join(cmd)}")
-        
+        runner = get_command_runner()
+        query = self._is_query(args)
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
+            result = runner.run_blocking(cmd, timeout=timeout, cache_ttl=NMCLI_QUERY_TTL if query else 0)
+            if result.returncode != 0 and result.stderr:
+                logger.warning(f"nmcli stderr: {result.stderr}")
+            return result
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout chạy lệnh: {' '.join(cmd)}")
+            raise
+        except Exception as e:
+            logger.error(f"Lỗi chạy nmcli: {e}")
+            raise
+        finally:
+            if not query:
+                runner.invalidate("nmcli")
+
+    async def _run_nmcli_async(self, args: List[str], timeout: int = 30) -> CommandResult:
+        """Chạy lệnh nmcli bất đồng bộ"""
+        cmd = ["nmcli"] + args
+        runner = get_command_runner()
+        query = self._is_query(args)
+        try:
+            result = await runner.run(cmd, timeout=timeout, cache_ttl=NMCLI_QUERY_TTL if query else 0)
             if result.returncode != 0 and result.stderr:
                 logger.warning(f"nmcli stderr: {result.stderr}")
             return result
@@ -154,6 +177,9 @@ class WiFiManager:
         except Exception as e:
             logger.error(f"Lỗi chạy nmcli: {e}")
             raise
+        finally:
+            if not query:
+                runner.invalidate("nmcli")
     
     def check_wifi_connection(self) -> bool:
         """
@@ -198,94 +224,147 @@ class WiFiManager:
             self._notify_state_change(WiFiState.ERROR)
             return False
     
+    _ACTIVE_CONNECTIONS_ARGS = ["-t", "-f", "NAME,DEVICE", "connection", "show", "--active"]
+
+    def _parse_current_ssid(self, result) -> Optional[str]:
+        if result.returncode == 0:
+            for line in result.stdout.strip().split('\n'):
+                parts = line.split(':')
+                if len(parts) >= 2 and parts[1] == self._wifi_interface:
+                    return parts[0]
+        return None
+
     def get_current_ssid(self) -> Optional[str]:
         """Lấy SSID đang kết nối"""
         try:
-            result = self._run_nmcli(["-t", "-f", "NAME,DEVICE", "connection", "show", "--active"])
-            
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    parts = line.split(':')
-                    if len(parts) >= 2 and parts[1] == self._wifi_interface:
-                        return parts[0]
-            
+            return self._parse_current_ssid(self._run_nmcli(self._ACTIVE_CONNECTIONS_ARGS))
+        except Exception as e:
+            logger.error(f"Lỗi lấy SSID hiện tại: {e}")
             return None
+
+    async def get_current_ssid_async(self) -> Optional[str]:
+        """Lấy SSID đang kết nối (bất đồng bộ)"""
+        try:
+            return self._parse_current_ssid(await self._run_nmcli_async(self._ACTIVE_CONNECTIONS_ARGS))
         except Exception as e:
             logger.error(f"Lỗi lấy SSID hiện tại: {e}")
             return None
-    
+
+    _LINK_INFO_ARGS = ["-t", "-f", "IN-USE,SIGNAL,RATE", "device", "wifi", "list", "--rescan", "no"]
+
+    @staticmethod
+    def _parse_link_info(result) -> Optional[Dict[str, float]]:
+        if result.returncode != 0:
+            return None
+        for line in result.stdout.strip().split('\n'):
+            parts = line.split(':')
+            if len(parts) >= 3 and parts[0].strip() == "*":
+                info = {"signal": float(parts[1])}
+                rate = parts[2].split()
+                if rate:
+                    info["bitrate_mbps"] = float(rate[0])
+                return info
+        return None
+
+    def get_link_info(self) -> Optional[Dict[str, float]]:
+        """
+        Cường độ (0-100) và tốc độ (Mbit/s) của mạng WiFi đang dùng, None nếu không có.
+        Dùng cache quét của NetworkManager (--rescan no), không quét lại.
+        """
+        try:
+            return self._parse_link_info(self._run_nmcli(self._LINK_INFO_ARGS, timeout=5))
+        except Exception as e:
+            logger.debug(f"Lỗi đọc thông tin liên kết WiFi: {e}")
+            return None
+
+    async def get_link_info_async(self) -> Optional[Dict[str, float]]:
+        """get_link_info bất đồng bộ"""
+        try:
+            return self._parse_link_info(await self._run_nmcli_async(self._LINK_INFO_ARGS, timeout=5))
+        except Exception as e:
+            logger.debug(f"Lỗi đọc thông tin liên kết WiFi: {e}")
+            return None
+
     def scan_wifi_networks(self) -> List[WiFiNetwork]:
         """
         Quét danh sách mạng WiFi khả dụng.
-        
+
         Returns:
             List[WiFiNetwork]: Danh sách mạng WiFi
         """
-        networks = []
-        
         try:
             # Yêu cầu quét lại
             self._run_nmcli(["device", "wifi", "rescan"], timeout=15)
-            
-            # Đợi quét hoàn tất (sử dụng time.sleep thay vì asyncio để tránh event loop conflict)
+
+            # Đợi quét hoàn tất (hàm đồng bộ, chỉ gọi từ luồng nền)
             import time
             time.sleep(2)
         except Exception:
             pass  # Bỏ qua lỗi rescan
-        
+
         try:
             # Lấy danh sách WiFi
-            result = self._run_nmcli([
-                "-t", "-f", "IN-USE,SSID,SIGNAL,SECURITY",
-                "device", "wifi", "list"
-            ])
-            
-            if result.returncode == 0:
-                seen_ssids = set()
-                for line in result.stdout.strip().split('\n'):
-                    if not line:
-                        continue
-                    
-                    parts = line.split(':')
-                    if len(parts) >= 4:
-                        in_use = parts[0] == '*'
-                        ssid = parts[1]
-                        
-                        # Bỏ qua SSID trống hoặc đã thấy
-                        if not ssid or ssid in seen_ssids:
-                            continue
-                        
-                        seen_ssids.add(ssid)
-                        
-                        try:
-                            signal = int(parts[2])
-                        except ValueError:
-                            signal = 0
-                        
-                        security = parts[3] if parts[3] else "open"
-                        
-                        networks.append(WiFiNetwork(
-                            ssid=ssid,
-                            signal_strength=signal,
-                            security=security,
-                            in_use=in_use
-                        ))
-                
-                # Sắp xếp theo tín hiệu mạnh nhất
-                networks.sort(key=lambda x: x.signal_strength, reverse=True)
-            
-            logger.info(f"Quét được {len(networks)} mạng WiFi")
-            
+            return self._parse_scan(self._run_nmcli(self._SCAN_LIST_ARGS))
         except Exception as e:
             logger.error(f"Lỗi quét mạng WiFi: {e}")
-        
-        return networks
-    
+            return []
+
     async def scan_wifi_networks_async(self) -> List[WiFiNetwork]:
         """Quét mạng WiFi bất đồng bộ"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.scan_wifi_networks)
-    
+        try:
+            await self._run_nmcli_async(["device", "wifi", "rescan"], timeout=15)
+            await asyncio.sleep(2)
+        except Exception:
+            pass  # Bỏ qua lỗi rescan
+
+        try:
+            return self._parse_scan(await self._run_nmcli_async(self._SCAN_LIST_ARGS))
+        except Exception as e:
+            logger.error(f"Lỗi quét mạng WiFi: {e}")
+            return []
+
+    _SCAN_LIST_ARGS = ["-t", "-f", "IN-USE,SSID,SIGNAL,SECURITY", "device", "wifi", "list"]
+
+    @staticmethod
+    def _parse_scan(result) -> List[WiFiNetwork]:
+        networks = []
+        if result.returncode == 0:
+            seen_ssids = set()
+            for line in result.stdout.strip().split('\n'):
+                if not line:
+                    continue
+
+                parts = line.split(':')
+                if len(parts) >= 4:
+                    in_use = parts[0] == '*'
+                    ssid = parts[1]
+
+                    # Bỏ qua SSID trống hoặc đã thấy
+                    if not ssid or ssid in seen_ssids:
+                        continue
+
+                    seen_ssids.add(ssid)
+
+                    try:
+                        signal = int(parts[2])
+                    except ValueError:
+                        signal = 0
+
+                    security = parts[3] if parts[3] else "open"
+
+                    networks.append(WiFiNetwork(
+                        ssid=ssid,
+                        signal_strength=signal,
+                        security=security,
+                        in_use=in_use
+                    ))
+
+            # Sắp xếp theo tín hiệu mạnh nhất
+            networks.sort(key=lambda x: x.signal_strength, reverse=True)
+
+        logger.info(f"Quét được {len(networks)} mạng WiFi")
+        return networks
+
     def connect_to_wifi(self, ssid: str, password: str = None) -> bool:
         """
         Kết nối tới mạng WiFi.
@@ -445,19 +524,30 @@ class WiFiManager:
         """Lấy IP của hotspot (gateway)"""
         return "192.168.4.1"
     
+    def _parse_hotspot_active(self, result) -> bool:
+        if result.returncode == 0:
+            active_connections = result.stdout.strip().split('\n')
+            return self._hotspot_connection_name in active_connections
+        return False
+
     def is_hotspot_active(self) -> bool:
         """Kiểm tra hotspot có đang chạy không"""
         try:
-            result = self._run_nmcli(["-t", "-f", "NAME", "connection", "show", "--active"])
-            
-            if result.returncode == 0:
-                active_connections = result.stdout.strip().split('\n')
-                return self._hotspot_connection_name in active_connections
-            
+            return self._parse_hotspot_active(
+                self._run_nmcli(["-t", "-f", "NAME", "connection", "show", "--active"])
+            )
+        except Exception:
             return False
+
+    async def is_hotspot_active_async(self) -> bool:
+        """Kiểm tra hotspot bất đồng bộ"""
+        try:
+            return self._parse_hotspot_active(
+                await self._run_nmcli_async(["-t", "-f", "NAME", "connection", "show", "--active"])
+            )
         except Exception:
             return False
-    
+
     def disconnect_wifi(self) -> bool:
         """Ngắt kết nối WiFi hiện tại"""
         try:
@@ -489,28 +579,6 @@ class WiFiManager:
             logger.error(f"Lỗi quên mạng WiFi: {e}")
             return False
     
-    def get_saved_networks(self) -> List[str]:
-        """Lấy danh sách mạng WiFi đã lưu"""
-        try:
-            result = self._run_nmcli([
-                "-t", "-f", "NAME,TYPE",
-                "connection", "show"
-            ])
-            
-            if result.returncode == 0:
-                networks = []
-                for line in result.stdout.strip().split('\n'):
-                    parts = line.split(':')
-                    if len(parts) >= 2 and parts[1] == '802-11-wireless':
-                        if parts[0] != self._hotspot_connection_name:
-                            networks.append(parts[0])
-                return networks
-            
-            return []
-        except Exception as e:
-            logger.error(f"Lỗi lấy danh sách mạng đã lưu: {e}")
-            return []
-    
     def get_ip_address(self) -> Optional[str]:
         """Lấy địa chỉ IP hiện tại"""
         try:
@@ -550,54 +618,75 @@ class WiFiManager:
     
     # ========== MULTIPLE WIFI PROFILES ==========
     
+    def _parse_saved_networks(self, result) -> List[str]:
+        saved = []
+        if result.returncode == 0:
+            for line in result.stdout.strip().split('\n'):
+                parts = line.split(':')
+                if len(parts) >= 2 and parts[1] == '802-11-wireless':
+                    ssid = parts[0]
+                    # Skip hotspot connection
+                    if ssid != self._hotspot_connection_name:
+                        saved.append(ssid)
+        logger.info(f"Saved WiFi networks: {saved}")
+        return saved
+
     def get_saved_networks(self) -> List[str]:
         """
         Lấy danh sách WiFi networks đã lưu.
-        
+
         Returns:
             List[str]: Danh sách SSIDs đã lưu
         """
-        saved = []
         try:
-            result = self._run_nmcli(["-t", "-f", "NAME,TYPE", "connection", "show"])
-            
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    parts = line.split(':')
-                    if len(parts) >= 2 and parts[1] == '802-11-wireless':
-                        ssid = parts[0]
-                        # Skip hotspot connection
-                        if ssid != self._hotspot_connection_name:
-                            saved.append(ssid)
-            
-            logger.info(f"Saved WiFi networks: {saved}")
+            return self._parse_saved_networks(
+                self._run_nmcli(["-t", "-f", "NAME,TYPE", "connection", "show"])
+            )
         except Exception as e:
             logger.error(f"Error getting saved networks: {e}")
-        
-        return saved
-    
+            return []
+
+    async def get_saved_networks_async(self) -> List[str]:
+        """Lấy danh sách WiFi đã lưu (bất đồng bộ)"""
+        try:
+            return self._parse_saved_networks(
+                await self._run_nmcli_async(["-t", "-f", "NAME,TYPE", "connection", "show"])
+            )
+        except Exception as e:
+            logger.error(f"Error getting saved networks: {e}")
+            return []
+
+    def _log_delete_result(self, ssid: str, result) -> bool:
+        if result.returncode == 0:
+            logger.info(f"Deleted saved network: {ssid}")
+            return True
+        logger.warning(f"Failed to delete network {ssid}: {result.stderr}")
+        return False
+
     def delete_saved_network(self, ssid: str) -> bool:
         """
         Xóa một WiFi profile đã lưu.
-        
+
         Args:
             ssid: Tên mạng cần xóa
-            
+
         Returns:
             bool: True nếu xóa thành công
         """
         try:
-            result = self._run_nmcli(["connection", "delete", ssid])
-            if result.returncode == 0:
-                logger.info(f"Deleted saved network: {ssid}")
-                return True
-            else:
-                logger.warning(f"Failed to delete network {ssid}: {result.stderr}")
-                return False
+            return self._log_delete_result(ssid, self._run_nmcli(["connection", "delete", ssid]))
         except Exception as e:
             logger.error(f"Error deleting network: {e}")
             return False
-    
+
+    async def delete_saved_network_async(self, ssid: str) -> bool:
+        """Xóa WiFi profile đã lưu (bất đồng bộ)"""
+        try:
+            return self._log_delete_result(ssid, await self._run_nmcli_async(["connection", "delete", ssid]))
+        except Exception as e:
+            logger.error(f"Error deleting network: {e}")
+            return False
+
     def set_network_priority(self, ssid: str, priority: int) -> bool:
         """
         Đặt priority cho một WiFi network (cao hơn = ưu tiên hơn).
@@ -630,7 +719,7 @@ class WiFiManager:
         Returns:
             bool: True nếu kết nối được một mạng
         """
-        saved = self.get_saved_networks()
+        saved = await self.get_saved_networks_async()
         
         if not saved:
             logger.info("No saved networks to try")
@@ -641,7 +730,7 @@ class WiFiManager:
         for ssid in saved:
             try:
                 logger.info(f"Attempting to connect to: {ssid}")
-                result = self._run_nmcli([
+                result = await self._run_nmcli_async([
                     "connection", "up", ssid,
                     "ifname", self._wifi_interface
                 ], timeout=30)
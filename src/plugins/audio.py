@@ -12,13 +12,15 @@ from src.plugins.base import Plugin
 
 class AudioPlugin(Plugin):
     name = "audio"
+    json_types = ("tts",)
+    # Khung TTS phải được ghi vào codec đúng thứ tự nhận
+    ordered_events = ("audio", "device_state")
 
     def __init__(self) -> None:
         super().__init__()
         self.app = None  # ApplicationExample
         self.codec: AudioCodec | None = None
         self._loop = None
-        self._send_sem = asyncio.Semaphore(4)
 
     async def setup(self, app: Any) -> None:
         self.app = app
@@ -70,6 +72,14 @@ class AudioPlugin(Plugin):
                 self.codec.mark_playback_ended()
         await asyncio.sleep(0)
 
+    async def on_device_state_changed(self, state: Any) -> None:
+        # Giảm nhạc khi đang nghe/nói để micro và TTS không bị nhạc lấn át
+        if self.codec:
+            self.codec.duck_music(
+                state in (DeviceState.LISTENING, DeviceState.SPEAKING)
+            )
+        await asyncio.sleep(0)
+
     async def on_incoming_audio(self, data: bytes) -> None:
         if self.codec:
             try:
@@ -87,6 +97,9 @@ class AudioPlugin(Plugin):
         """
         Dừng luồng âm thanh (giữ lại instance codec)
         """
+        if self.app is not None:
+            # Khung chưa gửi không còn ý nghĩa
+            self.app.task_supervisor.cancel_group("audio-send")
         if self.codec:
             try:
                 await self.codec.stop_streams()
@@ -140,21 +153,20 @@ class AudioPlugin(Plugin):
             return
 
         async def _send():
-            async with self._send_sem:
-                # Chỉ gửi âm thanh microphone ở trạng thái thiết bị cho phép
-                try:
-                    if not (
-                        self.app.protocol
-                        and self.app.protocol.is_audio_channel_opened()
-                    ):
-                        return
-                    if self._should_send_microphone_audio():
-                        await self.app.protocol.send_audio(encoded_data)
-                except Exception:
-                    pass
+            # Chỉ gửi âm thanh microphone ở trạng thái thiết bị cho phép
+            try:
+                if not (
+                    self.app.protocol
+                    and self.app.protocol.is_audio_channel_opened()
+                ):
+                    return
+                if self._should_send_microphone_audio():
+                    await self.app.protocol.send_audio(encoded_data)
+            except Exception:
+                pass
 
-        # Giao tác vụ cho quản lý ứng dụng
-        self.app.spawn(_send(), name="audio:send")
+        # Giao tác vụ cho quản lý ứng dụng (nhóm audio-send giới hạn 4 gửi đồng thời)
+        self.app.spawn(_send(), name="audio:send", group="audio-send")
 
     def _should_send_microphone_audio(self) -> bool:
         """Căn chỉnh với máy trạng thái ứng dụng:
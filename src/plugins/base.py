@@ -1,5 +1,5 @@
 import asyncio
-from typing import Any
+from typing import Any, Optional, Tuple
 
 
 class Plugin:
@@ -9,6 +9,21 @@ class Plugin:
 
     name: str = "plugin"
 
+    # Bus sự kiện: chỉ hook được ghi đè mới được đăng ký.
+    # json_types: loại tin nhắn JSON ("type") cần nhận, None = mọi loại.
+    # ordered_events: sự kiện cần xử lý tuần tự theo thứ tự đến ("audio", "device_state"...).
+    # event_timeout: thời gian chờ tối đa mỗi lần gọi hook (giây), None = không giới hạn.
+    json_types: Optional[Tuple[str, ...]] = None
+    ordered_events: Tuple[str, ...] = ()
+    event_timeout: Optional[float] = 5.0
+
+    # Thứ tự khởi động: setup/start chờ các plugin (theo tên) trong depends_on xong cùng
+    # giai đoạn; plugin độc lập chạy song song. setup_depends_on ghi đè riêng cho setup
+    # (None = giống depends_on), vd. wake_word nạp mô hình song song với audio nhưng chỉ
+    # start sau audio.
+    depends_on: Tuple[str, ...] = ()
+    setup_depends_on: Optional[Tuple[str, ...]] = None
+
     def __init__(self) -> None:
         self._started = False
 
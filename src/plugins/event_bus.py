@@ -0,0 +1,190 @@
+"""
+Event Bus - Phân phối sự kiện có kiểu cho plugin.
+
+Trước đây PluginManager lần lượt await hook của mọi plugin cho mỗi tin nhắn, kể cả hook
+rỗng, và nuốt mọi lỗi. Ở đây:
+- Plugin chỉ đăng ký sự kiện có hook thật; tin nhắn JSON được định tuyến theo "type"
+  (mcp chỉ tới McpPlugin, tts tới audio và UI...).
+- Các subscriber của cùng một sự kiện chạy đồng thời; subscriber khai báo "ordered" xử lý
+  tuần tự theo thứ tự đến (vd. khung audio).
+- Mỗi handler có thời gian chờ riêng; số lần gọi, lỗi, quá thời gian và độ trễ được ghi lại.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+EVENT_PROTOCOL_CONNECTED = "protocol_connected"
+EVENT_INCOMING_JSON = "json"
+EVENT_INCOMING_AUDIO = "audio"
+EVENT_DEVICE_STATE = "device_state"
+
+DEFAULT_TIMEOUT = 5.0
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class Subscription:
+    """
+    Một handler đã đăng ký cùng thống kê của nó.
+    """
+
+    def __init__(
+        self,
+        event: str,
+        handler: Handler,
+        name: str,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        ordered: bool = False,
+        types: Optional[Iterable[str]] = None,
+    ):
+        self.event = event
+        self.handler = handler
+        self.name = name
+        self.timeout = timeout
+        self.ordered = ordered
+        self.types = tuple(types) if types else None
+        self._lock = asyncio.Lock() if ordered else None
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    async def deliver(self, payload: Any) -> None:
+        if self._lock is None:
+            await self._run(payload)
+            return
+        # asyncio.Lock trao quyền theo thứ tự chờ: giữ nguyên thứ tự sự kiện
+        async with self._lock:
+            await self._run(payload)
+
+    async def _run(self, payload: Any) -> None:
+        started = time.perf_counter()
+        try:
+            if self.timeout:
+                await asyncio.wait_for(self.handler(payload), self.timeout)
+            else:
+                await self.handler(payload)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.last_error = f"timeout after {self.timeout}s"
+            logger.warning(f"⏱️ Handler {self.name} ({self.event}) quá {self.timeout}s, đã hủy")
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.warning(f"⚠️ Handler {self.name} ({self.event}) lỗi: {e}", exc_info=True)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000.0
+            self.calls += 1
+            self.total_ms += elapsed
+            if elapsed > self.max_ms:
+                self.max_ms = elapsed
+
+    def stats(self) -> dict:
+        return {
+            "handler": self.name,
+            "event": self.event,
+            "types": list(self.types) if self.types else None,
+            "ordered": self.ordered,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "last_error": self.last_error,
+        }
+
+
+class EventBus:
+    """
+    Bus sự kiện cho plugin: subscribe theo loại sự kiện (và loại JSON), publish đồng thời.
+    """
+
+    def __init__(self) -> None:
+        self._routes: Dict[str, List[Subscription]] = {}
+        self._subscriptions: List[Subscription] = []
+        self._published: Dict[str, int] = {}
+        self._unrouted: Dict[str, int] = {}
+
+    def subscribe(
+        self,
+        event: str,
+        handler: Handler,
+        name: Optional[str] = None,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        ordered: bool = False,
+        types: Optional[Iterable[str]] = None,
+    ) -> Callable[[], None]:
+        """
+        Đăng ký handler cho sự kiện; types giới hạn theo route (vd. "type" của JSON).
+
+        Trả về hàm hủy đăng ký.
+        """
+        sub = Subscription(
+            event,
+            handler,
+            name or getattr(handler, "__qualname__", repr(handler)),
+            timeout=timeout,
+            ordered=ordered,
+            types=types,
+        )
+        keys = [f"{event}:{t}" for t in sub.types] if sub.types else [event]
+        for key in keys:
+            self._routes.setdefault(key, []).append(sub)
+        self._subscriptions.append(sub)
+
+        def unsubscribe():
+            for key in keys:
+                subs = self._routes.get(key)
+                if subs and sub in subs:
+                    subs.remove(sub)
+            if sub in self._subscriptions:
+                self._subscriptions.remove(sub)
+
+        return unsubscribe
+
+    def subscribers(self, event: str, route: Optional[str] = None) -> List[Subscription]:
+        subs = list(self._routes.get(event, ()))
+        if route is not None:
+            subs.extend(self._routes.get(f"{event}:{route}", ()))
+        return subs
+
+    async def publish(self, event: str, payload: Any, route: Optional[str] = None) -> int:
+        """
+        Phát sự kiện tới các subscriber khớp; chờ tất cả xong (lỗi không lan ra ngoài).
+
+        Trả về số handler đã nhận.
+        """
+        self._published[event] = self._published.get(event, 0) + 1
+        subs = self.subscribers(event, route)
+        if not subs:
+            key = f"{event}:{route}" if route is not None else event
+            self._unrouted[key] = self._unrouted.get(key, 0) + 1
+            return 0
+        if len(subs) == 1:
+            await subs[0].deliver(payload)
+        else:
+            await asyncio.gather(*(sub.deliver(payload) for sub in subs))
+        return len(subs)
+
+    async def publish_json(self, message: Any) -> int:
+        """
+        Định tuyến tin nhắn JSON theo trường "type".
+        """
+        route = message.get("type") if isinstance(message, dict) else None
+        return await self.publish(
+            EVENT_INCOMING_JSON, message, route if isinstance(route, str) else None
+        )
+
+    def stats(self) -> dict:
+        return {
+            "published": dict(self._published),
+            "unrouted": dict(self._unrouted),
+            "handlers": [sub.stats() for sub in self._subscriptions],
+        }
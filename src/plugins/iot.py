@@ -5,6 +5,7 @@ from src.plugins.base import Plugin
 
 class IoTPlugin(Plugin):
     name = "iot"
+    json_types = ("iot",)
 
     def __init__(self) -> None:
         super().__init__()
@@ -29,11 +30,11 @@ class IoTPlugin(Plugin):
             from src.iot.thing_manager import ThingManager
 
             manager = ThingManager.get_instance()
-            descriptors_json = await manager.get_descriptors_json()
-            await self.app.protocol.send_iot_descriptors(descriptors_json)
+            descriptors = await manager.get_descriptors()
+            await self.app.protocol.send_iot_descriptors(descriptors)
 
-            changed, states_json = await manager.get_states_json(delta=False)
-            await self.app.protocol.send_iot_states(states_json)
+            changed, states = await manager.get_states(delta=False)
+            await self.app.protocol.send_iot_states(states)
         except Exception:
             pass
 
@@ -63,9 +64,9 @@ class IoTPlugin(Plugin):
 
             try:
                 # Sau khi thực thi, gửi trạng thái mới nhất (chỉ những thay đổi)
-                changed, states_json = await manager.get_states_json(delta=True)
+                changed, states = await manager.get_states(delta=True)
                 if changed:
-                    await self.app.protocol.send_iot_states(states_json)
+                    await self.app.protocol.send_iot_states(states)
             except Exception:
                 pass
         except Exception:
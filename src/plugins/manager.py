@@ -1,16 +1,40 @@
-from typing import Any, List
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.utils.logging_config import get_logger
 
 from .base import Plugin
+from .event_bus import (
+    EVENT_DEVICE_STATE,
+    EVENT_INCOMING_AUDIO,
+    EVENT_INCOMING_JSON,
+    EVENT_PROTOCOL_CONNECTED,
+    EventBus,
+)
+
+logger = get_logger(__name__)
+
+# Hook của plugin -> loại sự kiện trên bus
+_EVENT_HOOKS = (
+    ("on_protocol_connected", EVENT_PROTOCOL_CONNECTED),
+    ("on_incoming_json", EVENT_INCOMING_JSON),
+    ("on_incoming_audio", EVENT_INCOMING_AUDIO),
+    ("on_device_state_changed", EVENT_DEVICE_STATE),
+)
 
 
 class PluginManager:
     """
     Trình quản lý plugin nhẹ: Thống nhất phát setup/start/stop/shutdown; cách ly lỗi.
+
+    Sự kiện (JSON, audio, trạng thái...) đi qua EventBus: chỉ plugin có hook thật mới nhận.
     """
 
     def __init__(self) -> None:
         self._plugins: List[Plugin] = []
         self._by_name: dict[str, Plugin] = {}
+        self.bus = EventBus()
 
     def register(self, *plugins: Plugin) -> None:
         for p in plugins:
@@ -22,6 +46,24 @@ class PluginManager:
                         self._by_name[name] = p
                 except Exception:
                     pass
+                self._subscribe(p)
+
+    def _subscribe(self, p: Plugin) -> None:
+        """
+        Đăng ký các hook được plugin ghi đè (hook rỗng của lớp cơ sở bị bỏ qua).
+        """
+        plugin_name = getattr(p, "name", None) or type(p).__name__
+        for hook, event in _EVENT_HOOKS:
+            if getattr(type(p), hook, None) is getattr(Plugin, hook):
+                continue
+            self.bus.subscribe(
+                event,
+                getattr(p, hook),
+                name=f"{plugin_name}.{hook}",
+                timeout=p.event_timeout,
+                ordered=event in p.ordered_events,
+                types=p.json_types if event == EVENT_INCOMING_JSON else None,
+            )
 
     def get_plugin(self, name: str) -> Plugin | None:
         """
@@ -32,48 +74,99 @@ class PluginManager:
         except Exception:
             return None
 
-    async def setup_all(self, app: Any) -> None:
-        for p in list(self._plugins):
-            try:
-                await p.setup(app)
-            except Exception:
-                # Lỗi không chặn các plugin khác
-                pass
+    async def setup_all(self, app: Any, timeline: Any = None) -> None:
+        await self._run_phase("setup", lambda p: p.setup(app), timeline)
 
-    async def start_all(self) -> None:
-        for p in list(self._plugins):
+    async def start_all(self, timeline: Any = None) -> None:
+        await self._run_phase("start", lambda p: p.start(), timeline)
+
+    def _dependencies(self, p: Plugin, phase: str) -> List[str]:
+        deps = p.depends_on
+        if phase == "setup" and p.setup_depends_on is not None:
+            deps = p.setup_depends_on
+        # Phụ thuộc chưa đăng ký (vd. audio khi NO_AUDIO) được bỏ qua
+        return [d for d in deps if d in self._by_name and self._by_name[d] is not p]
+
+    def _has_cycle(self, phase: str) -> bool:
+        visiting, done = set(), set()
+
+        def visit(name: str) -> bool:
+            if name in done:
+                return False
+            if name in visiting:
+                return True
+            visiting.add(name)
+            for dep in self._dependencies(self._by_name[name], phase):
+                if visit(dep):
+                    return True
+            visiting.discard(name)
+            done.add(name)
+            return False
+
+        return any(visit(name) for name in list(self._by_name))
+
+    async def _run_phase(
+        self,
+        phase: str,
+        call: Callable[[Plugin], Awaitable[None]],
+        timeline: Any = None,
+    ) -> None:
+        """
+        Chạy một giai đoạn cho mọi plugin: mỗi plugin chờ các phụ thuộc của nó, còn lại song song.
+        """
+        plugins = list(self._plugins)
+        if self._has_cycle(phase):
+            logger.warning(f"⚠️ Phụ thuộc plugin bị vòng ({phase}), chạy tuần tự theo thứ tự đăng ký")
+            for p in plugins:
+                await self._run_one(p, phase, call, timeline)
+            return
+
+        finished: Dict[str, asyncio.Event] = {
+            name: asyncio.Event() for name in self._by_name
+        }
+
+        async def run(p: Plugin) -> None:
             try:
-                await p.start()
-            except Exception:
-                pass
+                for dep in self._dependencies(p, phase):
+                    await finished[dep].wait()
+                await self._run_one(p, phase, call, timeline)
+            finally:
+                event: Optional[asyncio.Event] = finished.get(getattr(p, "name", None))
+                if event is not None:
+                    event.set()
+
+        await asyncio.gather(*(run(p) for p in plugins))
+
+    async def _run_one(self, p: Plugin, phase: str, call, timeline: Any) -> None:
+        name = getattr(p, "name", None) or type(p).__name__
+        started = time.monotonic()
+        ok = True
+        try:
+            await call(p)
+        except Exception as e:
+            # Lỗi không chặn các plugin khác
+            ok = False
+            logger.warning(f"⚠️ Plugin {name}.{phase} lỗi: {e}", exc_info=True)
+        if timeline is not None:
+            timeline.record(f"plugin:{name}:{phase}", started, ok)
 
     async def notify_protocol_connected(self, protocol: Any) -> None:
-        for p in list(self._plugins):
-            try:
-                p.on_protocol_connected and await p.on_protocol_connected(protocol)
-            except Exception:
-                pass
+        await self.bus.publish(EVENT_PROTOCOL_CONNECTED, protocol)
 
     async def notify_incoming_json(self, message: Any) -> None:
-        for p in list(self._plugins):
-            try:
-                await p.on_incoming_json(message)
-            except Exception:
-                pass
+        await self.bus.publish_json(message)
 
     async def notify_incoming_audio(self, data: bytes) -> None:
-        for p in list(self._plugins):
-            try:
-                await p.on_incoming_audio(data)
-            except Exception:
-                pass
+        await self.bus.publish(EVENT_INCOMING_AUDIO, data)
 
     async def notify_device_state_changed(self, state: Any) -> None:
-        for p in list(self._plugins):
-            try:
-                await p.on_device_state_changed(state)
-            except Exception:
-                pass
+        await self.bus.publish(EVENT_DEVICE_STATE, state)
+
+    def event_stats(self) -> dict:
+        """
+        Thống kê phát sự kiện: số lần phát, tin không có người nhận, độ trễ/lỗi từng handler.
+        """
+        return self.bus.stats()
 
     async def stop_all(self) -> None:
         # Thứ tự ngược lại an toàn hơn
@@ -1,23 +1,29 @@
 from typing import Any, Optional
 
+from src.constants.constants import DeviceState
 from src.mcp.mcp_server import McpServer
 from src.plugins.base import Plugin
 
 
 class McpPlugin(Plugin):
     name = "mcp"
+    json_types = ("mcp",)
+    # tools/call chạy ngay trong hook (tìm nhạc, chụp ảnh...): cho phép lâu hơn mặc định
+    event_timeout = 60.0
 
     def __init__(self) -> None:
         super().__init__()
         self.app: Any = None
         self._server: Optional[McpServer] = None
+        self._spoke = False
+        self._warm_up_done = False
 
     async def setup(self, app: Any) -> None:
         self.app = app
         self._server = McpServer.get_instance()
 
-        # Gửi phản hồi MCP qua giao thức ứng dụng
-        async def _send(msg: str):
+        # Gửi phản hồi MCP qua giao thức ứng dụng (msg là dict, transport tự serialize)
+        async def _send(msg: Any):
             try:
                 if not self.app or not getattr(self.app, "protocol", None):
                     return
@@ -29,20 +35,31 @@ class McpPlugin(Plugin):
             self._server.set_send_callback(_send)
             # Đăng ký các công cụ chung (bao gồm lịch). Dịch vụ nhắc nhở được quản lý bởi CalendarPlugin.
             self._server.add_common_tools()
-            # Nếu trình phát nhạc tồn tại, trỏ tham chiếu app của nó về ứng dụng hiện tại (dùng cập nhật UI trong chế độ example)
-            try:
-                from src.mcp.tools.music import get_music_player_instance
-
-                player = get_music_player_instance()
-                try:
-                    player.app = self.app
-                except Exception:
-                    pass
-            except Exception:
-                pass
+            # Khi gói nhạc được nạp (có thể lười), trỏ tham chiếu app của trình phát về ứng dụng hiện tại
+            self._server.tool_registry.when_loaded("music", self._attach_music_player)
         except Exception:
             pass
 
+    def _attach_music_player(self) -> None:
+        from src.mcp.tools.music import get_music_player_instance
+
+        get_music_player_instance().app = self.app
+
+    async def on_device_state_changed(self, state: Any) -> None:
+        # Sau hội thoại đầu tiên (SPEAKING -> IDLE), làm ấm các gói trong MCP.WARM_UP_TOOLS
+        if self._warm_up_done or self._server is None:
+            return
+        if state == DeviceState.SPEAKING:
+            self._spoke = True
+            return
+        if state != DeviceState.IDLE or not self._spoke:
+            return
+        self._warm_up_done = True
+        names = self.app.config.get_config("MCP.WARM_UP_TOOLS", []) if self.app else []
+        if names:
+            targets = None if names == "all" else list(names)
+            self.app.spawn(self._server.tool_registry.warm_up(targets), "mcp:warm-up")
+
     async def on_incoming_json(self, message: Any) -> None:
         if not isinstance(message, dict):
             return
@@ -296,6 +296,9 @@ class PluginShortcutManager:
 
 class ShortcutsPlugin(Plugin):
     name = "shortcuts"
+    # start gắn display của UI
+    depends_on = ("ui",)
+    setup_depends_on = ()
 
     def __init__(self) -> None:
         super().__init__()
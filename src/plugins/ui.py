@@ -8,6 +8,8 @@ class UIPlugin(Plugin):
     """Plugin UI - Quản lý hiển thị CLI/GUI"""
 
     name = "ui"
+    json_types = ("tts", "stt", "llm")
+    ordered_events = ("json", "device_state")
 
     # Bản đồ văn bản trạng thái thiết bị
     STATE_TEXT_MAP = {
@@ -92,7 +94,7 @@ class UIPlugin(Plugin):
         """
         Đóng gói hàm coroutine thành lambda có thể lên lịch.
         """
-        return lambda: self.app.spawn(coro_func(), name="ui:callback")
+        return lambda: self.app.spawn(coro_func(), name="ui:callback", group="ui")
 
     async def on_incoming_json(self, message: Any) -> None:
         """
@@ -1,49 +1,90 @@
-from typing import Any
+import asyncio
+import time
+from typing import Any, Optional
 
+from src.audio_processing.kws_model_registry import get_kws_model_registry
 from src.constants.constants import AbortReason
 from src.plugins.base import Plugin
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
 
 
 class WakeWordPlugin(Plugin):
     name = "wake_word"
+    # start cần audio_codec; mô hình được nạp trong nền từ đầu Application.run
+    depends_on = ("audio",)
+    setup_depends_on = ()
 
     def __init__(self) -> None:
         super().__init__()
         self.app = None
         self.detector = None
+        self._ready_task: Optional[asyncio.Task] = None
 
     async def setup(self, app: Any) -> None:
         self.app = app
+        # Application.run đã nạp trước mô hình; gọi lại ở đây phòng khi plugin dùng riêng lẻ
+        get_kws_model_registry().preload_from_config()
+
+    async def start(self) -> None:
+        # Cần bộ giải mã âm thanh để cung cấp dữ liệu PCM thô
+        audio_codec = getattr(self.app, "audio_codec", None)
+        if audio_codec is None:
+            logger.warning("WakeWordPlugin: audio_codec not found in app, detection will not start.")
+            return
+        # Không chặn start_all/giai đoạn mạng: chờ mô hình nạp xong trong nền rồi mới bật phát hiện
+        self._ready_task = asyncio.create_task(self._start_detector(audio_codec))
+
+    async def _start_detector(self, audio_codec) -> None:
+        started = time.monotonic()
         try:
             from src.audio_processing.wake_word_detect import WakeWordDetector
 
-            self.detector = WakeWordDetector()
-            if not getattr(self.detector, "enabled", False):
-                self.detector = None
+            # Lấy mô hình từ registry trong luồng riêng (có thể chờ lượt nạp trước chưa xong)
+            detector = await asyncio.to_thread(WakeWordDetector)
+            if not getattr(detector, "enabled", False):
                 return
 
             # Gắn kết callback
-            self.detector.on_detected(self._on_detected)
-            self.detector.on_error = self._on_error
-        except Exception:
-            self.detector = None
+            detector.on_detected(self._on_detected)
+            detector.on_error = self._on_error
+            self.detector = detector
+            ok = await detector.start(audio_codec)
+            timeline = getattr(self.app, "startup_timeline", None)
+            if timeline is not None:
+                timeline.record("wake_word:ready", started, ok)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"WakeWordPlugin: không thể khởi động bộ phát hiện: {e}", exc_info=True)
 
-    async def start(self) -> None:
+    @property
+    def enabled(self) -> bool:
+        return bool(self.detector and self.detector.enabled)
+
+    def is_listening(self) -> bool:
+        return bool(self.detector and self.detector.is_running())
+
+    async def reload_keywords(self) -> bool:
+        """
+        Áp dụng thay đổi từ khóa/ngưỡng: chỉ biên dịch lại đồ thị từ khóa, giữ mô hình đã nạp.
+        """
         if not self.detector:
-            return
-        try:
-            # Cần bộ giải mã âm thanh để cung cấp dữ liệu PCM thô
-            audio_codec = getattr(self.app, "audio_codec", None)
-            if audio_codec is None:
-                from src.utils.logging_config import get_logger
-                logger = get_logger(__name__)
-                logger.warning("WakeWordPlugin: audio_codec not found in app, detection will not start.")
-                return
-            await self.detector.start(audio_codec)
-        except Exception:
-            pass
+            return False
+        return await self.detector.reload_keywords()
+
+    async def _cancel_ready_task(self) -> None:
+        if self._ready_task and not self._ready_task.done():
+            self._ready_task.cancel()
+            try:
+                await self._ready_task
+            except asyncio.CancelledError:
+                pass
+        self._ready_task = None
 
     async def stop(self) -> None:
+        await self._cancel_ready_task()
         if self.detector:
             try:
                 await self.detector.stop()
@@ -51,6 +92,7 @@ class WakeWordPlugin(Plugin):
                 pass
 
     async def shutdown(self) -> None:
+        await self._cancel_ready_task()
         if self.detector:
             try:
                 await self.detector.stop()
@@ -59,11 +101,12 @@ class WakeWordPlugin(Plugin):
 
     async def _on_detected(self, wake_word, full_text):
         # Phát hiện từ đánh thức: chuyển sang đối thoại tự động (tự động chọn thời gian thực/dừng tự động dựa trên AEC)
-        from src.utils.logging_config import get_logger
-        logger = get_logger(__name__)
-        
         try:
             logger.info(f"🎤 WakeWordPlugin: Detected '{wake_word}' - '{full_text}'")
+
+            # Âm báo xác nhận ngay lập tức (trộn đè nếu đang phát TTS)
+            if hasattr(self.app, "play_earcon"):
+                self.app.play_earcon("wake")
             
             # Nếu đang nói, để logic ngắt/máy trạng thái của ứng dụng xử lý
             if hasattr(self.app, "device_state") and hasattr(
@@ -1,15 +1,15 @@
 import asyncio
-import json
 import socket
-import threading
 import time
 
 import paho.mqtt.client as mqtt
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
 from src.constants.constants import AudioConfig
+from src.network.dns_cache import get_dns_cache, open_racing_socket
+from src.network.link_quality import LinkEstimate, get_link_probe
 from src.protocols.protocol import Protocol
+from src.protocols.udp_audio import AesCtrCodec, ReorderBuffer, UdpAudioProtocol
+from src.utils import json_codec
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
 
@@ -17,16 +17,42 @@ from src.utils.logging_config import get_logger
 logger = get_logger(__name__)
 
 
+class _PreconnectedMqttClient(mqtt.Client):
+    """
+    Client paho nhận socket TCP đã kết nối sẵn (DnsCache + đua IPv4/IPv6) cho lần
+    kết nối đầu. TLS vẫn do paho bọc lên socket đó với tên miền gốc (SNI/chứng chỉ).
+    Các lần paho tự kết nối lại không có socket sẵn thì dùng đường mặc định.
+    """
+
+    preconnected_socket = None
+
+    def _create_socket_connection(self):
+        sock, self.preconnected_socket = self.preconnected_socket, None
+        if sock is None:
+            return super()._create_socket_connection()
+        sock.setblocking(True)
+        sock.settimeout(getattr(self, "_connect_timeout", 5.0))
+        return sock
+
+
 class MqttProtocol(Protocol):
     def __init__(self, loop):
         super().__init__()
         self.loop = loop
         self.config = ConfigManager.get_instance()
         self.mqtt_client = None
-        self.udp_socket = None
-        self.udp_thread = None
-        self.udp_running = False
+        # Kênh UDP chạy trên event loop (create_datagram_endpoint)
+        self.udp_transport = None
+        self.udp_protocol = None
+        self._udp_crypto = None
+        self._last_udp_stats = None
+        # Họ địa chỉ (IPv4/IPv6) của kết nối broker gần nhất, dùng chọn địa chỉ UDP
+        self._preferred_family = socket.AF_INET
         self.connected = False
+        # Độ sâu jitter buffer UDP (window, max_delay_ms) theo chất lượng đường truyền
+        self._jitter_params = (4, 40.0)
+        # Đăng ký LinkQualityBus khi kết nối, hủy khi đóng (probe là singleton toàn cục)
+        self._unsubscribe_link = None
 
         # Giám sát trạng thái kết nối
         self._is_closing = False
@@ -95,6 +121,9 @@ class MqttProtocol(Protocol):
             logger.warning("Kết nối đang đóng, hủy các nỗ lực kết nối mới")
             return False
 
+        if self._unsubscribe_link is None:
+            self._unsubscribe_link = get_link_probe().bus.subscribe(self._on_link_estimate)
+
         # Đặt lại sự kiện hello
         self.server_hello_event = asyncio.Event()
 
@@ -157,7 +186,7 @@ class MqttProtocol(Protocol):
             return False
 
         # Tạo client MQTT mới
-        self.mqtt_client = mqtt.Client(client_id=self.client_id)
+        self.mqtt_client = _PreconnectedMqttClient(client_id=self.client_id)
         self.mqtt_client.username_pw_set(self.username, self.password)
 
         # Quyết định xem có định cấu hình kết nối mã hóa TLS dựa trên cổng hay không
@@ -227,8 +256,8 @@ class MqttProtocol(Protocol):
                         lambda: self._on_connection_state_changed(False, reason)
                     )
 
-                # Dừng luồng nhận UDP
-                self._stop_udp_receiver()
+                # Đóng kênh UDP (transport thuộc event loop)
+                self.loop.call_soon_threadsafe(self._stop_udp_receiver)
 
                 # Chỉ thử kết nối lại khi ngắt bất thường và bật tự động kết nối lại
                 if (
@@ -288,6 +317,9 @@ class MqttProtocol(Protocol):
         try:
             # Kết nối đến máy chủ MQTT, cấu hình khoảng thời gian keepalive
             logger.info(f"Đang kết nối đến máy chủ MQTT: {host}:{port}")
+            self.mqtt_client.preconnected_socket = await self._race_broker_socket(
+                host, port
+            )
             self.mqtt_client.connect_async(
                 host, port, keepalive=self._keep_alive_interval
             )
@@ -320,7 +352,7 @@ class MqttProtocol(Protocol):
             }
 
             # Gửi tin nhắn và chờ phản hồi
-            if not await self.send_text(json.dumps(hello_message)):
+            if not await self.send_text(hello_message):
                 logger.error("Gửi tin nhắn hello thất bại")
                 return False
 
@@ -332,23 +364,9 @@ class MqttProtocol(Protocol):
                     await self._on_network_error("Chờ phản hồi quá thời gian")
                 return False
 
-            # Tạo socket UDP
+            # Mở kênh UDP trên event loop
             try:
-                if self.udp_socket:
-                    self.udp_socket.close()
-
-                self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                self.udp_socket.settimeout(0.5)
-
-                # Khởi động luồng nhận UDP
-                if self.udp_thread and self.udp_thread.is_alive():
-                    self.udp_running = False
-                    self.udp_thread.join(1.0)
-
-                self.udp_running = True
-                self.udp_thread = threading.Thread(target=self._udp_receive_thread)
-                self.udp_thread.daemon = True
-                self.udp_thread.start()
+                await self._open_udp_channel()
 
                 self.connected = True
                 self._reconnect_attempts = 0  # Đặt lại bộ đếm kết nối lại
@@ -357,6 +375,9 @@ class MqttProtocol(Protocol):
                 if self._on_connection_state_changed:
                     self._on_connection_state_changed(True, "Kết nối thành công")
 
+                # Gửi lại các tin nhắn bị giữ trong lúc mất kết nối (session_id mới)
+                await self._replay_outbound()
+
                 return True
             except Exception as e:
                 logger.error(f"Tạo socket UDP thất bại: {e}")
@@ -375,7 +396,7 @@ class MqttProtocol(Protocol):
         Xử lý tin nhắn MQTT.
         """
         try:
-            data = json.loads(payload)
+            data = json_codec.loads(payload)
             msg_type = data.get("type")
 
             if msg_type == "goodbye":
@@ -438,91 +459,95 @@ class MqttProtocol(Protocol):
                             self._on_incoming_json(json_data)
 
                     self.loop.call_soon_threadsafe(process_json)
-        except json.JSONDecodeError:
+        except json_codec.JSONDecodeError:
             logger.error(f"Dữ liệu JSON không hợp lệ: {payload}")
         except Exception as e:
             logger.error(f"Lỗi khi xử lý tin nhắn MQTT: {e}")
 
-    def _udp_receive_thread(self):
-        """Luồng nhận UDP.
+    async def _race_broker_socket(self, host: str, port: int):
+        """
+        Mở socket TCP tới broker qua DnsCache chung + đua IPv4/IPv6 rồi giao cho paho
+        (paho tự thử từng địa chỉ tuần tự trong thread của nó). Lỗi thì trả None để
+        paho tự kết nối như cũ.
+        """
+        try:
+            sock = await open_racing_socket(host, port, timeout=5.0)
+        except Exception as e:
+            logger.warning(f"Đua địa chỉ broker thất bại, để paho tự kết nối: {e}")
+            return None
+        self._preferred_family = sock.family
+        return sock
 
-        Tham khảo cách triển khai của audio_player.py
+    async def _open_udp_channel(self):
+        """
+        Tạo endpoint UDP bằng asyncio; key/nonce AES được giải mã một lần cho cả phiên.
         """
+        self._stop_udp_receiver()
+        self._udp_crypto = AesCtrCodec(self.aes_key, self.aes_nonce)
+        loop = asyncio.get_running_loop()
+        # UDP không có bắt tay để đua: ưu tiên họ địa chỉ vừa kết nối được với broker,
+        # họ kia (vd. IPv6 khi Pi chỉ có IPv4) chỉ thử khi không mở được endpoint
+        addrs = await get_dns_cache().resolve(self.udp_server, self.udp_port)
+        addrs = sorted(addrs, key=lambda a: a[0] != self._preferred_family)
+        last_error = None
+        for family, sockaddr in addrs:
+            try:
+                self.udp_transport, self.udp_protocol = await loop.create_datagram_endpoint(
+                    lambda: UdpAudioProtocol(
+                        self._udp_crypto,
+                        self._on_incoming_audio,
+                        self._on_udp_lost,
+                        ReorderBuffer(
+                            window=self._jitter_params[0],
+                            max_delay_ms=self._jitter_params[1],
+                            frame_ms=AudioConfig.FRAME_DURATION,
+                        ),
+                    ),
+                    remote_addr=sockaddr[:2],
+                    family=family,
+                )
+                break
+            except OSError as e:
+                last_error = e
+                logger.warning(f"Không mở được kênh UDP tới {sockaddr[0]}: {e}")
+        else:
+            raise last_error or OSError(f"Không có địa chỉ UDP cho {self.udp_server}")
         logger.info(
-            f"Luồng nhận UDP đã khởi động, đang lắng nghe dữ liệu từ {self.udp_server}:{self.udp_port}"
+            f"Kênh UDP đã mở, đang lắng nghe dữ liệu từ {self.udp_server}:{self.udp_port}"
         )
 
-        self.udp_running = True
-        debug_counter = 0
-
-        while self.udp_running:
-            try:
-                data, addr = self.udp_socket.recvfrom(4096)
-                debug_counter += 1
-
-                try:
-                    # Xác minh gói dữ liệu
-                    if len(data) < 16:  # Cần ít nhất 16 byte nonce
-                        logger.error(f"Kích thước gói dữ liệu âm thanh không hợp lệ: {len(data)}")
-                        continue
-
-                    # Tách nonce và dữ liệu mã hóa
-                    received_nonce = data[:16]
-                    encrypted_audio = data[16:]
-
-                    # Sử dụng AES-CTR để giải mã
-                    decrypted = self.aes_ctr_decrypt(
-                        bytes.fromhex(self.aes_key), received_nonce, encrypted_audio
-                    )
-
-                    # Thông tin gỡ lỗi
-                    if debug_counter % 100 == 0:
-                        logger.debug(
-                            f"Đã giải mã gói dữ liệu âm thanh #{debug_counter}, kích thước: {len(decrypted)} byte"
-                        )
-
-                    # Xử lý dữ liệu âm thanh sau giải mã
-                    if self._on_incoming_audio:
-
-                        def process_audio(audio_data=decrypted):
-                            if asyncio.iscoroutinefunction(self._on_incoming_audio):
-                                coro = self._on_incoming_audio(audio_data)
-                                if coro is not None:
-                                    asyncio.create_task(coro)
-                            else:
-                                self._on_incoming_audio(audio_data)
-
-                        self.loop.call_soon_threadsafe(process_audio)
-
-                except Exception as e:
-                    logger.error(f"Lỗi xử lý gói dữ liệu âm thanh: {e}")
-                    continue
-
-            except socket.timeout:
-                # Quá thời gian chờ là bình thường, tiếp tục vòng lặp
-                pass
-            except Exception as e:
-                logger.error(f"Lỗi luồng nhận UDP: {e}")
-                if not self.udp_running:
-                    break
-                time.sleep(0.1)  # Tránh tiêu thụ quá nhiều CPU trong trường hợp lỗi
+    def _on_udp_lost(self, exc):
+        if exc is not None:
+            logger.warning(f"Kênh UDP bị đóng: {exc}")
+        self.udp_transport = None
 
-        logger.info("Luồng nhận UDP đã dừng")
+    async def _transmit(self, message):
+        if not self.mqtt_client or not self.mqtt_client.is_connected():
+            raise ConnectionError("MQTT chưa kết nối")
+        result = self.mqtt_client.publish(
+            self.publish_topic, json_codec.ensure_text(message)
+        )
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            raise ConnectionError(mqtt.error_string(result.rc))
+        result.wait_for_publish()
 
     async def send_text(self, message):
         """
-        Gửi tin nhắn văn bản.
+        Gửi tin nhắn văn bản. Mất kết nối thì tin điều khiển/MCP/IoT được giữ để phát lại.
         """
         if not self.mqtt_client:
+            if not self._is_closing and self._queue_outbound(message):
+                return False
             logger.error("Client MQTT chưa được khởi tạo")
             return False
 
         try:
-            result = self.mqtt_client.publish(self.publish_topic, message)
-            result.wait_for_publish()
+            await self._transmit(message)
             return True
         except Exception as e:
             logger.error(f"Gửi tin nhắn MQTT thất bại: {e}")
+            if not self._is_closing:
+                self._queue_outbound(message)
             if self._on_network_error:
                 await self._on_network_error(f"Gửi tin nhắn MQTT thất bại: {e}")
             return False
@@ -532,30 +557,20 @@ class MqttProtocol(Protocol):
 
         Tham khảo cách triển khai của audio_sender.py
         """
-        if not self.udp_socket or not self.udp_server or not self.udp_port:
+        transport = self.udp_transport
+        if transport is None or self._udp_crypto is None or transport.is_closing():
+            # Khung âm thanh cũ vô nghĩa với phiên mới: bỏ, không giữ lại
+            self._outbound.drop_audio()
             logger.error("Kênh UDP chưa được khởi tạo")
             return False
 
         try:
-            # Tạo nonce mới (tương tự như trong audio_sender.py)
-            # Định dạng: 0x01 (1 byte) + 0x00 (3 byte) + độ dài (2 byte) + nonce gốc (8 byte) + số thứ tự (8 byte)
+            # Nonce: tiền tố (2 byte) + độ dài (2 byte) + nonce gốc (8 byte) + số thứ tự (4 byte)
             self.local_sequence = (self.local_sequence + 1) & 0xFFFFFFFF
-            new_nonce = (
-                self.aes_nonce[:4]  # Tiền tố cố định
-                + format(len(audio_data), "04x")  # Độ dài dữ liệu
-                + self.aes_nonce[8:24]  # Nonce gốc
-                + format(self.local_sequence, "08x")  # Số thứ tự
-            )
+            packet = self._udp_crypto.encrypt_packet(audio_data, self.local_sequence)
 
-            encrypt_encoded_data = self.aes_ctr_encrypt(
-                bytes.fromhex(self.aes_key), bytes.fromhex(new_nonce), bytes(audio_data)
-            )
-
-            # Ghép nonce và dữ liệu mã hóa
-            packet = bytes.fromhex(new_nonce) + encrypt_encoded_data
-
-            # Gửi gói dữ liệu
-            self.udp_socket.sendto(packet, (self.udp_server, self.udp_port))
+            # Gửi gói dữ liệu (địa chỉ đích đã gắn với endpoint)
+            transport.sendto(packet)
 
             # In nhật ký mỗi 10 gói gửi đi
             if self.local_sequence % 10 == 0:
@@ -564,7 +579,6 @@ class MqttProtocol(Protocol):
                     f"{self.udp_server}:{self.udp_port}"
                 )
 
-            self.local_sequence += 1
             return True
         except Exception as e:
             logger.error(f"Gửi dữ liệu âm thanh thất bại: {e}")
@@ -590,7 +604,7 @@ class MqttProtocol(Protocol):
             # Nếu có ID phiên, gửi tin nhắn goodbye
             if self.session_id:
                 goodbye_msg = {"type": "goodbye", "session_id": self.session_id}
-                await self.send_text(json.dumps(goodbye_msg))
+                await self.send_text(goodbye_msg)
 
             # Xử lý goodbye
             await self._handle_goodbye()
@@ -616,58 +630,17 @@ class MqttProtocol(Protocol):
             return False
 
         # Kiểm tra trạng thái kết nối UDP
-        return self.udp_socket is not None and self.udp_running
-
-    def aes_ctr_encrypt(self, key, nonce, plaintext):
-        """Hàm mã hóa chế độ AES-CTR
-        Args:
-            key: Khóa mã hóa dạng bytes
-            nonce: Vector khởi tạo dạng bytes
-            plaintext: Dữ liệu gốc cần mã hóa
-        Returns:
-            Dữ liệu đã mã hóa dạng bytes
-        """
-        cipher = Cipher(
-            algorithms.AES(key), modes.CTR(nonce), backend=default_backend()
-        )
-        encryptor = cipher.encryptor()
-        return encryptor.update(plaintext) + encryptor.finalize()
-
-    def aes_ctr_decrypt(self, key, nonce, ciphertext):
-        """Hàm giải mã chế độ AES-CTR
-        Args:
-            key: Khóa giải mã dạng bytes
-            nonce: Vector khởi tạo dạng bytes (phải giống như khi mã hóa)
-            ciphertext: Dữ liệu đã mã hóa dạng bytes
-        Returns:
-            Dữ liệu gốc sau khi giải mã dạng bytes
-        """
-        cipher = Cipher(
-            algorithms.AES(key), modes.CTR(nonce), backend=default_backend()
-        )
-        decryptor = cipher.decryptor()
-        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-        return plaintext
+        return self.udp_transport is not None and not self.udp_transport.is_closing()
 
     async def _handle_goodbye(self):
         """
         Xử lý tin nhắn goodbye.
         """
+        self._unsubscribe_link_estimates()
         try:
-            # Dừng luồng nhận UDP
-            if self.udp_thread and self.udp_thread.is_alive():
-                self.udp_running = False
-                self.udp_thread.join(1.0)
-                self.udp_thread = None
-            logger.info("Luồng nhận UDP đã dừng")
-
-            # Đóng socket UDP
-            if self.udp_socket:
-                try:
-                    self.udp_socket.close()
-                except Exception as e:
-                    logger.error(f"Đóng socket UDP thất bại: {e}")
-                self.udp_socket = None
+            # Đóng kênh UDP
+            self._stop_udp_receiver()
+            logger.info("Kênh UDP đã đóng")
 
             # Dừng client MQTT
             if self.mqtt_client:
@@ -688,6 +661,7 @@ class MqttProtocol(Protocol):
             self.udp_port = 0
             self.aes_key = None
             self.aes_nonce = None
+            self._udp_crypto = None
 
             # Gọi callback đóng kênh âm thanh
             if self._on_audio_channel_closed:
@@ -698,26 +672,22 @@ class MqttProtocol(Protocol):
 
     def _stop_udp_receiver(self):
         """
-        Dừng luồng nhận UDP và đóng socket UDP.
+        Đóng endpoint UDP.
         """
-        # Đóng luồng nhận UDP
-        if (
-            hasattr(self, "udp_thread")
-            and self.udp_thread
-            and self.udp_thread.is_alive()
-        ):
-            self.udp_running = False
+        protocol = getattr(self, "udp_protocol", None)
+        if protocol is not None:
+            # Giữ thống kê của phiên vừa kết thúc cho get_connection_info / metrics
+            self._last_udp_stats = protocol.stats()
+            if self._last_udp_stats["received"]:
+                logger.info(f"📊 Phiên âm thanh UDP kết thúc: {self._last_udp_stats}")
+        transport = getattr(self, "udp_transport", None)
+        if transport is not None:
             try:
-                self.udp_thread.join(1.0)
-            except RuntimeError:
-                pass  # Xử lý trường hợp luồng đã kết thúc
-
-        # Đóng socket UDP
-        if hasattr(self, "udp_socket") and self.udp_socket:
-            try:
-                self.udp_socket.close()
+                transport.close()
             except Exception as e:
                 logger.error(f"Đóng socket UDP thất bại: {e}")
+        self.udp_transport = None
+        self.udp_protocol = None
 
     def __del__(self):
         """
@@ -881,6 +851,30 @@ class MqttProtocol(Protocol):
             self._max_reconnect_attempts = 0
             logger.info("Đã tắt tự động kết nối lại MQTT")
 
+    def _unsubscribe_link_estimates(self):
+        if self._unsubscribe_link is not None:
+            self._unsubscribe_link()
+            self._unsubscribe_link = None
+
+    def _on_link_estimate(self, estimate: LinkEstimate):
+        params = (estimate.jitter_window, estimate.jitter_max_delay_ms)
+        if params == self._jitter_params:
+            return
+        self._jitter_params = params
+        if self.udp_protocol is not None:
+            self.udp_protocol.reorder.retune(*params)
+        logger.info(
+            f"Jitter buffer UDP: {params[0]} gói / {params[1]:.0f} ms (đường truyền {estimate.grade})"
+        )
+
+    def get_send_backlog(self) -> int:
+        """
+        Số byte còn chờ trong bộ đệm gửi của kênh UDP âm thanh.
+        """
+        if self.udp_transport is None:
+            return 0
+        return self.udp_transport.get_write_buffer_size()
+
     def get_connection_info(self) -> dict:
         """Lấy thông tin kết nối.
 
@@ -903,14 +897,28 @@ class MqttProtocol(Protocol):
             "udp_server": (
                 f"{self.udp_server}:{self.udp_port}" if self.udp_server else None
             ),
+            "udp_packets_received": (
+                self.udp_protocol.received if self.udp_protocol else 0
+            ),
+            "udp_stream": self.get_udp_stream_stats(),
             "session_id": self.session_id,
+            "outbound": self.get_outbound_stats(),
         }
 
+    def get_udp_stream_stats(self):
+        """
+        Thống kê mất/trùng/lệch thứ tự/jitter của phiên UDP hiện tại (hoặc phiên gần nhất).
+        """
+        if self.udp_protocol is not None:
+            return self.udp_protocol.stats()
+        return self._last_udp_stats
+
     async def _cleanup_connection(self):
         """
         Dọn dẹp tài nguyên liên quan đến kết nối.
         """
         self.connected = False
+        self._unsubscribe_link_estimates()
 
         # Hủy tác vụ giám sát kết nối
         if self._connection_monitor_task and not self._connection_monitor_task.done():
@@ -0,0 +1,183 @@
+"""
+Outbound Queue - Giữ tin nhắn gửi đi trong lúc mất kết nối và phát lại sau khi kết nối lại.
+
+Trước đây send_text gặp ConnectionClosed thì tin nhắn mất luôn (kết quả MCP, trạng thái
+IoT, listen/abort), phiên mới bắt đầu từ đầu như chưa có gì xảy ra.
+
+Ở đây:
+- Mỗi tin nhắn được phân loại theo `type`: control (listen/abort), mcp, iot.
+  Mỗi loại có độ ưu tiên và thời hạn riêng; hello và loại lạ không được giữ.
+- Hàng đợi có giới hạn: đầy thì bỏ tin cũ nhất có ưu tiên thấp nhất.
+- Trạng thái IoT chỉ giữ bản mới nhất (bản cũ đã lỗi thời).
+- Phát lại theo đúng thứ tự gửi ban đầu, bỏ tin đã hết hạn; session_id được đổi
+  sang phiên mới.
+- Âm thanh không bao giờ được giữ (khung cũ vô nghĩa với phiên mới), chỉ đếm số khung bỏ.
+"""
+
+import itertools
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.utils import json_codec
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# kind -> (độ ưu tiên: số nhỏ = quan trọng hơn, thời hạn giây)
+REPLAY_POLICY: Dict[str, Tuple[int, float]] = {
+    "control": (0, 5.0),
+    "mcp": (1, 30.0),
+    "iot": (2, 60.0),
+}
+CONTROL_TYPES = {"listen", "abort"}
+DEFAULT_CAPACITY = 64
+
+
+def classify_message(message) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Trả về (kind, khóa gộp) của tin nhắn; kind None = không giữ lại để phát lại.
+    """
+    try:
+        data = json_codec.ensure_obj(message)
+    except (TypeError, ValueError):
+        return None, None
+    if not isinstance(data, dict):
+        return None, None
+    msg_type = data.get("type")
+    if msg_type in CONTROL_TYPES:
+        return "control", None
+    if msg_type == "mcp":
+        return "mcp", None
+    if msg_type == "iot":
+        # Chỉ trạng thái mới nhất có ý nghĩa; mô tả thiết bị thì giữ từng bản
+        return "iot", "iot:states" if "states" in data else None
+    return None, None
+
+
+class _Entry:
+    __slots__ = ("seq", "message", "kind", "priority", "expires_at", "key")
+
+    def __init__(self, seq, message, kind, priority, expires_at, key):
+        self.seq = seq
+        self.message = message
+        self.kind = kind
+        self.priority = priority
+        self.expires_at = expires_at
+        self.key = key
+
+
+class OutboundQueue:
+    """
+    Hàng đợi tin nhắn gửi đi có giới hạn, theo độ ưu tiên và thời hạn.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.capacity = capacity
+        self._clock = clock
+        self._entries: List[_Entry] = []
+        self._seq = itertools.count()
+
+        self.queued = 0
+        self.replayed = 0
+        self.expired = 0
+        self.evicted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.audio_dropped = 0
+        self.last_replay_count = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def push(self, message) -> bool:
+        """
+        Giữ tin nhắn để phát lại. Trả về False nếu loại tin này không được giữ.
+        """
+        kind, key = classify_message(message)
+        if kind is None:
+            self.rejected += 1
+            return False
+        priority, ttl = REPLAY_POLICY[kind]
+        now = self._clock()
+        self._expire(now)
+
+        if key is not None:
+            before = len(self._entries)
+            self._entries = [e for e in self._entries if e.key != key]
+            self.coalesced += before - len(self._entries)
+
+        if len(self._entries) >= self.capacity:
+            # Bỏ tin cũ nhất có ưu tiên thấp nhất; tin mới kém quan trọng hơn tất cả thì bỏ tin mới
+            victim = max(self._entries, key=lambda e: (e.priority, -e.seq))
+            if victim.priority < priority:
+                self.evicted += 1
+                return False
+            self._entries.remove(victim)
+            self.evicted += 1
+
+        self._entries.append(
+            _Entry(next(self._seq), message, kind, priority, now + ttl, key)
+        )
+        self.queued += 1
+        return True
+
+    def drop_audio(self, frames: int = 1):
+        self.audio_dropped += frames
+
+    def take_due(self) -> List[_Entry]:
+        """
+        Lấy toàn bộ tin còn hạn theo thứ tự gửi ban đầu (hàng đợi trống sau khi gọi).
+        """
+        self._expire(self._clock())
+        entries = sorted(self._entries, key=lambda e: e.seq)
+        self._entries = []
+        return entries
+
+    def restore(self, entries: List[_Entry]):
+        """
+        Trả lại các tin chưa phát lại được (giữ nguyên thứ tự và thời hạn).
+        """
+        self._entries = sorted(self._entries + list(entries), key=lambda e: e.seq)
+
+    def clear(self):
+        self._entries = []
+
+    @staticmethod
+    def rebind_session(entry: _Entry, session_id: Optional[str]):
+        """
+        Đổi session_id của tin cũ sang phiên hiện tại (chỉ khi khác).
+        """
+        message = entry.message
+        if not session_id:
+            return message
+        data = json_codec.loads(message) if isinstance(message, (str, bytes)) else dict(message)
+        if "session_id" not in data or data["session_id"] == session_id:
+            return message
+        data["session_id"] = session_id
+        return json_codec.dumps(data) if isinstance(message, (str, bytes)) else data
+
+    def stats(self) -> dict:
+        depth: Dict[str, int] = {}
+        for entry in self._entries:
+            depth[entry.kind] = depth.get(entry.kind, 0) + 1
+        return {
+            "depth": len(self._entries),
+            "depth_by_kind": depth,
+            "queued": self.queued,
+            "replayed": self.replayed,
+            "last_replay_count": self.last_replay_count,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "coalesced": self.coalesced,
+            "audio_dropped": self.audio_dropped,
+        }
+
+    def _expire(self, now: float):
+        alive = [e for e in self._entries if e.expires_at > now]
+        if len(alive) != len(self._entries):
+            self.expired += len(self._entries) - len(alive)
+            self._entries = alive
@@ -1,6 +1,6 @@
-import json
-
 from src.constants.constants import AbortReason, ListeningMode
+from src.protocols.outbound_queue import OutboundQueue
+from src.utils import json_codec
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -18,6 +18,8 @@ class Protocol:
         # Callback thay đổi trạng thái kết nối mới
         self._on_connection_state_changed = None
         self._on_reconnecting = None
+        # Tin nhắn giữ lại trong lúc mất kết nối, phát lại khi phiên mới sẵn sàng
+        self._outbound = OutboundQueue()
 
     def on_incoming_json(self, callback):
         """
@@ -68,9 +70,63 @@ class Protocol:
     async def send_text(self, message):
         """
         Phương thức trừu tượng gửi tin nhắn văn bản, cần được thực hiện trong lớp con.
+
+        message là dict (serialize một lần ở đây qua json_codec) hoặc chuỗi JSON có sẵn.
         """
         raise NotImplementedError("Phương thức send_text phải được thực hiện bởi lớp con")
 
+    async def _transmit(self, message):
+        """
+        Gửi thẳng một tin nhắn qua kết nối hiện tại (không giữ lại), lỗi thì raise.
+        Lớp con thực hiện để hỗ trợ phát lại hàng đợi gửi đi.
+        """
+        raise NotImplementedError("Phương thức _transmit phải được thực hiện bởi lớp con")
+
+    def _queue_outbound(self, message) -> bool:
+        """
+        Giữ tin nhắn chưa gửi được để phát lại sau khi kết nối lại.
+        """
+        if self._outbound.push(message):
+            logger.info(
+                f"📥 Giữ tin nhắn chờ kết nối lại (hàng đợi: {len(self._outbound)})"
+            )
+            return True
+        return False
+
+    async def _replay_outbound(self):
+        """
+        Phát lại các tin nhắn còn hạn theo thứ tự ban đầu; lỗi giữa chừng thì giữ phần còn lại.
+        """
+        entries = self._outbound.take_due()
+        if not entries:
+            return
+        sent = 0
+        for index, entry in enumerate(entries):
+            try:
+                await self._transmit(
+                    self._outbound.rebind_session(entry, self.session_id)
+                )
+            except Exception as e:
+                self._outbound.restore(entries[index:])
+                logger.warning(f"Phát lại tin nhắn bị gián đoạn: {e}")
+                break
+            sent += 1
+        self._outbound.replayed += sent
+        self._outbound.last_replay_count = sent
+        logger.info(f"📤 Đã phát lại {sent}/{len(entries)} tin nhắn sau khi kết nối lại")
+
+    def get_outbound_stats(self) -> dict:
+        """
+        Độ sâu hàng đợi gửi đi và số tin đã phát lại/hết hạn/bị bỏ.
+        """
+        return self._outbound.stats()
+
+    def get_send_backlog(self) -> int:
+        """
+        Số byte còn nằm trong bộ đệm gửi của transport (0 nếu không đo được).
+        """
+        return 0
+
     async def send_audio(self, data: bytes):
         """
         Phương thức trừu tượng gửi dữ liệu âm thanh, cần được thực hiện trong lớp con.
@@ -102,7 +158,7 @@ class Protocol:
         message = {"session_id": self.session_id, "type": "abort"}
         if reason == AbortReason.WAKE_WORD_DETECTED:
             message["reason"] = "wake_word_detected"
-        await self.send_text(json.dumps(message))
+        await self.send_text(message)
 
     async def send_wake_word_detected(self, wake_word):
         """
@@ -114,7 +170,7 @@ class Protocol:
             "state": "detect",
             "text": wake_word,
         }
-        await self.send_text(json.dumps(message))
+        await self.send_text(message)
 
     async def send_start_listening(self, mode):
         """
@@ -131,25 +187,21 @@ class Protocol:
             "state": "start",
             "mode": mode_map[mode],
         }
-        await self.send_text(json.dumps(message))
+        await self.send_text(message)
 
     async def send_stop_listening(self):
         """
         Gửi tin nhắn dừng nghe.
         """
         message = {"session_id": self.session_id, "type": "listen", "state": "stop"}
-        await self.send_text(json.dumps(message))
+        await self.send_text(message)
 
     async def send_iot_descriptors(self, descriptors):
         """
-        Gửi thông tin mô tả thiết bị IoT.
+        Gửi thông tin mô tả thiết bị IoT (danh sách dict; chuỗi JSON của mã cũ vẫn nhận).
         """
         try:
-            # Phân tích dữ liệu mô tả
-            if isinstance(descriptors, str):
-                descriptors_data = json.loads(descriptors)
-            else:
-                descriptors_data = descriptors
+            descriptors_data = json_codec.ensure_obj(descriptors)
 
             # Kiểm tra xem có phải là mảng không
             if not isinstance(descriptors_data, list):
@@ -170,7 +222,7 @@ class Protocol:
                 }
 
                 try:
-                    await self.send_text(json.dumps(message))
+                    await self.send_text(message)
                 except Exception as e:
                     logger.error(
                         f"Failed to send JSON message for IoT descriptor "
@@ -178,7 +230,7 @@ class Protocol:
                     )
                     continue
 
-        except json.JSONDecodeError as e:
+        except json_codec.JSONDecodeError as e:
             logger.error(f"Failed to parse IoT descriptors: {e}")
             return
 
@@ -186,32 +238,22 @@ class Protocol:
         """
         Gửi thông tin trạng thái thiết bị IoT.
         """
-        if isinstance(states, str):
-            states_data = json.loads(states)
-        else:
-            states_data = states
-
         message = {
             "session_id": self.session_id,
             "type": "iot",
             "update": True,
-            "states": states_data,
+            "states": json_codec.ensure_obj(states),
         }
-        await self.send_text(json.dumps(message))
+        await self.send_text(message)
 
     async def send_mcp_message(self, payload):
         """
-        Gửi tin nhắn MCP.
+        Gửi tin nhắn MCP (payload dạng dict, serialize một lần ở transport).
         """
-        if isinstance(payload, str):
-            payload_data = json.loads(payload)
-        else:
-            payload_data = payload
-
         message = {
             "session_id": self.session_id,
             "type": "mcp",
-            "payload": payload_data,
+            "payload": json_codec.ensure_obj(payload),
         }
 
-        await self.send_text(json.dumps(message))
+        await self.send_text(message)
@@ -0,0 +1,419 @@
+"""
+UDP Audio - Kênh âm thanh UDP (MQTT + UDP) chạy trực tiếp trên event loop.
+
+Trước đây: một thread riêng đọc socket chặn (timeout 0.5s); mỗi gói lại gọi
+`bytes.fromhex(aes_key)`, tạo `Cipher(...).decryptor()` mới và nhảy về loop bằng
+`run_coroutine_threadsafe`; mỗi khung gửi đi dựng nonce bằng nối chuỗi hex.
+
+Ở đây:
+- AesCtrCodec giải mã key/nonce MỘT LẦN, dựng nonce bằng `struct.pack_into` vào
+  bộ đệm dùng lại, và giữ một ngữ cảnh AES-ECB duy nhất để sinh keystream CTR
+  (tương đương AES-CTR của cryptography, không tạo Cipher cho mỗi gói).
+- UdpAudioProtocol (asyncio.DatagramProtocol) giải mã ngay trong
+  `datagram_received` và giao khung cho callback âm thanh, không qua thread.
+
+Định dạng nonce (16 byte): [0:2] tiền tố, [2:4] độ dài payload, [4:8] ssrc,
+[8:12] timestamp (ms), [12:16] số thứ tự (big-endian).
+
+Chiều nhận đi qua ReorderBuffer: sắp lại gói đến lệch thứ tự trong một cửa sổ
+nhỏ, bỏ gói trùng/đến muộn, và báo khoảng mất bằng khung rỗng (b"") để bộ giải mã
+Opus che lỗi (PLC).
+"""
+
+import asyncio
+import struct
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+NONCE_SIZE = 16
+_BLOCK = 16
+_COUNTER_MASK = (1 << 128) - 1
+_SEQ_MOD = 1 << 32
+_SEQ_HALF = 1 << 31
+_HEADER = struct.Struct(">II")  # timestamp, sequence tại offset 8
+
+# Khung rỗng gửi cho callback âm thanh: "mất một khung, hãy che lỗi"
+CONCEALED_FRAME = b""
+
+
+def seq_delta(seq: int, ref: int) -> int:
+    """
+    Khoảng cách có dấu seq - ref theo số học vòng 32 bit (chịu được tràn số thứ tự).
+    """
+    return ((seq - ref + _SEQ_HALF) % _SEQ_MOD) - _SEQ_HALF
+
+
+class ReorderBuffer:
+    """
+    Sắp xếp lại gói UDP theo số thứ tự trong một cửa sổ nhỏ và thống kê chất lượng luồng.
+
+    - Gói đúng thứ tự được giao ngay (không thêm độ trễ).
+    - Khi có khoảng trống, các gói phía sau được giữ lại tối đa `window` gói hoặc
+      `max_delay_ms`; hết hạn thì khoảng trống được coi là mất.
+    - Mỗi khung mất trả về None (tối đa `max_conceal` khung cho một khoảng) để bên
+      nhận che lỗi; khoảng dài hơn chỉ được đếm, không che.
+    - Gói trùng hoặc đến sau khi đã bị coi là mất thì bị bỏ.
+    - Gói cách xa quá `resync_gap`, sau `idle_reset_ms` im lặng, hoặc nhiều gói "cũ"
+      liên tiếp (máy chủ đặt lại số thứ tự) thì bắt đầu lại luồng.
+
+    Không an toàn đa luồng: chỉ dùng trên event loop. `push`/`expire` trả về danh
+    sách phần tử theo đúng thứ tự phát: gói gốc, hoặc None cho khung cần che lỗi.
+    """
+
+    def __init__(
+        self,
+        window: int = 4,
+        max_delay_ms: float = 40.0,
+        max_conceal: int = 2,
+        resync_gap: int = 500,
+        idle_reset_ms: float = 1000.0,
+        frame_ms: float = 60.0,
+    ):
+        self.window = max(1, int(window))
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_conceal = max(0, int(max_conceal))
+        self.resync_gap = resync_gap
+        self.idle_reset = idle_reset_ms / 1000.0
+        self.frame_ms = frame_ms
+
+        self._expected: Optional[int] = None
+        self._held: Dict[int, tuple] = {}
+        self._lost_recent = deque(maxlen=64)
+        self._behind_streak = 0
+        self._last_arrival: Optional[float] = None
+        self._prev_transit: Optional[float] = None
+
+        self.received = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.lost = 0
+        self.concealed = 0
+        self.reordered = 0
+        self.resyncs = 0
+        self.max_held = 0
+        self.jitter_ms = 0.0
+
+    def retune(self, window: int, max_delay_ms: float):
+        """
+        Đổi độ sâu cửa sổ theo chất lượng đường truyền (gói đang giữ không bị ảnh hưởng).
+        """
+        self.window = max(1, int(window))
+        self.max_delay = max_delay_ms / 1000.0
+
+    def push(self, sequence: int, timestamp: int, packet, now: Optional[float] = None) -> List:
+        """
+        Nhận một gói; trả về các phần tử sẵn sàng giao theo thứ tự (có thể rỗng).
+        """
+        if now is None:
+            now = time.monotonic()
+        self.received += 1
+        out: List = []
+
+        idle = self._last_arrival is not None and now - self._last_arrival > self.idle_reset
+        self._last_arrival = now
+
+        if self._expected is None or idle:
+            if self._held:
+                self._drain_all(out)
+            self._start(sequence)
+        else:
+            delta = seq_delta(sequence, self._expected)
+            if abs(delta) > self.resync_gap:
+                self._drain_all(out)
+                self.resyncs += 1
+                self._start(sequence)
+            elif delta < 0:
+                if self._is_lost(sequence):
+                    self.stale += 1
+                else:
+                    self.duplicates += 1
+                self._behind_streak += 1
+                if self._behind_streak < 3:
+                    return out
+                # Nhiều gói "cũ" liên tiếp: máy chủ đã đặt lại số thứ tự
+                self._drain_all(out)
+                self.resyncs += 1
+                self._start(sequence)
+            elif sequence in self._held:
+                self.duplicates += 1
+                return out
+
+        self._behind_streak = 0
+        self._update_jitter(sequence, timestamp, now)
+
+        if sequence == self._expected:
+            if self._held:
+                # Gói thiếu đến muộn nhưng vẫn kịp trong cửa sổ
+                self.reordered += 1
+            self._deliver(packet, out)
+            self._release_ready(out)
+            return out
+
+        # Có khoảng trống phía trước: giữ lại chờ gói thiếu
+        self._held[sequence] = (packet, now)
+        self.max_held = max(self.max_held, len(self._held))
+        while len(self._held) > self.window:
+            self._skip_gap(out)
+        return out
+
+    def expire(self, now: Optional[float] = None) -> List:
+        """
+        Giải phóng gói đã giữ quá `max_delay_ms` (khoảng trống phía trước coi là mất).
+        """
+        if now is None:
+            now = time.monotonic()
+        out: List = []
+        while self._held and self._oldest_held_time() + self.max_delay <= now:
+            self._skip_gap(out)
+        return out
+
+    def deadline(self) -> Optional[float]:
+        """
+        Thời điểm (monotonic) cần gọi `expire`, hoặc None nếu không giữ gói nào.
+        """
+        if not self._held:
+            return None
+        return self._oldest_held_time() + self.max_delay
+
+    def stats(self) -> dict:
+        expected_total = self.delivered + self.lost
+        return {
+            "received": self.received,
+            "delivered": self.delivered,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "lost": self.lost,
+            "concealed": self.concealed,
+            "reordered": self.reordered,
+            "resyncs": self.resyncs,
+            "held": len(self._held),
+            "max_held": self.max_held,
+            "loss_percent": round(100.0 * self.lost / expected_total, 2) if expected_total else 0.0,
+            "jitter_ms": round(self.jitter_ms, 2),
+        }
+
+    def _start(self, sequence: int):
+        self._expected = sequence
+        self._held.clear()
+        self._prev_transit = None
+
+    def _deliver(self, packet, out: List):
+        out.append(packet)
+        self.delivered += 1
+        self._expected = (self._expected + 1) % _SEQ_MOD
+
+    def _release_ready(self, out: List):
+        while self._expected in self._held:
+            packet, _ = self._held.pop(self._expected)
+            self._deliver(packet, out)
+
+    def _skip_gap(self, out: List):
+        """
+        Coi khoảng trống trước gói giữ sớm nhất là mất, rồi giao các gói liền sau nó.
+        """
+        nearest = min(self._held, key=lambda s: seq_delta(s, self._expected))
+        missing = seq_delta(nearest, self._expected)
+        for i in range(missing):
+            self._lost_recent.append((self._expected + i) % _SEQ_MOD)
+        self.lost += missing
+        conceal = min(missing, self.max_conceal)
+        self.concealed += conceal
+        out.extend([None] * conceal)
+        self._expected = nearest
+        self._release_ready(out)
+
+    def _drain_all(self, out: List):
+        while self._held:
+            self._skip_gap(out)
+
+    def _is_lost(self, sequence: int) -> bool:
+        return sequence in self._lost_recent
+
+    def _oldest_held_time(self) -> float:
+        return min(arrival for _, arrival in self._held.values())
+
+    def _update_jitter(self, sequence: int, timestamp: int, now: float):
+        # RFC 3550: J += (|D| - J) / 16; không có timestamp thì dùng seq * độ dài khung
+        sent_ms = timestamp if timestamp else sequence * self.frame_ms
+        transit = now * 1000.0 - sent_ms
+        if self._prev_transit is not None:
+            d = abs(transit - self._prev_transit)
+            self.jitter_ms += (d - self.jitter_ms) / 16.0
+        self._prev_transit = transit
+
+
+class AesCtrCodec:
+    """
+    Mã hóa/giải mã AES-CTR cho gói âm thanh UDP với key/nonce giải mã sẵn.
+
+    Không an toàn đa luồng: chỉ dùng trên event loop (send_audio và datagram_received).
+    """
+
+    def __init__(self, key_hex: str, nonce_hex: str):
+        self.key = bytes.fromhex(key_hex)
+        nonce = bytes.fromhex(nonce_hex)
+        if len(nonce) != NONCE_SIZE:
+            raise ValueError(f"Nonce phải dài {NONCE_SIZE} byte, nhận {len(nonce)}")
+        self._nonce = bytearray(nonce)
+        # Một ngữ cảnh ECB dùng suốt phiên: keystream CTR = AES(counter block)
+        self._ecb = Cipher(algorithms.AES(self.key), modes.ECB()).encryptor()
+        self._terms = {}
+
+    def build_nonce(self, length: int, sequence: int) -> bytearray:
+        """
+        Ghi độ dài + số thứ tự vào bộ đệm nonce dùng lại (trả về chính bộ đệm đó).
+        """
+        struct.pack_into(">H", self._nonce, 2, length & 0xFFFF)
+        struct.pack_into(">I", self._nonce, 12, sequence & 0xFFFFFFFF)
+        return self._nonce
+
+    def _counter_terms(self, blocks: int):
+        terms = self._terms.get(blocks)
+        if terms is None:
+            spread = sum(1 << (128 * k) for k in range(blocks))
+            offsets = sum(i << (128 * (blocks - 1 - i)) for i in range(blocks))
+            terms = self._terms[blocks] = (spread, offsets)
+        return terms
+
+    def _xor_keystream(self, counter: bytes, data) -> bytes:
+        n = len(data)
+        if n == 0:
+            return b""
+        blocks = (n + _BLOCK - 1) // _BLOCK
+        if blocks == 1:
+            counters = bytes(counter)
+        else:
+            base = int.from_bytes(counter, "big")
+            if base + blocks - 1 <= _COUNTER_MASK:
+                # Chuỗi counter block = base * R + S (R, S tính sẵn theo số block)
+                spread, offsets = self._counter_terms(blocks)
+                counters = (base * spread + offsets).to_bytes(blocks * _BLOCK, "big")
+            else:
+                counters = b"".join(
+                    ((base + i) & _COUNTER_MASK).to_bytes(_BLOCK, "big")
+                    for i in range(blocks)
+                )
+        keystream = self._ecb.update(counters)
+        value = int.from_bytes(data, "big") ^ int.from_bytes(keystream[:n], "big")
+        return value.to_bytes(n, "big")
+
+    def encrypt_packet(self, payload, sequence: int) -> bytes:
+        """
+        Trả về gói UDP hoàn chỉnh: nonce (16 byte) + payload đã mã hóa.
+        """
+        nonce = bytes(self.build_nonce(len(payload), sequence))
+        return nonce + self._xor_keystream(nonce, payload)
+
+    def decrypt_packet(self, packet: bytes) -> bytes:
+        """
+        Giải mã gói UDP nhận được (nonce nằm ở 16 byte đầu).
+        """
+        view = memoryview(packet)
+        return self._xor_keystream(view[:NONCE_SIZE], view[NONCE_SIZE:])
+
+
+class UdpAudioProtocol(asyncio.DatagramProtocol):
+    """
+    Nhận gói âm thanh UDP trên event loop, sắp lại thứ tự và giao khung đã giải mã
+    cho callback. Khung cần che lỗi được giao dưới dạng CONCEALED_FRAME (b"").
+    """
+
+    def __init__(
+        self,
+        codec: AesCtrCodec,
+        on_audio: Optional[Callable[[bytes], None]],
+        on_lost: Optional[Callable[[Optional[Exception]], None]] = None,
+        reorder: Optional[ReorderBuffer] = None,
+    ):
+        self.codec = codec
+        self.on_audio = on_audio
+        self.on_lost = on_lost
+        self.reorder = reorder if reorder is not None else ReorderBuffer()
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.received = 0
+        self.invalid = 0
+        self._expire_handle: Optional[asyncio.TimerHandle] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < NONCE_SIZE:
+            self.invalid += 1
+            logger.error(f"Kích thước gói dữ liệu âm thanh không hợp lệ: {len(data)}")
+            return
+
+        self.received += 1
+        timestamp, sequence = _HEADER.unpack_from(data, 8)
+        # Gói trùng/đến muộn bị bỏ trước khi giải mã
+        ready = self.reorder.push(sequence, timestamp, data)
+        if ready:
+            self._dispatch(ready)
+        self._schedule_expire()
+
+    def _dispatch(self, items: List):
+        for packet in items:
+            if packet is None:
+                self._emit(CONCEALED_FRAME)
+                continue
+            try:
+                decrypted = self.codec.decrypt_packet(packet)
+            except Exception as e:
+                self.invalid += 1
+                logger.error(f"Lỗi xử lý gói dữ liệu âm thanh: {e}")
+                continue
+            self._emit(decrypted)
+
+        if self.received % 100 == 0:
+            logger.debug(f"Luồng âm thanh UDP: {self.reorder.stats()}")
+
+    def _emit(self, frame: bytes):
+        callback = self.on_audio
+        if callback is None:
+            return
+        if asyncio.iscoroutinefunction(callback):
+            asyncio.create_task(callback(frame))
+        else:
+            callback(frame)
+
+    def _schedule_expire(self):
+        if self._expire_handle is not None:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+        deadline = self.reorder.deadline()
+        if deadline is None:
+            return
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, deadline - time.monotonic())
+        self._expire_handle = loop.call_later(delay, self._on_expire)
+
+    def _on_expire(self):
+        self._expire_handle = None
+        ready = self.reorder.expire()
+        if ready:
+            self._dispatch(ready)
+        self._schedule_expire()
+
+    def stats(self) -> dict:
+        stats = self.reorder.stats()
+        stats["invalid"] = self.invalid
+        return stats
+
+    def error_received(self, exc):
+        logger.warning(f"Lỗi socket UDP: {exc}")
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if self._expire_handle is not None:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+        if self.on_lost:
+            self.on_lost(exc)
@@ -0,0 +1,227 @@
+"""
+Warm Session - Giữ phiên giao thức luôn "ấm" để wake-word mở kênh không cần bắt tay.
+
+Trước đây kênh chỉ được mở lại khi cần (wake-word -> connect_protocol ->
+open_audio_channel). Nếu máy chủ đã đóng socket lúc rảnh, người dùng phải chờ
+trọn TCP + TLS + hello (thường 0.5-2s trên Pi) sau khi gọi từ đánh thức.
+
+WarmSession chạy nền:
+- Định kỳ gửi heartbeat khi rảnh (`protocol.keepalive()` nếu có) và ghi RTT.
+- Socket rơi lúc rảnh -> kết nối lại ngay (backoff tăng dần), không chờ wake-word.
+- Mạng thay đổi (đổi IP/WiFi) -> socket cũ coi như chết, chủ động mở lại khi rảnh.
+- Trước khi kết nối lại gọi `protocol.prepare()` (phân giải địa chỉ trước).
+- Ghi độ trễ mở kênh (warm = đã mở sẵn, cold = phải bắt tay) cho /api/metrics.
+- Backoff ban đầu khi kết nối lại lấy theo ước lượng chất lượng đường truyền
+  (link_quality): đường kém thì không dồn dập thử lại.
+
+Chỉ giao thức khai báo `supports_warm_session = True` (WebSocket) được tự mở
+lại; MQTT mở phiên UDP bằng hello theo từng lượt hội thoại nên chỉ đo độ trễ.
+"""
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+from src.network.link_quality import LinkEstimate, get_link_probe
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class WarmSession:
+    """
+    Quản lý phiên giao thức ấm (heartbeat, kết nối lại chủ động, đo độ trễ mở kênh).
+    """
+
+    def __init__(
+        self,
+        protocol,
+        is_idle: Optional[Callable[[], bool]] = None,
+        keepalive_interval: float = 25.0,
+        max_backoff: float = 60.0,
+    ):
+        self.protocol = protocol
+        self._is_idle = is_idle or (lambda: True)
+        self.keepalive_interval = keepalive_interval
+        self.max_backoff = max_backoff
+        self.min_backoff = 1.0
+        self._unsubscribe_link: Optional[Callable[[], None]] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._force_reconnect = False
+        self._connect: Optional[Callable] = None
+        self.background_reconnecting = False
+
+        # Thống kê
+        self.warm_opens = 0
+        self.cold_opens = 0
+        self.last_open_ms: Optional[float] = None
+        self.last_cold_open_ms: Optional[float] = None
+        self.background_reconnects = 0
+        self.failed_reconnects = 0
+        self.rtt_ms: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(self.protocol, "supports_warm_session", False))
+
+    def start(self, connect: Callable):
+        """
+        Bắt đầu giữ phiên ấm. `connect` là coroutine function mở kênh (Application.connect_protocol).
+        """
+        self._connect = connect
+        if not self.enabled:
+            return
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._keeper_loop(), name="warm-session")
+        if self._unsubscribe_link is None:
+            self._unsubscribe_link = get_link_probe().bus.subscribe(self.on_link_estimate)
+
+    def on_link_estimate(self, estimate: LinkEstimate):
+        self.min_backoff = min(estimate.reconnect_backoff, self.max_backoff)
+
+    async def stop(self):
+        if self._unsubscribe_link is not None:
+            self._unsubscribe_link()
+            self._unsubscribe_link = None
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def record_open(self, started: float, warm: bool):
+        """
+        Ghi độ trễ từ lúc yêu cầu mở kênh đến lúc kênh sẵn sàng.
+        """
+        elapsed_ms = (time.monotonic() - started) * 1000.0
+        self.last_open_ms = round(elapsed_ms, 1)
+        if warm:
+            self.warm_opens += 1
+        else:
+            self.cold_opens += 1
+            self.last_cold_open_ms = self.last_open_ms
+            logger.info(f"⏱️ Mở kênh cần bắt tay: {self.last_open_ms} ms")
+
+    def network_changed(self, reason: str = ""):
+        """
+        Báo mạng thay đổi: socket cũ có thể đã chết dù chưa phát hiện, mở lại khi rảnh.
+        """
+        if not self.enabled or self._wakeup is None:
+            return
+        logger.info(f"🔁 Mạng thay đổi ({reason}), làm mới phiên giao thức")
+        self._force_reconnect = True
+        self._wakeup.set()
+
+    def notify_closed(self):
+        """
+        Kênh vừa đóng: đánh thức vòng giữ phiên để kết nối lại sớm.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "warm_opens": self.warm_opens,
+            "cold_opens": self.cold_opens,
+            "last_open_ms": self.last_open_ms,
+            "last_cold_open_ms": self.last_cold_open_ms,
+            "background_reconnects": self.background_reconnects,
+            "failed_reconnects": self.failed_reconnects,
+            "rtt_ms": self.rtt_ms,
+        }
+
+    async def _keeper_loop(self):
+        backoff = self.min_backoff
+        try:
+            while True:
+                try:
+                    backoff = await self._keeper_iteration(backoff)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Lỗi một vòng không được dừng hẳn việc giữ phiên ấm
+                    backoff = min(backoff * 2, self.max_backoff)
+                    logger.error(f"Vòng giữ phiên ấm ngoại lệ, thử lại sau {backoff}s: {e}", exc_info=True)
+                    await asyncio.sleep(backoff)
+        except asyncio.CancelledError:
+            logger.debug("Tác vụ giữ phiên ấm bị hủy")
+            raise
+
+    async def _keeper_iteration(self, backoff: float) -> float:
+        """
+        Một vòng giữ phiên: chờ tới hạn, gửi heartbeat hoặc kết nối lại; trả về backoff mới.
+        """
+        timeout = self.keepalive_interval
+        if not self.protocol.is_audio_channel_opened():
+            timeout = backoff
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+        if not self._is_idle():
+            # Đang hội thoại: không chen heartbeat/kết nối lại
+            return backoff
+
+        opened = self.protocol.is_audio_channel_opened()
+        if opened and self._force_reconnect:
+            self._force_reconnect = False
+            await self._close_quietly()
+            opened = False
+        self._force_reconnect = False
+
+        if opened:
+            await self._keepalive()
+            return self.min_backoff
+
+        if await self._reconnect():
+            return self.min_backoff
+        return min(backoff * 2, self.max_backoff)
+
+    async def _keepalive(self):
+        keepalive = getattr(self.protocol, "keepalive", None)
+        if keepalive is None:
+            return
+        try:
+            rtt = await keepalive()
+            if rtt is not None:
+                self.rtt_ms = round(rtt * 1000.0, 1)
+        except Exception as e:
+            logger.debug(f"Heartbeat phiên ấm thất bại: {e}")
+
+    async def _reconnect(self) -> bool:
+        if self._connect is None:
+            return False
+        prepare = getattr(self.protocol, "prepare", None)
+        self.background_reconnecting = True
+        try:
+            if prepare is not None:
+                await prepare()
+            ok = await self._connect()
+        except Exception as e:
+            logger.debug(f"Kết nối lại nền thất bại: {e}")
+            ok = False
+        finally:
+            self.background_reconnecting = False
+        if ok:
+            self.background_reconnects += 1
+            logger.info("🔥 Phiên giao thức đã được làm ấm lại trong nền")
+        else:
+            self.failed_reconnects += 1
+        return ok
+
+    async def _close_quietly(self):
+        self.background_reconnecting = True
+        try:
+            await self.protocol.close_audio_channel()
+        except Exception as e:
+            logger.debug(f"Đóng phiên cũ thất bại: {e}")
+        finally:
+            self.background_reconnecting = False
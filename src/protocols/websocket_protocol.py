@@ -1,12 +1,16 @@
 import asyncio
-import json
 import ssl
 import time
+from typing import Optional
+from urllib.parse import urlparse
 
 import websockets
 
 from src.constants.constants import AudioConfig
+from src.network.dns_cache import get_dns_cache, open_racing_socket
 from src.protocols.protocol import Protocol
+from src.network.link_quality import get_link_probe
+from src.utils import json_codec
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
 
@@ -16,6 +20,9 @@ logger = get_logger(__name__)
 
 
 class WebsocketProtocol(Protocol):
+    # WarmSession được phép giữ phiên mở và tự kết nối lại khi rảnh
+    supports_warm_session = True
+
     def __init__(self):
         super().__init__()
         # Lấy phiên bản trình quản lý cấu hình
@@ -56,6 +63,57 @@ class WebsocketProtocol(Protocol):
             "Client-Id": client_id,
         }
 
+    def _server_address(self) -> tuple:
+        parsed = urlparse(self.WEBSOCKET_URL)
+        port = parsed.port or (443 if parsed.scheme == "wss" else 80)
+        return parsed.hostname, port
+
+    async def prepare(self):
+        """
+        Phân giải trước địa chỉ máy chủ (DnsCache chung) để lần kết nối sau bỏ qua DNS.
+        """
+        try:
+            host, port = self._server_address()
+            if host:
+                await get_dns_cache().resolve(host, port)
+        except Exception as e:
+            logger.debug(f"Phân giải trước địa chỉ WebSocket thất bại: {e}")
+
+    async def _connect_target(self) -> dict:
+        """
+        Mở sẵn socket TCP bằng DnsCache + đua IPv4/IPv6; lỗi thì để websockets tự kết nối.
+        """
+        try:
+            host, port = self._server_address()
+            sock = await open_racing_socket(host, port, timeout=10.0)
+            return {"sock": sock}
+        except Exception as e:
+            logger.warning(f"Kết nối đua địa chỉ thất bại, dùng kết nối mặc định: {e}")
+            return {}
+
+    async def keepalive(self) -> Optional[float]:
+        """
+        Heartbeat khi rảnh: gửi ping, chờ pong, trả về RTT (giây) hoặc None nếu chưa mở.
+        """
+        if not self.is_audio_channel_opened():
+            return None
+        try:
+            started = time.monotonic()
+            self._last_ping_time = time.time()
+            pong_waiter = await self.websocket.ping()
+            await asyncio.wait_for(pong_waiter, timeout=self._ping_timeout)
+            self._last_pong_time = time.time()
+            rtt = time.monotonic() - started
+            get_link_probe().record_rtt(rtt)
+            return rtt
+        except asyncio.TimeoutError:
+            logger.warning("Phản hồi pong nhịp tim quá thời gian")
+            await self._handle_connection_loss("Pong nhịp tim quá thời gian")
+        except Exception as e:
+            logger.warning(f"Gửi nhịp tim thất bại: {e}")
+            await self._handle_connection_loss("Gửi nhịp tim thất bại")
+        return None
+
     async def connect(self) -> bool:
         """
         Kết nối đến máy chủ WebSocket.
@@ -72,6 +130,8 @@ class WebsocketProtocol(Protocol):
             current_ssl_context = None
             if self.WEBSOCKET_URL.startswith("wss://"):
                 current_ssl_context = ssl_context
+            # Socket TCP đã kết nối qua bộ đệm DNS (websockets tự đặt SNI theo URL)
+            target = await self._connect_target()
 
             # Thiết lập kết nối WebSocket (tương thích với các phiên bản Python khác nhau)
             try:
@@ -85,6 +145,7 @@ class WebsocketProtocol(Protocol):
                     close_timeout=10,  # Thời gian chờ đóng 10 giây
                     max_size=10 * 1024 * 1024,  # Tin nhắn tối đa 10MB
                     compression=None,  # Tắt nén để cải thiện độ ổn định
+                    **target,
                 )
             except TypeError:
                 # Cách viết cũ (trong phiên bản Python trước đó)
@@ -97,6 +158,7 @@ class WebsocketProtocol(Protocol):
                     close_timeout=10,  # Thời gian chờ đóng 10 giây
                     max_size=10 * 1024 * 1024,  # Tin nhắn tối đa 10MB
                     compression=None,  # Tắt nén
+                    **target,
                 )
 
             # Khởi động vòng lặp xử lý tin nhắn (lưu tham chiếu tác vụ, có thể hủy khi đóng)
@@ -123,7 +185,7 @@ class WebsocketProtocol(Protocol):
                     "frame_duration": AudioConfig.FRAME_DURATION,
                 },
             }
-            await self.send_text(json.dumps(hello_message))
+            await self.send_text(hello_message)
 
             # Chờ phản hồi hello từ máy chủ
             try:
@@ -136,6 +198,9 @@ class WebsocketProtocol(Protocol):
                 if self._on_connection_state_changed:
                     self._on_connection_state_changed(True, "Kết nối thành công")
 
+                # Gửi lại các tin nhắn bị giữ trong lúc mất kết nối
+                await self._replay_outbound()
+
                 return True
             except asyncio.TimeoutError:
                 logger.error("Chờ phản hồi hello từ máy chủ quá thời gian")
@@ -181,6 +246,7 @@ class WebsocketProtocol(Protocol):
                 if self.websocket and not self._is_closing:
                     try:
                         self._last_ping_time = time.time()
+                        started = time.monotonic()
                         # Gửi ping và chờ phản hồi pong
                         pong_waiter = await self.websocket.ping()
                         logger.debug("Gửi ping nhịp tim")
@@ -191,6 +257,7 @@ class WebsocketProtocol(Protocol):
                                 pong_waiter, timeout=self._ping_timeout
                             )
                             self._last_pong_time = time.time()
+                            get_link_probe().record_rtt(time.monotonic() - started)
                             logger.debug("Nhận phản hồi pong nhịp tim")
                         except asyncio.TimeoutError:
                             logger.warning("Phản hồi pong nhịp tim quá thời gian")
@@ -331,6 +398,15 @@ class WebsocketProtocol(Protocol):
             self._max_reconnect_attempts = 0
             logger.info("Đã tắt tự động kết nối lại")
 
+    def get_send_backlog(self) -> int:
+        """
+        Số byte còn chờ trong bộ đệm ghi của socket WebSocket.
+        """
+        transport = getattr(self.websocket, "transport", None) if self.websocket else None
+        if transport is None:
+            return 0
+        return transport.get_write_buffer_size()
+
     def get_connection_info(self) -> dict:
         """Lấy thông tin kết nối.
 
@@ -349,6 +425,7 @@ class WebsocketProtocol(Protocol):
             "last_ping_time": self._last_ping_time,
             "last_pong_time": self._last_pong_time,
             "websocket_url": self.WEBSOCKET_URL,
+            "outbound": self.get_outbound_stats(),
         }
 
     async def _message_handler(self):
@@ -363,7 +440,7 @@ class WebsocketProtocol(Protocol):
                 try:
                     if isinstance(message, str):
                         try:
-                            data = json.loads(message)
+                            data = json_codec.loads(message)
                             msg_type = data.get("type")
                             if msg_type == "hello":
                                 # Xử lý tin nhắn hello từ máy chủ
@@ -371,7 +448,7 @@ class WebsocketProtocol(Protocol):
                             else:
                                 if self._on_incoming_json:
                                     self._on_incoming_json(data)
-                        except json.JSONDecodeError as e:
+                        except json_codec.JSONDecodeError as e:
                             logger.error(f"Tin nhắn JSON không hợp lệ: {message}, Lỗi: {e}")
                     elif isinstance(message, bytes):
                         # Tin nhắn nhị phân, có thể là âm thanh
@@ -411,6 +488,8 @@ class WebsocketProtocol(Protocol):
         Gửi dữ liệu âm thanh.
         """
         if not self.is_audio_channel_opened():
+            # Khung âm thanh cũ vô nghĩa với phiên mới: bỏ, không giữ lại
+            self._outbound.drop_audio()
             return
 
         try:
@@ -426,24 +505,34 @@ class WebsocketProtocol(Protocol):
             # Không gọi callback lỗi mạng ở đây, để bộ xử lý kết nối giải quyết
             await self._handle_connection_loss(f"Gửi âm thanh ngoại lệ: {str(e)}")
 
+    async def _transmit(self, message):
+        if not self.websocket or self.websocket.close_code is not None:
+            raise ConnectionError("WebSocket chưa kết nối")
+        await self.websocket.send(json_codec.ensure_text(message))
+
     async def send_text(self, message: str):
         """
-        Gửi tin nhắn văn bản.
+        Gửi tin nhắn văn bản. Mất kết nối thì tin điều khiển/MCP/IoT được giữ để phát lại.
         """
         if not self.websocket or self._is_closing:
-            logger.warning("WebSocket chưa kết nối hoặc đang đóng, không thể gửi tin nhắn")
+            if self._is_closing or not self._queue_outbound(message):
+                logger.warning("WebSocket chưa kết nối hoặc đang đóng, không thể gửi tin nhắn")
             return
 
         try:
-            await self.websocket.send(message)
+            # dict được serialize đúng một lần tại đây
+            await self.websocket.send(json_codec.ensure_text(message))
         except websockets.ConnectionClosed as e:
             logger.warning(f"Kết nối đóng khi gửi văn bản: {e}")
+            self._queue_outbound(message)
             await self._handle_connection_loss(f"Gửi văn bản thất bại: {e.code} {e.reason}")
         except websockets.ConnectionClosedError as e:
             logger.warning(f"Lỗi kết nối khi gửi văn bản: {e}")
+            self._queue_outbound(message)
             await self._handle_connection_loss(f"Lỗi gửi văn bản: {e.code} {e.reason}")
         except Exception as e:
             logger.error(f"Gửi tin nhắn văn bản thất bại: {e}")
+            self._queue_outbound(message)
             await self._handle_connection_loss(f"Gửi văn bản ngoại lệ: {str(e)}")
 
     def is_audio_channel_opened(self) -> bool:
@@ -0,0 +1,410 @@
+"""
+Command Runner - Dịch vụ chạy lệnh hệ thống bất đồng bộ dùng chung.
+
+Các lệnh nmcli/amixer/git/journalctl trước đây được gọi bằng subprocess.run rải rác
+(WiFiManager, web_settings, device_agent), nhiều chỗ chạy thẳng trên vòng lặp sự kiện và
+cùng một truy vấn bị chạy lặp lại nhiều lần mỗi giây.
+
+Ở đây mọi lệnh đi qua asyncio.create_subprocess_exec với:
+- Giới hạn số tiến trình chạy đồng thời theo chương trình (bỏ qua tiền tố sudo).
+- Single-flight: các lời gọi giống hệt nhau (cùng argv) đang chạy dùng chung một task;
+  lời gọi bị hủy không ảnh hưởng lời gọi khác, tiến trình chỉ bị kill khi không còn ai chờ.
+- Cache TTL ngắn cho truy vấn chỉ đọc (chỉ cache kết quả returncode == 0).
+- Thống kê thời gian chạy theo chương trình cho dashboard và /api/metrics.
+
+Mã đồng bộ (luồng nền) dùng run_blocking(): lệnh được chuyển về vòng lặp chính nếu có,
+ngược lại chạy subprocess.run nhưng vẫn dùng chung cache và thống kê. Gọi run_blocking()
+ngay trên luồng vòng lặp sẽ chặn vòng lặp: có cảnh báo và được đếm ("on_loop").
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Số tiến trình đồng thời tối đa theo chương trình
+DEFAULT_LIMITS = {
+    "nmcli": 2,
+    "amixer": 2,
+    "git": 1,
+    "journalctl": 1,
+}
+DEFAULT_LIMIT = 4
+MAX_CACHE_ENTRIES = 128
+
+
+@dataclass
+class _Flight:
+    """
+    Lệnh đang chạy dùng chung: task thực thi và số lời gọi đang chờ.
+    """
+
+    task: asyncio.Task
+    waiters: int = 0
+
+
+@dataclass
+class CommandResult:
+    """
+    Kết quả lệnh, cùng thuộc tính với subprocess.CompletedProcess.
+    """
+
+    args: List[str]
+    returncode: int
+    stdout: Any
+    stderr: Any
+    duration_ms: float = 0.0
+    cached: bool = False
+
+
+def program_of(cmd: Sequence[str]) -> str:
+    """
+    Tên chương trình dùng để giới hạn/thống kê: "sudo nmcli ..." -> "nmcli".
+    """
+    args = list(cmd)
+    while args and args[0] == "sudo":
+        args = args[1:]
+        # Bỏ các cờ của sudo (-n, -E ...)
+        while args and args[0].startswith("-"):
+            args = args[1:]
+    return os.path.basename(args[0]) if args else ""
+
+
+class CommandRunner:
+    _instance = None
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        default_limit: int = DEFAULT_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self._clock = clock
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[Tuple, _Flight] = {}
+        self._warned_on_loop: set = set()
+        self._cache: Dict[Tuple, Tuple[float, CommandResult]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    @classmethod
+    def get_instance(cls) -> "CommandRunner":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Gắn vòng lặp chính; run_blocking() từ luồng khác sẽ chuyển lệnh về vòng lặp này.
+        """
+        if loop is not self._loop:
+            # Semaphore/Future gắn với vòng lặp cũ không dùng lại được
+            self._loop = loop
+            self._semaphores = {}
+            self._inflight = {}
+
+    # ----- chạy lệnh -----
+    async def run(
+        self,
+        cmd: Sequence[str],
+        timeout: float = 30,
+        cache_ttl: float = 0.0,
+        text: bool = True,
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> CommandResult:
+        """
+        Chạy lệnh, trả về CommandResult; hết thời gian thì kill tiến trình và ném
+        subprocess.TimeoutExpired (giống subprocess.run).
+
+        cache_ttl > 0 chỉ dùng cho truy vấn chỉ đọc.
+        """
+        self.bind_loop(asyncio.get_running_loop())
+        argv = [str(part) for part in cmd]
+        program = program_of(argv)
+        key = (tuple(argv), text, cwd)
+
+        if cache_ttl > 0:
+            cached = self._cache_get(key, cache_ttl)
+            if cached is not None:
+                self._record(program, cache_hit=True)
+                return cached
+
+        flight = self._inflight.get(key) if env is None else None
+        if flight is not None:
+            self._record(program, deduped=True)
+        else:
+            # Lệnh chạy trong task riêng, không thuộc về lời gọi nào
+            task = asyncio.get_running_loop().create_task(
+                self._execute(argv, program, timeout, text, cwd, env)
+            )
+            flight = _Flight(task)
+            if env is None:
+                self._inflight[key] = flight
+            task.add_done_callback(lambda t, key=key, flight=flight: self._flight_done(key, flight))
+
+        flight.waiters += 1
+        try:
+            # shield: một lời gọi bị hủy không hủy lệnh của các lời gọi khác
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Không còn ai chờ: hủy task, _execute kill tiến trình
+                flight.task.cancel()
+        if cache_ttl > 0 and result.returncode == 0:
+            self._cache_put(key, result)
+        return result
+
+    def _flight_done(self, key: Tuple, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        # Tránh cảnh báo "exception was never retrieved" khi mọi lời gọi đã bị hủy
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    async def _execute(
+        self,
+        argv: List[str],
+        program: str,
+        timeout: float,
+        text: bool,
+        cwd: Optional[str],
+        env: Optional[Dict[str, str]],
+    ) -> CommandResult:
+        semaphore = self._semaphores.get(program)
+        if semaphore is None:
+            semaphore = self._semaphores[program] = asyncio.Semaphore(
+                self.limits.get(program, self.default_limit)
+            )
+        with self._lock:
+            stats = self._stats_for(program)
+        stats["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            stats["waiting"] -= 1
+
+        stats["running"] += 1
+        started = self._clock()
+        try:
+            logger.debug(f"Chạy lệnh: {' '.join(argv)}")
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=cwd,
+                env=env,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            except asyncio.TimeoutError:
+                self._kill(proc)
+                await proc.wait()
+                self._record(program, elapsed_ms=(self._clock() - started) * 1000.0, timed_out=True)
+                logger.warning(f"⏱️ Lệnh quá {timeout}s, đã dừng: {' '.join(argv)}")
+                raise subprocess.TimeoutExpired(argv, timeout)
+            except asyncio.CancelledError:
+                self._kill(proc)
+                raise
+        finally:
+            stats["running"] -= 1
+            semaphore.release()
+
+        elapsed_ms = (self._clock() - started) * 1000.0
+        if text:
+            stdout = stdout.decode("utf-8", errors="replace")
+            stderr = stderr.decode("utf-8", errors="replace")
+        self._record(program, elapsed_ms=elapsed_ms, failed=proc.returncode != 0)
+        return CommandResult(argv, proc.returncode, stdout, stderr, round(elapsed_ms, 1))
+
+    @staticmethod
+    def _kill(proc) -> None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+    def run_blocking(
+        self,
+        cmd: Sequence[str],
+        timeout: float = 30,
+        cache_ttl: float = 0.0,
+        text: bool = True,
+        cwd: Optional[str] = None,
+    ) -> CommandResult:
+        """
+        Phiên bản đồng bộ cho mã chạy trong luồng nền (run_in_executor, to_thread).
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running() and not self._on_loop_thread(loop):
+            future = asyncio.run_coroutine_threadsafe(
+                self.run(cmd, timeout=timeout, cache_ttl=cache_ttl, text=text, cwd=cwd), loop
+            )
+            # Dự phòng khi vòng lặp bị chặn: không chờ quá timeout + 5s
+            try:
+                return future.result(timeout + 5)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise subprocess.TimeoutExpired(list(cmd), timeout)
+        if self._on_any_loop_thread():
+            self._warn_on_loop(cmd)
+        return self._run_sync(cmd, timeout, cache_ttl, text, cwd)
+
+    def _warn_on_loop(self, cmd: Sequence[str]) -> None:
+        program = program_of([str(part) for part in cmd])
+        with self._lock:
+            self._stats_for(program)["on_loop"] += 1
+            first = program not in self._warned_on_loop
+            self._warned_on_loop.add(program)
+        if first:
+            logger.warning(
+                f"⚠️ run_blocking() gọi trên luồng vòng lặp sự kiện, vòng lặp bị chặn tới khi "
+                f"lệnh xong: {' '.join(str(part) for part in cmd)} (dùng await run() hoặc chạy trong luồng nền)",
+                stack_info=True,
+            )
+
+    @staticmethod
+    def _on_any_loop_thread() -> bool:
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _on_loop_thread(loop: asyncio.AbstractEventLoop) -> bool:
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    def _run_sync(
+        self,
+        cmd: Sequence[str],
+        timeout: float,
+        cache_ttl: float,
+        text: bool,
+        cwd: Optional[str],
+    ) -> CommandResult:
+        argv = [str(part) for part in cmd]
+        program = program_of(argv)
+        key = (tuple(argv), text, cwd)
+        if cache_ttl > 0:
+            cached = self._cache_get(key, cache_ttl)
+            if cached is not None:
+                self._record(program, cache_hit=True)
+                return cached
+        started = self._clock()
+        try:
+            proc = subprocess.run(argv, capture_output=True, text=text, timeout=timeout, cwd=cwd)
+        except subprocess.TimeoutExpired:
+            self._record(program, elapsed_ms=(self._clock() - started) * 1000.0, timed_out=True)
+            raise
+        elapsed_ms = (self._clock() - started) * 1000.0
+        self._record(program, elapsed_ms=elapsed_ms, failed=proc.returncode != 0)
+        result = CommandResult(argv, proc.returncode, proc.stdout, proc.stderr, round(elapsed_ms, 1))
+        if cache_ttl > 0 and result.returncode == 0:
+            self._cache_put(key, result)
+        return result
+
+    # ----- cache -----
+    def _cache_get(self, key: Tuple, ttl: float) -> Optional[CommandResult]:
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if self._clock() - stored_at > ttl:
+            return None
+        return CommandResult(
+            result.args, result.returncode, result.stdout, result.stderr, result.duration_ms, cached=True
+        )
+
+    def _cache_put(self, key: Tuple, result: CommandResult) -> None:
+        with self._lock:
+            if len(self._cache) >= MAX_CACHE_ENTRIES and key not in self._cache:
+                oldest = min(self._cache, key=lambda k: self._cache[k][0])
+                del self._cache[oldest]
+            self._cache[key] = (self._clock(), result)
+
+    def invalidate(self, program: Optional[str] = None) -> None:
+        """
+        Xóa cache (của một chương trình hoặc tất cả) sau lệnh làm thay đổi trạng thái.
+        """
+        with self._lock:
+            if program is None:
+                self._cache.clear()
+                return
+            for key in [k for k in self._cache if program_of(k[0]) == program]:
+                del self._cache[key]
+
+    # ----- thống kê -----
+    def _stats_for(self, program: str) -> dict:
+        stats = self._stats.get(program)
+        if stats is None:
+            stats = self._stats[program] = {
+                "calls": 0,
+                "errors": 0,
+                "timeouts": 0,
+                "cache_hits": 0,
+                "deduped": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "running": 0,
+                "waiting": 0,
+                "on_loop": 0,
+            }
+        return stats
+
+    def _record(
+        self,
+        program: str,
+        elapsed_ms: Optional[float] = None,
+        failed: bool = False,
+        timed_out: bool = False,
+        cache_hit: bool = False,
+        deduped: bool = False,
+    ) -> None:
+        with self._lock:
+            stats = self._stats_for(program)
+            if cache_hit:
+                stats["cache_hits"] += 1
+                return
+            if deduped:
+                stats["deduped"] += 1
+                return
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["timeouts"] += int(timed_out)
+            if elapsed_ms is not None:
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                program: {
+                    **{k: v for k, v in s.items() if k not in ("total_ms", "max_ms")},
+                    "limit": self.limits.get(program, self.default_limit),
+                    "avg_ms": round(s["total_ms"] / s["calls"], 1) if s["calls"] else 0.0,
+                    "max_ms": round(s["max_ms"], 1),
+                }
+                for program, s in self._stats.items()
+            }
+
+
+def get_command_runner() -> CommandRunner:
+    """Lấy instance CommandRunner dùng chung"""
+    return CommandRunner.get_instance()
@@ -1,24 +1,49 @@
+import atexit
+import copy
 import json
+import os
+import threading
 import uuid
-from typing import Any, Dict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
 
 from src.utils.logging_config import get_logger
 from src.utils.resource_finder import resource_finder
 
 logger = get_logger(__name__)
 
+# Đánh dấu khóa không tồn tại khi so sánh cấu hình
+_MISSING = object()
+
+
+def _join_path(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def _path_matches(prefix: str, path: str) -> bool:
+    """
+    Người đăng ký "AUDIO" khớp "AUDIO" và "AUDIO.MIC_VOLUME"; người đăng ký "AUDIO.MIC_VOLUME"
+    cũng khớp khi cả nhánh "AUDIO" bị thay bằng giá trị không phải dict.
+    """
+    return path == prefix or path.startswith(prefix + ".") or prefix.startswith(path + ".")
+
 
 class ConfigManager:
     """Trình quản lý cấu hình - Singleton"""
 
     _instance = None
 
+    # Gom các lần update_config lẻ trong cửa sổ này thành một lần ghi (giây, 0 = ghi ngay)
+    SAVE_DEBOUNCE_S = 0.5
+
     # Cấu hình mặc định
     DEFAULT_CONFIG = {
         "SYSTEM_OPTIONS": {
             "CLIENT_ID": None,
             "DEVICE_ID": None,
             "LANGUAGE": "vi-VN",  # Ngôn ngữ mặc định
+            # Vòng lặp sự kiện cho --mode cli: auto (uvloop nếu có), uvloop, asyncio
+            "EVENT_LOOP": "auto",
             "NETWORK": {
                 "OTA_VERSION_URL": "https://xiaozhi-ai-iot.vn/api/v1/ota",
                 "WEBSOCKET_URL": None,
@@ -26,6 +51,8 @@ class ConfigManager:
                 "MQTT_INFO": None,
                 "ACTIVATION_VERSION": "v2",  # Giá trị tùy chọn: v1, v2
                 "AUTHORIZATION_URL": "https://xiaozhi-ai-iot.vn/",
+                # Boot từ snapshot OTA lần trước, làm mới trong nền (cache/warm_start.json)
+                "WARM_START": True,
             },
         },
         "WAKE_WORD_OPTIONS": {
@@ -95,6 +122,16 @@ class ConfigManager:
             "YOUTUBE_URL": "",
             "VIDEO_LOOP": True
         },
+        # Công cụ MCP: nạp lười gói công cụ; gói làm ấm sau hội thoại đầu ("all" = tất cả)
+        "MCP": {
+            "LAZY_TOOLS": True,
+            "WARM_UP_TOOLS": [],
+        },
+        # Chẩn đoán: luồng watchdog đo độ trễ vòng lặp và lấy mẫu stack khi bị chặn
+        "DIAGNOSTICS": {
+            "LOOP_MONITOR": True,
+            "LOOP_LAG_THRESHOLD_MS": 100,
+        },
     }
 
     def __new__(cls):
@@ -120,8 +157,27 @@ class ConfigManager:
         # Đảm bảo các thư mục cần thiết tồn tại
         self._ensure_required_directories()
 
+        # Trạng thái ghi: transaction, ghi trễ, người đăng ký thay đổi
+        self._lock = threading.RLock()
+        # Chỉ một lần ghi tệp tại một thời điểm; ghi ngoài _lock để không chặn update_config
+        self._write_lock = threading.Lock()
+        self._txn_depth = 0
+        self._pending_paths: List[str] = []
+        self._dirty = False
+        self._save_timer = None
+        self._last_save_ok = True
+        self._subscribers: List[Tuple[Tuple[str, ...], Callable[[Dict[str, Any]], None]]] = []
+        self.save_debounce_s = self.SAVE_DEBOUNCE_S
+        self.write_count = 0
+        self.coalesced_count = 0
+
         # Tải cấu hình
         self._config = self._load_config()
+        # Bản đã commit, dùng để tính chính xác khóa nào thay đổi
+        self._committed = copy.deepcopy(self._config)
+
+        # Ghi nốt thay đổi đang chờ khi thoát
+        atexit.register(self.flush)
 
     def _init_config_paths(self):
         """
@@ -199,16 +255,25 @@ class ConfigManager:
 
     def _save_config(self, config: dict) -> bool:
         """
-        Lưu cấu hình vào tệp.
+        Lưu cấu hình vào tệp (nguyên tử: tệp tạm + fsync + rename).
+
+        Mất điện giữa chừng thì config.json vẫn là bản cũ hoặc bản mới, không bao giờ bị cắt dở.
         """
+        tmp_file = self.config_file.with_name(self.config_file.name + ".tmp")
         try:
             # Đảm bảo thư mục cấu hình tồn tại
             self.config_dir.mkdir(parents=True, exist_ok=True)
 
             # Lưu tệp cấu hình
             config_json = json.dumps(config, indent=2, ensure_ascii=False)
-            self.config_file.write_text(config_json, encoding="utf-8")
-            
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(config_json)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.config_file)
+            self._fsync_dir()
+            self.write_count += 1
+
             # Log chi tiết AUDIO_DEVICES để debug
             audio_devices = config.get("AUDIO_DEVICES", {})
             logger.info(f"✅ Config saved to: {self.config_file}")
@@ -217,8 +282,27 @@ class ConfigManager:
 
         except Exception as e:
             logger.error(f"Lỗi lưu cấu hình: {e}")
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
             return False
 
+    def _fsync_dir(self):
+        """
+        fsync thư mục cấu hình để rename tồn tại qua mất điện (bỏ qua nếu hệ điều hành không hỗ trợ).
+        """
+        try:
+            fd = os.open(str(self.config_dir), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
     @staticmethod
     def _merge_configs(default: dict, custom: dict) -> dict:
         """
@@ -249,29 +333,211 @@ class ConfigManager:
         except (KeyError, TypeError):
             return default
 
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Bản sao toàn bộ cấu hình trong bộ nhớ (gồm thay đổi còn chờ ghi trễ).
+        """
+        with self._lock:
+            return copy.deepcopy(self._config)
+
     def update_config(self, path: str, value: Any) -> bool:
         """
         Cập nhật mục cấu hình cụ thể
         path: Đường dẫn cấu hình ngăn cách bằng dấu chấm, ví dụ "SYSTEM_OPTIONS.NETWORK.MQTT_INFO"
+
+        Ngoài transaction: báo người đăng ký ngay, ghi tệp trễ SAVE_DEBOUNCE_S giây (gom nhiều lần).
+        Trong transaction: chỉ đổi trong bộ nhớ, ghi và báo một lần khi transaction kết thúc.
+        Giá trị không đổi thì không ghi tệp.
         """
         try:
-            current = self._config
-            *parts, last = path.split(".")
-            for part in parts:
-                current = current.setdefault(part, {})
-            current[last] = value
-            return self._save_config(self._config)
+            with self._lock:
+                current = self._config
+                *parts, last = path.split(".")
+                for part in parts:
+                    current = current.setdefault(part, {})
+                current[last] = value
+                self._pending_paths.append(path)
+                if self._txn_depth:
+                    return True
+                changes = self._commit_locked()
+            ok = self._schedule_save() if changes else True
+            self._notify(changes)
+            return ok
         except Exception as e:
             logger.error(f"Lỗi cập nhật cấu hình {path}: {e}")
             return False
 
+    @contextmanager
+    def transaction(self):
+        """
+        Gom nhiều update_config thành một lần ghi tệp và một lần báo thay đổi.
+
+            with config.transaction():
+                config.update_config("AUDIO.MIC_VOLUME", 80)
+                config.update_config("AUDIO.SPEAKER_VOLUME", 60)
+            ok = config.flush()  # kết quả lần ghi
+
+        Lồng nhau được; chỉ transaction ngoài cùng mới ghi. Lỗi giữa chừng thì các khóa đã đổi vẫn được ghi.
+        """
+        with self._lock:
+            self._txn_depth += 1
+        changes: Dict[str, Any] = {}
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._txn_depth -= 1
+                if not self._txn_depth:
+                    changes = self._commit_locked()
+                    if changes:
+                        self._dirty = True
+            if changes:
+                self.flush()
+        self._notify(changes)
+
+    def flush(self) -> bool:
+        """
+        Ghi ngay thay đổi đang chờ ghi trễ. Trả về kết quả lần ghi gần nhất.
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return self._last_save_ok
+                snapshot = copy.deepcopy(self._config)
+                self._dirty = False
+            ok = self._save_config(snapshot)
+            with self._lock:
+                self._last_save_ok = ok
+                if not ok:
+                    # Ghi lỗi thì giữ dirty để lần flush sau thử lại
+                    self._dirty = True
+            return ok
+
+    def subscribe(
+        self,
+        paths: Union[str, Iterable[str]],
+        callback: Callable[[Dict[str, Any]], None],
+    ) -> Callable[[], None]:
+        """
+        Đăng ký nhận thay đổi theo đường dẫn chấm ("VIDEO_BACKGROUND", "AUDIO.MIC_VOLUME", ...).
+
+        callback nhận {đường_dẫn_lá: giá_trị_mới} chỉ gồm các khóa đã đổi (None nếu bị xóa),
+        được gọi trên luồng đã đổi cấu hình. Trả về hàm hủy đăng ký.
+        """
+        prefixes = (paths,) if isinstance(paths, str) else tuple(paths)
+        entry = (prefixes, callback)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+
+        return unsubscribe
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Số liệu ghi cấu hình cho /metrics.
+        """
+        with self._lock:
+            return {
+                "writes": self.write_count,
+                "coalesced": self.coalesced_count,
+                "pending": self._dirty,
+                "last_save_ok": self._last_save_ok,
+                "subscribers": len(self._subscribers),
+            }
+
+    def _commit_locked(self) -> Dict[str, Any]:
+        """
+        So các đường dẫn vừa cập nhật với bản đã commit, trả về {đường_dẫn_lá: giá_trị_mới}.
+
+        So với bản sao (không phải tham chiếu) nên cả dict lấy từ get_config rồi sửa tại chỗ cũng nhận ra.
+        """
+        paths, self._pending_paths = self._pending_paths, []
+        changes: Dict[str, Any] = {}
+        for path in dict.fromkeys(paths):
+            new = self._lookup(self._config, path)
+            self._diff(path, self._lookup(self._committed, path), new, changes)
+            node = self._committed
+            *parts, last = path.split(".")
+            for part in parts:
+                child = node.get(part)
+                if not isinstance(child, dict):
+                    child = node[part] = {}
+                node = child
+            node[last] = copy.deepcopy(new)
+        return changes
+
+    def _schedule_save(self) -> bool:
+        with self._lock:
+            self._dirty = True
+            if self.save_debounce_s > 0:
+                if self._save_timer is None:
+                    self._save_timer = threading.Timer(self.save_debounce_s, self.flush)
+                    self._save_timer.daemon = True
+                    self._save_timer.start()
+                else:
+                    self.coalesced_count += 1
+                return True
+        return self.flush()
+
+    def _notify(self, changes: Dict[str, Any]):
+        if not changes:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for prefixes, callback in subscribers:
+            matched = {
+                path: value
+                for path, value in changes.items()
+                if any(_path_matches(prefix, path) for prefix in prefixes)
+            }
+            if not matched:
+                continue
+            try:
+                callback(matched)
+            except Exception as e:
+                logger.warning(f"⚠️ Callback thay đổi cấu hình lỗi ({', '.join(matched)}): {e}")
+
+    @staticmethod
+    def _lookup(config: dict, path: str) -> Any:
+        value = config
+        for key in path.split("."):
+            if not isinstance(value, dict) or key not in value:
+                return _MISSING
+            value = value[key]
+        return value
+
+    @staticmethod
+    def _diff(path: str, old: Any, new: Any, changes: Dict[str, Any]):
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in list(old) + [k for k in new if k not in old]:
+                ConfigManager._diff(
+                    _join_path(path, key), old.get(key, _MISSING), new.get(key, _MISSING), changes
+                )
+        elif old is _MISSING or new is _MISSING or old != new:
+            changes[path] = None if new is _MISSING else new
+
     def reload_config(self) -> bool:
         """
-        Tải lại tệp cấu hình.
+        Tải lại tệp cấu hình; người đăng ký được báo các khóa bị sửa từ bên ngoài.
         """
         try:
-            self._config = self._load_config()
+            # Ghi nốt thay đổi đang chờ trước, tránh mất khi đọc lại
+            self.flush()
+            config = self._load_config()
+            changes: Dict[str, Any] = {}
+            with self._lock:
+                self._config = config
+                self._diff("", self._committed, config, changes)
+                self._committed = copy.deepcopy(config)
             logger.info("Tệp cấu hình đã được tải lại")
+            self._notify(changes)
             return True
         except Exception as e:
             logger.error(f"Tải lại cấu hình thất bại: {e}")
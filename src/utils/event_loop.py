@@ -0,0 +1,88 @@
+"""
+Event Loop - Chọn hiện thực vòng lặp asyncio cho chế độ CLI/headless.
+
+Chế độ GUI bắt buộc dùng vòng lặp qasync (Qt). Chế độ CLI (install_minimal.sh, --mode cli)
+không có Qt nên có thể dùng uvloop (libuv) cho gửi/nhận âm thanh, MCP và máy chủ web cài đặt.
+
+uvloop là tùy chọn: chưa cài, nền tảng không hỗ trợ (Windows) hoặc tạo vòng lặp lỗi thì tự
+quay về vòng lặp asyncio chuẩn.
+"""
+
+import asyncio
+import sys
+from typing import Any, Awaitable, Callable, Optional
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import uvloop
+
+    UVLOOP_AVAILABLE = sys.platform != "win32"
+except ImportError:
+    uvloop = None
+    UVLOOP_AVAILABLE = False
+
+LOOP_CHOICES = ("auto", "uvloop", "asyncio")
+
+
+def resolve_loop_impl(preference: Optional[str] = "auto") -> str:
+    """
+    "auto"/"uvloop" -> "uvloop" nếu dùng được, ngược lại "asyncio".
+    """
+    preference = (preference or "auto").lower()
+    if preference not in LOOP_CHOICES:
+        logger.warning(f"Giá trị vòng lặp không hợp lệ: {preference}, dùng auto")
+        preference = "auto"
+    if preference == "asyncio":
+        return "asyncio"
+    if UVLOOP_AVAILABLE:
+        return "uvloop"
+    if preference == "uvloop":
+        logger.warning("uvloop chưa được cài đặt, dùng vòng lặp asyncio chuẩn")
+    return "asyncio"
+
+
+def new_event_loop(impl: str) -> asyncio.AbstractEventLoop:
+    """
+    Tạo vòng lặp theo impl; tạo uvloop lỗi thì quay về asyncio.
+    """
+    if impl == "uvloop" and UVLOOP_AVAILABLE:
+        try:
+            return uvloop.new_event_loop()
+        except Exception as e:
+            logger.warning(f"Không tạo được vòng lặp uvloop, dùng asyncio: {e}")
+    return asyncio.new_event_loop()
+
+
+def run(main: Awaitable[Any], preference: Optional[str] = "auto") -> Any:
+    """
+    Giống asyncio.run nhưng chạy trên vòng lặp đã chọn.
+    """
+    impl = resolve_loop_impl(preference)
+    if impl == "asyncio":
+        return asyncio.run(main)
+    factory: Callable[[], asyncio.AbstractEventLoop] = lambda: new_event_loop(impl)
+    if hasattr(asyncio, "Runner"):
+        with asyncio.Runner(loop_factory=factory) as runner:
+            return runner.run(main)
+    # Python < 3.11: không có Runner(loop_factory=...)
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    try:
+        return asyncio.run(main)
+    finally:
+        asyncio.set_event_loop_policy(None)
+
+
+def loop_impl_name(loop: Optional[asyncio.AbstractEventLoop] = None) -> str:
+    """
+    Tên hiện thực của vòng lặp: "uvloop", "qasync" hoặc "asyncio".
+    """
+    loop = loop or asyncio.get_running_loop()
+    module = type(loop).__module__
+    if module.startswith("uvloop"):
+        return "uvloop"
+    if module.startswith("qasync"):
+        return "qasync"
+    return "asyncio"
@@ -0,0 +1,285 @@
+"""
+Import Profiler - Đo thời gian và RSS của từng module khi import (chế độ --profile-startup).
+
+Phần lớn thời gian/RAM khởi động trên Pi là chi phí import (PyQt5, numpy, opencv, các gói
+công cụ MCP...). ImportProfiler cài một finder ở đầu sys.meta_path, bọc loader của mỗi
+module để đo:
+- thời gian tích lũy (gồm module con được import bên trong) và thời gian riêng,
+- RSS tăng thêm trong lúc import,
+theo cây import thật (module nào kéo module nào).
+
+Báo cáo gom thời gian riêng theo nhóm (src.<gói> hoặc gói ngoài cấp cao nhất) - không phụ
+thuộc thứ tự import - và so với file ngân sách (config/import_budget.json) để phát hiện
+hồi quy.
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_BUDGET_PATH = Path(__file__).resolve().parents[2] / "config" / "import_budget.json"
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def module_group(name: str) -> str:
+    """
+    Nhóm của module: "src.audio_codecs.x" -> "src.audio_codecs", "numpy.core" -> "numpy".
+    """
+    parts = name.split(".")
+    if parts[0] == "src" and len(parts) > 1:
+        return ".".join(parts[:2])
+    return parts[0]
+
+
+class ImportNode:
+    __slots__ = ("name", "parent", "children", "cum_ms", "self_ms", "rss_kb", "error", "_t0", "_rss0")
+
+    def __init__(self, name: str, parent: Optional["ImportNode"]):
+        self.name = name
+        self.parent = parent
+        self.children: List["ImportNode"] = []
+        self.cum_ms = 0.0
+        self.self_ms = 0.0
+        self.rss_kb = 0
+        self.error: Optional[str] = None
+        self._t0 = 0.0
+        self._rss0 = 0
+
+
+class _TimedLoader:
+    """
+    Bọc loader thật: đo create_module + exec_module, mọi thuộc tính khác chuyển tiếp.
+    """
+
+    def __init__(self, loader: Any, profiler: "ImportProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+        self._node: Optional[ImportNode] = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        self._node = self._profiler._enter(spec.name)
+        try:
+            create = getattr(self._loader, "create_module", None)
+            return create(spec) if create else None
+        except BaseException as e:
+            self._profiler._exit(self._node, e)
+            self._node = None
+            raise
+
+    def exec_module(self, module):
+        node = self._node or self._profiler._enter(module.__name__)
+        self._node = None
+        error = None
+        try:
+            self._loader.exec_module(module)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._profiler._exit(node, error)
+            # Trả loader thật cho module (importlib.resources, pkgutil... kiểm tra loader)
+            try:
+                module.__loader__ = self._loader
+                if module.__spec__ is not None:
+                    module.__spec__.loader = self._loader
+            except Exception:
+                pass
+
+
+class _ProfilingFinder:
+    def __init__(self, profiler: "ImportProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, self._profiler)
+            return spec
+        return None
+
+
+class ImportProfiler:
+    def __init__(self) -> None:
+        self.roots: List[ImportNode] = []
+        self.nodes: List[ImportNode] = []
+        self._stack: List[ImportNode] = []
+        self._finder = _ProfilingFinder(self)
+        self._started_at = 0.0
+        self._rss_start = 0
+        self.wall_ms = 0.0
+        self.rss_delta_kb = 0
+
+    def start(self) -> "ImportProfiler":
+        self._started_at = time.perf_counter()
+        self._rss_start = _rss_kb()
+        sys.meta_path.insert(0, self._finder)
+        return self
+
+    def stop(self) -> "ImportProfiler":
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self.wall_ms = (time.perf_counter() - self._started_at) * 1000.0
+        self.rss_delta_kb = _rss_kb() - self._rss_start
+        return self
+
+    def import_optional(self, name: str) -> Optional[str]:
+        """
+        Import một module khởi động lười (plugin, GUI...); trả về lỗi nếu thiếu phụ thuộc.
+        """
+        try:
+            __import__(name)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    # ----- ghi nhận -----
+    def _enter(self, name: str) -> ImportNode:
+        parent = self._stack[-1] if self._stack else None
+        node = ImportNode(name, parent)
+        (parent.children if parent else self.roots).append(node)
+        self.nodes.append(node)
+        self._stack.append(node)
+        node._rss0 = _rss_kb()
+        node._t0 = time.perf_counter()
+        return node
+
+    def _exit(self, node: ImportNode, error: Optional[BaseException]) -> None:
+        node.cum_ms = (time.perf_counter() - node._t0) * 1000.0
+        node.rss_kb = _rss_kb() - node._rss0
+        node.self_ms = max(0.0, node.cum_ms - sum(c.cum_ms for c in node.children))
+        if error is not None:
+            node.error = f"{type(error).__name__}: {error}"
+        while self._stack:
+            if self._stack.pop() is node:
+                break
+
+    # ----- báo cáo -----
+    def groups(self) -> Dict[str, dict]:
+        """
+        Thời gian riêng và RSS riêng gom theo nhóm module.
+        """
+        groups: Dict[str, dict] = {}
+        for node in self.nodes:
+            group = groups.setdefault(module_group(node.name), {"ms": 0.0, "rss_kb": 0, "modules": 0})
+            group["ms"] += node.self_ms
+            group["rss_kb"] += node.rss_kb - sum(c.rss_kb for c in node.children)
+            group["modules"] += 1
+        for group in groups.values():
+            group["ms"] = round(group["ms"], 1)
+        return groups
+
+    def compare(self, budget: dict) -> dict:
+        """
+        So với ngân sách: nhóm/tổng vượt quá budget * (1 + tolerance) là hồi quy.
+        """
+        tolerance = float(budget.get("tolerance", 0.2))
+        groups = self.groups()
+        regressions = []
+        for name, limit in budget.get("groups", {}).items():
+            measured = groups.get(name, {}).get("ms", 0.0)
+            if measured > limit * (1 + tolerance):
+                regressions.append({"group": name, "value": measured, "budget": limit})
+        for key, measured in (("total_ms", self.wall_ms), ("total_rss_kb", self.rss_delta_kb)):
+            limit = budget.get(key)
+            if limit is not None and measured > limit * (1 + tolerance):
+                regressions.append({"group": key, "value": round(measured, 1), "budget": limit})
+        floor = float(budget.get("unbudgeted_ms", 50.0))
+        unbudgeted = sorted(
+            (
+                {"group": name, "ms": g["ms"]}
+                for name, g in groups.items()
+                if name not in budget.get("groups", {}) and g["ms"] >= floor
+            ),
+            key=lambda g: -g["ms"],
+        )
+        return {"regressions": regressions, "unbudgeted": unbudgeted, "tolerance": tolerance}
+
+    def make_budget(self, headroom: float = 0.3, floor_ms: float = 20.0) -> dict:
+        """
+        Ngân sách mới từ lần đo này (nhóm >= floor_ms, cộng thêm headroom).
+        """
+        groups = {
+            name: round(g["ms"] * (1 + headroom))
+            for name, g in sorted(self.groups().items(), key=lambda kv: -kv[1]["ms"])
+            if g["ms"] >= floor_ms
+        }
+        return {
+            "note": "Generated by: python main.py --profile-startup --update-budget",
+            "tolerance": 0.2,
+            "unbudgeted_ms": 50,
+            "total_ms": round(self.wall_ms * (1 + headroom)),
+            "total_rss_kb": round(self.rss_delta_kb * (1 + headroom)),
+            "groups": groups,
+        }
+
+    def tree_lines(self, min_ms: float = 20.0, max_depth: int = 4) -> List[str]:
+        lines: List[str] = []
+
+        def walk(node: ImportNode, depth: int):
+            if node.cum_ms < min_ms or depth > max_depth:
+                return
+            mark = f"  ❌ {node.error}" if node.error else ""
+            lines.append(
+                f"{node.cum_ms:9.1f} ms {node.self_ms:8.1f} ms {node.rss_kb:+8d} KB  "
+                f"{'  ' * depth}{node.name}{mark}"
+            )
+            for child in sorted(node.children, key=lambda c: -c.cum_ms):
+                walk(child, depth + 1)
+
+        for root in sorted(self.roots, key=lambda r: -r.cum_ms):
+            walk(root, 0)
+        return lines
+
+    def print_report(self, budget: Optional[dict] = None, top: int = 15) -> int:
+        """
+        In cây import, nhóm tốn nhất và so sánh ngân sách. Trả về số hồi quy.
+        """
+        print("=" * 72)
+        print(f"  IMPORT KHỞI ĐỘNG: {self.wall_ms:.0f} ms, RSS +{self.rss_delta_kb / 1024:.1f} MB, "
+              f"{len(self.nodes)} module")
+        print("=" * 72)
+        print("  tích lũy      riêng       RSS  module")
+        for line in self.tree_lines():
+            print("  " + line)
+
+        print(f"\n  Top {top} nhóm (thời gian riêng):")
+        ranked = sorted(self.groups().items(), key=lambda kv: -kv[1]["ms"])[:top]
+        for name, g in ranked:
+            print(f"  {g['ms']:9.1f} ms {g['rss_kb'] / 1024:+7.1f} MB {g['modules']:5d} module  {name}")
+
+        if budget is None:
+            return 0
+        result = self.compare(budget)
+        print(f"\n  Ngân sách (dung sai {result['tolerance']:.0%}):")
+        if not result["regressions"]:
+            print("  ✅ Không vượt ngân sách")
+        for r in result["regressions"]:
+            print(f"  ❌ {r['group']}: {r['value']:.0f} > {r['budget']}")
+        for u in result["unbudgeted"]:
+            print(f"  ⚠️ {u['group']}: {u['ms']:.0f} ms chưa có trong ngân sách")
+        return len(result["regressions"])
+
+
+def load_budget(path: Path = DEFAULT_BUDGET_PATH) -> Optional[dict]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
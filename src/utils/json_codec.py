@@ -0,0 +1,90 @@
+"""
+JSON Codec - Lớp mã hóa/giải mã JSON dùng chung cho giao thức, MCP và IoT.
+
+Trước đây mỗi tin nhắn bị dumps/loads nhiều lần trên đường đi: Protocol.send_mcp_message
+và send_iot_descriptors parse chuỗi chỉ để dumps lại, McpServer dumps kết quả hai lần
+(một lần chỉ để đo độ dài), ThingManager dumps rồi so sánh rồi loads lại trạng thái.
+
+Ở đây:
+- Dữ liệu đi dạng dict từ đầu đến cuối, chỉ serialize MỘT lần ở tầng transport (send_text).
+- Dùng orjson nếu đã cài (nhanh hơn nhiều lần trên Pi), không có thì dùng json chuẩn.
+- Đầu ra gọn (không khoảng trắng, UTF-8 thay vì \\uXXXX) giống nhau ở cả hai backend.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:  # orjson là tùy chọn
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# orjson.JSONDecodeError kế thừa json.JSONDecodeError -> bắt một loại là đủ
+JSONDecodeError = json.JSONDecodeError
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if ORJSON_AVAILABLE else 0
+
+
+def _std_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize thành chuỗi JSON gọn.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            # Kiểu orjson không hỗ trợ (số nguyên > 64 bit, lớp con lạ...): dùng json chuẩn
+            pass
+    return _std_dumps(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """
+    Serialize thành bytes UTF-8 (cho transport nhận bytes, tránh encode thêm lần nữa).
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return _std_dumps(obj).encode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """
+    Giải mã JSON từ str hoặc bytes, lỗi thì raise JSONDecodeError.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def ensure_obj(data: Any) -> Any:
+    """
+    Nhận chuỗi JSON (mã cũ) hoặc đối tượng đã parse, trả về đối tượng.
+    """
+    if isinstance(data, (str, bytes, bytearray)):
+        return loads(data)
+    return data
+
+
+def ensure_text(message: Any) -> Union[str, bytes]:
+    """
+    Chuỗi/bytes giữ nguyên, đối tượng thì serialize (dùng ở tầng transport).
+    """
+    if isinstance(message, (str, bytes)):
+        return message
+    return dumps(message)
+
+
+def backend_name() -> str:
+    return "orjson" if orjson is not None else "json"
@@ -0,0 +1,284 @@
+"""
+Loop Lag Monitor - Đo độ trễ vòng lặp sự kiện và lấy mẫu stack khi vòng lặp bị chặn.
+
+Vòng lặp qasync chạy âm thanh, GUI và giao thức trên cùng một luồng; một lời gọi đồng bộ
+(subprocess.run nmcli/amixer/git, time.sleep, socket.create_connection, sqlite...) trong
+coroutine làm đứng tất cả.
+
+Ở đây một luồng watchdog liên tục gửi "nhịp" vào vòng lặp (call_soon_threadsafe) và đo thời
+gian tới khi nhịp được chạy. Khi nhịp trễ quá ngưỡng, watchdog đọc stack hiện tại của luồng
+vòng lặp (sys._current_frames) theo chu kỳ cho tới khi vòng lặp chạy lại. Các mẫu được gom
+theo vị trí trong mã dự án (src/, main.py) gây chặn, kèm lời gọi sâu nhất (ví dụ
+subprocess.py:communicate), để báo cáo trên dashboard và /api/metrics.
+"""
+
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_PROJECT_ROOT = str(Path(__file__).resolve().parents[2])
+_THIS_FILE = str(Path(__file__).resolve())
+
+DEFAULT_THRESHOLD_MS = 100.0
+DEFAULT_INTERVAL = 0.25
+DEFAULT_SAMPLE_INTERVAL = 0.05
+MAX_STACK_DEPTH = 30
+MAX_CULPRITS = 50
+
+
+def _short(frame: traceback.FrameSummary) -> str:
+    filename = frame.filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = filename[len(_PROJECT_ROOT) + 1:]
+    else:
+        filename = Path(filename).name
+    return f"{filename}:{frame.lineno} {frame.name}"
+
+
+def _is_project_frame(frame: traceback.FrameSummary) -> bool:
+    filename = frame.filename
+    return (
+        filename.startswith(_PROJECT_ROOT)
+        and filename != _THIS_FILE
+        and "site-packages" not in filename
+        and "/.venv/" not in filename
+    )
+
+
+def classify_stack(stack: List[traceback.FrameSummary]) -> Tuple[str, str]:
+    """
+    (vị trí trong mã dự án sâu nhất, lời gọi sâu nhất) của một stack.
+    """
+    if not stack:
+        return "<unknown>", "<unknown>"
+    leaf = _short(stack[-1])
+    for frame in reversed(stack):
+        if _is_project_frame(frame):
+            return _short(frame), leaf
+    return leaf, leaf
+
+
+class LoopLagMonitor:
+    _instance = None
+
+    def __init__(
+        self,
+        threshold_ms: float = DEFAULT_THRESHOLD_MS,
+        interval: float = DEFAULT_INTERVAL,
+        sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+        history: int = 1200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self.sample_interval = sample_interval
+        self._clock = clock
+        self._loop = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.lags_ms: deque = deque(maxlen=history)
+        self.beats = 0
+        self.blocks = 0
+        self.blocked_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.culprits: Dict[str, dict] = {}
+        self.recent_blocks: deque = deque(maxlen=20)
+
+    @classmethod
+    def get_instance(cls) -> "LoopLagMonitor":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    # ----- vòng đời -----
+    def start(self, loop: Any, loop_thread_id: Optional[int] = None) -> None:
+        """
+        Bắt đầu theo dõi loop; mặc định luồng vòng lặp là luồng đang gọi start().
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = loop
+        self._loop_thread_id = loop_thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-lag-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"🐢 Theo dõi độ trễ vòng lặp (ngưỡng {self.threshold_ms:.0f} ms)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    # ----- watchdog -----
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self._heartbeat():
+                break
+            self._stop.wait(self.interval)
+
+    def _heartbeat(self) -> bool:
+        done = threading.Event()
+        arrived: List[float] = []
+
+        def beat():
+            arrived.append(self._clock())
+            done.set()
+
+        sent = self._clock()
+        try:
+            self._loop.call_soon_threadsafe(beat)
+        except RuntimeError:
+            # Vòng lặp đã đóng
+            return False
+
+        samples: List[List[traceback.FrameSummary]] = []
+        wait = self.threshold_ms / 1000.0
+        while not done.wait(wait):
+            if self._stop.is_set():
+                return False
+            stack = self._sample()
+            if stack:
+                samples.append(stack)
+            wait = self.sample_interval
+
+        self._record((arrived[0] - sent) * 1000.0, samples)
+        return True
+
+    def _sample(self) -> Optional[List[traceback.FrameSummary]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        return traceback.extract_stack(frame)[-MAX_STACK_DEPTH:]
+
+    def _record(self, lag_ms: float, samples: List[List[traceback.FrameSummary]]) -> None:
+        with self._lock:
+            self.beats += 1
+            self.lags_ms.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms < self.threshold_ms:
+                return
+            self.blocks += 1
+            self.blocked_ms += lag_ms
+            if not samples:
+                # Trễ do nhiều callback ngắn xếp hàng, không bắt được stack chặn
+                sites = Counter({"<không bắt được stack>": 1})
+                leaves = {"<không bắt được stack>": "<không bắt được stack>"}
+                stacks = {}
+            else:
+                sites = Counter()
+                leaves = {}
+                stacks = {}
+                for stack in samples:
+                    site, leaf = classify_stack(stack)
+                    sites[site] += 1
+                    leaves.setdefault(site, leaf)
+                    stacks.setdefault(site, stack)
+            # Thời gian trễ chia cho các vị trí theo số mẫu
+            total = sum(sites.values())
+            for site, count in sites.items():
+                self._add_culprit(site, leaves[site], stacks.get(site), lag_ms * count / total, lag_ms)
+            top = sites.most_common(1)[0][0]
+            self.recent_blocks.append(
+                {"at": time.time(), "lag_ms": round(lag_ms, 1), "site": top, "call": leaves[top]}
+            )
+        logger.warning(f"🐢 Vòng lặp bị chặn {lag_ms:.0f} ms tại {top} ({leaves[top]})")
+
+    def _add_culprit(self, site: str, leaf: str, stack, share_ms: float, lag_ms: float) -> None:
+        culprit = self.culprits.get(site)
+        if culprit is None:
+            if len(self.culprits) >= MAX_CULPRITS:
+                # Bỏ vị trí ít tốn nhất để giới hạn bộ nhớ
+                weakest = min(self.culprits, key=lambda k: self.culprits[k]["total_ms"])
+                del self.culprits[weakest]
+            culprit = self.culprits[site] = {
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "calls": Counter(),
+                "stack": None,
+                "last_seen": None,
+            }
+        culprit["count"] += 1
+        culprit["total_ms"] += share_ms
+        culprit["max_ms"] = max(culprit["max_ms"], lag_ms)
+        culprit["calls"][leaf] += 1
+        culprit["last_seen"] = time.time()
+        if stack:
+            culprit["stack"] = [_short(f) for f in stack]
+
+    # ----- báo cáo -----
+    def _percentile(self, values: List[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lags = list(self.lags_ms)
+            return {
+                "running": self.running,
+                "threshold_ms": self.threshold_ms,
+                "beats": self.beats,
+                "blocks": self.blocks,
+                "blocked_ms": round(self.blocked_ms, 1),
+                "lag_ms": {
+                    "avg": round(sum(lags) / len(lags), 2) if lags else 0.0,
+                    "p95": round(self._percentile(lags, 0.95), 2),
+                    "p99": round(self._percentile(lags, 0.99), 2),
+                    "max": round(self.max_lag_ms, 1),
+                },
+            }
+
+    def report(self, top: int = 10) -> dict:
+        """
+        Thống kê + các vị trí chặn tốn nhất (tổng thời gian) kèm lời gọi và stack mẫu.
+        """
+        report = self.stats()
+        with self._lock:
+            ranked = sorted(self.culprits.items(), key=lambda kv: -kv[1]["total_ms"])[:top]
+            report["culprits"] = [
+                {
+                    "site": site,
+                    "count": c["count"],
+                    "total_ms": round(c["total_ms"], 1),
+                    "max_ms": round(c["max_ms"], 1),
+                    "calls": [call for call, _ in c["calls"].most_common(3)],
+                    "stack": c["stack"],
+                    "last_seen": c["last_seen"],
+                }
+                for site, c in ranked
+            ]
+            report["recent"] = list(self.recent_blocks)
+        return report
+
+    def reset(self) -> None:
+        with self._lock:
+            self.lags_ms.clear()
+            self.beats = 0
+            self.blocks = 0
+            self.blocked_ms = 0.0
+            self.max_lag_ms = 0.0
+            self.culprits.clear()
+            self.recent_blocks.clear()
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Lấy instance LoopLagMonitor dùng chung"""
+    return LoopLagMonitor.get_instance()
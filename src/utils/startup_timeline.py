@@ -0,0 +1,67 @@
+"""
+Startup Timeline - Ghi lại các giai đoạn khởi động (bắt đầu, thời lượng) để log và /api/metrics.
+
+Các giai đoạn có thể chồng lên nhau (setup plugin chạy song song), nên mỗi giai đoạn lưu
+mốc bắt đầu tương đối so với lúc tạo timeline cùng thời lượng của nó.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class StartupTimeline:
+    def __init__(self) -> None:
+        self._t0 = time.monotonic()
+        self.stages: List[dict] = []
+        self.total_ms: Optional[float] = None
+
+    def record(self, name: str, started: float, ok: bool = True) -> dict:
+        """
+        Ghi một giai đoạn đã kết thúc; started là time.monotonic() lúc bắt đầu.
+        """
+        now = time.monotonic()
+        stage = {
+            "stage": name,
+            "start_ms": round((started - self._t0) * 1000.0, 1),
+            "duration_ms": round((now - started) * 1000.0, 1),
+            "ok": ok,
+        }
+        self.stages.append(stage)
+        return stage
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(name, started, ok)
+
+    def has(self, name: str) -> bool:
+        return any(stage["stage"] == name for stage in self.stages)
+
+    def finish(self) -> None:
+        """
+        Đánh dấu khởi động xong và log toàn bộ timeline.
+        """
+        self.total_ms = round((time.monotonic() - self._t0) * 1000.0, 1)
+        logger.info(f"⏱️ Khởi động xong sau {self.total_ms:.0f} ms:")
+        for stage in sorted(self.stages, key=lambda s: s["start_ms"]):
+            mark = "" if stage["ok"] else "  ❌"
+            logger.info(
+                f"   +{stage['start_ms']:7.0f} ms  {stage['duration_ms']:7.0f} ms  "
+                f"{stage['stage']}{mark}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "total_ms": self.total_ms,
+            "stages": sorted(self.stages, key=lambda s: s["start_ms"]),
+        }
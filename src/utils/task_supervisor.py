@@ -0,0 +1,250 @@
+"""
+Task Supervisor - Quản lý vòng đời các tác vụ tạo bởi Application.spawn.
+
+Application.spawn tạo rất nhiều tác vụ "bắn rồi quên" (đổi trạng thái, thông báo plugin,
+gửi khung âm thanh, hẹn giờ ẩn overlay); trước đây chỉ có một done callback nên khi tải cao
+không biết bao nhiêu tác vụ đang sống, tên nào chiếm đa số hay tác vụ nào bị kẹt.
+
+Ở đây:
+- Thống kê theo tên tác vụ: số lần tạo, hoàn thành/lỗi/hủy, đang sống, thời gian chạy.
+- Nhóm có giới hạn (audio-send, ui): tối đa `limit` tác vụ chạy cùng lúc, tối đa
+  `max_pending` tác vụ trong nhóm; vượt quá thì bỏ tác vụ mới (khung âm thanh cũ vô ích
+  hơn khung mới bị trễ). Mỗi nhóm giữ tập tác vụ riêng nên hủy cả nhóm chỉ duyệt nhóm đó.
+- Dữ liệu nhận từ máy chủ không bao giờ bị bỏ: JSON (tts stop, MCP tools/call, iot) đi nhóm
+  plugin-notify không giới hạn, âm thanh TTS đi nhóm plugin-audio riêng để công cụ MCP chạy
+  lâu không chặn được âm thanh.
+- Tác vụ chạy quá `expected_s` của nhóm được báo là "quá hạn"; tác vụ đã bị hủy mà vẫn
+  chạy sau LEAK_GRACE_S (nuốt CancelledError) được báo là "rò rỉ".
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_GROUP = "default"
+# Tác vụ bị hủy mà vẫn chạy sau chừng này giây được coi là rò rỉ
+LEAK_GRACE_S = 5.0
+# Giới hạn số tên tác vụ được thống kê riêng (tên động như call:<fn>)
+MAX_NAMES = 200
+
+
+@dataclass(frozen=True)
+class TaskGroupSpec:
+    limit: Optional[int] = None  # số tác vụ chạy đồng thời, None = không giới hạn
+    max_pending: Optional[int] = None  # số tác vụ tối đa trong nhóm (chạy + chờ)
+    expected_s: Optional[float] = None  # chạy lâu hơn thì báo quá hạn, None = tác vụ sống lâu
+
+
+DEFAULT_GROUPS = {
+    DEFAULT_GROUP: TaskGroupSpec(),
+    # Mỗi khung Opus một tác vụ; backlog 64 khung (~4 s) là đã quá muộn để gửi
+    "audio-send": TaskGroupSpec(limit=4, max_pending=64, expected_s=5),
+    # Thông điệp điều khiển: không giới hạn, không bỏ (MCP có thể giữ tác vụ tới 60 s)
+    "plugin-notify": TaskGroupSpec(expected_s=30),
+    # Âm thanh TTS nhận về: hàng chờ không giới hạn, tách khỏi JSON/MCP
+    "plugin-audio": TaskGroupSpec(limit=4, expected_s=5),
+    "ui": TaskGroupSpec(limit=4, max_pending=64, expected_s=30),
+}
+
+
+class _Group:
+    def __init__(self, name: str, spec: TaskGroupSpec):
+        self.name = name
+        self.spec = spec
+        self.tasks: set = set()
+        self.semaphore = asyncio.Semaphore(spec.limit) if spec.limit else None
+        self.running = 0
+        self.dropped = 0
+
+
+class TaskSupervisor:
+    def __init__(
+        self,
+        groups: Optional[Dict[str, TaskGroupSpec]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._groups: Dict[str, _Group] = {}
+        for name, spec in {**DEFAULT_GROUPS, **(groups or {})}.items():
+            self._groups[name] = _Group(name, spec)
+        self._started: Dict[asyncio.Task, float] = {}
+        self._cancel_requested: Dict[asyncio.Task, float] = {}
+        self._names: Dict[str, dict] = {}
+
+    # ----- tạo tác vụ -----
+    def spawn(self, coro: Awaitable[Any], name: str, group: Optional[str] = None) -> Optional[asyncio.Task]:
+        """
+        Tạo tác vụ trong nhóm; trả về None (và đóng coroutine) nếu nhóm đã đầy.
+        """
+        grp = self._group(group or DEFAULT_GROUP)
+        stats = self._name_stats(name)
+        if grp.spec.max_pending is not None and len(grp.tasks) >= grp.spec.max_pending:
+            grp.dropped += 1
+            stats["dropped"] += 1
+            if hasattr(coro, "close"):
+                coro.close()
+            if grp.dropped == 1 or grp.dropped % 100 == 0:
+                logger.warning(f"⚠️ Nhóm tác vụ {grp.name} đầy ({len(grp.tasks)}), bỏ {name} (đã bỏ {grp.dropped})")
+            return None
+
+        if grp.semaphore is not None:
+            coro = self._bounded(grp, coro)
+        task = asyncio.create_task(coro, name=name)
+        grp.tasks.add(task)
+        self._started[task] = self._clock()
+        stats["spawned"] += 1
+        stats["active"] += 1
+        task.add_done_callback(lambda t: self._on_done(t, grp, stats))
+        return task
+
+    async def _bounded(self, grp: _Group, coro: Awaitable[Any]) -> Any:
+        try:
+            async with grp.semaphore:
+                grp.running += 1
+                try:
+                    return await coro
+                finally:
+                    grp.running -= 1
+        finally:
+            # Bị hủy khi còn chờ semaphore: coroutine gốc chưa từng chạy
+            if hasattr(coro, "close"):
+                coro.close()
+
+    def _on_done(self, task: asyncio.Task, grp: _Group, stats: dict) -> None:
+        grp.tasks.discard(task)
+        started = self._started.pop(task, None)
+        self._cancel_requested.pop(task, None)
+        stats["active"] -= 1
+        if started is not None:
+            elapsed_ms = (self._clock() - started) * 1000.0
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if task.cancelled():
+            stats["cancelled"] += 1
+            return
+        exc = task.exception()
+        if exc is not None:
+            stats["failed"] += 1
+            logger.error(f"Nhiệm vụ {task.get_name()} kết thúc với ngoại lệ: {exc}", exc_info=exc)
+        else:
+            stats["completed"] += 1
+
+    def _group(self, name: str) -> _Group:
+        grp = self._groups.get(name)
+        if grp is None:
+            grp = self._groups[name] = _Group(name, TaskGroupSpec())
+        return grp
+
+    def _name_stats(self, name: str) -> dict:
+        stats = self._names.get(name)
+        if stats is None:
+            if len(self._names) >= MAX_NAMES:
+                name = "<other>"
+                stats = self._names.get(name)
+            if stats is None:
+                stats = self._names[name] = {
+                    "spawned": 0,
+                    "completed": 0,
+                    "failed": 0,
+                    "cancelled": 0,
+                    "dropped": 0,
+                    "active": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                }
+        return stats
+
+    # ----- hủy -----
+    def cancel_group(self, group: str) -> int:
+        """
+        Hủy mọi tác vụ của một nhóm; trả về số tác vụ đã yêu cầu hủy.
+        """
+        grp = self._groups.get(group)
+        if grp is None:
+            return 0
+        return self._cancel(list(grp.tasks))
+
+    def _cancel(self, tasks: List[asyncio.Task]) -> int:
+        now = self._clock()
+        count = 0
+        for task in tasks:
+            if not task.done() and task.cancel():
+                self._cancel_requested.setdefault(task, now)
+                count += 1
+        return count
+
+    async def cancel_all(self, timeout: Optional[float] = None) -> List[str]:
+        """
+        Hủy và chờ tất cả tác vụ; trả về tên các tác vụ vẫn chưa kết thúc sau timeout.
+        """
+        tasks = [t for grp in self._groups.values() for t in grp.tasks]
+        self._cancel(tasks)
+        if not tasks:
+            return []
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        leaked = sorted(t.get_name() for t in pending)
+        if leaked:
+            logger.warning(f"⚠️ Tác vụ không dừng sau khi hủy: {', '.join(leaked)}")
+        return leaked
+
+    # ----- báo cáo -----
+    @property
+    def active(self) -> int:
+        return len(self._started)
+
+    def long_running(self) -> List[dict]:
+        """
+        Tác vụ chạy quá expected_s của nhóm, lâu nhất trước.
+        """
+        now = self._clock()
+        overdue = []
+        for grp in self._groups.values():
+            if grp.spec.expected_s is None:
+                continue
+            for task in grp.tasks:
+                age = now - self._started.get(task, now)
+                if age > grp.spec.expected_s:
+                    overdue.append({"name": task.get_name(), "group": grp.name, "age_s": round(age, 1)})
+        return sorted(overdue, key=lambda item: -item["age_s"])
+
+    def leaked(self) -> List[dict]:
+        """
+        Tác vụ đã bị hủy nhưng vẫn chạy quá LEAK_GRACE_S.
+        """
+        now = self._clock()
+        return [
+            {"name": task.get_name(), "since_cancel_s": round(now - at, 1)}
+            for task, at in self._cancel_requested.items()
+            if not task.done() and now - at > LEAK_GRACE_S
+        ]
+
+    def stats(self) -> dict:
+        names = {}
+        for name, s in self._names.items():
+            finished = s["completed"] + s["failed"] + s["cancelled"]
+            names[name] = {
+                **{k: v for k, v in s.items() if k not in ("total_ms", "max_ms")},
+                "avg_ms": round(s["total_ms"] / finished, 1) if finished else 0.0,
+                "max_ms": round(s["max_ms"], 1),
+            }
+        return {
+            "active": self.active,
+            "groups": {
+                grp.name: {
+                    "active": len(grp.tasks),
+                    "running": grp.running if grp.semaphore is not None else len(grp.tasks),
+                    "limit": grp.spec.limit,
+                    "max_pending": grp.spec.max_pending,
+                    "dropped": grp.dropped,
+                }
+                for grp in self._groups.values()
+            },
+            "names": names,
+            "long_running": self.long_running(),
+            "leaked": self.leaked(),
+        }
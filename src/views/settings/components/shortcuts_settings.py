@@ -137,18 +137,20 @@ class ShortcutsSettingsWidget(QWidget):
         Áp dụng cài đặt.
         """
         try:
-            # Cập nhật trạng thái kích hoạt
-            self.config.update_config(
-                "SHORTCUTS.ENABLED", self.enable_checkbox.isChecked()
-            )
-
-            # Cập nhật các cấu hình phím tắt
-            for key, widget in self.shortcut_widgets.items():
-                modifier = widget.modifier_combo.currentText().lower()
-                key_value = widget.key_combo.currentText().lower()
-
-                self.config.update_config(f"SHORTCUTS.{key}.modifier", modifier)
-                self.config.update_config(f"SHORTCUTS.{key}.key", key_value)
+            # Một lần ghi tệp cho tất cả phím tắt
+            with self.config.transaction():
+                # Cập nhật trạng thái kích hoạt
+                self.config.update_config(
+                    "SHORTCUTS.ENABLED", self.enable_checkbox.isChecked()
+                )
+
+                # Cập nhật các cấu hình phím tắt
+                for key, widget in self.shortcut_widgets.items():
+                    modifier = widget.modifier_combo.currentText().lower()
+                    key_value = widget.key_combo.currentText().lower()
+
+                    self.config.update_config(f"SHORTCUTS.{key}.modifier", modifier)
+                    self.config.update_config(f"SHORTCUTS.{key}.key", key_value)
 
             # Tải lại cấu hình
             self.config.reload_config()
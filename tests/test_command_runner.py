@@ -0,0 +1,184 @@
+"""
+Unit Tests for the shared async command runner
+
+Run: pytest tests/test_command_runner.py -v
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.command_runner import CommandRunner, program_of
+
+PYTHON = program_of([sys.executable])
+
+
+def py(code):
+    return [sys.executable, "-c", code]
+
+
+class Clock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestCommandRunner:
+    """Tests for CommandRunner."""
+
+    def test_identical_inflight_calls_share_one_process(self):
+        runner = CommandRunner()
+        cmd = py("import time; time.sleep(0.2); print('ok')")
+
+        async def main():
+            return await asyncio.gather(runner.run(cmd), runner.run(cmd), runner.run(cmd))
+
+        results = asyncio.run(main())
+        assert [r.stdout.strip() for r in results] == ["ok", "ok", "ok"]
+        stats = runner.stats()[PYTHON]
+        assert stats["calls"] == 1
+        assert stats["deduped"] == 2
+
+    def test_cancelled_first_caller_does_not_cancel_followers(self):
+        runner = CommandRunner()
+        cmd = py("import time; time.sleep(0.2); print('ok')")
+
+        async def main():
+            leader = asyncio.ensure_future(runner.run(cmd))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(runner.run(cmd))
+            await asyncio.sleep(0)
+            leader.cancel()
+            result = await follower
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return result
+
+        assert asyncio.run(main()).stdout.strip() == "ok"
+        assert runner.stats()[PYTHON]["calls"] == 1
+
+    def test_process_is_killed_when_every_caller_is_cancelled(self):
+        runner = CommandRunner()
+        cmd = py("import time; time.sleep(5)")
+
+        async def main():
+            callers = [asyncio.ensure_future(runner.run(cmd)) for _ in range(2)]
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            for caller in callers:
+                caller.cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            while runner.stats()[PYTHON]["running"]:
+                await asyncio.sleep(0.01)
+            return time.monotonic() - started
+
+        assert asyncio.run(main()) < 2
+        assert not runner._inflight
+
+    def test_read_only_results_are_cached_for_ttl(self):
+        clock = Clock()
+        runner = CommandRunner(clock=clock)
+        cmd = py("print('v')")
+
+        async def main():
+            first = await runner.run(cmd, cache_ttl=2)
+            second = await runner.run(cmd, cache_ttl=2)
+            clock.now += 3
+            third = await runner.run(cmd, cache_ttl=2)
+            return first, second, third
+
+        first, second, third = asyncio.run(main())
+        assert not first.cached and second.cached and not third.cached
+        assert second.stdout == first.stdout
+        stats = runner.stats()[PYTHON]
+        assert stats["calls"] == 2 and stats["cache_hits"] == 1
+
+    def test_failed_results_are_not_cached_and_invalidate_clears(self):
+        runner = CommandRunner()
+
+        async def main():
+            failed = await runner.run(py("import sys; sys.exit(3)"), cache_ttl=60)
+            await runner.run(py("print(1)"), cache_ttl=60)
+            runner.invalidate(PYTHON)
+            again = await runner.run(py("print(1)"), cache_ttl=60)
+            return failed, again
+
+        failed, again = asyncio.run(main())
+        assert failed.returncode == 3
+        assert not again.cached
+        stats = runner.stats()[PYTHON]
+        assert stats["errors"] == 1 and stats["cache_hits"] == 0
+
+    def test_concurrency_limit_per_program(self):
+        runner = CommandRunner(limits={PYTHON: 1})
+
+        async def main():
+            started = time.monotonic()
+            await asyncio.gather(
+                runner.run(py("import time; time.sleep(0.3)")),
+                runner.run(py("import time; time.sleep(0.3); pass")),
+            )
+            return time.monotonic() - started
+
+        assert asyncio.run(main()) >= 0.55
+        assert runner.stats()[PYTHON]["limit"] == 1
+
+    def test_timeout_kills_process(self):
+        runner = CommandRunner()
+
+        async def main():
+            await runner.run(py("import time; time.sleep(10)"), timeout=0.3)
+
+        started = time.monotonic()
+        with pytest.raises(subprocess.TimeoutExpired):
+            asyncio.run(main())
+        assert time.monotonic() - started < 5
+        assert runner.stats()[PYTHON]["timeouts"] == 1
+
+    def test_run_blocking_from_worker_thread_uses_loop(self, monkeypatch):
+        runner = CommandRunner()
+
+        def no_sync(*args, **kwargs):
+            raise AssertionError("should be routed to the event loop")
+
+        async def main():
+            runner.bind_loop(asyncio.get_running_loop())
+            monkeypatch.setattr(runner, "_run_sync", no_sync)
+            return await asyncio.to_thread(runner.run_blocking, py("print('thread')"))
+
+        assert asyncio.run(main()).stdout.strip() == "thread"
+
+    def test_run_blocking_without_loop_runs_directly(self):
+        runner = CommandRunner()
+        result = runner.run_blocking(py("print('sync')"), cache_ttl=5)
+        assert result.stdout.strip() == "sync"
+        assert runner.run_blocking(py("print('sync')"), cache_ttl=5).cached
+
+    def test_run_blocking_on_loop_thread_warns(self, caplog):
+        runner = CommandRunner()
+
+        async def main():
+            runner.bind_loop(asyncio.get_running_loop())
+            return runner.run_blocking(py("print('loop')"))
+
+        assert asyncio.run(main()).stdout.strip() == "loop"
+        assert runner.stats()[PYTHON]["on_loop"] == 1
+        assert "run_blocking()" in caplog.text
+
+
+class TestProgramOf:
+    """program_of strips sudo and its flags."""
+
+    def test_sudo_prefix(self):
+        assert program_of(["sudo", "-n", "nmcli", "device", "wifi", "list"]) == "nmcli"
+        assert program_of(["/usr/bin/git", "pull"]) == "git"
+        assert program_of([]) == ""
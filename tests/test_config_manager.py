@@ -0,0 +1,150 @@
+"""
+Unit Tests for ConfigManager transactions, debounced atomic writes and change subscriptions
+
+Run: pytest tests/test_config_manager.py -v
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import config_manager
+from src.utils.config_manager import ConfigManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({
+        "AUDIO": {"MIC_VOLUME": 100, "SPEAKER_VOLUME": 80},
+        "AUDIO_DEVICES": {"i2s_enabled": True, "hdmi_audio": True},
+    }), encoding="utf-8")
+    monkeypatch.setattr(config_manager.resource_finder, "find_config_dir", lambda: tmp_path)
+    monkeypatch.setattr(config_manager.resource_finder, "find_file", lambda *args, **kwargs: None)
+    monkeypatch.setattr(ConfigManager, "_ensure_required_directories", lambda self: None)
+    monkeypatch.setattr(ConfigManager, "_instance", None)
+    cfg = ConfigManager()
+    cfg.save_debounce_s = 0
+    yield cfg
+    cfg.flush()
+
+
+def read_file(cfg):
+    return json.loads(cfg.config_file.read_text(encoding="utf-8"))
+
+
+class TestConfigManagerWrites:
+    """Tests for transaction() and debounced atomic writes."""
+
+    def test_transaction_writes_once(self, manager):
+        with manager.transaction():
+            manager.update_config("AUDIO.MIC_VOLUME", 70)
+            manager.update_config("AUDIO.SPEAKER_VOLUME", 60)
+            with manager.transaction():
+                manager.update_config("AUDIO.INPUT_DEVICE_INDEX", 2)
+            assert manager.write_count == 0
+
+        assert manager.write_count == 1
+        assert read_file(manager)["AUDIO"] == {
+            "MIC_VOLUME": 70, "SPEAKER_VOLUME": 60, "INPUT_DEVICE_INDEX": 2,
+        }
+        assert not list(manager.config_dir.glob("*.tmp"))
+
+    def test_unchanged_value_does_not_write(self, manager):
+        assert manager.update_config("AUDIO.MIC_VOLUME", 100)
+        with manager.transaction():
+            manager.update_config("AUDIO.SPEAKER_VOLUME", 80)
+        assert manager.write_count == 0
+
+    def test_debounce_coalesces_updates(self, manager):
+        manager.save_debounce_s = 0.05
+        for volume in range(10, 60, 10):
+            assert manager.update_config("AUDIO.SPEAKER_VOLUME", volume)
+        assert manager.write_count == 0
+        assert manager.stats()["pending"]
+
+        deadline = time.monotonic() + 2.0
+        while manager.write_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert manager.write_count == 1
+        assert manager.coalesced_count == 4
+        assert read_file(manager)["AUDIO"]["SPEAKER_VOLUME"] == 50
+
+    def test_flush_and_reload_keep_pending_changes(self, manager):
+        manager.save_debounce_s = 60
+        manager.update_config("AUDIO.MIC_VOLUME", 55)
+        snapshot = manager.snapshot()
+        assert snapshot["AUDIO"]["MIC_VOLUME"] == 55
+        snapshot["AUDIO"]["MIC_VOLUME"] = 0  # a copy, not the live config
+        assert read_file(manager)["AUDIO"]["MIC_VOLUME"] == 100
+        assert manager.reload_config()
+        assert manager.get_config("AUDIO.MIC_VOLUME") == 55
+        assert read_file(manager)["AUDIO"]["MIC_VOLUME"] == 55
+        assert manager.write_count == 1
+
+    def test_failed_write_keeps_old_file(self, manager, monkeypatch):
+        before = manager.config_file.read_text(encoding="utf-8")
+
+        def fail_replace(src, dst):
+            raise OSError("disk full")
+
+        with monkeypatch.context() as m:
+            m.setattr(config_manager.os, "replace", fail_replace)
+            assert not manager.update_config("AUDIO.MIC_VOLUME", 10)
+            assert manager.config_file.read_text(encoding="utf-8") == before
+            assert not list(manager.config_dir.glob("*.tmp"))
+            assert manager.stats()["pending"]
+
+        assert manager.flush()
+        assert read_file(manager)["AUDIO"]["MIC_VOLUME"] == 10
+
+
+class TestConfigManagerSubscriptions:
+    """Tests for subscribe()."""
+
+    def test_subscribers_get_exact_changed_keys(self, manager):
+        audio, devices, everything = [], [], []
+        manager.subscribe("AUDIO", audio.append)
+        manager.subscribe("AUDIO_DEVICES.hdmi_audio", devices.append)
+        manager.subscribe(("AUDIO", "AUDIO_DEVICES"), everything.append)
+
+        with manager.transaction():
+            manager.update_config("AUDIO.MIC_VOLUME", 90)
+            manager.update_config("AUDIO.SPEAKER_VOLUME", 80)  # unchanged
+            # Same pattern as web_settings._handle_audio: edit the live dict, then write it back
+            current = manager.get_config("AUDIO_DEVICES")
+            current["i2s_enabled"] = False
+            manager.update_config("AUDIO_DEVICES", current)
+
+        assert audio == [{"AUDIO.MIC_VOLUME": 90}]
+        assert devices == []
+        assert everything == [{"AUDIO.MIC_VOLUME": 90, "AUDIO_DEVICES.i2s_enabled": False}]
+
+    def test_unsubscribe_and_failing_callback(self, manager):
+        received = []
+
+        def broken(changes):
+            raise RuntimeError("boom")
+
+        manager.subscribe("AUDIO", broken)
+        unsubscribe = manager.subscribe("AUDIO", received.append)
+        manager.update_config("AUDIO.MIC_VOLUME", 1)
+        unsubscribe()
+        manager.update_config("AUDIO.MIC_VOLUME", 2)
+        assert received == [{"AUDIO.MIC_VOLUME": 1}]
+
+    def test_reload_reports_external_edits(self, manager):
+        received = []
+        manager.subscribe("AUDIO_DEVICES", received.append)
+        data = read_file(manager)
+        data["AUDIO_DEVICES"]["hdmi_audio"] = False
+        manager.config_file.write_text(json.dumps(data), encoding="utf-8")
+
+        assert manager.reload_config()
+        assert received == [{"AUDIO_DEVICES.hdmi_audio": False}]
@@ -0,0 +1,131 @@
+"""
+Unit Tests for audio device probe cache
+
+Run: pytest tests/test_device_probe_cache.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio_codecs.device_probe_cache import (
+    AudioProbeCache,
+    compute_hardware_signature,
+)
+
+PROBE = {
+    "mic_device_id": 1,
+    "speaker_device_id": 2,
+    "input_sample_rate": 48000,
+    "output_sample_rate": 48000,
+    "hdmi_device_name": "vc4hdmi0",
+}
+
+
+@pytest.fixture
+def fake_hw(tmp_path):
+    """Fake /proc/asound/cards and /sys/bus/usb/devices."""
+    cards = tmp_path / "cards"
+    cards.write_text(" 0 [vc4hdmi0 ]: vc4-hdmi - vc4-hdmi-0\n")
+    usb = tmp_path / "usb"
+    dev = usb / "1-1"
+    dev.mkdir(parents=True)
+    (dev / "idVendor").write_text("0d8c\n")
+    (dev / "idProduct").write_text("0014\n")
+    return cards, usb
+
+
+class TestHardwareSignature:
+    """Tests for compute_hardware_signature."""
+
+    def test_stable(self, fake_hw):
+        cards, usb = fake_hw
+        a = compute_hardware_signature({}, cards, usb)
+        b = compute_hardware_signature({}, cards, usb)
+        assert a == b
+
+    def test_changes_with_usb_device(self, fake_hw):
+        cards, usb = fake_hw
+        before = compute_hardware_signature({}, cards, usb)
+        (usb / "1-1" / "idProduct").write_text("0015\n")
+        assert compute_hardware_signature({}, cards, usb) != before
+
+    def test_changes_with_sound_cards(self, fake_hw):
+        cards, usb = fake_hw
+        before = compute_hardware_signature({}, cards, usb)
+        cards.write_text(cards.read_text() + " 1 [Headphones ]: bcm2835\n")
+        assert compute_hardware_signature({}, cards, usb) != before
+
+    def test_changes_with_device_config(self, fake_hw):
+        cards, usb = fake_hw
+        before = compute_hardware_signature({"hdmi_audio": False}, cards, usb)
+        after = compute_hardware_signature({"hdmi_audio": True}, cards, usb)
+        assert before != after
+
+    def test_ignores_unrelated_config(self, fake_hw):
+        cards, usb = fake_hw
+        before = compute_hardware_signature({"mic_distance": 8.0}, cards, usb)
+        after = compute_hardware_signature({"mic_distance": 6.0}, cards, usb)
+        assert before == after
+
+    def test_missing_files(self, tmp_path):
+        sig = compute_hardware_signature({}, tmp_path / "nope", tmp_path / "nope")
+        assert isinstance(sig, str) and len(sig) == 16
+
+
+class TestAudioProbeCache:
+    """Tests for AudioProbeCache."""
+
+    def test_miss_when_empty(self, tmp_path):
+        cache = AudioProbeCache(tmp_path / "audio_probe.json")
+        assert cache.load("abc") is None
+
+    def test_roundtrip(self, tmp_path):
+        path = tmp_path / "audio_probe.json"
+        assert AudioProbeCache(path).store("abc", PROBE, 1500.0)
+        assert AudioProbeCache(path).load("abc") == PROBE
+
+    def test_signature_mismatch(self, tmp_path):
+        path = tmp_path / "audio_probe.json"
+        AudioProbeCache(path).store("abc", PROBE, 1500.0)
+        assert AudioProbeCache(path).load("def") is None
+
+    def test_incomplete_probe_rejected(self, tmp_path):
+        path = tmp_path / "audio_probe.json"
+        AudioProbeCache(path).store("abc", {"mic_device_id": 1}, 10.0)
+        assert AudioProbeCache(path).load("abc") is None
+
+    def test_corrupt_file(self, tmp_path):
+        path = tmp_path / "audio_probe.json"
+        path.write_text("{not json")
+        assert AudioProbeCache(path).load("abc") is None
+
+    def test_invalidate(self, tmp_path):
+        path = tmp_path / "audio_probe.json"
+        cache = AudioProbeCache(path)
+        cache.store("abc", PROBE, 1500.0)
+        cache.invalidate("test")
+        assert not path.exists()
+        assert AudioProbeCache(path).load("abc") is None
+
+    def test_saved_time(self, tmp_path):
+        path = tmp_path / "audio_probe.json"
+        AudioProbeCache(path).store("abc", PROBE, 1500.0)
+        cache = AudioProbeCache(path)
+        cache.load("abc")
+        cache.record_hit(20.0)
+        stats = cache.get_stats()
+        assert stats["hit"] is True
+        assert stats["full_probe_ms"] == 1500.0
+        assert stats["saved_ms"] == 1480.0
+
+    def test_miss_saves_nothing(self, tmp_path):
+        cache = AudioProbeCache(tmp_path / "audio_probe.json")
+        cache.record_miss(1200.0)
+        stats = cache.get_stats()
+        assert stats["hit"] is False
+        assert stats["saved_ms"] == 0.0
@@ -0,0 +1,168 @@
+"""
+Unit Tests for the shared DNS cache and racing connect
+
+Run: pytest tests/test_dns_cache.py -v
+"""
+
+import asyncio
+import socket
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.network.dns_cache import (
+    CachedResolver,
+    DnsCache,
+    interleave_families,
+    open_racing_socket,
+    race_connect,
+)
+
+V4 = socket.AF_INET
+V6 = socket.AF_INET6
+
+
+class FakeLookup:
+    def __init__(self, addrs):
+        self.addrs = addrs
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self, host, port):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise socket.gaierror("temporary failure")
+        return list(self.addrs)
+
+
+class TestDnsCache:
+    """Tests for DnsCache."""
+
+    def test_hit_after_miss(self):
+        lookup = FakeLookup([(V4, ("10.0.0.1", 443))])
+        cache = DnsCache(lookup=lookup)
+
+        async def run():
+            await cache.resolve("Example.com", 443)
+            return await cache.resolve("example.com", 443)
+
+        assert asyncio.run(run()) == [(V4, ("10.0.0.1", 443))]
+        assert lookup.calls == 1 and cache.hits == 1 and cache.misses == 1
+
+    def test_concurrent_lookups_share_one_query(self):
+        lookup = FakeLookup([(V4, ("10.0.0.1", 80))])
+        cache = DnsCache(lookup=lookup)
+
+        async def run():
+            return await asyncio.gather(*(cache.resolve("a.test", 80) for _ in range(5)))
+
+        assert len(asyncio.run(run())) == 5
+        assert lookup.calls == 1
+
+    def test_stale_entry_served_while_refreshing(self):
+        lookup = FakeLookup([(V4, ("10.0.0.1", 80))])
+        now = [1000.0]
+        cache = DnsCache(ttl=60, lookup=lookup, clock=lambda: now[0])
+
+        async def run():
+            await cache.resolve("a.test", 80)
+            lookup.addrs = [(V4, ("10.0.0.2", 80))]
+            now[0] += 120
+            stale = await cache.resolve("a.test", 80)
+            await asyncio.sleep(0.05)
+            fresh = await cache.resolve("a.test", 80)
+            return stale, fresh
+
+        stale, fresh = asyncio.run(run())
+        assert stale[0][1][0] == "10.0.0.1"
+        assert fresh[0][1][0] == "10.0.0.2"
+        assert cache.stale_hits == 1 and lookup.calls == 2
+
+    def test_dns_failure_falls_back_to_cached(self):
+        lookup = FakeLookup([(V4, ("10.0.0.1", 80))])
+        now = [1000.0]
+        cache = DnsCache(ttl=60, stale_ttl=0, lookup=lookup, clock=lambda: now[0])
+
+        async def run():
+            await cache.resolve("a.test", 80)
+            now[0] += 120
+            lookup.fail = True
+            return await cache.resolve("a.test", 80)
+
+        assert asyncio.run(run())[0][1][0] == "10.0.0.1"
+        assert cache.failures == 1
+
+    def test_ip_literal_bypasses_lookup(self):
+        lookup = FakeLookup([])
+        cache = DnsCache(lookup=lookup)
+        assert asyncio.run(cache.resolve("::1", 80)) == [(V6, ("::1", 80))]
+        assert lookup.calls == 0
+
+    def test_promote_moves_winner_first(self):
+        lookup = FakeLookup([(V6, ("2001:db8::1", 80)), (V4, ("10.0.0.1", 80))])
+        cache = DnsCache(lookup=lookup)
+
+        async def run():
+            await cache.resolve("a.test", 80)
+            cache.promote("a.test", 80, ("10.0.0.1", 80))
+            return await cache.resolve("a.test", 80)
+
+        assert asyncio.run(run())[0][0] == V4
+
+    def test_interleave_families(self):
+        addrs = [(V6, ("a",)), (V6, ("b",)), (V4, ("c",)), (V4, ("d",))]
+        assert [a[1][0] for a in interleave_families(addrs)] == ["a", "c", "b", "d"]
+
+
+class TestRaceConnect:
+    """Tests for race_connect / open_racing_socket on loopback."""
+
+    @staticmethod
+    def closed_port():
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        return port
+
+    def test_refused_address_falls_through(self):
+        async def run():
+            server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            addrs = [(V4, ("127.0.0.1", self.closed_port())), (V4, ("127.0.0.1", port))]
+            sock = await race_connect(addrs, delay=5.0)
+            peer = sock.getpeername()
+            sock.close()
+            server.close()
+            await server.wait_closed()
+            return peer[1] == port
+
+        assert asyncio.run(run())
+
+    def test_all_failed_invalidates_entry(self):
+        port = self.closed_port()
+        cache = DnsCache(lookup=FakeLookup([(V4, ("127.0.0.1", port))]))
+
+        async def run():
+            try:
+                await open_racing_socket("a.test", port, timeout=2.0, cache=cache)
+            except OSError:
+                return True
+            return False
+
+        assert asyncio.run(run())
+        assert cache.stats()["entries"] == 0
+
+
+class TestCachedResolver:
+    """Tests for the aiohttp resolver adapter."""
+
+    def test_filters_family(self):
+        lookup = FakeLookup([(V6, ("2001:db8::1", 443, 0, 0)), (V4, ("10.0.0.1", 443))])
+        resolver = CachedResolver(DnsCache(lookup=lookup))
+        results = asyncio.run(resolver.resolve("a.test", 443, V4))
+        assert [r["host"] for r in results] == ["10.0.0.1"]
+        assert results[0]["hostname"] == "a.test" and results[0]["port"] == 443
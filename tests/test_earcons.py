@@ -0,0 +1,107 @@
+"""
+Unit Tests for earcon bank and mixer
+
+Run: pytest tests/test_earcons.py -v
+"""
+
+import sys
+import wave
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio_codecs.earcons import (
+    EARCON_PATTERNS,
+    EarconBank,
+    EarconMixer,
+    resample_linear,
+    synthesize_earcon,
+)
+
+
+class TestEarconBank:
+    """Tests for EarconBank."""
+
+    def test_synthesized_length_matches_pattern(self):
+        rate = 24000
+        samples = synthesize_earcon(EARCON_PATTERNS["wake"], rate)
+        expected = sum(int(rate * d) for _, d in EARCON_PATTERNS["wake"])
+        assert samples.dtype == np.int16
+        assert len(samples) == expected
+
+    def test_cached_per_rate(self, tmp_path):
+        bank = EarconBank(sounds_dir=tmp_path)
+        a = bank.get("wake", 24000)
+        assert bank.get("wake", 24000) is a
+        b = bank.get("wake", 48000)
+        assert len(b) == 2 * len(a)
+
+    def test_unknown_name(self, tmp_path):
+        assert EarconBank(sounds_dir=tmp_path).get("nope", 16000) is None
+
+    def test_wav_asset_overrides_and_resamples(self, tmp_path):
+        data = (np.ones(800, dtype=np.int16) * 1000).reshape(-1, 2)  # stereo 400 frames
+        with wave.open(str(tmp_path / "wake.wav"), "wb") as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(data.tobytes())
+        samples = EarconBank(sounds_dir=tmp_path).get("wake", 16000)
+        assert len(samples) == 800
+        assert np.all(samples == 1000)
+
+    def test_resample_identity(self):
+        x = np.arange(10, dtype=np.int16)
+        assert resample_linear(x, 16000, 16000) is x
+
+
+class TestEarconMixer:
+    """Tests for EarconMixer."""
+
+    def test_render_consumes_voice(self):
+        mixer = EarconMixer()
+        mixer.play(np.full(300, 100, dtype=np.int16))
+        first = mixer.render(200)
+        assert np.all(first == 100)
+        second = mixer.render(200)
+        assert np.all(second[:100] == 100) and np.all(second[100:] == 0)
+        assert not mixer.active
+        assert mixer.render(200) is None
+
+    def test_mix_saturates(self):
+        mixer = EarconMixer()
+        mixer.play(np.full(4, 30000, dtype=np.int16))
+        frame = np.full((4, 1), 10000, dtype=np.int16)
+        out = mixer.mix_into(frame)
+        assert out.shape == (4, 1)
+        assert np.all(out == 32767)
+
+    def test_mix_without_voice_is_passthrough(self):
+        frame = np.arange(8, dtype=np.int16)
+        assert EarconMixer().mix_into(frame) is frame
+
+    def test_gain_and_overlap(self):
+        mixer = EarconMixer()
+        mixer.play(np.full(4, 1000, dtype=np.int16), gain=0.5)
+        mixer.play(np.full(2, 100, dtype=np.int16))
+        out = mixer.render(4)
+        assert list(out) == [600, 600, 500, 500]
+
+    def test_start_latency_recorded(self):
+        mixer = EarconMixer()
+        mixer.play(np.ones(10, dtype=np.int16))
+        mixer.render(5)
+        assert mixer.last_start_latency_ms is not None
+        assert mixer.last_start_latency_ms >= 0
+
+    def test_device_latency_includes_output_delay(self):
+        mixer = EarconMixer()
+        mixer.play(np.ones(10, dtype=np.int16))
+        mixer.mix_wide(np.zeros(5, dtype=np.int16), output_delay=0.015)
+        assert mixer.last_device_latency_ms >= mixer.last_start_latency_ms + 15
+        # Only the first block of a voice is measured
+        mixer.render(5, output_delay=1.0)
+        assert mixer.last_device_latency_ms < 1000
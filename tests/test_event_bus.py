@@ -0,0 +1,193 @@
+"""
+Unit Tests for the plugin event bus and PluginManager routing/startup
+
+Run: pytest tests/test_event_bus.py -v
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.plugins.base import Plugin
+from src.plugins.event_bus import EVENT_INCOMING_AUDIO, EventBus
+from src.plugins.manager import PluginManager
+from src.utils.startup_timeline import StartupTimeline
+
+
+class RecordingPlugin(Plugin):
+    def __init__(self, name, json_types=None, ordered=()):
+        super().__init__()
+        self.name = name
+        self.json_types = json_types
+        self.ordered_events = ordered
+        self.json = []
+        self.audio = []
+
+    async def on_incoming_json(self, message):
+        self.json.append(message["type"])
+
+    async def on_incoming_audio(self, data):
+        # Later frames finish first unless delivery is ordered
+        await asyncio.sleep(0.01 * (5 - data[0]))
+        self.audio.append(data[0])
+
+
+class TestEventBus:
+    """Tests for EventBus."""
+
+    def test_timeout_and_error_are_counted(self):
+        bus = EventBus()
+
+        async def slow(_):
+            await asyncio.sleep(1)
+
+        async def broken(_):
+            raise RuntimeError("boom")
+
+        bus.subscribe("x", slow, name="slow", timeout=0.01)
+        bus.subscribe("x", broken, name="broken")
+        assert asyncio.run(bus.publish("x", None)) == 2
+        stats = {h["handler"]: h for h in bus.stats()["handlers"]}
+        assert stats["slow"]["timeouts"] == 1 and stats["slow"]["calls"] == 1
+        assert stats["broken"]["errors"] == 1 and stats["broken"]["last_error"] == "boom"
+
+    def test_handlers_run_concurrently(self):
+        bus = EventBus()
+
+        async def wait(_):
+            await asyncio.sleep(0.05)
+
+        for i in range(5):
+            bus.subscribe("x", wait, name=f"h{i}")
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await bus.publish("x", None)
+            return loop.time() - started
+
+        assert asyncio.run(run()) < 0.2
+
+    def test_unsubscribe_and_unrouted(self):
+        bus = EventBus()
+        received = []
+
+        async def handler(payload):
+            received.append(payload)
+
+        unsubscribe = bus.subscribe("json", handler, types=("mcp",))
+        asyncio.run(bus.publish_json({"type": "mcp"}))
+        unsubscribe()
+        asyncio.run(bus.publish_json({"type": "mcp"}))
+        assert len(received) == 1
+        assert bus.stats()["unrouted"] == {"json:mcp": 1}
+
+
+class TestPluginManagerRouting:
+    """PluginManager subscribes only real hooks and routes JSON by type."""
+
+    def test_json_routed_by_type(self):
+        manager = PluginManager()
+        mcp = RecordingPlugin("mcp", json_types=("mcp",))
+        ui = RecordingPlugin("ui", json_types=("tts", "stt"))
+        everything = RecordingPlugin("log")
+        manager.register(mcp, ui, everything)
+
+        async def run():
+            for msg_type in ("mcp", "tts", "iot"):
+                await manager.notify_incoming_json({"type": msg_type})
+
+        asyncio.run(run())
+        assert mcp.json == ["mcp"]
+        assert ui.json == ["tts"]
+        assert everything.json == ["mcp", "tts", "iot"]
+
+    def test_base_hooks_are_not_subscribed(self):
+        manager = PluginManager()
+        manager.register(RecordingPlugin("a"))
+        events = {h["event"] for h in manager.event_stats()["handlers"]}
+        assert events == {"json", "audio"}
+
+    def test_ordered_audio_keeps_arrival_order(self):
+        manager = PluginManager()
+        ordered = RecordingPlugin("ordered", ordered=(EVENT_INCOMING_AUDIO,))
+        unordered = RecordingPlugin("unordered")
+        manager.register(ordered, unordered)
+
+        async def run():
+            # Each frame is published from its own task, as Application does
+            await asyncio.gather(
+                *(manager.notify_incoming_audio(bytes([i])) for i in range(5))
+            )
+
+        asyncio.run(run())
+        assert ordered.audio == [0, 1, 2, 3, 4]
+        assert unordered.audio == [4, 3, 2, 1, 0]
+
+
+class StagePlugin(Plugin):
+    def __init__(self, name, log, delay=0.0, depends_on=(), setup_depends_on=None):
+        super().__init__()
+        self.name = name
+        self.log = log
+        self.delay = delay
+        self.depends_on = depends_on
+        self.setup_depends_on = setup_depends_on
+
+    async def setup(self, app):
+        self.log.append(f"{self.name}:setup:begin")
+        await asyncio.sleep(self.delay)
+        self.log.append(f"{self.name}:setup:end")
+
+    async def start(self):
+        self.log.append(f"{self.name}:start")
+
+
+class TestDependencyOrderedPhases:
+    """setup_all/start_all run independent plugins concurrently and respect depends_on."""
+
+    def test_independent_setups_overlap(self):
+        log = []
+        manager = PluginManager()
+        manager.register(*(StagePlugin(f"p{i}", log, delay=0.05) for i in range(4)))
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await manager.setup_all(None)
+            return loop.time() - started
+
+        assert asyncio.run(run()) < 0.15
+
+    def test_dependencies_are_awaited_per_phase(self):
+        log = []
+        manager = PluginManager()
+        audio = StagePlugin("audio", log, delay=0.05)
+        wake = StagePlugin("wake_word", log, depends_on=("audio",), setup_depends_on=())
+        ui = StagePlugin("ui", log, depends_on=("missing",))
+        manager.register(wake, audio, ui)
+        timeline = StartupTimeline()
+
+        async def run():
+            await manager.setup_all(None, timeline)
+            await manager.start_all(timeline)
+
+        asyncio.run(run())
+        # wake_word setup does not wait for audio, its start does
+        assert log.index("wake_word:setup:end") < log.index("audio:setup:end")
+        assert log.index("audio:start") < log.index("wake_word:start")
+        stages = {s["stage"] for s in timeline.stats()["stages"]}
+        assert "plugin:audio:setup" in stages and "plugin:ui:start" in stages
+
+    def test_cycle_falls_back_to_registration_order(self):
+        log = []
+        manager = PluginManager()
+        manager.register(
+            StagePlugin("a", log, depends_on=("b",)),
+            StagePlugin("b", log, depends_on=("a",)),
+        )
+        asyncio.run(manager.start_all())
+        assert log == ["a:start", "b:start"]
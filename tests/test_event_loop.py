@@ -0,0 +1,66 @@
+"""
+Unit Tests for the CLI event loop selection (uvloop with asyncio fallback)
+
+Run: pytest tests/test_event_loop.py -v
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import event_loop
+
+
+class BrokenUvloop:
+    @staticmethod
+    def new_event_loop():
+        raise RuntimeError("libuv mismatch")
+
+
+class TestResolveLoopImpl:
+    """resolve_loop_impl picks uvloop only when it can be used."""
+
+    def test_without_uvloop_falls_back(self, monkeypatch):
+        monkeypatch.setattr(event_loop, "UVLOOP_AVAILABLE", False)
+        assert event_loop.resolve_loop_impl("auto") == "asyncio"
+        assert event_loop.resolve_loop_impl("uvloop") == "asyncio"
+        assert event_loop.resolve_loop_impl(None) == "asyncio"
+
+    def test_with_uvloop(self, monkeypatch):
+        monkeypatch.setattr(event_loop, "UVLOOP_AVAILABLE", True)
+        assert event_loop.resolve_loop_impl("auto") == "uvloop"
+        assert event_loop.resolve_loop_impl("asyncio") == "asyncio"
+        assert event_loop.resolve_loop_impl("bogus") == "uvloop"
+
+
+class TestRun:
+    """event_loop.run behaves like asyncio.run on the selected loop."""
+
+    def test_asyncio_loop(self):
+        async def main():
+            await asyncio.sleep(0)
+            return event_loop.loop_impl_name()
+
+        assert event_loop.run(main(), "asyncio") == "asyncio"
+
+    def test_broken_uvloop_falls_back_to_asyncio(self, monkeypatch):
+        monkeypatch.setattr(event_loop, "UVLOOP_AVAILABLE", True)
+        monkeypatch.setattr(event_loop, "uvloop", BrokenUvloop)
+        loop = event_loop.new_event_loop("uvloop")
+        try:
+            assert event_loop.loop_impl_name(loop) == "asyncio"
+        finally:
+            loop.close()
+
+    def test_uvloop_when_installed(self):
+        pytest.importorskip("uvloop")
+
+        async def main():
+            return event_loop.loop_impl_name()
+
+        assert event_loop.run(main(), "auto") == "uvloop"
@@ -0,0 +1,71 @@
+"""
+Unit Tests for the startup import profiler
+
+Run: pytest tests/test_import_profiler.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.import_profiler import ImportProfiler, module_group
+
+
+@pytest.fixture
+def fake_tree(tmp_path, monkeypatch):
+    """profpkg imports profpkg.slow (sleeps) and profpkg.broken (fails, caught)."""
+    pkg = tmp_path / "profpkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text(
+        "from profpkg import slow\n"
+        "try:\n"
+        "    from profpkg import broken\n"
+        "except ImportError:\n"
+        "    pass\n"
+    )
+    (pkg / "slow.py").write_text("import time\ntime.sleep(0.05)\n")
+    (pkg / "broken.py").write_text("import profpkg_missing_dependency\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "profpkg"
+    for name in list(sys.modules):
+        if name.startswith("profpkg"):
+            sys.modules.pop(name)
+
+
+class TestImportProfiler:
+    """Tests for ImportProfiler."""
+
+    def test_tree_and_self_time(self, fake_tree):
+        profiler = ImportProfiler().start()
+        try:
+            __import__(fake_tree)
+        finally:
+            profiler.stop()
+        root = next(n for n in profiler.roots if n.name == "profpkg")
+        children = {c.name: c for c in root.children}
+        assert children["profpkg.slow"].self_ms >= 40
+        assert root.cum_ms >= children["profpkg.slow"].cum_ms
+        assert root.self_ms < children["profpkg.slow"].self_ms
+        assert "ModuleNotFoundError" in children["profpkg.broken"].error
+        # The real loader is handed back once the module has executed
+        assert type(sys.modules["profpkg.slow"].__loader__).__name__ != "_TimedLoader"
+        assert profiler.groups()["profpkg"]["modules"] == 3
+
+    def test_budget_comparison(self, fake_tree):
+        profiler = ImportProfiler().start()
+        try:
+            __import__(fake_tree)
+        finally:
+            profiler.stop()
+        result = profiler.compare({"tolerance": 0.1, "groups": {"profpkg": 10, "cv2": 0}})
+        assert [r["group"] for r in result["regressions"]] == ["profpkg"]
+        assert profiler.compare(profiler.make_budget())["regressions"] == []
+
+    def test_module_group(self):
+        assert module_group("src.audio_codecs.audio_codec") == "src.audio_codecs"
+        assert module_group("numpy.core.multiarray") == "numpy"
+        assert module_group("src") == "src"
@@ -0,0 +1,103 @@
+"""
+Unit Tests for the shared JSON codec and the single-serialisation send path
+
+Run: pytest tests/test_json_codec.py -v
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.mcp.mcp_server import McpServer, McpTool, PropertyList
+from src.protocols.protocol import Protocol
+from src.utils import json_codec
+
+
+class RecordingProtocol(Protocol):
+    def __init__(self):
+        super().__init__()
+        self.session_id = "s1"
+        self.sent = []
+
+    async def send_text(self, message):
+        self.sent.append(message)
+        return True
+
+
+class TestJsonCodec:
+    """Tests for json_codec helpers."""
+
+    def test_roundtrip_keeps_unicode_compact(self):
+        text = json_codec.dumps({"a": "Xin chào", "b": [1, 2]})
+        assert text == '{"a":"Xin chào","b":[1,2]}'
+        assert json_codec.loads(text) == {"a": "Xin chào", "b": [1, 2]}
+        assert json_codec.loads(text.encode("utf-8"))["b"] == [1, 2]
+
+    def test_dumps_bytes_matches_dumps(self):
+        obj = {"k": 1.5, "n": None}
+        assert json_codec.dumps_bytes(obj).decode("utf-8") == json_codec.dumps(obj)
+
+    def test_huge_int_falls_back_to_stdlib(self):
+        assert json_codec.loads(json_codec.dumps({"v": 2**70}))["v"] == 2**70
+
+    def test_decode_error_is_stdlib_type(self):
+        try:
+            json_codec.loads("{bad")
+        except json.JSONDecodeError:
+            return
+        raise AssertionError("expected JSONDecodeError")
+
+    def test_ensure_helpers(self):
+        assert json_codec.ensure_obj('[1]') == [1]
+        assert json_codec.ensure_obj({"a": 1}) == {"a": 1}
+        assert json_codec.ensure_text("raw") == "raw"
+        assert json_codec.ensure_text({"a": 1}) == '{"a":1}'
+
+
+class TestSendPath:
+    """Protocol and MCP hand dicts to the transport without re-encoding."""
+
+    def test_mcp_and_iot_messages_are_dicts(self):
+        protocol = RecordingProtocol()
+
+        async def run():
+            await protocol.send_mcp_message({"jsonrpc": "2.0", "id": 1})
+            await protocol.send_iot_descriptors([{"name": "Lamp"}])
+            await protocol.send_iot_states('[{"name": "Lamp"}]')
+
+        asyncio.run(run())
+        mcp, desc, states = protocol.sent
+        assert mcp["payload"] == {"jsonrpc": "2.0", "id": 1}
+        assert desc["descriptors"] == [{"name": "Lamp"}]
+        assert states["states"] == [{"name": "Lamp"}]
+        assert all(isinstance(m, dict) for m in protocol.sent)
+
+    def test_tool_reply_is_sent_once_as_dict(self):
+        server = McpServer()
+        server.add_tool(McpTool("echo", "Echo", PropertyList(), lambda args: "ok"))
+        sent = []
+
+        async def send(payload):
+            sent.append(payload)
+
+        server.set_send_callback(send)
+        request = {"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {"name": "echo"}}
+        asyncio.run(server.parse_message(json_codec.dumps(request)))
+
+        assert sent == [
+            {
+                "jsonrpc": "2.0",
+                "id": 7,
+                "result": {"content": [{"type": "text", "text": "ok"}], "isError": False},
+            }
+        ]
+
+    def test_tool_json_size_is_cached(self):
+        tool = McpTool("echo", "Echo", PropertyList(), lambda args: "ok")
+        first = tool.json_with_size()
+        assert tool.json_with_size() is first
+        assert first[1] == len(json_codec.dumps(tool.to_json()))
@@ -0,0 +1,134 @@
+"""
+Unit Tests for background wake word model loading and keyword-only reloads
+
+Run: pytest tests/test_kws_model_registry.py -v
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio_processing import wake_word_detect
+from src.audio_processing.kws_model_registry import KwsModelRegistry, KwsModelSpec
+from src.audio_processing.wake_word_detect import WakeWordDetector
+
+
+class FakeSpotter:
+    def __init__(self):
+        self.streams = []
+
+    def create_stream(self, keywords=None):
+        self.streams.append(keywords)
+        return object()
+
+
+class FakeConfig:
+    def __init__(self, values):
+        self.values = values
+
+    def get_config(self, path, default=None):
+        return self.values.get(path, default)
+
+
+def make_registry(calls, gate=None, fail_first=False):
+    def builder(spec):
+        calls.append(spec)
+        if gate is not None:
+            gate.wait(5)
+        if fail_first and len(calls) == 1:
+            raise FileNotFoundError("missing encoder.onnx")
+        return FakeSpotter()
+
+    return KwsModelRegistry(builder=builder)
+
+
+class TestKwsModelRegistry:
+    """Tests for KwsModelRegistry."""
+
+    def test_preload_is_shared_with_later_get(self):
+        calls = []
+        gate = threading.Event()
+        registry = make_registry(calls, gate)
+        spec = KwsModelSpec(model_dir="models")
+        future = registry.preload(spec)
+        assert not future.done()
+        gate.set()
+        spotter = registry.get(spec, timeout=5)
+        assert spotter is future.result()
+        assert registry.get(spec) is spotter
+        assert len(calls) == 1
+        stats = registry.stats()
+        assert stats["hits"] == 2
+        assert stats["models"][0]["preloaded"] and stats["models"][0]["load_ms"] is not None
+
+    def test_different_spec_loads_another_model(self):
+        calls = []
+        registry = make_registry(calls)
+        a = registry.get(KwsModelSpec(model_dir="models", num_threads=2))
+        b = registry.get(KwsModelSpec(model_dir="models", num_threads=4))
+        assert a is not b and len(calls) == 2
+
+    def test_failed_load_is_retried(self):
+        calls = []
+        registry = make_registry(calls, fail_first=True)
+        spec = KwsModelSpec(model_dir="models")
+        with pytest.raises(FileNotFoundError):
+            registry.get(spec)
+        assert registry.get(spec) is not None
+        assert len(calls) == 2
+        assert registry.stats()["last_error"] == "missing encoder.onnx"
+
+    def test_preload_skipped_when_disabled(self):
+        registry = make_registry([])
+        config = FakeConfig({"WAKE_WORD_OPTIONS.USE_WAKE_WORD": False})
+        assert registry.preload_from_config(config) is None
+        assert registry.stats()["models"] == []
+
+
+class TestKeywordReload:
+    """WakeWordDetector reuses the registry model and recompiles only keywords."""
+
+    @pytest.fixture
+    def detector(self, monkeypatch):
+        config = FakeConfig(
+            {
+                "WAKE_WORD_OPTIONS.USE_WAKE_WORD": True,
+                "WAKE_WORD_OPTIONS.MODEL_PATH": "models",
+                "WAKE_WORD_OPTIONS.KEYWORDS_THRESHOLD": 0.3,
+                "WAKE_WORD_OPTIONS.KEYWORDS_SCORE": 2.0,
+            }
+        )
+        calls = []
+        registry = make_registry(calls)
+        monkeypatch.setattr(wake_word_detect.ConfigManager, "get_instance", lambda: config)
+        monkeypatch.setattr(wake_word_detect, "get_kws_model_registry", lambda: registry)
+        detector = WakeWordDetector()
+        detector.config_values = config.values
+        detector.load_calls = calls
+        return detector
+
+    def test_model_comes_from_registry(self, detector):
+        assert detector.enabled
+        assert isinstance(detector.keyword_spotter, FakeSpotter)
+        assert detector.model_wait_ms is not None and detector.model_load_ms is not None
+        assert WakeWordDetector().keyword_spotter is detector.keyword_spotter
+        assert len(detector.load_calls) == 1
+
+    def test_reload_recompiles_keywords_with_new_threshold(self, detector):
+        detector.stream = detector._create_stream()
+        first = detector.keyword_spotter.streams[-1]
+        assert "x i a o z h i :2.0 #0.3 @xiaozhi" in first
+        assert first.count("/") == first.count("@") - 1
+
+        detector.config_values["WAKE_WORD_OPTIONS.KEYWORDS_THRESHOLD"] = 0.5
+        assert asyncio.run(detector.reload_keywords())
+        assert "#0.5" in detector.keyword_spotter.streams[-1]
+        assert detector.keyword_compiles == 2
+        assert detector.keyword_compile_ms is not None
+        assert len(detector.load_calls) == 1
@@ -0,0 +1,120 @@
+"""
+Unit Tests for the link quality probe and estimate bus
+
+Run: pytest tests/test_link_quality.py -v
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.network.link_quality import (
+    GRADE_POLICY,
+    LinkEstimate,
+    LinkQualityBus,
+    LinkQualityProbe,
+    grade_for,
+)
+from src.protocols.udp_audio import ReorderBuffer
+
+
+class FakeProtocol:
+    def __init__(self, backlog=0, loss=None):
+        self.backlog = backlog
+        self.loss = loss
+
+    def get_send_backlog(self):
+        return self.backlog
+
+    def get_udp_stream_stats(self):
+        if self.loss is None:
+            return None
+        return {"received": 100, "loss_percent": self.loss}
+
+
+def make_probe(wifi=None):
+    return LinkQualityProbe(wifi_reader=lambda: wifi, wifi_interval=0)
+
+
+class TestLinkQualityProbe:
+    """Tests for LinkQualityProbe."""
+
+    def test_no_measurements_is_good(self):
+        estimate = make_probe().estimate()
+        assert estimate.grade == "good" and estimate.score == 1.0
+        assert estimate.bitrate_bps == GRADE_POLICY["good"]["bitrate_bps"]
+
+    def test_rtt_smoothing(self):
+        probe = make_probe()
+        probe.record_rtt(0.100)
+        probe.record_rtt(0.900)
+        # One spike moves SRTT by 1/8 of the difference
+        assert probe.srtt_ms == 200.0
+        assert probe.rttvar_ms > 50.0
+
+    def test_grade_change_needs_consecutive_samples(self):
+        probe = make_probe()
+        probe.record_rtt(1.0)
+        assert probe.estimate().grade == "good"
+        estimate = probe.estimate()
+        assert estimate.grade == "poor"
+        assert estimate.jitter_window == GRADE_POLICY["poor"]["jitter_window"]
+        assert probe.grade_changes == 1
+
+    def test_sample_reads_protocol_and_wifi(self):
+        probe = make_probe(wifi={"signal": 35, "bitrate_mbps": 6.5})
+        probe._protocol = FakeProtocol(backlog=50000, loss=4.0)
+
+        async def run():
+            await probe.sample()
+            return await probe.sample()
+
+        estimate = asyncio.run(run())
+        assert estimate.wifi_signal == 35.0 and estimate.wifi_bitrate_mbps == 6.5
+        assert estimate.loss_percent == 4.0
+        assert estimate.backlog_bytes > 0
+        assert estimate.grade == "poor"
+        assert probe.bus.latest is estimate
+
+    def test_grade_thresholds(self):
+        assert grade_for(0.9) == "good"
+        assert grade_for(0.5) == "fair"
+        assert grade_for(0.1) == "poor"
+
+
+class TestLinkQualityBus:
+    """Tests for LinkQualityBus."""
+
+    def test_replay_and_unsubscribe(self):
+        bus = LinkQualityBus()
+        bus.publish(LinkEstimate(score=1.0, grade="good"))
+        received = []
+        unsubscribe = bus.subscribe(received.append)
+        assert len(received) == 1
+        unsubscribe()
+        bus.publish(LinkEstimate(score=0.1, grade="poor"))
+        assert len(received) == 1
+
+    def test_failing_subscriber_does_not_block_others(self):
+        bus = LinkQualityBus()
+        received = []
+
+        def broken(estimate):
+            raise RuntimeError("boom")
+
+        bus.subscribe(broken)
+        bus.subscribe(received.append)
+        bus.publish(LinkEstimate(score=1.0, grade="good"))
+        assert len(received) == 1
+
+
+class TestReorderRetune:
+    """ReorderBuffer depth follows the estimate."""
+
+    def test_retune_changes_window_and_delay(self):
+        buffer = ReorderBuffer(window=4, max_delay_ms=40.0)
+        buffer.retune(8, 160.0)
+        assert buffer.window == 8 and buffer.max_delay == 0.16
@@ -0,0 +1,96 @@
+"""
+Unit Tests for the event-loop lag monitor
+
+Run: pytest tests/test_loop_monitor.py -v
+"""
+
+import asyncio
+import sys
+import threading
+import traceback
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.loop_monitor import LoopLagMonitor, classify_stack
+
+ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+def blocking_helper():
+    # A synchronous wait inside a coroutine, like subprocess.run or time.sleep
+    threading.Event().wait(0.3)
+
+
+def run_monitored(monitor, body):
+    async def main():
+        monitor.start(asyncio.get_running_loop())
+        try:
+            await body()
+            # Let the delayed heartbeat land and be recorded
+            await asyncio.sleep(0.15)
+        finally:
+            monitor.stop()
+
+    asyncio.run(main())
+
+
+class TestLoopLagMonitor:
+    """Tests for LoopLagMonitor."""
+
+    def test_blocking_call_is_attributed_to_project_site(self):
+        monitor = LoopLagMonitor(threshold_ms=50, interval=0.02, sample_interval=0.02)
+
+        async def body():
+            await asyncio.sleep(0.05)
+            blocking_helper()
+
+        run_monitored(monitor, body)
+        report = monitor.report()
+        assert report["blocks"] >= 1
+        assert report["lag_ms"]["max"] >= 200
+        top = report["culprits"][0]
+        assert top["site"].startswith("tests/test_loop_monitor.py:")
+        assert top["site"].endswith("blocking_helper")
+        assert any(call.startswith("threading.py:") for call in top["calls"])
+        assert any("blocking_helper" in line for line in top["stack"])
+        assert report["recent"][-1]["site"] == top["site"]
+
+    def test_idle_loop_records_lag_without_blocks(self):
+        monitor = LoopLagMonitor(threshold_ms=200, interval=0.01)
+
+        async def body():
+            await asyncio.sleep(0.1)
+
+        run_monitored(monitor, body)
+        stats = monitor.stats()
+        assert stats["beats"] >= 3
+        assert stats["blocks"] == 0
+        assert monitor.report()["culprits"] == []
+
+    def test_reset_clears_report(self):
+        monitor = LoopLagMonitor(threshold_ms=10)
+        monitor._record(50.0, [])
+        assert monitor.report()["culprits"][0]["count"] == 1
+        monitor.reset()
+        assert monitor.stats()["blocks"] == 0 and monitor.report()["culprits"] == []
+
+
+class TestClassifyStack:
+    """classify_stack picks the innermost project frame and the leaf call."""
+
+    def test_library_leaf_under_project_frame(self):
+        stack = [
+            traceback.FrameSummary("/usr/lib/python3/asyncio/events.py", 80, "_run"),
+            traceback.FrameSummary(f"{ROOT}/src/network/wifi_manager.py", 120, "scan_wifi_networks"),
+            traceback.FrameSummary("/usr/lib/python3/subprocess.py", 1200, "communicate"),
+        ]
+        assert classify_stack(stack) == (
+            "src/network/wifi_manager.py:120 scan_wifi_networks",
+            "subprocess.py:1200 communicate",
+        )
+
+    def test_no_project_frame(self):
+        stack = [traceback.FrameSummary("/usr/lib/python3/selectors.py", 468, "select")]
+        assert classify_stack(stack) == ("selectors.py:468 select", "selectors.py:468 select")
@@ -0,0 +1,160 @@
+"""
+Unit Tests for the music bus and progressive decoder
+
+Run: pytest tests/test_music_bus.py -v
+"""
+
+import sys
+import threading
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio_codecs import music_bus
+from src.audio_codecs.music_bus import DUCK_GAIN, MusicBus, MusicDecoder
+
+
+class TestMusicBus:
+    """Tests for MusicBus."""
+
+    def test_pull_in_order_and_position(self):
+        bus = MusicBus()
+        session = bus.start(1000)
+        bus.push(session, np.arange(6, dtype=np.int16))
+        bus.push(session, np.arange(6, 10, dtype=np.int16))
+        out = bus.pull(8)
+        assert list(out) == list(range(8))
+        assert bus.position_seconds() == 0.008
+
+    def test_underrun_pads_silence(self):
+        bus = MusicBus()
+        session = bus.start(1000)
+        bus.push(session, np.full(3, 100, dtype=np.int16))
+        out = bus.pull(5)
+        assert list(out) == [100, 100, 100, 0, 0]
+        assert bus.underruns == 1
+
+    def test_drained_after_finish(self):
+        bus = MusicBus()
+        session = bus.start(1000)
+        bus.push(session, np.ones(4, dtype=np.int16))
+        bus.finish(session)
+        assert bus.active and not bus.drained
+        bus.pull(4)
+        assert bus.drained and not bus.active
+        assert bus.pull(4) is None
+
+    def test_paused_bus_yields_nothing(self):
+        bus = MusicBus()
+        session = bus.start(1000)
+        bus.push(session, np.ones(4, dtype=np.int16))
+        bus.set_paused(True)
+        assert bus.pull(4) is None
+        bus.set_paused(False)
+        assert bus.pull(4) is not None
+
+    def test_stale_session_rejected(self):
+        bus = MusicBus()
+        old = bus.start(1000)
+        bus.start(1000)
+        assert bus.push(old, np.ones(4, dtype=np.int16)) is False
+        bus.finish(old)
+        assert not bus.drained
+
+    def test_push_blocks_when_full(self):
+        bus = MusicBus(capacity_ms=10)
+        session = bus.start(1000)  # capacity 10 samples
+        bus.push(session, np.ones(10, dtype=np.int16))
+        done = threading.Event()
+
+        def producer():
+            bus.push(session, np.ones(5, dtype=np.int16), timeout=0.05)
+            done.set()
+
+        threading.Thread(target=producer, daemon=True).start()
+        time.sleep(0.1)
+        assert not done.is_set()
+        bus.pull(6)
+        assert done.wait(1.0)
+
+    def test_ducking_ramps_down(self):
+        bus = MusicBus()
+        session = bus.start(1000)  # ramp 150 samples
+        bus.push(session, np.full(400, 1000, dtype=np.int16))
+        bus.set_ducked(True)
+        out = bus.pull(200)
+        assert out[0] > 990
+        assert np.all(np.diff(out) <= 0)
+        assert abs(out[-1] - 1000 * DUCK_GAIN) < 1
+        steady = bus.pull(100)
+        assert np.allclose(steady, 1000 * DUCK_GAIN)
+
+    def test_mix_wide_keeps_shape(self):
+        bus = MusicBus()
+        session = bus.start(1000)
+        bus.push(session, np.full(4, 30000, dtype=np.int16))
+        frame = np.full((4, 1), 10000, dtype=np.int16)
+        out = bus.mix_wide(frame)
+        assert out.dtype == np.int32 and out.shape == (4, 1)
+        assert np.all(out == 40000)
+
+
+class TestMusicDecoder:
+    """Tests for MusicDecoder (WAV path, no ffmpeg)."""
+
+    def test_wav_decoded_progressively(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(music_bus.shutil, "which", lambda name: None)
+        path = tmp_path / "song.wav"
+        data = np.full(1600, 500, dtype=np.int16)  # 0.2s @ 8kHz
+        with wave.open(str(path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(data.tobytes())
+
+        bus = MusicBus()
+        session = bus.start(16000)
+        decoder = MusicDecoder(bus, path, 16000, start_seconds=0.1)
+        decoder.start(session)
+        decoder._thread.join(2.0)
+        assert bus.error is None
+        out = bus.pull(1600)
+        assert np.all(out == 500)
+        assert bus.drained
+
+    def test_unsupported_without_ffmpeg(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(music_bus.shutil, "which", lambda name: None)
+        bus = MusicBus()
+        session = bus.start(16000)
+        decoder = MusicDecoder(bus, tmp_path / "song.mp3", 16000)
+        decoder.start(session)
+        decoder._thread.join(2.0)
+        assert bus.error and bus.drained
+
+    def test_unavailable_reason(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(music_bus.shutil, "which", lambda name: None)
+        mp3 = tmp_path / "song.mp3"
+        assert "không tồn tại" in MusicDecoder.unavailable_reason(mp3)
+        mp3.write_bytes(b"\x00")
+        assert "ffmpeg" in MusicDecoder.unavailable_reason(mp3)
+        wav = tmp_path / "song.wav"
+        wav.write_bytes(b"\x00")
+        assert MusicDecoder.unavailable_reason(wav) is None
+        monkeypatch.setattr(music_bus.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+        assert MusicDecoder.unavailable_reason(mp3) is None
+
+    def test_corrupt_wav_reports_error(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(music_bus.shutil, "which", lambda name: None)
+        path = tmp_path / "broken.wav"
+        path.write_bytes(b"not a wav file")
+        bus = MusicBus()
+        session = bus.start(16000)
+        decoder = MusicDecoder(bus, path, 16000)
+        decoder.start(session)
+        decoder._thread.join(2.0)
+        assert bus.error and not bus.started
@@ -0,0 +1,115 @@
+"""
+Unit Tests for the outbound message queue
+
+Run: pytest tests/test_outbound_queue.py -v
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.protocols.outbound_queue import OutboundQueue, classify_message
+from src.protocols.protocol import Protocol
+
+
+def msg(msg_type, **extra):
+    return json.dumps({"session_id": "old", "type": msg_type, **extra})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestOutboundQueue:
+    """Tests for OutboundQueue."""
+
+    def test_classification(self):
+        assert classify_message(msg("listen", state="start"))[0] == "control"
+        assert classify_message(msg("mcp", payload={}))[0] == "mcp"
+        assert classify_message(msg("iot", states=[])) == ("iot", "iot:states")
+        assert classify_message(msg("hello"))[0] is None
+        assert classify_message(msg("goodbye"))[0] is None
+        assert classify_message("not json")[0] is None
+
+    def test_replay_in_original_order(self):
+        queue = OutboundQueue()
+        sent = [msg("mcp", payload={"id": 1}), msg("abort"), msg("iot", descriptors=[])]
+        for m in sent:
+            assert queue.push(m)
+        assert [e.message for e in queue.take_due()] == sent
+        assert len(queue) == 0
+
+    def test_expired_messages_dropped(self):
+        clock = FakeClock()
+        queue = OutboundQueue(clock=clock)
+        queue.push(msg("listen", state="start"))
+        queue.push(msg("mcp", payload={}))
+        clock.now += 10
+        assert [e.kind for e in queue.take_due()] == ["mcp"]
+        assert queue.expired == 1
+
+    def test_iot_states_coalesced(self):
+        queue = OutboundQueue()
+        queue.push(msg("iot", states=[1]))
+        queue.push(msg("iot", states=[2]))
+        entries = queue.take_due()
+        assert len(entries) == 1 and json.loads(entries[0].message)["states"] == [2]
+        assert queue.coalesced == 1
+
+    def test_full_queue_evicts_lowest_priority(self):
+        queue = OutboundQueue(capacity=2)
+        queue.push(msg("iot", descriptors=[1]))
+        queue.push(msg("mcp", payload={}))
+        assert queue.push(msg("abort"))
+        assert [e.kind for e in queue.take_due()] == ["mcp", "control"]
+        queue = OutboundQueue(capacity=1)
+        queue.push(msg("abort"))
+        assert not queue.push(msg("iot", descriptors=[]))
+        assert queue.evicted == 1
+
+    def test_rebind_session(self):
+        queue = OutboundQueue()
+        queue.push(msg("mcp", payload={}))
+        entry = queue.take_due()[0]
+        assert json.loads(OutboundQueue.rebind_session(entry, "new"))["session_id"] == "new"
+        assert OutboundQueue.rebind_session(entry, "") is entry.message
+
+
+class FlakyProtocol(Protocol):
+    def __init__(self, fail_after):
+        super().__init__()
+        self.fail_after = fail_after
+        self.sent = []
+
+    async def _transmit(self, message):
+        if len(self.sent) >= self.fail_after:
+            raise ConnectionError("closed again")
+        self.sent.append(json.loads(message))
+
+
+class TestProtocolReplay:
+    """Tests for Protocol._replay_outbound."""
+
+    def test_replay_rebinds_and_keeps_rest_on_failure(self):
+        protocol = FlakyProtocol(fail_after=1)
+        protocol.session_id = "s2"
+        for i in range(3):
+            protocol._queue_outbound(msg("mcp", payload={"id": i}))
+
+        asyncio.run(protocol._replay_outbound())
+        assert [m["payload"]["id"] for m in protocol.sent] == [0]
+        assert protocol.sent[0]["session_id"] == "s2"
+        assert protocol.get_outbound_stats()["depth"] == 2
+
+        protocol.fail_after = 10
+        asyncio.run(protocol._replay_outbound())
+        assert [m["payload"]["id"] for m in protocol.sent] == [0, 1, 2]
+        assert protocol.get_outbound_stats()["replayed"] == 3
@@ -0,0 +1,93 @@
+"""
+Unit Tests for software output gain and soft limiter
+
+Run: pytest tests/test_output_gain.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio_codecs.earcons import EarconMixer
+from src.audio_codecs.output_gain import OutputGainStage, volume_to_gain
+
+
+class TestVolumeCurve:
+    """Tests for volume_to_gain."""
+
+    def test_endpoints(self):
+        assert volume_to_gain(100) == 1.0
+        assert volume_to_gain(0) == 0.0
+        assert volume_to_gain(150) == 1.0
+        assert volume_to_gain(-5) == 0.0
+
+    def test_monotonic_db_scale(self):
+        assert abs(volume_to_gain(50) - 0.1) < 1e-9  # -20 dB
+        gains = [volume_to_gain(v) for v in range(0, 101, 10)]
+        assert gains == sorted(gains)
+
+
+class TestOutputGainStage:
+    """Tests for OutputGainStage."""
+
+    def test_unity_int16_is_passthrough(self):
+        stage = OutputGainStage(100)
+        frame = np.full((480, 1), 32000, dtype=np.int16)
+        assert stage.process(frame, 24000) is frame
+
+    def test_steady_gain_applied(self):
+        stage = OutputGainStage(50)
+        out = stage.process(np.full(480, 10000, dtype=np.int16), 24000)
+        assert out.dtype == np.int16
+        assert np.all(out == 1000)
+
+    def test_ramp_is_smooth_and_reaches_target(self):
+        stage = OutputGainStage(100, ramp_ms=10)
+        stage.set_volume(0)
+        frame = np.full(480, 10000, dtype=np.int16)  # 20ms @ 24kHz
+        out = stage.process(frame, 24000)
+        # Gain giảm dần trong 240 mẫu đầu rồi giữ ở 0
+        assert np.all(np.diff(out.astype(np.int32)) <= 0)
+        assert out[0] > 9000
+        assert np.all(out[240:] == 0)
+        assert stage.gain == 0.0
+
+    def test_ramp_spans_frames(self):
+        stage = OutputGainStage(0, ramp_ms=40)
+        stage.set_volume(100)
+        frame = np.full(480, 10000, dtype=np.int16)  # nửa thời gian ramp
+        out = stage.process(frame, 24000)
+        assert 0.45 < stage.gain < 0.55
+        assert out[-1] < 10000
+        out = stage.process(frame, 24000)
+        assert stage.gain == 1.0
+        assert out[-1] == 10000
+
+    def test_soft_limiter_compresses_wide_sum(self):
+        stage = OutputGainStage(100)
+        wide = np.array([10000, 40000, -60000, 29000], dtype=np.int32)
+        out = stage.process(wide, 24000)
+        assert out.dtype == np.int16
+        assert out[0] == 10000  # dưới ngưỡng không đổi
+        assert 29490 < out[1] <= 32767
+        assert -32768 <= out[2] < -29490
+        assert out[1] < -out[2]  # nén mềm, vẫn giữ thứ tự biên độ
+        assert stage.limited_samples == 2
+
+    def test_keeps_shape(self):
+        stage = OutputGainStage(80)
+        frame = np.ones((96, 1), dtype=np.int16) * 1000
+        assert stage.process(frame, 48000).shape == (96, 1)
+
+    def test_with_earcon_mix(self):
+        mixer = EarconMixer()
+        mixer.play(np.full(4, 30000, dtype=np.int16))
+        frame = np.full((4, 1), 10000, dtype=np.int16)
+        wide = mixer.mix_wide(frame)
+        assert wide.dtype == np.int32 and wide.shape == (4, 1)
+        out = OutputGainStage(100).process(wide, 24000)
+        assert np.all(out > 29490) and np.all(out <= 32767)
@@ -0,0 +1,146 @@
+"""
+Unit Tests for the local stand-in voice server (scripts/standin_server.py)
+
+Run: pytest tests/test_standin_server.py -v
+"""
+
+import asyncio
+import struct
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.standin_server import (
+    CONNACK,
+    CONNECT,
+    PUBLISH,
+    SUBACK,
+    SUBSCRIBE,
+    StandinConfig,
+    StandinServer,
+    build_packet,
+    encode_string,
+    read_packet,
+    topic_matches,
+)
+from src.constants.constants import ListeningMode
+from src.protocols.udp_audio import AesCtrCodec
+from src.protocols.websocket_protocol import WebsocketProtocol
+from src.utils import json_codec
+
+
+class TestWebSocketFront:
+    """The real WebsocketProtocol against the stand-in server."""
+
+    def test_hello_mcp_burst_and_tts(self):
+        async def run():
+            server = StandinServer(StandinConfig(tts_frames=10, frame_ms=10, seed=1))
+            await server.start(mqtt_port=None)
+            protocol = WebsocketProtocol()
+            protocol.WEBSOCKET_URL = server.client_config()["WEBSOCKET_URL"]
+            received = {"json": [], "audio": 0}
+
+            def on_json(data):
+                received["json"].append(data)
+                payload = data.get("payload") or {}
+                if data.get("type") == "mcp" and "method" in payload:
+                    reply = {"jsonrpc": "2.0", "id": payload["id"], "result": {"tools": []}}
+                    asyncio.ensure_future(protocol.send_mcp_message(reply))
+
+            def on_audio(frame):
+                received["audio"] += 1
+
+            protocol.on_incoming_json(on_json)
+            protocol.on_incoming_audio(on_audio)
+            try:
+                assert await protocol.connect()
+                session = await server.wait_for_session(timeout=2)
+                assert await session.mcp_burst(5) == 5
+
+                await protocol.send_start_listening(ListeningMode.MANUAL)
+                await protocol.send_audio(b"\x00" * 40)
+                await protocol.send_stop_listening()
+                for _ in range(100):
+                    if any(m.get("state") == "stop" for m in received["json"]):
+                        break
+                    await asyncio.sleep(0.02)
+            finally:
+                await protocol.close_audio_channel()
+                await server.stop()
+            return server.report(), received
+
+        report, received = asyncio.run(run())
+        latency = report["latency_ms"]
+        assert latency["ws_mcp_tools_list_ms"]["count"] == 5
+        assert "ws_hello_ms" in latency and "ws_listen_to_first_audio_ms" in latency
+        assert received["audio"] == 10
+        assert [m.get("state") for m in received["json"] if m.get("type") == "tts"] == [
+            "start",
+            "sentence_start",
+            "stop",
+        ]
+
+
+class TestMqttUdpFront:
+    """A raw MQTT client plus UDP socket against the embedded broker."""
+
+    def test_hello_over_broker_and_lossy_udp_tts(self):
+        async def run():
+            server = StandinServer(
+                StandinConfig(tts_frames=20, frame_ms=5, loss_percent=50.0, seed=3)
+            )
+            await server.start(ws_port=None)
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.mqtt.broker.port)
+
+            connect = (
+                encode_string("MQTT") + bytes([4, 0x02]) + struct.pack(">H", 60)
+                + encode_string("dev-1")
+            )
+            writer.write(build_packet(CONNECT, 0, connect))
+            assert (await read_packet(reader))[0] == CONNACK
+            writer.write(build_packet(SUBSCRIBE, 2, b"\x00\x01" + encode_string("devices/p2p/dev-1") + b"\x00"))
+            assert (await read_packet(reader))[0] == SUBACK
+
+            hello = json_codec.dumps_bytes({"type": "hello", "transport": "udp"})
+            writer.write(build_packet(PUBLISH, 0, encode_string("device-server") + hello))
+            packet_type, _, body = await read_packet(reader)
+            assert packet_type == PUBLISH
+            (length,) = struct.unpack_from(">H", body, 0)
+            reply = json_codec.loads(body[2 + length:])
+            udp = reply["udp"]
+
+            loop = asyncio.get_running_loop()
+            codec = AesCtrCodec(udp["key"], udp["nonce"])
+            frames = []
+
+            class Receiver(asyncio.DatagramProtocol):
+                def datagram_received(self, data, addr):
+                    frames.append(codec.decrypt_packet(data))
+
+            transport, _ = await loop.create_datagram_endpoint(
+                Receiver, remote_addr=(udp["server"], udp["port"])
+            )
+            transport.sendto(codec.encrypt_packet(b"mic", 1))
+            session = await server.wait_for_session(timeout=2)
+            await asyncio.sleep(0.05)
+            await session.stream_tts()
+            await asyncio.sleep(0.05)
+
+            transport.close()
+            writer.close()
+            await server.stop()
+            return reply, session.stats(), frames, server.report()
+
+        reply, stats, frames, report = asyncio.run(run())
+        assert reply["transport"] == "udp" and reply["session_id"] == stats["session_id"]
+        assert stats["audio_frames_in"] == 1
+        assert stats["tts_frames_dropped"] > 0
+        assert len(frames) == stats["tts_frames_sent"] == 20 - stats["tts_frames_dropped"]
+        assert report["latency_ms"]["mqtt_connect_to_hello_ms"]["count"] == 1
+
+    def test_topic_matching(self):
+        assert topic_matches("devices/#", "devices/p2p/a")
+        assert topic_matches("devices/+/a", "devices/p2p/a")
+        assert not topic_matches("devices/+", "devices/p2p/a")
@@ -0,0 +1,73 @@
+"""
+Unit Tests for stream switch gap recording
+
+Run: pytest tests/test_stream_switcher.py -v
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio_codecs.stream_switcher import StreamRoute, SwitchRecorder
+
+
+class TestSwitchRecorder:
+    """Tests for SwitchRecorder."""
+
+    def test_seamless_switch_has_no_gap(self):
+        rec = SwitchRecorder(frame_ms=20)
+        rec.note_frame("input", 1, now=1.000)
+        rec.note_frame("input", 1, now=1.020)
+        rec.flipped("input", 2, from_device=1, to_device=3, parallel=True, open_ms=50)
+        rec.note_frame("input", 2, now=1.040)
+        last = rec.last("input")
+        assert last["gap_ms"] == 0.0
+        assert last["parallel"] is True
+        assert last["to_device"] == 3
+        assert rec.total == 1
+
+    def test_gap_measured_beyond_frame_period(self):
+        rec = SwitchRecorder(frame_ms=20)
+        rec.note_frame("output", 1, now=2.000)
+        rec.flipped("output", 2, 1, 2, parallel=False, open_ms=120)
+        rec.note_frame("output", 2, now=2.150)
+        assert rec.last("output")["gap_ms"] == 130.0
+
+    def test_old_route_frame_does_not_complete_switch(self):
+        rec = SwitchRecorder(frame_ms=20)
+        rec.note_frame("input", 1, now=1.000)
+        rec.flipped("input", 2, 1, 2, parallel=True, open_ms=10)
+        # In-flight callback of the old route right after the flip
+        rec.note_frame("input", 1, now=1.020)
+        assert rec.history() == []
+        rec.note_frame("input", 2, now=1.040)
+        assert rec.last("input")["gap_ms"] == 0.0
+
+    def test_kinds_are_independent(self):
+        rec = SwitchRecorder(frame_ms=20)
+        rec.flipped("input", 5, None, 1, parallel=True, open_ms=1)
+        rec.note_frame("output", 5, now=1.0)
+        assert rec.last("input") is None
+        rec.note_frame("input", 5, now=1.0)
+        assert rec.last("input")["gap_ms"] is None  # no frame before the switch
+
+    def test_history_bounded(self):
+        rec = SwitchRecorder(frame_ms=20, history=3)
+        for gen in range(10):
+            rec.flipped("input", gen, None, gen, parallel=True, open_ms=1)
+            rec.note_frame("input", gen, now=float(gen))
+        assert len(rec.history()) == 3
+        assert rec.total == 10
+
+
+class TestStreamRoute:
+    """Tests for StreamRoute."""
+
+    def test_own_buffer(self):
+        a = StreamRoute("input", 1, 0, 48000, 960)
+        b = StreamRoute("input", 2, 0, 48000, 960)
+        a.buffer.append(1)
+        assert len(b.buffer) == 0
+        assert a.stream is None
@@ -0,0 +1,149 @@
+"""
+Unit Tests for the Application.spawn task supervisor
+
+Run: pytest tests/test_task_supervisor.py -v
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.task_supervisor import LEAK_GRACE_S, TaskGroupSpec, TaskSupervisor
+
+
+class Clock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTaskSupervisor:
+    """Tests for TaskSupervisor."""
+
+    def test_counts_and_durations_by_name(self):
+        clock = Clock()
+        supervisor = TaskSupervisor(clock=clock)
+
+        async def ok():
+            clock.now += 0.25
+
+        async def boom():
+            raise ValueError("x")
+
+        async def main():
+            await asyncio.gather(
+                supervisor.spawn(ok(), "state:idle"),
+                supervisor.spawn(ok(), "state:idle"),
+                supervisor.spawn(boom(), "plugin:on_json"),
+                return_exceptions=True,
+            )
+
+        asyncio.run(main())
+        stats = supervisor.stats()
+        assert stats["active"] == 0
+        assert stats["names"]["state:idle"]["spawned"] == 2
+        assert stats["names"]["state:idle"]["completed"] == 2
+        assert stats["names"]["state:idle"]["max_ms"] >= 250
+        assert stats["names"]["plugin:on_json"]["failed"] == 1
+
+    def test_group_limits_concurrency_and_drops_overflow(self):
+        supervisor = TaskSupervisor(groups={"audio-send": TaskGroupSpec(limit=2, max_pending=3)})
+        running = []
+        peak = []
+
+        async def send():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.pop()
+
+        async def main():
+            tasks = [supervisor.spawn(send(), "audio:send", group="audio-send") for _ in range(5)]
+            assert tasks[3] is None and tasks[4] is None
+            await asyncio.gather(*[t for t in tasks if t])
+
+        asyncio.run(main())
+        assert max(peak) == 2
+        group = supervisor.stats()["groups"]["audio-send"]
+        assert group["dropped"] == 2 and group["active"] == 0
+        assert supervisor.stats()["names"]["audio:send"]["completed"] == 3
+
+    def test_incoming_json_is_never_dropped_and_audio_runs_beside_slow_tools(self):
+        supervisor = TaskSupervisor()
+        release = None
+
+        async def slow_tool():
+            await release.wait()
+
+        async def main():
+            nonlocal release
+            release = asyncio.Event()
+            tools = [supervisor.spawn(slow_tool(), "plugin:on_json", group="plugin-notify") for _ in range(300)]
+            audio = supervisor.spawn(asyncio.sleep(0), "plugin:on_audio", group="plugin-audio")
+            assert all(tools)
+            await asyncio.wait_for(audio, timeout=1)
+            release.set()
+            await asyncio.gather(*tools)
+
+        asyncio.run(main())
+        stats = supervisor.stats()
+        assert stats["groups"]["plugin-notify"]["dropped"] == 0
+        assert stats["names"]["plugin:on_json"]["completed"] == 300
+
+    def test_cancel_group_leaves_other_groups(self):
+        supervisor = TaskSupervisor()
+
+        async def main():
+            audio = [supervisor.spawn(asyncio.sleep(10), "audio:send", group="audio-send") for _ in range(6)]
+            ui = supervisor.spawn(asyncio.sleep(0.05), "ui:callback", group="ui")
+            await asyncio.sleep(0)
+            assert supervisor.cancel_group("audio-send") == 6
+            await asyncio.gather(*audio, return_exceptions=True)
+            await ui
+            return audio, ui
+
+        audio, ui = asyncio.run(main())
+        assert all(t.cancelled() for t in audio)
+        assert not ui.cancelled()
+        assert supervisor.stats()["names"]["audio:send"]["cancelled"] == 6
+
+    def test_long_running_and_leaked_tasks_are_reported(self):
+        clock = Clock()
+        supervisor = TaskSupervisor(clock=clock)
+        release = None
+
+        async def stubborn():
+            while True:
+                try:
+                    await release.wait()
+                    return
+                except asyncio.CancelledError:
+                    continue  # swallows cancellation
+
+        async def main():
+            nonlocal release
+            release = asyncio.Event()
+            slow = supervisor.spawn(asyncio.sleep(10), "plugin:on_json", group="plugin-notify")
+            forever = supervisor.spawn(asyncio.sleep(10), "ui:start")
+            leaky = supervisor.spawn(stubborn(), "leaky")
+            await asyncio.sleep(0)
+
+            clock.now += 31
+            overdue = supervisor.long_running()
+            assert [item["name"] for item in overdue] == ["plugin:on_json"]
+
+            leaked = await supervisor.cancel_all(timeout=0.05)
+            assert leaked == ["leaky"]
+            clock.now += LEAK_GRACE_S + 1
+            assert [item["name"] for item in supervisor.leaked()] == ["leaky"]
+
+            release.set()
+            await asyncio.gather(slow, forever, leaky, return_exceptions=True)
+
+        asyncio.run(main())
+        assert supervisor.stats()["leaked"] == []
@@ -0,0 +1,123 @@
+"""
+Unit Tests for lazy MCP tool package loading
+
+Run: pytest tests/test_tool_registry.py -v
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.mcp.mcp_server import (
+    LazyMcpTool,
+    McpServer,
+    McpTool,
+    Property,
+    PropertyList,
+    PropertyType,
+    _as_tool,
+)
+from src.mcp.tool_registry import ToolPackage, ToolRegistry
+
+
+@pytest.fixture
+def heavy_module(tmp_path, monkeypatch):
+    """A throwaway tool module; importing it counts as the heavy import."""
+    (tmp_path / "fake_heavy_tools.py").write_text("IMPORTED = True\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    sys.modules.pop("fake_heavy_tools", None)
+    yield "fake_heavy_tools"
+    sys.modules.pop("fake_heavy_tools", None)
+
+
+def make_registry(tmp_path, module, calls, version="1"):
+    def loader(add_tool):
+        calls.append("load")
+
+        async def echo(args):
+            return f"echo:{args['text']}"
+
+        props = PropertyList([Property("text", PropertyType.STRING)])
+        add_tool(("self.heavy.echo", "Echo text", props, echo))
+
+    return ToolRegistry(
+        [ToolPackage("heavy", module, loader)],
+        manifest_path=tmp_path / "manifest.json",
+        normalize=_as_tool,
+        version=version,
+    )
+
+
+class TestToolRegistry:
+    """Tests for ToolRegistry."""
+
+    def test_first_boot_loads_eagerly_and_writes_manifest(self, tmp_path, heavy_module):
+        calls = []
+        registry = make_registry(tmp_path, heavy_module, calls)
+        tools = []
+        registry.register_all(tools.append, lambda d, p: None)
+        assert calls == ["load"]
+        assert isinstance(tools[0], McpTool) and not isinstance(tools[0], LazyMcpTool)
+        assert (tmp_path / "manifest.json").exists()
+        stats = registry.stats()["packages"]["heavy"]
+        assert stats["loaded"] and stats["tools"] == 1 and stats["import_ms"] is not None
+
+    def test_second_boot_registers_descriptors_only(self, tmp_path, heavy_module):
+        make_registry(tmp_path, heavy_module, []).register_all(lambda t: None, None)
+        sys.modules.pop(heavy_module, None)
+
+        calls = []
+        server = McpServer()
+        server.tool_registry = make_registry(tmp_path, heavy_module, calls)
+        server.tool_registry.register_all(server.add_tool, server._make_lazy_tool)
+        assert calls == []
+        assert heavy_module not in sys.modules
+        assert isinstance(server.tools[0], LazyMcpTool)
+        assert server.tools[0].json_with_size()[0]["inputSchema"]["required"] == ["text"]
+
+        replies = []
+
+        async def send(msg):
+            replies.append(msg)
+
+        server.set_send_callback(send)
+
+        async def run():
+            await asyncio.gather(
+                *(
+                    server._handle_tool_call(
+                        i, {"name": "self.heavy.echo", "arguments": {"text": str(i)}}
+                    )
+                    for i in range(3)
+                )
+            )
+
+        asyncio.run(run())
+        # One import shared by concurrent calls; the lazy entry is swapped in place
+        assert calls == ["load"]
+        assert heavy_module in sys.modules
+        assert not isinstance(server.tools[0], LazyMcpTool)
+        texts = sorted(r["result"]["content"][0]["text"] for r in replies)
+        assert texts == ["echo:0", "echo:1", "echo:2"]
+
+    def test_changed_fingerprint_reloads_eagerly(self, tmp_path, heavy_module):
+        make_registry(tmp_path, heavy_module, []).register_all(lambda t: None, None)
+        calls = []
+        registry = make_registry(tmp_path, heavy_module, calls, version="2")
+        registry.register_all(lambda t: None, lambda d, p: None)
+        assert calls == ["load"]
+
+    def test_when_loaded_runs_after_lazy_load(self, tmp_path, heavy_module):
+        make_registry(tmp_path, heavy_module, []).register_all(lambda t: None, None)
+        registry = make_registry(tmp_path, heavy_module, [])
+        registry.register_all(lambda t: None, lambda d, p: d)
+        seen = []
+        registry.when_loaded("heavy", lambda: seen.append("ready"))
+        assert seen == []
+        asyncio.run(registry.warm_up())
+        assert seen == ["ready"] and registry.is_loaded("heavy")
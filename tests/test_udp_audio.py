@@ -0,0 +1,201 @@
+"""
+Unit Tests for the asyncio UDP audio channel
+
+Run: pytest tests/test_udp_audio.py -v
+"""
+
+import asyncio
+import os
+import socket
+import sys
+from pathlib import Path
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.protocols.udp_audio import (
+    AesCtrCodec,
+    ReorderBuffer,
+    UdpAudioProtocol,
+    seq_delta,
+)
+
+KEY = "00112233445566778899aabbccddeeff"
+NONCE = "01000000" + "0102030405060708" + "00000000"
+
+
+def reference_packet(payload: bytes, sequence: int) -> bytes:
+    """Packet built the way MqttProtocol used to (hex strings + Cipher per packet)."""
+    nonce = NONCE[:4] + format(len(payload), "04x") + NONCE[8:24] + format(sequence, "08x")
+    enc = Cipher(
+        algorithms.AES(bytes.fromhex(KEY)), modes.CTR(bytes.fromhex(nonce))
+    ).encryptor()
+    return bytes.fromhex(nonce) + enc.update(payload) + enc.finalize()
+
+
+class TestAesCtrCodec:
+    """Tests for AesCtrCodec."""
+
+    def test_matches_reference_encryption(self):
+        codec = AesCtrCodec(KEY, NONCE)
+        for size in (0, 1, 16, 17, 120, 999):
+            payload = os.urandom(size)
+            assert codec.encrypt_packet(payload, 42) == reference_packet(payload, 42)
+
+    def test_decrypt_roundtrip(self):
+        codec = AesCtrCodec(KEY, NONCE)
+        payload = os.urandom(200)
+        assert codec.decrypt_packet(reference_packet(payload, 7)) == payload
+
+    def test_nonce_layout(self):
+        codec = AesCtrCodec(KEY, NONCE)
+        nonce = codec.build_nonce(0x0123, 0xDEADBEEF)
+        assert bytes(nonce).hex() == "0100" + "0123" + "0102030405060708" + "deadbeef"
+        # Buffer is reused between packets
+        assert codec.build_nonce(1, 1) is nonce
+
+    def test_counter_wraps_like_ctr(self):
+        nonce = "ff" * 16
+        codec = AesCtrCodec(KEY, nonce)
+        payload = os.urandom(64)
+        packet = codec.encrypt_packet(payload, 0xFFFFFFFF)
+        dec = Cipher(algorithms.AES(bytes.fromhex(KEY)), modes.CTR(packet[:16])).decryptor()
+        assert dec.update(packet[16:]) == payload
+
+    def test_rejects_bad_nonce(self):
+        try:
+            AesCtrCodec(KEY, "0011")
+        except ValueError:
+            return
+        raise AssertionError("short nonce accepted")
+
+
+class TestReorderBuffer:
+    """Tests for ReorderBuffer."""
+
+    @staticmethod
+    def feed(buf, seqs, now=0.0):
+        out = []
+        for seq in seqs:
+            out.extend(buf.push(seq, 0, seq, now))
+        return out
+
+    def test_in_order_passes_through(self):
+        buf = ReorderBuffer()
+        assert self.feed(buf, [5, 6, 7]) == [5, 6, 7]
+        assert buf.deadline() is None
+        assert buf.stats()["lost"] == 0
+
+    def test_swap_is_reordered(self):
+        buf = ReorderBuffer()
+        assert self.feed(buf, [1, 3, 2, 4]) == [1, 2, 3, 4]
+        assert buf.reordered == 1 and buf.lost == 0
+
+    def test_duplicates_dropped(self):
+        buf = ReorderBuffer()
+        assert self.feed(buf, [1, 2, 2, 4, 4, 3]) == [1, 2, 3, 4]
+        assert buf.duplicates == 2
+
+    def test_window_overflow_conceals_gap(self):
+        buf = ReorderBuffer(window=2)
+        out = self.feed(buf, [1, 3, 4, 5])
+        assert out == [1, None, 3, 4, 5]
+        assert buf.lost == 1 and buf.concealed == 1
+
+    def test_late_packet_after_loss_is_stale(self):
+        buf = ReorderBuffer(window=1)
+        self.feed(buf, [1, 3, 4])
+        assert self.feed(buf, [2]) == []
+        assert buf.stale == 1
+
+    def test_expire_releases_held_packets(self):
+        buf = ReorderBuffer(max_delay_ms=40)
+        assert buf.push(1, 0, 1, now=0.0) == [1]
+        assert buf.push(3, 0, 3, now=0.01) == []
+        assert abs(buf.deadline() - 0.05) < 1e-9
+        assert buf.expire(now=0.02) == []
+        assert buf.expire(now=0.06) == [None, 3]
+
+    def test_long_gap_conceal_is_capped(self):
+        buf = ReorderBuffer(window=1, max_conceal=2)
+        out = self.feed(buf, [1, 10, 11])
+        assert out == [1, None, None, 10, 11]
+        assert buf.lost == 8 and buf.concealed == 2
+
+    def test_sequence_wraps(self):
+        buf = ReorderBuffer()
+        assert self.feed(buf, [0xFFFFFFFF, 1, 0]) == [0xFFFFFFFF, 0, 1]
+        assert seq_delta(1, 0xFFFFFFFF) == 2
+
+    def test_server_sequence_reset_resyncs(self):
+        buf = ReorderBuffer()
+        self.feed(buf, list(range(100, 110)))
+        out = self.feed(buf, [1, 2, 3, 4])
+        assert out == [3, 4]
+        assert buf.resyncs == 1
+
+    def test_idle_gap_starts_new_stream(self):
+        buf = ReorderBuffer(idle_reset_ms=1000)
+        buf.push(50, 0, 50, now=0.0)
+        assert buf.push(1, 0, 1, now=5.0) == [1]
+        assert buf.duplicates == 0
+
+    def test_jitter_from_timestamps(self):
+        buf = ReorderBuffer()
+        for i in range(20):
+            arrival = i * 0.06 + (0.01 if i % 2 else 0.0)
+            buf.push(i, i * 60, i, now=arrival)
+        assert 5.0 < buf.stats()["jitter_ms"] < 10.0
+
+
+class TestUdpAudioProtocol:
+    """Tests for UdpAudioProtocol over loopback."""
+
+    def test_receives_and_decrypts(self):
+        payloads = [os.urandom(100) for _ in range(5)]
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            got = []
+            done = asyncio.Event()
+
+            def on_audio(data):
+                got.append(data)
+                if len(got) == len(payloads):
+                    done.set()
+
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: UdpAudioProtocol(AesCtrCodec(KEY, NONCE), on_audio),
+                local_addr=("127.0.0.1", 0),
+            )
+            addr = transport.get_extra_info("sockname")
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sender.sendto(b"short", addr)
+            for i, payload in enumerate(payloads):
+                sender.sendto(reference_packet(payload, i), addr)
+            await asyncio.wait_for(done.wait(), 2.0)
+            sender.close()
+            transport.close()
+            return got, protocol
+
+        got, protocol = asyncio.run(run())
+        assert got == payloads
+        assert protocol.received == 5
+        assert protocol.invalid == 1
+
+    def test_gap_delivers_concealed_frame(self):
+        codec = AesCtrCodec(KEY, NONCE)
+        got = []
+
+        async def run():
+            protocol = UdpAudioProtocol(codec, got.append, reorder=ReorderBuffer(max_delay_ms=10))
+            for seq in (1, 3):
+                protocol.datagram_received(reference_packet(bytes([seq]) * 10, seq), None)
+            await asyncio.sleep(0.05)
+            return protocol
+
+        protocol = asyncio.run(run())
+        assert got == [b"\x01" * 10, b"", b"\x03" * 10]
+        assert protocol.stats()["lost"] == 1
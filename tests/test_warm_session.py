@@ -0,0 +1,141 @@
+"""
+Unit Tests for the warm protocol session manager
+
+Run: pytest tests/test_warm_session.py -v
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.protocols.warm_session import WarmSession
+
+
+class FakeProtocol:
+    supports_warm_session = True
+
+    def __init__(self, opened=False):
+        self.opened = opened
+        self.pings = 0
+        self.prepared = 0
+        self.closes = 0
+
+    def is_audio_channel_opened(self):
+        return self.opened
+
+    async def keepalive(self):
+        self.pings += 1
+        return 0.012
+
+    async def prepare(self):
+        self.prepared += 1
+
+    async def close_audio_channel(self):
+        self.closes += 1
+        self.opened = False
+
+
+class TestWarmSession:
+    """Tests for WarmSession."""
+
+    def test_record_open_counts_paths(self):
+        session = WarmSession(FakeProtocol())
+        session.record_open(time.monotonic(), warm=True)
+        session.record_open(time.monotonic() - 0.5, warm=False)
+        stats = session.stats()
+        assert stats["warm_opens"] == 1 and stats["cold_opens"] == 1
+        assert stats["last_cold_open_ms"] >= 500
+
+    def test_reconnects_dropped_session_in_background(self):
+        protocol = FakeProtocol(opened=False)
+        flags = []
+
+        async def connect():
+            flags.append(session.background_reconnecting)
+            protocol.opened = True
+            return True
+
+        async def run():
+            session.start(connect)
+            await asyncio.sleep(1.2)
+            await session.stop()
+
+        session = WarmSession(protocol, keepalive_interval=0.05)
+        asyncio.run(run())
+        assert flags == [True]
+        assert protocol.prepared == 1
+        assert session.background_reconnects == 1
+        assert protocol.pings > 0 and session.rtt_ms == 12.0
+
+    def test_network_change_refreshes_idle_session(self):
+        protocol = FakeProtocol(opened=True)
+
+        async def connect():
+            protocol.opened = True
+            return True
+
+        async def run():
+            session.start(connect)
+            await asyncio.sleep(0)
+            session.network_changed("IP changed")
+            await asyncio.sleep(0.05)
+            await session.stop()
+
+        session = WarmSession(protocol, keepalive_interval=10)
+        asyncio.run(run())
+        assert protocol.closes == 1
+        assert protocol.opened and session.background_reconnects == 1
+
+    def test_busy_device_is_left_alone(self):
+        protocol = FakeProtocol(opened=True)
+
+        async def run():
+            session.start(lambda: None)
+            await asyncio.sleep(0)
+            session.network_changed()
+            await asyncio.sleep(0.05)
+            await session.stop()
+
+        session = WarmSession(protocol, is_idle=lambda: False, keepalive_interval=0.01)
+        asyncio.run(run())
+        assert protocol.closes == 0 and protocol.pings == 0
+
+    def test_disabled_without_protocol_support(self):
+        protocol = FakeProtocol()
+        protocol.supports_warm_session = False
+
+        async def run():
+            session.start(lambda: None)
+            return session._task
+
+        session = WarmSession(protocol)
+        assert asyncio.run(run()) is None
+
+    def test_keeper_survives_unexpected_errors(self):
+        protocol = FakeProtocol(opened=True)
+        failures = []
+        is_opened = protocol.is_audio_channel_opened
+
+        def flaky_is_opened():
+            if len(failures) < 2:
+                failures.append(1)
+                raise RuntimeError("transport state unavailable")
+            return is_opened()
+
+        protocol.is_audio_channel_opened = flaky_is_opened
+
+        async def run():
+            session.start(lambda: None)
+            await asyncio.sleep(0.3)
+            alive = not session._task.done()
+            await session.stop()
+            return alive
+
+        session = WarmSession(protocol, keepalive_interval=0.02)
+        session.min_backoff = 0.01
+        assert asyncio.run(run())
+        assert len(failures) == 2 and protocol.pings > 0
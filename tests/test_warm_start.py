@@ -0,0 +1,161 @@
+"""
+Unit Tests for the warm-start OTA snapshot
+
+Run: pytest tests/test_warm_start.py -v
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.warm_start import WarmStartSnapshot, response_meta
+
+IDENTITY = {"ota_url": "https://ota.example/api", "device_id": "aa:bb", "client_id": "c1"}
+RESPONSE = {
+    "websocket": {"url": "wss://ws.example/v1", "token": "tok"},
+    "mqtt": {"endpoint": "mqtt.example"},
+}
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeConfig:
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.writes = []
+
+    def get_config(self, path, default=None):
+        return self.values.get(path, default)
+
+    def update_config(self, path, value):
+        self.values[path] = value
+        self.writes.append(path)
+        return True
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def snapshot(tmp_path, clock):
+    return WarmStartSnapshot(tmp_path / "warm_start.json", clock=clock, default_ttl=60, max_stale=600)
+
+
+class TestWarmStartSnapshot:
+    """Tests for WarmStartSnapshot."""
+
+    def test_roundtrip_and_expiry(self, snapshot, clock):
+        assert snapshot.load(IDENTITY) is None
+        snapshot.save(IDENTITY, RESPONSE, {"etag": '"v1"', "last_modified": None, "max_age": None})
+        data = snapshot.load(IDENTITY)
+        assert data["websocket"] == {"url": "wss://ws.example/v1", "token": "tok"}
+        assert snapshot.is_fresh(data)
+        assert snapshot.validators(data) == {"If-None-Match": '"v1"'}
+
+        clock.now += 120  # past default_ttl: still usable, but refresh needed
+        data = snapshot.load(IDENTITY)
+        assert data is not None and not snapshot.is_fresh(data)
+
+        clock.now += 1000  # past max_stale: not used for boot
+        assert snapshot.load(IDENTITY) is None
+
+    def test_identity_change_and_activation_are_rejected(self, snapshot):
+        snapshot.save(IDENTITY, RESPONSE)
+        assert snapshot.load({**IDENTITY, "device_id": "cc:dd"}) is None
+        snapshot.save(IDENTITY, {**RESPONSE, "activation": {"code": "123456"}})
+        assert snapshot.load(IDENTITY) is None
+
+    def test_touch_extends_and_keeps_validators(self, snapshot, clock):
+        snapshot.save(IDENTITY, RESPONSE, {"etag": '"v1"', "max_age": 30})
+        clock.now += 45
+        data = snapshot.load(IDENTITY)
+        assert not snapshot.is_fresh(data)
+        snapshot.touch(data, {"etag": None, "last_modified": "Tue, 01 Sep 2026 00:00:00 GMT", "max_age": None})
+        data = snapshot.load(IDENTITY)
+        assert snapshot.is_fresh(data)
+        assert snapshot.validators(data) == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Tue, 01 Sep 2026 00:00:00 GMT",
+        }
+
+    def test_apply_to_config_writes_only_differences(self, snapshot):
+        snapshot.save(IDENTITY, RESPONSE)
+        data = snapshot.load(IDENTITY)
+        config = FakeConfig({"SYSTEM_OPTIONS.NETWORK.WEBSOCKET_URL": "wss://ws.example/v1"})
+        assert snapshot.apply_to_config(config, data) == 2
+        assert config.values["SYSTEM_OPTIONS.NETWORK.WEBSOCKET_ACCESS_TOKEN"] == "tok"
+        assert snapshot.apply_to_config(config, data) == 0
+
+    def test_response_meta(self):
+        meta = response_meta({"Cache-Control": "private, max-age=300", "ETag": 'W/"x"'})
+        assert meta == {"etag": 'W/"x"', "last_modified": None, "max_age": 300.0}
+        assert response_meta({"Cache-Control": "no-store"})["max_age"] == 0.0
+
+
+class TestSnapshotBoot:
+    """SystemInitializer boots from the snapshot and refreshes it conditionally."""
+
+    @pytest.fixture
+    def initializer(self, monkeypatch, snapshot):
+        pytest.importorskip("machineid")
+        from src.core import system_initializer
+
+        class FakeOta:
+            def __init__(self):
+                self.validators = []
+                self.last_response_meta = {"etag": '"v1"', "last_modified": None, "max_age": None}
+
+            async def fetch_and_update_config(self, validators=None):
+                self.validators.append(validators)
+                return {"response_data": None, "not_modified": True}
+
+        ota = FakeOta()
+
+        async def get_instance():
+            return ota
+
+        monkeypatch.setattr(system_initializer.Ota, "get_instance", get_instance)
+        monkeypatch.setattr(system_initializer, "get_warm_start", lambda: snapshot)
+        init = system_initializer.SystemInitializer()
+        init.config_manager = FakeConfig(
+            {
+                "SYSTEM_OPTIONS.NETWORK.ACTIVATION_VERSION": "v2",
+                "SYSTEM_OPTIONS.NETWORK.OTA_VERSION_URL": IDENTITY["ota_url"],
+            }
+        )
+        init.activation_status["local_activated"] = True
+        init.fake_ota = ota
+        return init
+
+    def test_expired_snapshot_boots_and_refreshes(self, initializer, snapshot, clock):
+        snapshot.save(initializer._snapshot_identity(), RESPONSE, {"etag": '"v1"'})
+        clock.now += 120
+
+        async def run():
+            used = await initializer.stage_3_from_snapshot()
+            await asyncio.gather(*snapshot._background)
+            return used
+
+        assert asyncio.run(run())
+        assert initializer.activation_status["server_activated"]
+        assert initializer.fake_ota.validators == [{"If-None-Match": '"v1"'}]
+        assert snapshot.stats()["refresh"] == {"not_modified": 1}
+        assert snapshot.is_fresh(snapshot.load(initializer._snapshot_identity()))
+
+    def test_unactivated_device_waits_for_ota(self, initializer, snapshot):
+        snapshot.save(initializer._snapshot_identity(), RESPONSE)
+        initializer.activation_status["local_activated"] = False
+        assert not asyncio.run(initializer.stage_3_from_snapshot())